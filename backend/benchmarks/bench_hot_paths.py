@@ -0,0 +1,241 @@
+"""
+Hot-path micro-benchmarks
+The pure-Python functions and in-memory structures that run on every
+request or every order, timed at a few input sizes so a regression (or an
+accidental O(n^2)) shows up before it reaches production. No database or
+network: inputs are built in memory.
+
+    python benchmarks/bench_hot_paths.py [-k profit] [--rounds 25] [--json out.json]
+    python benchmarks/bench_hot_paths.py --compare out.json --fail-above 10
+"""
+import itertools
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+# server.py reads these at import; nothing connects until a query runs
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "benchmark")
+
+import compression  # noqa: E402
+import http_middleware  # noqa: E402
+import server  # noqa: E402
+from benchmarks.harness import benchmark, main  # noqa: E402
+from event_stream import OrderEventBus, REPLAY_BUFFER_SIZE  # noqa: E402
+from metrics import Histogram  # noqa: E402
+from query_profiler import command_shape  # noqa: E402
+from ticker_service import RecentPurchasesTicker  # noqa: E402
+
+SIZES = [10, 100, 1000]
+SEED = 42
+
+
+def make_product(i: int, variations: int = 4) -> dict:
+    created = datetime(2025, 1, 1, tzinfo=timezone.utc) + timedelta(hours=i)
+    return {
+        "id": f"product-{i}", "name": f"Netflix Premium {i}", "slug": f"netflix-premium-{i}",
+        "description": "<p>Ultra HD streaming on 4 screens. Instant delivery.</p>",
+        "image_url": f"https://i.ibb.co/abc/{i}.png", "category_id": f"cat-{i % 12}",
+        "variations": [
+            {"id": f"v-{i}-{j}", "name": f"{j + 1} Month", "price": 499.0 * (j + 1),
+             "original_price": 599.0 * (j + 1), "cost_price": 350.0 * (j + 1)}
+            for j in range(variations)
+        ],
+        "tags": ["streaming", "netflix"], "sort_order": i, "is_active": True,
+        "discord_webhooks": ["https://discord.com/api/webhooks/1/secret"],
+        "created_at": created, "updated_at": created,
+    }
+
+
+def make_order(i: int, rng: random.Random, products: int) -> dict:
+    return {
+        "id": f"order-{i}", "customer_name": f"Customer {i}", "status": "Completed",
+        "total_amount": rng.choice((499.0, 998.0, 1497.0)),
+        "created_at": (datetime(2025, 1, 1, tzinfo=timezone.utc) + timedelta(minutes=37 * i)).isoformat(),
+        "items": [
+            {"product_id": f"product-{rng.randrange(products)}", "variation_id": f"v-0-{rng.randrange(4)}",
+             "name": "Netflix Premium", "quantity": rng.randint(1, 3), "price": 499.0}
+            for _ in range(rng.randint(1, 3))
+        ],
+    }
+
+
+# ==================== RATE LIMITER ====================
+
+@benchmark("rate_limit_check", "allowed", clients=SIZES)
+def bench_rate_limit_allowed(clients: int):
+    """A fresh window every call, round-robin over `clients` IPs in the store"""
+    http_middleware.rate_limit_store.clear()
+    ips = itertools.cycle([f"10.0.{n // 256}.{n % 256}" for n in range(clients)])
+    check = http_middleware.rate_limit_check
+    return lambda: check(next(ips), 60, 0)
+
+
+@benchmark("rate_limit_check", "limited", window_size=[10, 60, 300])
+def bench_rate_limit_limited(window_size: int):
+    """An IP that has used up its window: the check must not scan the timestamps"""
+    http_middleware.rate_limit_store.clear()
+    now = time.time()
+    http_middleware.rate_limit_store["10.0.0.1"].extend(now for _ in range(window_size))
+    check = http_middleware.rate_limit_check
+    return lambda: check("10.0.0.1", window_size, 3600)
+
+
+# ==================== CATALOG ====================
+
+@benchmark("generate_slug", length=[20, 80, 400])
+def bench_generate_slug(length: int):
+    words = itertools.cycle(["PUBG", "Mobile", "UC", "(Global)", "--", "Top-Up", "&", "Netflix", "4K!!"])
+    name = ""
+    while len(name) < length:
+        name += next(words) + " "
+    return lambda: server.generate_slug(name[:length])
+
+
+def old_scrub_products(products):
+    """get_products before DocumentShape (copied verbatim)"""
+    for product in products:
+        if "created_at" in product and isinstance(product["created_at"], datetime):
+            product["created_at"] = product["created_at"].isoformat()
+        if "updated_at" in product and isinstance(product["updated_at"], datetime):
+            product["updated_at"] = product["updated_at"].isoformat()
+        if "discord_webhooks" in product:
+            product["discord_webhooks"] = []
+    return products
+
+
+@benchmark("product_scrub", "old_loop", rows=SIZES)
+def bench_scrub_old(rows: int):
+    return old_scrub_products, lambda: [make_product(i) for i in range(rows)]
+
+
+@benchmark("product_scrub", "document_shape", rows=SIZES)
+def bench_scrub_shape(rows: int):
+    """Also stands in for response_model validation, which the old loop left to FastAPI (see bench_serialization)"""
+    def projected():
+        # What PUBLIC_PRODUCT_SHAPE.projection leaves of a stored product
+        products = [make_product(i) for i in range(rows)]
+        for product in products:
+            del product["discord_webhooks"]
+            for var in product["variations"]:
+                del var["cost_price"]
+        return products
+    return server.PUBLIC_PRODUCT_SHAPE.fill_many, projected
+
+
+# ==================== ORDERS ====================
+
+@benchmark("build_items_text", items=[1, 5, 50])
+def bench_items_text(items: int):
+    order_items = [
+        server.OrderItem(name=f"PUBG Mobile UC {n}", price=99.0, quantity=n % 3 + 1,
+                         variation=f"{60 * (n + 1)} UC" if n % 2 == 0 else None)
+        for n in range(items)
+    ]
+    return lambda: server.build_items_text(order_items)
+
+
+@benchmark("calculate_promo_discount", discount_type=["percentage", "fixed", "buy_x_get_y", "free_shipping"])
+def bench_promo_discount(discount_type: str):
+    promo = {"code": "DASHAIN", "discount_type": discount_type, "discount_value": 15,
+             "buy_quantity": 2, "get_quantity": 1}
+    return lambda: server.calculate_promo_discount(promo, 2499.0)
+
+
+@benchmark("ticker", "record_order", subscribers=[0, 10, 100])
+def bench_ticker_record(subscribers: int):
+    ticker = RecentPurchasesTicker()
+    for _ in range(subscribers):
+        ticker.subscribe()
+    order = {"customer_name": "Aarav Shrestha", "items_text": "2x PUBG UC (60 UC)",
+             "created_at": datetime.now(timezone.utc).isoformat()}
+    return lambda: ticker.record_order(order)
+
+
+@benchmark("event_bus", "publish", subscribers=[0, 10, 100])
+def bench_event_publish(subscribers: int):
+    bus = OrderEventBus()
+    for _ in range(subscribers):
+        bus.subscribe()
+    order = {"id": "order-1", "status": "Completed", "customer_name": "Aarav Shrestha",
+             "total_amount": 499.0, "items_text": "1x Netflix Premium (1 Month)"}
+    return lambda: bus.publish("order.updated", order)
+
+
+@benchmark("event_bus", "resume", missed=[1, 50, REPLAY_BUFFER_SIZE - 1])
+def bench_event_resume(missed: int):
+    """A reconnecting client replaying what it missed from the replay buffer"""
+    bus = OrderEventBus()
+    for n in range(REPLAY_BUFFER_SIZE):
+        bus.publish("order.updated", {"id": f"order-{n}", "status": "Completed"})
+    last_event_id = f"{bus.epoch}-{bus._seq - missed}"
+
+    def resume():
+        bus.unsubscribe(bus.subscribe(last_event_id=last_event_id))
+    return resume
+
+
+# ==================== ANALYTICS ====================
+
+@benchmark("build_cost_lookup", products=SIZES)
+def bench_cost_lookup(products: int):
+    catalog = [make_product(i) for i in range(products)]
+    return lambda: server.build_cost_lookup(catalog)
+
+
+@benchmark("calculate_profit", orders=[100, 1000, 10000])
+def bench_calculate_profit(orders: int):
+    rng = random.Random(SEED)
+    cost_lookup = server.build_cost_lookup([make_product(i) for i in range(200)])
+    completed = [make_order(i, rng, 200) for i in range(orders)]
+    return lambda: server.calculate_profit(completed, cost_lookup)
+
+
+# ==================== INSTRUMENTATION AND CACHES ====================
+
+@benchmark("histogram", "labels_observe", label_sets=[1, 100, 1000])
+def bench_histogram(label_sets: int):
+    histogram = Histogram("benchmark_seconds", "Benchmark histogram", ("method", "route"))
+    routes = [f"/api/route-{n}" for n in range(label_sets)]
+    for route in routes:
+        histogram.labels("GET", route)
+    values = itertools.cycle([0.0004, 0.003, 0.02, 0.15, 1.2, 7.0])
+    route = routes[-1]
+    return lambda: histogram.labels("GET", route).observe(next(values))
+
+
+QUERY_COMMANDS = {
+    "find": ("find", {"find": "orders", "filter": {"status": "Completed", "created_at": {"$gte": "2025-01-01"}},
+                      "sort": {"created_at": -1}, "limit": 50}),
+    "aggregate": ("aggregate", {"aggregate": "orders", "pipeline": [
+        {"$match": {"status": {"$in": ["Completed", "Confirmed"]}, "created_at": {"$gte": "2025-01-01"}}},
+        {"$unwind": "$items"},
+        {"$group": {"_id": "$items.name", "revenue": {"$sum": {"$multiply": ["$items.price", "$items.quantity"]}}}},
+        {"$sort": {"revenue": -1}}, {"$limit": 10},
+    ]}),
+    "update": ("update", {"update": "orders", "updates": [
+        {"q": {"id": "order-1"}, "u": {"$set": {"status": "Completed"}}, "multi": False}]}),
+}
+
+
+@benchmark("command_shape", command=list(QUERY_COMMANDS))
+def bench_command_shape(command: str):
+    command_name, body = QUERY_COMMANDS[command]
+    return lambda: command_shape(command_name, body)
+
+
+@benchmark("precompressed_body", "select", accept_encoding=["gzip, deflate, br", "gzip;q=0.5, *;q=0", "identity"])
+def bench_precompressed_select(accept_encoding: str):
+    """A cache hit on a warmed sitemap/feed body: encoding negotiation plus the variant lookup"""
+    body = compression.PrecompressedBody(b"<url><loc>https://example.com/p</loc></url>" * 200)
+    body.warm()
+    return lambda: body.select(accept_encoding)
+
+
+if __name__ == "__main__":
+    main(__doc__.strip().splitlines()[0])
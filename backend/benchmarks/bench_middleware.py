@@ -0,0 +1,201 @@
+"""
+Middleware overhead benchmark
+Per-request cost of the rate limiting + security headers layers as the old
+`@app.middleware("http")` (BaseHTTPMiddleware) functions versus the pure
+ASGI classes in http_middleware.py, for a small JSON response, a streamed
+response and a file response. Requests are driven straight through the
+ASGI interface, so only the middleware and the endpoint are measured.
+
+    python benchmarks/bench_middleware.py [--requests 5000] [--repeat 3]
+"""
+import argparse
+import asyncio
+import gc
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import defaultdict
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from starlette.applications import Starlette  # noqa: E402
+from starlette.requests import Request  # noqa: E402
+from starlette.responses import FileResponse, JSONResponse, StreamingResponse  # noqa: E402
+from starlette.routing import Route  # noqa: E402
+
+import http_middleware  # noqa: E402
+
+STREAM_CHUNKS = 64
+CHUNK = b"x" * 1024
+FILE_SIZE = 256 * 1024
+
+
+# ==================== OLD: BaseHTTPMiddleware ====================
+# The decorators removed from server.py, verbatim apart from the metrics
+
+old_rate_limit_store = defaultdict(list)
+
+
+def old_rate_limit_check(ip: str, limit: int = 100, window: int = 60):
+    now = time.time()
+    old_rate_limit_store[ip] = [req_time for req_time in old_rate_limit_store[ip] if now - req_time < window]
+    if len(old_rate_limit_store[ip]) >= limit:
+        return False
+    old_rate_limit_store[ip].append(now)
+    return True
+
+
+async def old_rate_limit_middleware(request: Request, call_next):
+    client_ip = request.client.host
+    if request.url.path in ("/health", "/metrics"):
+        return await call_next(request)
+    if "/auth/login" in request.url.path:
+        if not old_rate_limit_check(client_ip, limit=30, window=60):
+            return JSONResponse(status_code=429, content={"detail": "Too many login attempts. Please try again later."})
+    else:
+        if not old_rate_limit_check(client_ip, limit=100, window=60):
+            return JSONResponse(status_code=429, content={"detail": "Too many requests. Please slow down."})
+    return await call_next(request)
+
+
+async def old_security_headers_middleware(request: Request, call_next):
+    response = await call_next(request)
+    response.headers["X-Content-Type-Options"] = "nosniff"
+    response.headers["X-Frame-Options"] = "DENY"
+    response.headers["X-XSS-Protection"] = "1; mode=block"
+    response.headers["Strict-Transport-Security"] = "max-age=31536000; includeSubDomains"
+    return response
+
+
+# ==================== APPS ====================
+
+def make_routes(file_path: Path):
+    async def small_json(request):
+        return JSONResponse({"id": "product-1", "name": "Netflix Premium", "price": 499.0})
+
+    async def streamed(request):
+        async def chunks():
+            for _ in range(STREAM_CHUNKS):
+                yield CHUNK
+        return StreamingResponse(chunks(), media_type="text/csv")
+
+    async def file(request):
+        return FileResponse(file_path, media_type="application/pdf")
+
+    return [Route("/json", small_json), Route("/stream", streamed), Route("/file", file)]
+
+
+def old_app(routes) -> Starlette:
+    app = Starlette(routes=routes)
+    app.middleware("http")(old_rate_limit_middleware)
+    app.middleware("http")(old_security_headers_middleware)
+    return app
+
+
+def new_app(routes) -> Starlette:
+    app = Starlette(routes=routes)
+    app.add_middleware(http_middleware.RateLimitMiddleware)
+    app.add_middleware(http_middleware.SecurityHeadersMiddleware)
+    return app
+
+
+def bare_app(routes) -> Starlette:
+    return Starlette(routes=routes)
+
+
+# ==================== DRIVER ====================
+
+async def call(app, path: str, client_ip: str) -> int:
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "root_path": "", "query_string": b"",
+        "headers": [(b"host", b"bench"), (b"accept", b"*/*")],
+        "client": (client_ip, 50000), "server": ("bench", 80),
+    }
+    received = False
+    size = 0
+
+    async def receive():
+        nonlocal received
+        if not received:
+            received = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        # Like a server's receive: nothing more until the client disconnects
+        await asyncio.sleep(3600)
+
+    async def send(message):
+        nonlocal size
+        if message["type"] == "http.response.body":
+            size += len(message.get("body", b""))
+
+    await app(scope, receive, send)
+    return size
+
+
+async def run_case(app, path: str, requests: int, offset: int) -> float:
+    """Mean wall time per request in microseconds"""
+    # Every request comes from a fresh IP so no case trips the limiter
+    start = time.perf_counter()
+    for i in range(requests):
+        n = offset + i
+        await call(app, path, f"10.{n >> 16 & 255}.{n >> 8 & 255}.{n & 255}")
+    return (time.perf_counter() - start) / requests * 1e6
+
+
+async def transient_kb(app, path: str, requests: int) -> float:
+    """Mean peak memory a request holds above the baseline while it runs"""
+    tracemalloc.start()
+    total = 0
+    for i in range(requests):
+        baseline, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        await call(app, path, f"172.16.{i >> 8 & 255}.{i & 255}")
+        _, peak = tracemalloc.get_traced_memory()
+        total += peak - baseline
+    tracemalloc.stop()
+    return total / requests / 1024
+
+
+async def main_async(args):
+    with tempfile.NamedTemporaryFile(suffix=".pdf") as handle:
+        handle.write(b"%PDF" + b"0" * FILE_SIZE)
+        handle.flush()
+        routes = make_routes(Path(handle.name))
+        apps = {"none": bare_app(routes), "old": old_app(routes), "new": new_app(routes)}
+
+        print(f"📊 Middleware overhead per request ({args.requests} requests, best of {args.repeat})")
+        offset = 0
+        for path, name in (("/json", "small JSON"), ("/stream", f"stream {STREAM_CHUNKS}x1KB"), ("/file", "file 256KB")):
+            timings = {}
+            for label, app in apps.items():
+                await run_case(app, path, 200, offset)  # warm up
+                offset += 200
+                best = float("inf")
+                for _ in range(args.repeat):
+                    gc.collect()
+                    best = min(best, await run_case(app, path, args.requests, offset))
+                    offset += args.requests
+                timings[label] = best
+            old_overhead = timings["old"] - timings["none"]
+            new_overhead = timings["new"] - timings["none"]
+            old_kb = await transient_kb(apps["old"], path, 200)
+            new_kb = await transient_kb(apps["new"], path, 200)
+            print(
+                f"  {name:<18} endpoint {timings['none']:7.1f} µs   "
+                f"old {old_overhead:+7.1f} µs   new {new_overhead:+7.1f} µs   "
+                f"saved {old_overhead - new_overhead:6.1f} µs/request   "
+                f"peak {old_kb:5.1f} -> {new_kb:5.1f} KB"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=3)
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+Serialization benchmark
+CPU time per request to turn the big list endpoints' documents into a
+response body: FastAPI's response_model validation + jsonable_encoder +
+stdlib json (the old path) versus DocumentShape + orjson (the new path).
+
+    python benchmarks/bench_serialization.py [--rows 1000] [--repeat 20]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import List
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+# server.py reads these at import; nothing connects until a query runs
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "benchmark")
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from fastapi.responses import JSONResponse  # noqa: E402
+from fastapi.routing import serialize_response  # noqa: E402
+from fastapi.utils import create_response_field  # noqa: E402
+
+import server  # noqa: E402
+from serialization import json_response  # noqa: E402
+
+
+def make_product(i: int) -> dict:
+    return {
+        "id": f"product-{i}", "name": f"Netflix Premium {i}", "slug": f"netflix-premium-{i}",
+        "description": "<p>Ultra HD streaming on 4 screens. Instant delivery.</p>" * 4,
+        "image_url": f"https://i.ibb.co/abc/{i}.png", "category_id": f"cat-{i % 12}",
+        "variations": [
+            {"id": f"v-{i}-{j}", "name": f"{j + 1} Month", "price": 499.0 * (j + 1),
+             "original_price": 599.0 * (j + 1), "cost_price": 350.0 * (j + 1), "description": None}
+            for j in range(4)
+        ],
+        "tags": ["streaming", "netflix", "premium"], "sort_order": i,
+        "custom_fields": [{"id": f"f-{i}", "label": "Email", "placeholder": "you@example.com", "required": True}],
+        "is_active": True, "is_sold_out": False, "stock_quantity": None,
+        "flash_sale_end": None, "flash_sale_label": None, "whatsapp_only": False, "whatsapp_message": None,
+        "discord_webhooks": ["https://discord.com/api/webhooks/1/secret"],
+        "created_at": datetime(2025, 1, 1, tzinfo=timezone.utc).isoformat(),
+    }
+
+
+def make_order(i: int) -> dict:
+    return {
+        "id": f"order-{i}", "customer_name": f"Customer {i}", "customer_phone": f"97798{i:08d}",
+        "customer_email": f"customer{i}@example.com",
+        "items": [{"name": "Netflix Premium", "price": 499.0, "quantity": 1, "variation": "1 Month"}],
+        "total_amount": 499.0, "total": 499.0, "remark": None, "items_text": "1x Netflix Premium (1 Month)",
+        "status": "Completed", "payment_screenshot": f"https://i.ibb.co/pay/{i}.png", "payment_method": "esewa",
+        "credits_used": 0, "promo_code": None,
+        "status_history": [{"id": f"h-{i}", "old_status": "pending", "new_status": "Completed",
+                            "created_at": "2025-01-01T00:00:00+00:00"}],
+        "created_at": datetime(2025, 1, 1, tzinfo=timezone.utc),
+    }
+
+
+def make_customer(i: int) -> dict:
+    return {
+        "id": f"customer-{i}", "email": f"customer{i}@example.com", "name": f"Customer {i}",
+        "phone": f"97798{i:08d}", "created_at": "2025-01-01T00:00:00+00:00",
+        "total_orders": i % 20, "total_spent": 499.0 * (i % 20), "completed_orders": i % 20,
+        "first_order_at": "2025-01-01T00:00:00+00:00", "last_order_at": "2025-06-01T00:00:00+00:00",
+    }
+
+
+def public_projection(product: dict) -> dict:
+    """What PUBLIC_PRODUCT_SHAPE.projection leaves of a stored product"""
+    projected = {k: v for k, v in product.items() if k != "discord_webhooks"}
+    projected["variations"] = [{k: v for k, v in var.items() if k != "cost_price"} for var in product["variations"]]
+    return projected
+
+
+def cpu_ms_per_call(fn, make_rows, repeat: int) -> float:
+    """Mean CPU time of fn(rows); rows are rebuilt outside the timed section"""
+    total = 0.0
+    for _ in range(repeat):
+        rows = make_rows()
+        start = time.process_time()
+        fn(rows)
+        total += time.process_time() - start
+    return total / repeat * 1000
+
+
+def old_model_path(field):
+    def run(rows: List[dict]):
+        content = asyncio.run(serialize_response(field=field, response_content=rows, is_coroutine=True))
+        return JSONResponse(content).body
+    return run
+
+
+def old_plain_path(rows: List[dict]):
+    return JSONResponse(jsonable_encoder(rows)).body
+
+
+def new_shape_path(shape):
+    def run(rows: List[dict]):
+        return json_response(shape.fill_many(rows)).body
+    return run
+
+
+def new_plain_path(rows: List[dict]):
+    return json_response(rows).body
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    product_field = create_response_field(name="products", type_=List[server.Product])
+    shape = server.PUBLIC_PRODUCT_SHAPE
+
+    cases = [
+        ("GET /products", lambda: [make_product(i) for i in range(args.rows)],
+         old_model_path(product_field),
+         lambda: [public_projection(make_product(i)) for i in range(args.rows)], new_shape_path(shape)),
+        ("GET /orders", lambda: [make_order(i) for i in range(args.rows)], old_plain_path,
+         None, new_plain_path),
+        ("GET /customers", lambda: [make_customer(i) for i in range(args.rows)], old_plain_path,
+         None, new_plain_path),
+    ]
+
+    print(f"📊 Serialization CPU per request ({args.rows} rows, mean of {args.repeat})")
+    for name, make_rows, old, make_new_rows, new in cases:
+        old_ms = cpu_ms_per_call(old, make_rows, args.repeat)
+        new_ms = cpu_ms_per_call(new, make_new_rows or make_rows, args.repeat)
+        print(f"  {name:<16} before {old_ms:8.2f} ms   after {new_ms:8.2f} ms   saved {old_ms - new_ms:8.2f} ms ({old_ms / new_ms:5.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+"""
+Micro-benchmark harness
+A small stand-in for pytest-benchmark that the bench_* scripts can share:
+register cases with @benchmark, run them with main(). Each case is timed in
+rounds of calibrated loops with the garbage collector off, after a few warm-up
+rounds, and reported as per-call min/median/mean/stddev/IQR/outliers. --json
+writes a pytest-benchmark style file and --compare diffs medians against one.
+
+A case's setup gets its parameters as keyword arguments and returns either
+the zero-argument callable to time, or (fn, make_args) when fn consumes or
+mutates its input - then every call gets fresh make_args() built outside the
+timed section, one call per round.
+"""
+import argparse
+import gc
+import itertools
+import json
+import math
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional
+
+DEFAULT_ROUNDS = 25
+DEFAULT_WARMUP = 3
+DEFAULT_MIN_TIME = 0.002  # seconds per round; loops are raised until a round takes this long
+MAX_LOOPS = 1_000_000
+
+
+class Case:
+    def __init__(self, group: str, name: str, setup: Callable, params: Dict):
+        self.group = group
+        self.name = name
+        self.setup = setup
+        self.params = params
+
+    @property
+    def fullname(self) -> str:
+        if not self.params:
+            return f"{self.group}::{self.name}"
+        return f"{self.group}::{self.name}[" + "-".join(str(value) for value in self.params.values()) + "]"
+
+
+REGISTRY: List[Case] = []
+
+
+def benchmark(group: str, name: Optional[str] = None, **params: List):
+    """Register a setup function once per combination of `params`, e.g. size=[10, 1000]; name defaults to group"""
+    def register(setup: Callable) -> Callable:
+        names = list(params)
+        for values in itertools.product(*params.values()):
+            REGISTRY.append(Case(group, name or group, setup, dict(zip(names, values))))
+        return setup
+    return register
+
+
+def _time_loops(fn: Callable, loops: int) -> float:
+    timer = time.perf_counter
+    start = timer()
+    for _ in range(loops):
+        fn()
+    return timer() - start
+
+
+def _calibrate(fn: Callable, min_time: float) -> int:
+    loops = 1
+    while loops < MAX_LOOPS:
+        if _time_loops(fn, loops) >= min_time:
+            break
+        loops *= 2 if loops < 8 else 10
+    return min(loops, MAX_LOOPS)
+
+
+def stats(samples: List[float], loops: int) -> dict:
+    """Per-call statistics, in seconds, for rounds of `loops` calls each"""
+    data = sorted(samples)
+    mean = statistics.fmean(data)
+    stddev = statistics.stdev(data) if len(data) > 1 else 0.0
+    q1, median, q3 = statistics.quantiles(data, n=4, method="inclusive") if len(data) > 1 else (data[0],) * 3
+    iqr = q3 - q1
+    # Same "a;b" notation as pytest-benchmark: beyond 1 stddev ; beyond 1.5 IQR
+    stddev_outliers = sum(1 for value in data if abs(value - mean) > stddev)
+    iqr_outliers = sum(1 for value in data if value < q1 - 1.5 * iqr or value > q3 + 1.5 * iqr)
+    return {
+        "min": data[0], "max": data[-1], "mean": mean, "stddev": stddev, "median": median,
+        "q1": q1, "q3": q3, "iqr": iqr, "outliers": f"{stddev_outliers};{iqr_outliers}",
+        "rounds": len(data), "iterations": loops, "ops": 1 / mean if mean else math.inf,
+    }
+
+
+def run_case(case: Case, rounds: int, warmup: int, min_time: float) -> dict:
+    target = case.setup(**case.params)
+    gc.collect()
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        if isinstance(target, tuple):
+            fn, make_args = target
+            samples = []
+            for n in range(warmup + rounds):
+                args = make_args()
+                start = time.perf_counter()
+                fn(args)
+                elapsed = time.perf_counter() - start
+                if n >= warmup:
+                    samples.append(elapsed)
+            loops = 1
+        else:
+            loops = _calibrate(target, min_time)
+            for _ in range(warmup):
+                _time_loops(target, loops)
+            samples = [_time_loops(target, loops) / loops for _ in range(rounds)]
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+    return {
+        "group": case.group, "name": case.name, "fullname": case.fullname,
+        "params": case.params, "stats": stats(samples, loops),
+    }
+
+
+def _commit() -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, timeout=5).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain"], capture_output=True, text=True,
+                                    timeout=5).stdout.strip())
+    except (OSError, subprocess.SubprocessError):
+        commit, dirty = "", False
+    return {"id": commit, "dirty": dirty}
+
+
+def machine_info() -> dict:
+    return {
+        "node": platform.node(), "processor": platform.processor(), "machine": platform.machine(),
+        "python_implementation": platform.python_implementation(), "python_version": platform.python_version(),
+        "system": platform.system(), "release": platform.release(), "cpu_count": os.cpu_count(),
+    }
+
+
+def _format_time(seconds: float) -> str:
+    for unit, scale in (("s", 1), ("ms", 1e-3), ("us", 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:8.2f} {unit}"
+    return f"{seconds / 1e-9:8.1f} ns"
+
+
+def print_results(results: List[dict]):
+    group = None
+    for result in results:
+        if result["group"] != group:
+            group = result["group"]
+            print(f"\n{group}")
+            print(f"  {'case':<44} {'min':>11} {'median':>11} {'mean':>11} {'stddev':>11} {'IQR':>11} "
+                  f"{'outliers':>9} {'ops/s':>12}")
+        s = result["stats"]
+        label = result["fullname"].split("::", 1)[1]
+        print(f"  {label:<44} {_format_time(s['min'])} {_format_time(s['median'])} {_format_time(s['mean'])} "
+              f"{_format_time(s['stddev'])} {_format_time(s['iqr'])} {s['outliers']:>9} {s['ops']:12,.0f}")
+
+
+def compare(results: List[dict], baseline_path: str, fail_above: Optional[float]) -> bool:
+    """Print the median change against a saved run; False when a case regressed more than fail_above %"""
+    with open(baseline_path) as f:
+        baseline = {item["fullname"]: item for item in json.load(f)["benchmarks"]}
+    print(f"\n📈 Median change vs {baseline_path}")
+    ok = True
+    for result in results:
+        before = baseline.get(result["fullname"])
+        if before is None:
+            print(f"  {result['fullname']:<60} (new)")
+            continue
+        change = (result["stats"]["median"] / before["stats"]["median"] - 1) * 100
+        # A change inside the combined IQRs is noise, whatever its size
+        noise = result["stats"]["iqr"] + before["stats"]["iqr"]
+        significant = abs(result["stats"]["median"] - before["stats"]["median"]) > noise
+        flag = ""
+        if fail_above is not None and change > fail_above and significant:
+            flag = "  ❌ regression"
+            ok = False
+        elif not significant:
+            flag = "  (noise)"
+        print(f"  {result['fullname']:<60} {change:+7.1f}%{flag}")
+    return ok
+
+
+def main(description: str):
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("-k", "--filter", help="only cases whose full name contains this")
+    parser.add_argument("--rounds", type=int, default=DEFAULT_ROUNDS)
+    parser.add_argument("--warmup", type=int, default=DEFAULT_WARMUP)
+    parser.add_argument("--min-time", type=float, default=DEFAULT_MIN_TIME, help="seconds per round")
+    parser.add_argument("--json", help="write the results here (pytest-benchmark format)")
+    parser.add_argument("--compare", help="a previous --json file to diff medians against")
+    parser.add_argument("--fail-above", type=float, help="with --compare, exit 1 if a median grew by more %%")
+    parser.add_argument("--list", action="store_true", help="list the cases and exit")
+    args = parser.parse_args()
+
+    cases = [case for case in REGISTRY if not args.filter or args.filter in case.fullname]
+    if args.list:
+        for case in cases:
+            print(case.fullname)
+        return
+    if not cases:
+        raise SystemExit(f"❌ No benchmark matches '{args.filter}'")
+
+    print(f"⏱️  {len(cases)} cases, {args.rounds} rounds each (Python {platform.python_version()})")
+    results = [run_case(case, args.rounds, args.warmup, args.min_time) for case in cases]
+    print_results(results)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({
+                "machine_info": machine_info(), "commit_info": _commit(), "benchmarks": results,
+                "datetime": datetime.now(timezone.utc).isoformat(), "version": "nobeosh-harness-1",
+            }, f, indent=2)
+        print(f"\n💾 Saved {args.json}")
+    if args.compare and not compare(results, args.compare, args.fail_above):
+        sys.exit(1)
@@ -0,0 +1,236 @@
+"""
+Response Compression
+`CompressionMiddleware` is a pure ASGI middleware that gzip- or
+brotli-encodes responses by Accept-Encoding, skipping small bodies, already
+encoded bodies and content types that don't compress (images, PDFs, event
+streams). Brotli is used only when the `brotli` package is installed.
+
+Cached bodies should not pay for compression on every request: wrap them in
+`PrecompressedBody`, which compresses each encoding once (at a higher level
+than the middleware can afford) and keeps the result next to the raw bytes.
+"""
+import gzip
+import hashlib
+import zlib
+from typing import Dict, Optional, Tuple
+
+try:
+    import brotli
+except ImportError:  # optional - gzip only without it
+    brotli = None
+
+GZIP = "gzip"
+BROTLI = "br"
+IDENTITY = "identity"
+
+# Below this, headers and framing cost more than compression saves
+MINIMUM_SIZE = 500
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 4
+# Precompressed variants are built once, so spend the CPU
+PRECOMPRESSED_GZIP_LEVEL = 9
+PRECOMPRESSED_BROTLI_QUALITY = 11
+
+COMPRESSIBLE_TYPES = (
+    "application/json",
+    "application/xml",
+    "application/javascript",
+    "application/rss+xml",
+    "image/svg+xml",
+    "text/html",
+    "text/plain",
+    "text/css",
+    "text/xml",
+    "text/csv",
+)
+
+
+def supported_encodings() -> Tuple[str, ...]:
+    return (BROTLI, GZIP) if brotli is not None else (GZIP,)
+
+
+def select_encoding(accept_encoding: Optional[str]) -> str:
+    """Best encoding the client accepts (q > 0), preferring brotli"""
+    if not accept_encoding:
+        return IDENTITY
+    accepted = {}
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip()] = quality
+
+    wildcard = accepted.get("*", 0.0)
+    for encoding in supported_encodings():
+        if accepted.get(encoding, wildcard) > 0:
+            return encoding
+    return IDENTITY
+
+
+def is_compressible(content_type: str) -> bool:
+    media_type = content_type.split(";", 1)[0].strip().lower()
+    return media_type in COMPRESSIBLE_TYPES or media_type.endswith("+json")
+
+
+def compress(body: bytes, encoding: str, level: Optional[int] = None) -> bytes:
+    if encoding == BROTLI:
+        return brotli.compress(body, quality=BROTLI_QUALITY if level is None else level)
+    if encoding == GZIP:
+        return gzip.compress(body, compresslevel=GZIP_LEVEL if level is None else level, mtime=0)
+    return body
+
+
+class PrecompressedBody:
+    """Raw bytes plus lazily built, cached compressed variants and ETags"""
+
+    __slots__ = ("body", "digest", "_variants")
+
+    def __init__(self, body: bytes):
+        self.body = body
+        self.digest = hashlib.sha256(body).hexdigest()[:32]
+        self._variants: Dict[str, bytes] = {IDENTITY: body}
+
+    def variant(self, encoding: str) -> bytes:
+        if encoding not in self._variants:
+            level = PRECOMPRESSED_BROTLI_QUALITY if encoding == BROTLI else PRECOMPRESSED_GZIP_LEVEL
+            self._variants[encoding] = compress(self.body, encoding, level)
+        return self._variants[encoding]
+
+    def warm(self):
+        """Build every supported variant up front (call off the event loop for big bodies)"""
+        for encoding in supported_encodings():
+            self.variant(encoding)
+
+    def etag(self, encoding: str = IDENTITY) -> str:
+        return f'"{self.digest}"' if encoding == IDENTITY else f'"{self.digest}-{encoding}"'
+
+    def select(self, accept_encoding: Optional[str]) -> Tuple[str, bytes]:
+        """(encoding, body) for a request; small bodies always go out as-is"""
+        encoding = select_encoding(accept_encoding) if len(self.body) >= MINIMUM_SIZE else IDENTITY
+        return encoding, self.variant(encoding)
+
+
+class _StreamCompressor:
+    def __init__(self, encoding: str):
+        if encoding == BROTLI:
+            self._compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+            self._write, self._flush = self._compressor.process, self._compressor.finish
+        else:
+            # wbits 16+ -> gzip container
+            self._compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+            self._write, self._flush = self._compressor.compress, self._compressor.flush
+
+    def write(self, data: bytes) -> bytes:
+        return self._write(data)
+
+    def finish(self) -> bytes:
+        return self._flush()
+
+
+class CompressionMiddleware:
+    """Pure ASGI compression; a response is only buffered until MINIMUM_SIZE bytes are seen"""
+
+    def __init__(self, app, minimum_size: int = MINIMUM_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        accept_encoding = None
+        for name, value in scope["headers"]:
+            if name == b"accept-encoding":
+                accept_encoding = value.decode("latin-1")
+                break
+        encoding = select_encoding(accept_encoding)
+        if encoding == IDENTITY:
+            await self.app(scope, receive, send)
+            return
+
+        responder = _CompressionResponder(send, encoding, self.minimum_size)
+        await self.app(scope, receive, responder.send)
+
+
+class _CompressionResponder:
+    def __init__(self, send, encoding: str, minimum_size: int):
+        self._send = send
+        self.encoding = encoding
+        self.minimum_size = minimum_size
+        self.start_message = None
+        self.compressor: Optional[_StreamCompressor] = None
+        self.passthrough = False
+        self.pending = []
+        self.pending_size = 0
+
+    async def send(self, message):
+        message_type = message["type"]
+        if message_type == "http.response.start":
+            self.start_message = message
+            headers = message.get("headers", [])
+            content_type = b""
+            for name, value in headers:
+                if name == b"content-encoding":
+                    self.passthrough = True
+                elif name == b"content-type":
+                    content_type = value
+            if not self.passthrough and not is_compressible(content_type.decode("latin-1")):
+                self.passthrough = True
+            if self.passthrough:
+                await self._send(message)
+            return
+
+        if message_type != "http.response.body" or self.passthrough:
+            await self._send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.compressor is None:
+            # Hold chunks back until there is enough to be worth compressing
+            self.pending.append(body)
+            self.pending_size += len(body)
+            if more_body and self.pending_size < self.minimum_size:
+                return
+            body, self.pending = b"".join(self.pending), []
+
+            if not more_body:
+                # Whole body known - the common case for JSON
+                if len(body) < self.minimum_size:
+                    await self._send(self.start_message)
+                    await self._send({"type": "http.response.body", "body": body})
+                    return
+                compressed = compress(body, self.encoding)
+                await self._send(self._encoded_start(len(compressed)))
+                await self._send({"type": "http.response.body", "body": compressed})
+                return
+            self.compressor = _StreamCompressor(self.encoding)
+            await self._send(self._encoded_start(None))
+
+        chunk = self.compressor.write(body)
+        if not more_body:
+            chunk += self.compressor.finish()
+        if chunk or not more_body:
+            await self._send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+
+    def _encoded_start(self, content_length: Optional[int]):
+        headers = [
+            (name, value) for name, value in self.start_message.get("headers", [])
+            if name not in (b"content-length", b"vary")
+        ]
+        vary = [value for name, value in self.start_message.get("headers", []) if name == b"vary"]
+        vary_values = {v.strip().lower() for value in vary for v in value.split(b",")}
+        if b"accept-encoding" not in vary_values:
+            vary.append(b"Accept-Encoding")
+        headers.append((b"vary", b", ".join(vary)))
+        headers.append((b"content-encoding", self.encoding.encode("latin-1")))
+        if content_length is not None:
+            headers.append((b"content-length", str(content_length).encode("latin-1")))
+        return {**self.start_message, "headers": headers}
@@ -0,0 +1,310 @@
+"""
+Materialized customer order statistics
+`total_orders`, `total_spent`, `completed_orders`, `first_order_at` and
+`last_order_at` live on each customer document and are kept current with
+atomic $inc/$min/$max updates at order lifecycle events, so listing
+customers never aggregates the orders collection. Rebuilds count archived
+and imported Take.app orders too (once, when an order exists in both). Customers that predate the fields are backfilled at startup.
+Orders are matched on the lowercased email, which create_order stores and
+the startup backfill applies to orders written before it did.
+
+Run directly to rebuild every customer's stats from the orders:
+    python customer_stats.py
+"""
+import asyncio
+import logging
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from dotenv import load_dotenv
+from pymongo import UpdateOne
+
+from database import time_budget
+
+logger = logging.getLogger(__name__)
+
+STAT_FIELDS = ("total_orders", "total_spent", "completed_orders", "first_order_at", "last_order_at")
+EMPTY_STATS = {"total_orders": 0, "total_spent": 0, "completed_orders": 0, "first_order_at": None, "last_order_at": None}
+
+SORTABLE_FIELDS = ("created_at", "total_orders", "total_spent", "completed_orders", "last_order_at", "first_order_at", "name")
+
+# Matches what the analytics endpoints count as completed
+COMPLETED_STATUSES = ("completed", "delivered")
+# Spellings admins type, for queries that must stay on the status index
+COMPLETED_STATUS_VARIANTS = [
+    variant for status in COMPLETED_STATUSES for variant in (status, status.capitalize(), status.upper())
+]
+
+REBUILD_BATCH_SIZE = 500
+
+
+def order_amount(order: dict) -> float:
+    return float(order.get("total_amount") or order.get("total") or 0)
+
+
+def is_completed(status: Optional[str]) -> bool:
+    return (status or "").lower() in COMPLETED_STATUSES
+
+
+def _order_email(order: dict) -> Optional[str]:
+    email = (order.get("customer_email") or "").strip().lower()
+    return email or None
+
+
+def phone_filter(phone: str) -> dict:
+    """Customers whose phone is `phone` - the WhatsApp number standing in when there is none, as in the rebuild"""
+    return {"$or": [{"phone": phone}, {"phone": {"$in": [None, ""]}, "whatsapp_number": phone}]}
+
+
+async def _update_customer(db, order: dict, update: dict) -> bool:
+    """Apply an update to the order's customer, matched by email, then by phone"""
+    email = _order_email(order)
+    phone = order.get("customer_phone")
+    if email:
+        result = await db.customers.update_one({"email": email}, update)
+        if result.matched_count:
+            return True
+    if phone:
+        result = await db.customers.update_one(phone_filter(phone), update)
+        return result.matched_count > 0
+    return False
+
+
+async def record_order_created(db, order: dict):
+    created_at = order.get("created_at")
+    update = {"$inc": {"total_orders": 1, "total_spent": order_amount(order)}}
+    if created_at:
+        update["$min"] = {"first_order_at": created_at}
+        update["$max"] = {"last_order_at": created_at}
+    if is_completed(order.get("status")):
+        update["$inc"]["completed_orders"] = 1
+    await _update_customer(db, order, update)
+
+
+async def record_status_change(db, order: dict, old_status: Optional[str], new_status: str):
+    was_completed, now_completed = is_completed(old_status), is_completed(new_status)
+    if was_completed == now_completed:
+        return
+    delta = 1 if now_completed else -1
+    await _update_customer(db, order, {"$inc": {"completed_orders": delta}})
+
+
+async def record_orders_removed(db, orders: Iterable[dict]):
+    """
+    Take deleted orders out of the counters, one update per customer.
+    first/last_order_at can't be un-applied atomically; they stay until the
+    next rebuild.
+    """
+    per_customer = {}
+    for order in orders:
+        key = (_order_email(order), order.get("customer_phone"))
+        delta = per_customer.setdefault(key, {"total_orders": 0, "total_spent": 0.0, "completed_orders": 0})
+        delta["total_orders"] -= 1
+        delta["total_spent"] -= order_amount(order)
+        if is_completed(order.get("status")):
+            delta["completed_orders"] -= 1
+
+    for (email, phone), delta in per_customer.items():
+        if not delta["completed_orders"]:
+            del delta["completed_orders"]
+        await _update_customer(db, {"customer_email": email, "customer_phone": phone}, {"$inc": delta})
+
+
+def _stats_pipeline(match: dict, group_key) -> list:
+    return [
+        {"$match": match},
+        {"$group": {
+            "_id": group_key,
+            "total_orders": {"$sum": 1},
+            "total_spent": {"$sum": {"$ifNull": ["$total_amount", {"$ifNull": ["$total", 0]}]}},
+            "completed_orders": {"$sum": {"$cond": [
+                {"$in": [{"$toLower": {"$ifNull": ["$status", ""]}}, list(COMPLETED_STATUSES)]}, 1, 0
+            ]}},
+            "first_order_at": {"$min": "$created_at"},
+            "last_order_at": {"$max": "$created_at"},
+            "phone": {"$first": "$customer_phone"},
+        }},
+    ]
+
+
+# Archived orders still belong to the customer's history, and so do the
+# imported Take.app orders
+LOCAL_ORDER_COLLECTIONS = ("orders", "orders_archive")
+ORDER_COLLECTIONS = LOCAL_ORDER_COLLECTIONS + ("takeapp_orders",)
+
+
+async def local_takeapp_ids(db, takeapp_ids: Optional[list] = None) -> set:
+    """Take.app ids of orders that also exist locally, so they are counted once"""
+    query = {"takeapp_order_id": {"$in": takeapp_ids} if takeapp_ids is not None else {"$nin": [None, ""]}}
+    ids = set()
+    for collection in LOCAL_ORDER_COLLECTIONS:
+        ids.update(str(value) for value in await db[collection].distinct("takeapp_order_id", query))
+    return ids
+
+
+async def _takeapp_duplicates(db, match: dict) -> set:
+    """Local copies of the Take.app orders matching `match`, looked up by those orders' own ids"""
+    takeapp_ids = await db.takeapp_orders.distinct("takeapp_id", match)
+    return await local_takeapp_ids(db, takeapp_ids) if takeapp_ids else set()
+
+
+def _merge_group(into: Optional[dict], group: dict) -> dict:
+    if into is None:
+        return dict(group)
+    into["total_orders"] += group["total_orders"]
+    into["total_spent"] += group["total_spent"]
+    into["completed_orders"] += group["completed_orders"]
+    for field, pick in (("first_order_at", min), ("last_order_at", max)):
+        values = [v for v in (into.get(field), group.get(field)) if v]
+        into[field] = pick(values) if values else None
+    into["phone"] = into.get("phone") or group.get("phone")
+    return into
+
+
+async def _grouped_stats(db, match: dict, group_key, duplicates: Optional[set] = None) -> dict:
+    """
+    Run the stats pipeline over every order collection and merge the groups by
+    key. Take.app orders in `duplicates` are skipped; by default that is the
+    local copies of just the matched ones.
+    """
+    if duplicates is None:
+        duplicates = await _takeapp_duplicates(db, match)
+    groups = {}
+    for collection in ORDER_COLLECTIONS:
+        collection_match = match
+        if collection == "takeapp_orders" and duplicates:
+            collection_match = {**match, "takeapp_id": {"$nin": list(duplicates)}}
+        async for group in db[collection].aggregate(_stats_pipeline(collection_match, group_key), allowDiskUse=True):
+            groups[group["_id"]] = _merge_group(groups.get(group["_id"]), group)
+    return groups
+
+
+def _stats_from_group(group: Optional[dict]) -> dict:
+    if not group:
+        return dict(EMPTY_STATS)
+    return {field: group.get(field) for field in STAT_FIELDS}
+
+
+def _customer_update(customer: dict, by_email: dict, by_phone: dict) -> dict:
+    """The $set for a customer from stats grouped by lowercased email and by phone"""
+    email = (customer.get("email") or "").lower()
+    phone = customer.get("phone") or customer.get("whatsapp_number")
+    group = by_email.get(email) or by_phone.get(phone)
+
+    stats = _stats_from_group(group)
+    if not customer.get("phone") and group and group.get("phone"):
+        stats["phone"] = group["phone"]
+    return stats
+
+
+async def refresh_customer_stats(db, email: Optional[str] = None, phone: Optional[str] = None) -> dict:
+    """Recompute one customer's stats (used when a customer document is first created)"""
+    email = (email or "").strip().lower() or None
+    group = None
+    if email:
+        group = (await _grouped_stats(db, {"customer_email": email}, None)).get(None)
+    if not group and phone:
+        group = (await _grouped_stats(db, {"customer_phone": phone}, None)).get(None)
+
+    stats = _stats_from_group(group)
+    if email:
+        await db.customers.update_one({"email": email}, {"$set": stats})
+    elif phone:
+        await db.customers.update_one(phone_filter(phone), {"$set": stats})
+    return stats
+
+
+async def refresh_many(db, customers: List[dict]) -> Dict[str, dict]:
+    """
+    Recompute and store the stats of a batch of customers (e.g. a page of the
+    customer list) with one grouped pass per match key; returns {id: stats}.
+    """
+    emails = list({(c.get("email") or "").strip().lower() for c in customers} - {""})
+    phones = list({c.get("phone") or c.get("whatsapp_number") for c in customers} - {None, ""})
+    by_email = await _grouped_stats(db, {"customer_email": {"$in": emails}}, "$customer_email") if emails else {}
+    by_phone = await _grouped_stats(db, {"customer_phone": {"$in": phones}}, "$customer_phone") if phones else {}
+
+    refreshed = {customer["id"]: _customer_update(customer, by_email, by_phone) for customer in customers}
+    if refreshed:
+        await db.customers.bulk_write(
+            [UpdateOne({"id": customer_id}, {"$set": stats}) for customer_id, stats in refreshed.items()],
+            ordered=False
+        )
+    return refreshed
+
+
+async def rebuild_customer_stats(db, batch_size: int = REBUILD_BATCH_SIZE) -> int:
+    """Recompute stats for every customer from the hot, archived and Take.app orders"""
+    # One full-collection dedupe for both passes
+    duplicates = await local_takeapp_ids(db)
+    by_email = await _grouped_stats(
+        db, {"customer_email": {"$nin": [None, ""]}}, {"$toLower": "$customer_email"}, duplicates
+    )
+    by_phone = await _grouped_stats(db, {"customer_phone": {"$nin": [None, ""]}}, "$customer_phone", duplicates)
+
+    updated = 0
+    operations = []
+    async for customer in db.customers.find({}, {"_id": 0, "id": 1, "email": 1, "phone": 1, "whatsapp_number": 1}):
+        stats = _customer_update(customer, by_email, by_phone)
+        operations.append(UpdateOne({"id": customer["id"]}, {"$set": stats}))
+        if len(operations) >= batch_size:
+            updated += (await db.customers.bulk_write(operations, ordered=False)).modified_count
+            operations = []
+    if operations:
+        updated += (await db.customers.bulk_write(operations, ordered=False)).modified_count
+
+    logger.info(f"Rebuilt customer stats: {updated} customers updated")
+    return updated
+
+
+async def normalize_order_emails(db) -> int:
+    """Lowercase the emails of orders stored as typed, so email matches agree with the rebuild"""
+    normalized = 0
+    for collection in LOCAL_ORDER_COLLECTIONS:
+        result = await db[collection].update_many(
+            {"customer_email": {"$regex": "[A-Z]"}},
+            [{"$set": {"customer_email": {"$toLower": "$customer_email"}}}]
+        )
+        normalized += result.modified_count
+    if normalized:
+        logger.info(f"Lowercased the email on {normalized} orders")
+    return normalized
+
+
+async def backfill_missing_stats(db):
+    """At startup: normalize order emails, then one rebuild if any customer predates the materialized stats"""
+    try:
+        await normalize_order_emails(db)
+        if await db.customers.find_one({"total_orders": {"$exists": False}}, {"_id": 1}) is None:
+            return
+        # Full-collection aggregations - allow more than the admin pool's default budget
+        with time_budget(300):
+            await rebuild_customer_stats(db)
+    except Exception as e:
+        logger.error(f"Customer stats backfill failed: {e}")
+
+
+async def ensure_customer_stats_indexes(db):
+    await db.customers.create_index("email")
+    await db.customers.create_index("phone")
+    await db.customers.create_index("whatsapp_number")
+    # The customer list breaks ties on id, so the sort is served from the index
+    for field in SORTABLE_FIELDS:
+        await db.customers.create_index([(field, 1), ("id", 1)])
+
+
+async def main():
+    from database import ADMIN, close_clients, get_db
+
+    load_dotenv(Path(__file__).parent / '.env')
+    db = get_db(ADMIN)
+
+    print("🔄 Rebuilding customer order stats...")
+    await ensure_customer_stats_indexes(db)
+    updated = await rebuild_customer_stats(db)
+    print(f"✅ Updated {updated} customers")
+    close_clients()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
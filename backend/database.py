@@ -0,0 +1,211 @@
+"""
+Database Access
+Owns the process's MongoDB clients. Each workload gets its own pool so a
+heavy admin report can't starve checkout of connections:
+
+    STOREFRONT - public API traffic; big pool, short per-operation budget
+    ADMIN      - admin endpoints, analytics and background jobs; small pool,
+                 longer budget
+
+Budgets use the driver's client-side operation timeout (timeoutMS), which
+also sends maxTimeMS to the server, so a runaway query is killed there
+rather than just abandoned. `time_budget()` sets a deadline for a block.
+`get_reporting_db()` reads through the ADMIN pool with a configurable read
+preference (e.g. secondaryPreferred) for dashboards that tolerate lag.
+
+Scripts and services call `get_db()`; nothing else should construct a client.
+"""
+import asyncio
+import logging
+import os
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List, TypeVar
+
+import pymongo
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+from pymongo.errors import ConnectionFailure, PyMongoError
+from pymongo.read_preferences import make_read_preference, read_pref_mode_from_name
+from pymongo.uri_parser import split_hosts
+
+import query_profiler
+from metrics import MongoCommandListener
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+logger = logging.getLogger(__name__)
+
+STOREFRONT = "storefront"
+ADMIN = "admin"
+
+# workload -> (pool size env, default, timeout env, default ms)
+WORKLOADS = {
+    STOREFRONT: ("MONGO_STOREFRONT_POOL_SIZE", 100, "MONGO_STOREFRONT_TIMEOUT_MS", 5000),
+    ADMIN: ("MONGO_ADMIN_POOL_SIZE", 20, "MONGO_ADMIN_TIMEOUT_MS", 30000),
+}
+
+CONNECT_TIMEOUT_MS = int(os.environ.get("MONGO_CONNECT_TIMEOUT_MS", "5000"))
+SERVER_SELECTION_TIMEOUT_MS = int(os.environ.get("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000"))
+# How long a request may wait for a free pooled connection
+WAIT_QUEUE_TIMEOUT_MS = int(os.environ.get("MONGO_WAIT_QUEUE_TIMEOUT_MS", "2000"))
+
+# primary (default), primaryPreferred, secondary, secondaryPreferred or nearest
+REPORTING_READ_PREFERENCE = os.environ.get("MONGO_REPORTING_READ_PREFERENCE", "primary")
+REPORTING_MAX_STALENESS_SECONDS = int(os.environ.get("MONGO_REPORTING_MAX_STALENESS_SECONDS", "-1"))
+
+# What the load test and dataset generator accept as "a local mongod"
+LOCAL_HOSTS = frozenset(("localhost", "127.0.0.1", "::1"))
+
+RETRY_ATTEMPTS = 3
+RETRY_BASE_DELAY = 0.2
+
+_clients: Dict[str, AsyncIOMotorClient] = {}
+
+T = TypeVar("T")
+
+
+def _env_int(name: str, default: int) -> int:
+    return int(os.environ.get(name, str(default)))
+
+
+def remote_hosts(mongo_url: str) -> List[str]:
+    """The hosts in a MongoDB URI that aren't this machine (an SRV record never is)"""
+    scheme, _, rest = mongo_url.partition("://")
+    hosts = rest.split("/", 1)[0].split("?", 1)[0].rpartition("@")[2]
+    if scheme != "mongodb":
+        return [hosts]
+    return [
+        host for host, port in split_hosts(hosts)
+        # Unix domain sockets come back without a port
+        if port is not None and host not in LOCAL_HOSTS
+    ]
+
+
+def get_client(workload: str = STOREFRONT) -> AsyncIOMotorClient:
+    """The shared client for a workload, created on first use"""
+    if workload not in _clients:
+        pool_env, pool_default, timeout_env, timeout_default = WORKLOADS[workload]
+        _clients[workload] = AsyncIOMotorClient(
+            os.environ["MONGO_URL"],
+            appname=f"nobeosh-{workload}",
+            maxPoolSize=_env_int(pool_env, pool_default),
+            minPoolSize=0,
+            timeoutMS=_env_int(timeout_env, timeout_default),
+            connectTimeoutMS=CONNECT_TIMEOUT_MS,
+            serverSelectionTimeoutMS=SERVER_SELECTION_TIMEOUT_MS,
+            waitQueueTimeoutMS=WAIT_QUEUE_TIMEOUT_MS,
+            retryReads=True,
+            retryWrites=True,
+            event_listeners=[MongoCommandListener(workload), *query_profiler.listeners()],
+        )
+    return _clients[workload]
+
+
+def get_db(workload: str = STOREFRONT) -> AsyncIOMotorDatabase:
+    return get_client(workload)[os.environ["DB_NAME"]]
+
+
+def get_reporting_db() -> AsyncIOMotorDatabase:
+    """ADMIN pool with the reporting read preference (may read from secondaries)"""
+    read_preference = make_read_preference(
+        read_pref_mode_from_name(REPORTING_READ_PREFERENCE),
+        None,
+        REPORTING_MAX_STALENESS_SECONDS if REPORTING_READ_PREFERENCE != "primary" else -1
+    )
+    return get_client(ADMIN).get_database(os.environ["DB_NAME"], read_preference=read_preference)
+
+
+def close_clients():
+    for client in _clients.values():
+        client.close()
+    _clients.clear()
+
+
+@contextmanager
+def time_budget(seconds: float):
+    """Deadline shared by every operation in the block; replaces the pool default (nested budgets only tighten)"""
+    with pymongo.timeout(seconds):
+        yield
+
+
+def is_transient(error: Exception) -> bool:
+    """Network blips and failovers - not timeouts, which mean the budget is spent"""
+    if getattr(error, "timeout", False):
+        return False
+    if isinstance(error, ConnectionFailure):
+        return True
+    return isinstance(error, PyMongoError) and (
+        error.has_error_label("RetryableWriteError") or error.has_error_label("TransientTransactionError")
+    )
+
+
+async def with_retry(operation: Callable[[], Awaitable[T]], attempts: int = RETRY_ATTEMPTS,
+                     description: str = "database operation") -> T:
+    """
+    Run an idempotent operation, retrying transient errors with backoff.
+    The driver already retries once; this covers longer failovers for
+    background jobs.
+    """
+    for attempt in range(1, attempts + 1):
+        try:
+            return await operation()
+        except PyMongoError as e:
+            if attempt == attempts or not is_transient(e):
+                raise
+            delay = RETRY_BASE_DELAY * 2 ** (attempt - 1)
+            logger.warning(f"Transient error in {description} (attempt {attempt}/{attempts}), retrying in {delay:.1f}s: {e}")
+            await asyncio.sleep(delay)
+
+
+# Indexes for the collections server.py queries directly (services create their
+# own). tests/test_query_plans.py checks the hot queries stay on them.
+CORE_INDEXES = {
+    "products": [
+        [("slug", 1)],
+        [("id", 1)],
+        [("is_active", 1), ("sort_order", 1), ("created_at", -1)],
+        [("category_id", 1), ("is_active", 1), ("sort_order", 1), ("created_at", -1)],
+        [("tags", 1), ("is_active", 1)],
+    ],
+    "orders": [
+        [("created_at", -1)],
+        [("customer_email", 1), ("created_at", -1)],
+    ],
+    "promo_codes": [
+        [("code", 1)],
+        [("auto_apply", 1), ("is_active", 1)],
+    ],
+    "promo_usage": [
+        [("promo_code", 1), ("customer_email", 1)],
+    ],
+    "visits": [
+        [("date", 1), ("visitor_id", 1)],
+        [("created_at", 1)],
+    ],
+    "wishlists": [
+        [("visitor_id", 1), ("product_id", 1), ("variation_id", 1)],
+        [("email", 1)],
+    ],
+}
+
+
+async def ensure_indexes(db):
+    """Create every index the services rely on"""
+    import customer_stats
+    import order_archive
+    import review_service
+    import takeapp_sync
+    from order_timeline import ensure_order_timeline_indexes
+
+    await ensure_order_timeline_indexes(db)
+    await customer_stats.ensure_customer_stats_indexes(db)
+    await takeapp_sync.ensure_takeapp_indexes(db)
+    await review_service.ensure_review_indexes(db)
+    await order_archive.ensure_archive_indexes(db)
+
+    for collection, indexes in CORE_INDEXES.items():
+        for keys in indexes:
+            await db[collection].create_index(keys)
+
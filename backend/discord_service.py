@@ -4,11 +4,27 @@ Sends order notifications to Discord via webhooks
 """
 import httpx
 import logging
+import os
 from datetime import datetime
 from typing import List, Optional
+from urllib.parse import urlsplit
+
+import metrics
 
 logger = logging.getLogger(__name__)
 
+# When set, webhooks are posted here instead of to discord.com, keeping the
+# /api/webhooks/{id}/{token} path - for the local stand-in (see fakes/)
+DISCORD_WEBHOOK_BASE_URL = os.environ.get("DISCORD_WEBHOOK_BASE_URL", "").rstrip("/")
+
+
+def webhook_target(webhook_url: str) -> str:
+    """The URL a stored webhook is actually posted to"""
+    if not DISCORD_WEBHOOK_BASE_URL:
+        return webhook_url
+    parts = urlsplit(webhook_url.strip())
+    return DISCORD_WEBHOOK_BASE_URL + parts.path + (f"?{parts.query}" if parts.query else "")
+
 
 async def send_discord_order_notification(
     webhook_urls: List[str],
@@ -116,13 +132,13 @@ async def send_discord_order_notification(
     
     
     # Send to all webhooks
-    async with httpx.AsyncClient(timeout=10.0) as client:
+    async with httpx.AsyncClient(timeout=10.0, transport=metrics.http_transport(metrics.DISCORD)) as client:
         for webhook_url in webhook_urls:
             if not webhook_url or not webhook_url.strip():
                 continue
             
             try:
-                response = await client.post(webhook_url, json=embed)
+                response = await client.post(webhook_target(webhook_url), json=embed)
                 
                 if response.status_code in [200, 204]:
                     logger.info(f"✅ Discord webhook sent successfully to {webhook_url[:50]}...")
@@ -207,13 +223,13 @@ async def send_discord_order_status_update(
     }
     
     # Send to all webhooks
-    async with httpx.AsyncClient(timeout=10.0) as client:
+    async with httpx.AsyncClient(timeout=10.0, transport=metrics.http_transport(metrics.DISCORD)) as client:
         for webhook_url in webhook_urls:
             if not webhook_url or not webhook_url.strip():
                 continue
             
             try:
-                response = await client.post(webhook_url, json=embed)
+                response = await client.post(webhook_target(webhook_url), json=embed)
                 
                 if response.status_code in [200, 204]:
                     logger.info(f"✅ Discord status update sent to {webhook_url[:50]}...")
@@ -6,11 +6,14 @@ import os
 import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-from typing import Optional
+from email.mime.application import MIMEApplication
+from typing import List, Optional, Tuple
 import logging
 from pathlib import Path
 from dotenv import load_dotenv
 
+import metrics
+
 # Load environment variables
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
@@ -22,29 +25,48 @@ SMTP_HOST = os.environ.get("SMTP_HOST", "smtp.gmail.com")
 SMTP_PORT = int(os.environ.get("SMTP_PORT", "587"))
 SMTP_USER = os.environ.get("SMTP_USER", "")
 SMTP_PASSWORD = os.environ.get("SMTP_PASSWORD", "")
+# Off only for servers without TLS, like the local SMTP sink (see fakes/)
+SMTP_STARTTLS = os.environ.get("SMTP_STARTTLS", "true").lower() != "false"
 SMTP_FROM_EMAIL = os.environ.get("SMTP_FROM_EMAIL", "noreply@gameshopnepal.com")
 SMTP_FROM_NAME = os.environ.get("SMTP_FROM_NAME", "GameShop Nepal")
 
-def send_email(to_email: str, subject: str, html_body: str, text_body: Optional[str] = None):
-    """Send email via SMTP"""
+def send_email(to_email: str, subject: str, html_body: str, text_body: Optional[str] = None,
+               attachments: Optional[List[Tuple[str, bytes, str]]] = None):
+    """Send email via SMTP
+
+    Args:
+        attachments: Optional list of (filename, content, mime_subtype) tuples, e.g. ("invoice.pdf", pdf_bytes, "pdf")
+    """
     if not SMTP_USER or not SMTP_PASSWORD:
         logger.warning("SMTP credentials not configured. Email not sent.")
         return False
     
     try:
-        msg = MIMEMultipart("alternative")
-        msg["Subject"] = subject
-        msg["From"] = f"{SMTP_FROM_NAME} <{SMTP_FROM_EMAIL}>"
-        msg["To"] = to_email
+        body = MIMEMultipart("alternative")
         
         # Add text and HTML versions
         if text_body:
-            msg.attach(MIMEText(text_body, "plain"))
-        msg.attach(MIMEText(html_body, "html"))
+            body.attach(MIMEText(text_body, "plain"))
+        body.attach(MIMEText(html_body, "html"))
+        
+        if attachments:
+            msg = MIMEMultipart("mixed")
+            msg.attach(body)
+            for filename, content, subtype in attachments:
+                part = MIMEApplication(content, _subtype=subtype)
+                part.add_header("Content-Disposition", "attachment", filename=filename)
+                msg.attach(part)
+        else:
+            msg = body
+        
+        msg["Subject"] = subject
+        msg["From"] = f"{SMTP_FROM_NAME} <{SMTP_FROM_EMAIL}>"
+        msg["To"] = to_email
         
         # Send email
-        with smtplib.SMTP(SMTP_HOST, SMTP_PORT) as server:
-            server.starttls()
+        with metrics.outbound_call(metrics.SMTP), smtplib.SMTP(SMTP_HOST, SMTP_PORT) as server:
+            if SMTP_STARTTLS:
+                server.starttls()
             server.login(SMTP_USER, SMTP_PASSWORD)
             server.send_message(msg)
         
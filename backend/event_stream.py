@@ -0,0 +1,222 @@
+"""
+Order Event Stream Service
+Pushes order events (new orders, payment uploads, status changes) to
+server-sent-events clients instead of having them re-poll full endpoints.
+
+Events come from a MongoDB change stream on `orders` when the deployment is a
+replica set, otherwise from an in-process bus fed by the order handlers.
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import deque
+from typing import Callable, Optional
+
+from pymongo.errors import OperationFailure, PyMongoError
+
+logger = logging.getLogger(__name__)
+
+# "auto" tries a change stream first and falls back to the in-process bus
+ORDER_EVENTS_SOURCE = os.environ.get("ORDER_EVENTS_SOURCE", "auto")
+
+HEARTBEAT_SECONDS = 15
+REPLAY_BUFFER_SIZE = 500
+SUBSCRIBER_QUEUE_SIZE = 100
+CHANGE_STREAM_RETRY_SECONDS = 5
+
+ORDER_CREATED = "order.created"
+PAYMENT_UPLOADED = "order.payment_uploaded"
+STATUS_CHANGED = "order.status_changed"
+
+# Sent when a client fell too far behind (or resumed from an unknown id)
+# and must refetch the full list
+RESYNC = "resync"
+
+# Mongo error code for "$changeStream is only supported on replica sets"
+CHANGE_STREAM_NOT_SUPPORTED = 40573
+CHANGE_STREAM_HISTORY_LOST = 286
+
+ADMIN_FIELDS = ("id", "status", "customer_name", "customer_email", "total_amount", "items_text",
+                "payment_method", "payment_screenshot", "created_at", "updated_at")
+PUBLIC_FIELDS = ("id", "status", "updated_at")
+
+
+def format_sse(data: dict, event: Optional[str] = None, event_id: Optional[str] = None) -> str:
+    """Format a single server-sent event frame"""
+    frame = ""
+    if event_id:
+        frame += f"id: {event_id}\n"
+    if event:
+        frame += f"event: {event}\n"
+    frame += f"data: {json.dumps(data, default=str)}\n\n"
+    return frame
+
+
+class Subscription:
+    """A single SSE client: bounded queue plus an optional event filter"""
+
+    def __init__(self, event_filter: Optional[Callable[[dict], bool]] = None):
+        self.queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self.event_filter = event_filter
+
+    def offer(self, event: dict):
+        if self.event_filter and not self.event_filter(event):
+            return
+        if self.queue.full():
+            # Backpressure: a slow client loses its backlog and is told to resync
+            # rather than holding an unbounded amount of memory
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait({"type": RESYNC, "id": None, "order": {}})
+            return
+        self.queue.put_nowait(event)
+
+
+class OrderEventBus:
+    """
+    Fan-out of order events with a replay buffer.
+
+    Every event gets an id of the form "<epoch>-<seq>"; clients send it back as
+    Last-Event-ID to resume. The epoch changes on restart, so a stale id forces
+    a resync instead of silently missing events.
+    """
+
+    def __init__(self):
+        self.epoch = format(int(time.time()), "x")
+        self.source = "local"
+        self._seq = 0
+        self._replay = deque(maxlen=REPLAY_BUFFER_SIZE)
+        self._subscribers = set()
+        self._resume_token = None
+
+    @property
+    def uses_change_stream(self) -> bool:
+        return self.source == "change_stream"
+
+    def _next_id(self) -> str:
+        self._seq += 1
+        return f"{self.epoch}-{self._seq}"
+
+    def _dispatch(self, event_type: str, order: dict):
+        event = {
+            "type": event_type,
+            "id": self._next_id(),
+            "order": {k: order.get(k) for k in ADMIN_FIELDS if k in order},
+        }
+        self._replay.append(event)
+        for subscription in list(self._subscribers):
+            subscription.offer(event)
+
+    def publish(self, event_type: str, order: dict):
+        """Publish from a request handler - skipped when the change stream already sees the write"""
+        if self.uses_change_stream:
+            return
+        self._dispatch(event_type, order)
+
+    def subscribe(self, event_filter: Optional[Callable[[dict], bool]] = None,
+                  last_event_id: Optional[str] = None) -> Subscription:
+        subscription = Subscription(event_filter)
+
+        if last_event_id:
+            epoch, _, seq = last_event_id.partition("-")
+            oldest_seq = self._seq - len(self._replay) + 1
+            if epoch != self.epoch or not seq.isdigit() or int(seq) < oldest_seq - 1:
+                subscription.offer({"type": RESYNC, "id": None, "order": {}})
+            else:
+                for event in self._replay:
+                    if int(event["id"].split("-")[1]) > int(seq):
+                        subscription.offer(event)
+
+        self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        self._subscribers.discard(subscription)
+
+    def _handle_change(self, change: dict):
+        order = change.get("fullDocument") or {}
+        if change["operationType"] == "insert":
+            self._dispatch(ORDER_CREATED, order)
+            return
+
+        updated_fields = (change.get("updateDescription") or {}).get("updatedFields", {})
+        if "payment_screenshot" in updated_fields:
+            self._dispatch(PAYMENT_UPLOADED, order)
+        elif "status" in updated_fields:
+            self._dispatch(STATUS_CHANGED, order)
+
+    def _broadcast_resync(self):
+        for subscription in list(self._subscribers):
+            subscription.offer({"type": RESYNC, "id": None, "order": {}})
+
+    async def run_change_stream(self, db):
+        """Watch `orders` and publish changes; returns if change streams are unavailable"""
+        if ORDER_EVENTS_SOURCE == "local":
+            logger.info("Order events: using in-process event bus")
+            return
+
+        pipeline = [{"$match": {"operationType": {"$in": ["insert", "update", "replace"]}}}]
+        while True:
+            try:
+                async with db.orders.watch(
+                    pipeline,
+                    full_document="updateLookup",
+                    resume_after=self._resume_token
+                ) as stream:
+                    if not self.uses_change_stream:
+                        logger.info("✅ Order events: using MongoDB change stream")
+                    self.source = "change_stream"
+                    async for change in stream:
+                        self._resume_token = stream.resume_token
+                        self._handle_change(change)
+            except asyncio.CancelledError:
+                self.source = "local"
+                raise
+            except OperationFailure as e:
+                if e.code == CHANGE_STREAM_NOT_SUPPORTED:
+                    self.source = "local"
+                    logger.info("Order events: change streams not supported, using in-process event bus")
+                    return
+                if e.code == CHANGE_STREAM_HISTORY_LOST:
+                    # The oplog rolled past our token - clients have to refetch
+                    self._resume_token = None
+                    self._broadcast_resync()
+                logger.warning(f"Order change stream failed: {e}")
+            except PyMongoError as e:
+                # Keep source as change_stream: the resume token replays what we miss
+                # while reconnecting, so handlers must not publish locally meanwhile
+                logger.warning(f"Order change stream interrupted: {e}")
+
+            await asyncio.sleep(CHANGE_STREAM_RETRY_SECONDS)
+
+
+def public_order_event(event: dict) -> dict:
+    """Strip an event down to what the public tracking page may see"""
+    return {
+        "type": event["type"],
+        "order": {k: event["order"].get(k) for k in PUBLIC_FIELDS if k in event["order"]},
+    }
+
+
+async def stream_events(request, subscription: Subscription, bus: OrderEventBus,
+                        transform: Optional[Callable[[dict], dict]] = None):
+    """Async generator yielding SSE frames for a subscription, with heartbeats"""
+    try:
+        yield f"retry: {CHANGE_STREAM_RETRY_SECONDS * 1000}\n\n"
+        while True:
+            if await request.is_disconnected():
+                break
+            try:
+                event = await asyncio.wait_for(subscription.queue.get(), timeout=HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": heartbeat\n\n"
+                continue
+            payload = transform(event) if transform else event
+            yield format_sse(payload, event=event["type"], event_id=event["id"])
+    finally:
+        bus.unsubscribe(subscription)
+
+
+order_events = OrderEventBus()
@@ -0,0 +1,18 @@
+"""
+Integration Stand-ins
+Local fakes for everything the backend talks to outside MongoDB: an SMTP
+sink (email_service, newsletter_service) and HTTP fakes of the parts of
+ImgBB, Discord webhooks, Google Sheets/Drive, Trustpilot and Take.app that
+the services use. Each can be given a latency distribution, an error rate
+and a rate limit (see fakes.faults), so a load test can show how a slow or
+failing integration shows up in request latency.
+
+    python -m fakes                                   # prints the settings to use
+    python -m fakes --latency lognormal:120,0.6 --error-rate 0.02
+    FAKE_IMGBB_LATENCY=uniform:800,4000 python -m fakes
+    python -m loadtest --fakes                        # in-process app + stand-ins
+
+Start the backend with the printed settings (SMTP_HOST, IMGBB_UPLOAD_URL,
+DISCORD_WEBHOOK_BASE_URL, GOOGLE_API_BASE_URL, TRUSTPILOT_BASE_URL,
+TAKEAPP_BASE_URL...) and every integration goes to the stand-ins instead.
+"""
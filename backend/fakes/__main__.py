@@ -0,0 +1,3 @@
+from fakes.server import main
+
+main()
@@ -0,0 +1,190 @@
+"""
+HTTP stand-ins for ImgBB, Discord webhooks, Trustpilot and Take.app
+Only what the services call is implemented, with the response shapes they
+parse. Whatever is sent is kept in memory (see /_fakes/captured/{service})
+so a test can check what would have gone out.
+"""
+import base64
+import binascii
+import hashlib
+import json
+import random
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from fastapi import APIRouter, Form, Request, Response
+from fastapi.responses import HTMLResponse, JSONResponse
+
+imgbb = APIRouter(prefix="/imgbb")
+discord = APIRouter(prefix="/discord")
+trustpilot = APIRouter(prefix="/trustpilot")
+takeapp = APIRouter(prefix="/takeapp")
+
+TAKEAPP_STATUSES = ("pending", "confirmed", "completed", "completed", "completed", "cancelled")
+REVIEWERS = ("Aarav S.", "Sita K.", "Bikash T.", "Prakriti R.", "Nischal G.", "Anjali M.", "Rohan B.", "Sujan P.")
+REVIEW_TEXTS = (
+    "Instant delivery, got my UC within minutes.",
+    "Smooth payment with eSewa and fast support on WhatsApp.",
+    "Best prices for Netflix in Nepal, will buy again.",
+    "Took a while on a Friday night but they delivered.",
+    "Legit shop, third order and no problems.",
+)
+
+
+def state(request: Request):
+    return request.app.state.fakes
+
+
+# ==================== IMGBB ====================
+
+@imgbb.post("/1/upload")
+async def imgbb_upload(request: Request, key: str = Form(""), image: str = Form(""), name: Optional[str] = Form(None)):
+    """POST https://api.imgbb.com/1/upload with a base64 image"""
+    if not key:
+        return JSONResponse(
+            {"status_code": 400, "error": {"message": "Invalid API v1 key.", "code": 100}, "success": False},
+            status_code=400,
+        )
+    try:
+        content = base64.b64decode(image, validate=True)
+    except (binascii.Error, ValueError):
+        content = b""
+    if not content:
+        return JSONResponse(
+            {"status_code": 400, "error": {"message": "Empty upload source.", "code": 130}, "success": False},
+            status_code=400,
+        )
+
+    fakes = state(request)
+    image_id = uuid.uuid4().hex[:7]
+    filename = name or "image"
+    base = str(request.base_url).rstrip("/")
+    url = f"{base}/imgbb/i/{image_id}/{filename}"
+    fakes.store_image(image_id, content)
+    fakes.capture("imgbb", {"id": image_id, "name": filename, "size": len(content)})
+    return {
+        "data": {
+            "id": image_id,
+            "title": filename,
+            "url_viewer": f"{base}/imgbb/view/{image_id}",
+            "url": url,
+            "display_url": url,
+            "size": len(content),
+            "time": int(datetime.now(timezone.utc).timestamp()),
+            "expiration": 0,
+            "image": {"filename": filename, "name": filename, "url": url},
+            "thumb": {"filename": filename, "name": filename, "url": f"{url}?thumb"},
+            "medium": {"filename": filename, "name": filename, "url": f"{url}?medium"},
+            "delete_url": f"{base}/imgbb/delete/{image_id}",
+        },
+        "success": True,
+        "status": 200,
+    }
+
+
+@imgbb.get("/i/{image_id}/{filename}")
+async def imgbb_image(request: Request, image_id: str, filename: str):
+    content = state(request).images.get(image_id)
+    if content is None:
+        return Response(status_code=404)
+    return Response(content, media_type="image/png")
+
+
+# ==================== DISCORD ====================
+
+@discord.post("/api/webhooks/{webhook_id}/{token}")
+async def discord_webhook(request: Request, webhook_id: str, token: str, wait: bool = False):
+    """Execute Webhook: 204 unless ?wait=true, which returns the message"""
+    try:
+        payload = await request.json()
+    except json.JSONDecodeError:
+        return JSONResponse({"message": "Cannot send an empty message", "code": 50006}, status_code=400)
+    if not isinstance(payload, dict) or not (payload.get("content") or payload.get("embeds")):
+        return JSONResponse({"message": "Cannot send an empty message", "code": 50006}, status_code=400)
+
+    message = {"id": str(random.getrandbits(63)), "webhook_id": webhook_id, **payload}
+    state(request).capture("discord", message)
+    if wait:
+        return message
+    return Response(status_code=204)
+
+
+# ==================== TRUSTPILOT ====================
+
+def review_page(domain: str, count: int, seed: int) -> str:
+    """A review page with the JSON-LD block review_service parses"""
+    rng = random.Random(seed)
+    now = datetime.now(timezone.utc)
+    reviews = [
+        {
+            "@type": "Review",
+            "author": {"@type": "Person", "name": rng.choice(REVIEWERS)},
+            "reviewRating": {"@type": "Rating", "ratingValue": rng.choices((5, 4, 3, 2, 1), (70, 18, 6, 3, 3))[0]},
+            "reviewBody": f"{rng.choice(REVIEW_TEXTS)} (#{n})",
+            "datePublished": (now - timedelta(days=n * 3)).isoformat(),
+        }
+        for n in range(count)
+    ]
+    business = {"@context": "https://schema.org", "@type": "LocalBusiness", "name": domain, "review": reviews}
+    return (
+        f"<!DOCTYPE html><html><head><title>{domain} Reviews</title>"
+        f'<script type="application/ld+json">{json.dumps(business)}</script>'
+        f"</head><body><h1>{domain}</h1></body></html>"
+    )
+
+
+@trustpilot.get("/review/{domain}")
+async def trustpilot_reviews(request: Request, domain: str):
+    """The public review page, with an ETag so conditional fetches get 304"""
+    fakes = state(request)
+    # Built once per domain so the ETag only changes when the server restarts
+    if domain not in fakes.review_pages:
+        html = review_page(domain, fakes.trustpilot_reviews, fakes.seed)
+        fakes.review_pages[domain] = (html, '"' + hashlib.sha256(html.encode()).hexdigest()[:16] + '"')
+    html, etag = fakes.review_pages[domain]
+    fakes.capture("trustpilot", {"domain": domain, "if_none_match": request.headers.get("if-none-match")})
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    return HTMLResponse(html, headers={"ETag": etag})
+
+
+# ==================== TAKE.APP ====================
+
+def takeapp_orders(count: int, seed: int) -> list:
+    """Deterministic orders, oldest first, a new one every few hours"""
+    rng = random.Random(seed)
+    now = datetime.now(timezone.utc)
+    start = now - timedelta(hours=4 * count)
+    orders = []
+    for n in range(count):
+        created = start + timedelta(hours=4 * n, minutes=rng.randrange(240))
+        customer = rng.randrange(max(count // 3, 1))
+        orders.append({
+            "id": f"ta_{seed}_{n:06d}",
+            "number": 10000 + n,
+            "customer": {
+                "name": f"Take.app Customer {customer}",
+                "email": f"takeapp-{customer}@example.com",
+                "phone": f"+97798{customer:08d}",
+            },
+            "status": rng.choice(TAKEAPP_STATUSES),
+            "total": rng.choice((120, 499, 550, 1100, 1450, 2499)),
+            "created_at": created.isoformat(),
+            "updated_at": min(created + timedelta(minutes=rng.randrange(1, 600)), now).isoformat(),
+        })
+    return orders
+
+
+@takeapp.get("/v1/orders")
+async def takeapp_list_orders(request: Request, api_key: str = "", page: int = 1, limit: int = 100,
+                              updated_after: Optional[str] = None):
+    if not api_key:
+        return JSONResponse({"error": "Unauthorized", "message": "Missing api_key"}, status_code=401)
+    orders = state(request).takeapp_orders
+    if updated_after:
+        orders = [order for order in orders if order["updated_at"] > updated_after]
+    orders = sorted(orders, key=lambda order: order["updated_at"])
+    page, limit = max(page, 1), max(min(limit, 250), 1)
+    items = orders[(page - 1) * limit:page * limit]
+    return {"data": items, "meta": {"page": page, "limit": limit, "total": len(orders)}}
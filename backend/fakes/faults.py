@@ -0,0 +1,195 @@
+"""
+Fault injection for the stand-in servers
+A Profile describes how one fake misbehaves: how long each response is held
+back (a latency distribution), what share of requests fail outright, and how
+many requests per second it serves before it starts refusing them (429 over
+HTTP, 421 over SMTP). Profiles come from the environment and can be changed
+on a running server through PUT /_fakes/faults/{service}.
+
+    FAKE_LATENCY=lognormal:80,0.5     every service, unless overridden
+    FAKE_ERROR_RATE=0.02
+    FAKE_RATE_LIMIT=5                 requests per second, 0 = unlimited
+    FAKE_IMGBB_LATENCY=uniform:500,3000
+    FAKE_DISCORD_RATE_LIMIT=1
+
+Latency specs, in milliseconds: "fixed:50" (or just "50"), "uniform:10,200",
+"normal:100,30" (mean, standard deviation) and "lognormal:80,0.5" (median,
+sigma - the long tail real APIs have).
+"""
+import asyncio
+import math
+import os
+import random
+import time
+from typing import Dict, Optional
+
+SERVICES = ("smtp", "imgbb", "discord", "google", "trustpilot", "takeapp")
+
+DISTRIBUTIONS = {"fixed": 1, "uniform": 2, "normal": 2, "lognormal": 2}
+
+# Outcomes of Faults.decide
+OK = "ok"
+ERROR = "error"
+THROTTLED = "throttled"
+
+
+class Latency:
+    """A parsed latency spec; sample() returns seconds"""
+
+    def __init__(self, spec: str = "fixed:0"):
+        spec = (spec or "0").strip()
+        kind, _, raw = spec.partition(":") if ":" in spec else ("fixed", "", spec)
+        if kind not in DISTRIBUTIONS:
+            raise ValueError(f"Unknown latency distribution '{kind}' (use {', '.join(DISTRIBUTIONS)})")
+        try:
+            args = [float(value) for value in raw.split(",")]
+        except ValueError:
+            raise ValueError(f"Latency '{spec}' needs numeric arguments")
+        if len(args) != DISTRIBUTIONS[kind] or any(value < 0 for value in args):
+            raise ValueError(f"Latency '{spec}' needs {DISTRIBUTIONS[kind]} non-negative arguments")
+        if kind == "uniform" and args[0] > args[1]:
+            raise ValueError(f"Latency '{spec}': low is above high")
+        self.kind = kind
+        self.args = args
+        self.spec = f"{kind}:{','.join(f'{value:g}' for value in args)}"
+
+    def sample(self, rng: random.Random) -> float:
+        if self.kind == "fixed":
+            ms = self.args[0]
+        elif self.kind == "uniform":
+            ms = rng.uniform(*self.args)
+        elif self.kind == "normal":
+            ms = max(0.0, rng.gauss(*self.args))
+        else:
+            median, sigma = self.args
+            ms = rng.lognormvariate(math.log(median), sigma) if median else 0.0
+        return ms / 1000
+
+
+class Profile:
+    """Latency, error rate and rate limit of one service"""
+
+    FIELDS = ("latency", "error_rate", "error_status", "rate_limit")
+
+    def __init__(self, latency: str = "fixed:0", error_rate: float = 0.0, error_status: int = 503,
+                 rate_limit: float = 0.0):
+        self.latency = Latency(latency)
+        self.error_rate = float(error_rate)
+        self.error_status = int(error_status)
+        self.rate_limit = float(rate_limit)
+        if not 0 <= self.error_rate <= 1:
+            raise ValueError("error_rate must be between 0 and 1")
+        if self.rate_limit < 0:
+            raise ValueError("rate_limit must not be negative")
+
+    @classmethod
+    def from_env(cls, service: str) -> "Profile":
+        def setting(name: str, default: str) -> str:
+            return os.environ.get(f"FAKE_{service.upper()}_{name}", os.environ.get(f"FAKE_{name}", default))
+
+        return cls(
+            latency=setting("LATENCY", "fixed:0"),
+            error_rate=float(setting("ERROR_RATE", "0")),
+            error_status=int(setting("ERROR_STATUS", "503")),
+            rate_limit=float(setting("RATE_LIMIT", "0")),
+        )
+
+    def updated(self, changes: dict) -> "Profile":
+        """A copy with some fields replaced; raises ValueError on bad input"""
+        unknown = set(changes) - set(self.FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown profile fields: {', '.join(sorted(unknown))}")
+        return Profile(**{**self.as_dict(), **changes})
+
+    def as_dict(self) -> dict:
+        return {
+            "latency": self.latency.spec,
+            "error_rate": self.error_rate,
+            "error_status": self.error_status,
+            "rate_limit": self.rate_limit,
+        }
+
+
+class TokenBucket:
+    """`rate` requests per second with a burst of one second's worth"""
+
+    def __init__(self, rate: float):
+        self.rate = rate
+        self.capacity = max(rate, 1.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def take(self) -> Optional[float]:
+        """None if the request may go ahead, else seconds until it could"""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return None
+        return (1 - self.tokens) / self.rate
+
+
+class Faults:
+    """Profiles, rate limiters and counters for every service"""
+
+    def __init__(self, seed: Optional[int] = None):
+        self.rng = random.Random(seed)
+        self.profiles: Dict[str, Profile] = {service: Profile.from_env(service) for service in SERVICES}
+        self.buckets: Dict[str, TokenBucket] = {}
+        self.counters: Dict[str, Dict[str, float]] = {}
+        self.reset_counters()
+        for service in SERVICES:
+            self._reset_bucket(service)
+
+    def _reset_bucket(self, service: str):
+        rate = self.profiles[service].rate_limit
+        if rate:
+            self.buckets[service] = TokenBucket(rate)
+        else:
+            self.buckets.pop(service, None)
+
+    def set_profile(self, service: str, profile: Profile):
+        self.profiles[service] = profile
+        self._reset_bucket(service)
+
+    def reset_counters(self):
+        self.counters = {
+            service: {"requests": 0, "errors": 0, "throttled": 0, "delay_seconds": 0.0}
+            for service in SERVICES
+        }
+
+    async def decide(self, service: str):
+        """
+        Hold the request for its sampled latency, then return (outcome,
+        retry_after). Throttled requests wait too: a refusal still costs a
+        round trip.
+        """
+        profile = self.profiles[service]
+        counters = self.counters[service]
+        counters["requests"] += 1
+
+        delay = profile.latency.sample(self.rng)
+        if delay:
+            counters["delay_seconds"] += delay
+            await asyncio.sleep(delay)
+
+        bucket = self.buckets.get(service)
+        retry_after = bucket.take() if bucket else None
+        if retry_after is not None:
+            counters["throttled"] += 1
+            return THROTTLED, retry_after
+        if profile.error_rate and self.rng.random() < profile.error_rate:
+            counters["errors"] += 1
+            return ERROR, None
+        return OK, None
+
+    def summary(self) -> dict:
+        return {
+            service: {
+                "profile": self.profiles[service].as_dict(),
+                **{key: round(value, 3) if isinstance(value, float) else value
+                   for key, value in self.counters[service].items()},
+            }
+            for service in SERVICES
+        }
@@ -0,0 +1,340 @@
+"""
+Google Sheets and Drive stand-ins
+Both APIs are served under one base URL (GOOGLE_API_BASE_URL), laid out like
+the real hosts: /v4/spreadsheets/... as on sheets.googleapis.com and
+/drive/v3/..., /upload/drive/v3/... as on www.googleapis.com. Only what
+gspread and the Drive client do for google_sheets_service and
+google_drive_service is implemented. Any spreadsheet id opens a spreadsheet,
+created empty on first use; uploads must be resumable, as the Drive service
+sends them.
+"""
+import re
+import uuid
+from datetime import datetime, timezone
+from typing import List, Optional, Tuple
+
+from fastapi import APIRouter, Request, Response
+from fastapi.responses import JSONResponse
+
+google = APIRouter(prefix="/google")
+
+CELL_RE = re.compile(r"^([A-Z]*)(\d*)$")
+
+
+def error(status: int, message: str, reason: str = "INVALID_ARGUMENT") -> JSONResponse:
+    return JSONResponse({"error": {"code": status, "message": message, "status": reason}}, status_code=status)
+
+
+# ==================== SHEETS ====================
+
+def column_number(letters: str) -> int:
+    number = 0
+    for letter in letters:
+        number = number * 26 + ord(letter) - 64
+    return number
+
+
+def column_letters(number: int) -> str:
+    letters = ""
+    while number:
+        number, remainder = divmod(number - 1, 26)
+        letters = chr(65 + remainder) + letters
+    return letters
+
+
+def split_range(a1: str) -> Tuple[Optional[str], str]:
+    """"'Sheet ''1'''!A1:B2" -> ("Sheet '1'", "A1:B2"); no sheet name -> (None, cells)"""
+    if a1.startswith("'"):
+        end = 1
+        while True:
+            end = a1.index("'", end)
+            if a1[end + 1:end + 2] == "'":
+                end += 2
+                continue
+            break
+        return a1[1:end].replace("''", "'"), a1[end + 2:]
+    if "!" in a1:
+        sheet, _, cells = a1.partition("!")
+        return sheet, cells
+    if all(CELL_RE.match(part) for part in a1.split(":")):
+        return None, a1
+    return a1, ""
+
+
+def parse_cells(cells: str) -> Tuple[int, int, Optional[int], Optional[int]]:
+    """"B2:D4" -> (first row, first column, last row, last column), 1-based, None = open"""
+    if not cells:
+        return 1, 1, None, None
+    start, _, end = cells.partition(":")
+    start_col, start_row = CELL_RE.match(start).groups()
+    first_row, first_col = int(start_row or 1), column_number(start_col) if start_col else 1
+    if not end:
+        return first_row, first_col, first_row, first_col
+    end_col, end_row = CELL_RE.match(end).groups()
+    return first_row, first_col, int(end_row) if end_row else None, column_number(end_col) if end_col else None
+
+
+def rendered(value):
+    """Values come back formatted, as strings, like valueRenderOption=FORMATTED_VALUE"""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return "" if value is None else str(value)
+
+
+class Spreadsheet:
+    def __init__(self, spreadsheet_id: str):
+        self.id = spreadsheet_id
+        self.title = f"Spreadsheet {spreadsheet_id[:8]}"
+        self.sheets: List[dict] = []
+        self.add_sheet("Sheet1", 1000, 26)
+
+    def add_sheet(self, title: str, rows: int, cols: int, index: Optional[int] = None) -> dict:
+        sheet = {
+            "properties": {
+                "sheetId": (max((s["properties"]["sheetId"] for s in self.sheets), default=-1) + 1),
+                "title": title,
+                "index": len(self.sheets) if index is None else index,
+                "sheetType": "GRID",
+                "gridProperties": {"rowCount": rows, "columnCount": cols},
+            },
+            "rows": [],
+        }
+        self.sheets.insert(sheet["properties"]["index"], sheet)
+        for position, existing in enumerate(self.sheets):
+            existing["properties"]["index"] = position
+        return sheet
+
+    def sheet(self, title: Optional[str]) -> Optional[dict]:
+        if title is None:
+            return self.sheets[0]
+        return next((s for s in self.sheets if s["properties"]["title"] == title), None)
+
+    def metadata(self) -> dict:
+        return {
+            "spreadsheetId": self.id,
+            "properties": {"title": self.title, "locale": "en_US", "timeZone": "Asia/Kathmandu"},
+            "sheets": [{"properties": sheet["properties"]} for sheet in self.sheets],
+            "spreadsheetUrl": f"https://docs.google.com/spreadsheets/d/{self.id}/edit",
+        }
+
+
+def a1_label(title: str, first_row: int, first_col: int, last_row: int, last_col: int) -> str:
+    quoted = "'" + title.replace("'", "''") + "'"
+    return f"{quoted}!{column_letters(first_col)}{first_row}:{column_letters(last_col)}{last_row}"
+
+
+def write_rows(sheet: dict, first_row: int, first_col: int, values: List[list]):
+    rows = sheet["rows"]
+    for offset, row_values in enumerate(values):
+        row_index = first_row - 1 + offset
+        while len(rows) <= row_index:
+            rows.append([])
+        row = rows[row_index]
+        end = first_col - 1 + len(row_values)
+        if len(row) < end:
+            row.extend([""] * (end - len(row)))
+        row[first_col - 1:end] = row_values
+    grid = sheet["properties"]["gridProperties"]
+    grid["rowCount"] = max(grid["rowCount"], len(rows))
+    grid["columnCount"] = max(grid["columnCount"], max((len(r) for r in rows), default=0))
+
+
+def read_rows(sheet: dict, cells: str) -> List[list]:
+    first_row, first_col, last_row, last_col = parse_cells(cells)
+    selected = sheet["rows"][first_row - 1:last_row]
+    values = [[rendered(value) for value in row[first_col - 1:last_col]] for row in selected]
+    # The API trims trailing empty cells and rows
+    values = [row[:max((i + 1 for i, v in enumerate(row) if v != ""), default=0)] for row in values]
+    while values and not values[-1]:
+        values.pop()
+    return values
+
+
+def updated(spreadsheet: Spreadsheet, sheet: dict, first_row: int, first_col: int, values: List[list]) -> dict:
+    width = max((len(row) for row in values), default=0)
+    return {
+        "spreadsheetId": spreadsheet.id,
+        "updatedRange": a1_label(sheet["properties"]["title"], first_row, first_col,
+                                 first_row + len(values) - 1, first_col + max(width, 1) - 1),
+        "updatedRows": len(values),
+        "updatedColumns": width,
+        "updatedCells": sum(len(row) for row in values),
+    }
+
+
+def batch_update(spreadsheet: Spreadsheet, body: dict):
+    replies = []
+    for number, change in enumerate(body.get("requests", [])):
+        if "addSheet" not in change:
+            return error(400, f"Invalid requests[{number}]: only addSheet is supported by the stand-in")
+        properties = change["addSheet"].get("properties", {})
+        title = properties.get("title") or f"Sheet{len(spreadsheet.sheets) + 1}"
+        if spreadsheet.sheet(title):
+            return error(400, f'Invalid requests[{number}].addSheet: A sheet with the name "{title}" already '
+                              f"exists. Please enter another name.")
+        grid = properties.get("gridProperties", {})
+        sheet = spreadsheet.add_sheet(title, grid.get("rowCount", 1000), grid.get("columnCount", 26),
+                                      properties.get("index"))
+        replies.append({"addSheet": {"properties": sheet["properties"]}})
+    return {"spreadsheetId": spreadsheet.id, "replies": replies}
+
+
+@google.api_route("/v4/spreadsheets/{path:path}", methods=["GET", "POST", "PUT"])
+async def sheets(request: Request, path: str):
+    """
+    spreadsheets.get, spreadsheets.batchUpdate (addSheet) and values get,
+    update and append. One route because the method names hang off ids and
+    ranges with a colon (":batchUpdate", ":append").
+    """
+    fakes = request.app.state.fakes
+    spreadsheet_id, _, rest = path.partition("/")
+    spreadsheet_id, _, action = spreadsheet_id.partition(":")
+    spreadsheet = fakes.spreadsheets.get(spreadsheet_id)
+    if spreadsheet is None:
+        spreadsheet = fakes.spreadsheets[spreadsheet_id] = Spreadsheet(spreadsheet_id)
+    body = await request.json() if request.method != "GET" and await request.body() else {}
+    method = request.method
+
+    if not rest:
+        if method == "GET" and not action:
+            return spreadsheet.metadata()
+        if method == "POST" and action == "batchUpdate":
+            fakes.capture("google", {"api": "sheets", "spreadsheet": spreadsheet_id, "batchUpdate": body})
+            return batch_update(spreadsheet, body)
+        return error(404, f"Method not found: {method} {path}", "NOT_FOUND")
+
+    if not rest.startswith("values/"):
+        return error(404, f"Method not found: {method} {path}", "NOT_FOUND")
+    a1, _, action = rest[len("values/"):].rpartition(":") if rest.endswith(":append") else (rest[7:], "", "")
+    title, cells = split_range(a1)
+    sheet = spreadsheet.sheet(title)
+    if sheet is None:
+        return error(400, f"Unable to parse range: {a1}")
+
+    if method == "GET" and not action:
+        result = {"range": a1, "majorDimension": "ROWS"}
+        values = read_rows(sheet, cells)
+        if values:
+            result["values"] = values
+        return result
+    if method == "PUT" and not action:
+        values = body.get("values", [])
+        first_row, first_col, _, _ = parse_cells(cells)
+        write_rows(sheet, first_row, first_col, values)
+        fakes.capture("google", {"api": "sheets", "update": a1, "values": values})
+        return updated(spreadsheet, sheet, first_row, first_col, values)
+    if method == "POST" and action == "append":
+        values = body.get("values", [])
+        first_row = len(sheet["rows"]) + 1
+        write_rows(sheet, first_row, 1, values)
+        fakes.capture("google", {"api": "sheets", "append": a1, "values": values})
+        return {
+            "spreadsheetId": spreadsheet.id,
+            "tableRange": a1,
+            "updates": updated(spreadsheet, sheet, first_row, 1, values),
+        }
+    return error(404, f"Method not found: {method} {path}", "NOT_FOUND")
+
+
+# ==================== DRIVE ====================
+
+def drive_file(request: Request, file_id: str, metadata: dict, size: int = 0) -> dict:
+    base = str(request.base_url).rstrip("/")
+    return {
+        "kind": "drive#file",
+        "id": file_id,
+        "name": metadata.get("name", "Untitled"),
+        "mimeType": metadata.get("mimeType", "application/octet-stream"),
+        "parents": metadata.get("parents") or [],
+        "size": str(size),
+        "trashed": False,
+        "createdTime": datetime.now(timezone.utc).isoformat(),
+        "webViewLink": f"https://drive.google.com/file/d/{file_id}/view",
+        "webContentLink": f"{base}/google/drive/v3/files/{file_id}?alt=media",
+    }
+
+
+def query_matches(query: str, file: dict) -> bool:
+    """The `name='...'`, `mimeType='...'` and `trashed=false` terms of a files.list q"""
+    for field, value in re.findall(r"(\w+)\s*=\s*'((?:[^'\\]|\\.)*)'", query or ""):
+        if file.get(field) != value.replace("\\'", "'"):
+            return False
+    return True
+
+
+@google.post("/drive/v3/files")
+async def drive_create(request: Request):
+    """files.create without content - folders"""
+    fakes = request.app.state.fakes
+    metadata = await request.json() if await request.body() else {}
+    file = drive_file(request, uuid.uuid4().hex, metadata)
+    fakes.drive_files[file["id"]] = file
+    fakes.capture("google", {"api": "drive", "create": file["name"], "mimeType": file["mimeType"]})
+    return file
+
+
+@google.get("/drive/v3/files")
+async def drive_list(request: Request, q: str = ""):
+    files = [file for file in request.app.state.fakes.drive_files.values() if query_matches(q, file)]
+    return {"kind": "drive#fileList", "incompleteSearch": False, "files": files}
+
+
+@google.get("/drive/v3/files/{file_id}")
+async def drive_get(request: Request, file_id: str, alt: str = "json"):
+    fakes = request.app.state.fakes
+    file = fakes.drive_files.get(file_id)
+    if file is None:
+        return error(404, f"File not found: {file_id}.", "NOT_FOUND")
+    if alt == "media":
+        return Response(fakes.drive_content.get(file_id, b""), media_type=file["mimeType"])
+    return file
+
+
+@google.delete("/drive/v3/files/{file_id}")
+async def drive_delete(request: Request, file_id: str):
+    fakes = request.app.state.fakes
+    if fakes.drive_files.pop(file_id, None) is None:
+        return error(404, f"File not found: {file_id}.", "NOT_FOUND")
+    fakes.drive_content.pop(file_id, None)
+    return Response(status_code=204)
+
+
+@google.post("/drive/v3/files/{file_id}/permissions")
+async def drive_share(request: Request, file_id: str):
+    if file_id not in request.app.state.fakes.drive_files:
+        return error(404, f"File not found: {file_id}.", "NOT_FOUND")
+    permission = await request.json() if await request.body() else {}
+    return {"kind": "drive#permission", "id": "anyoneWithLink", **permission}
+
+
+@google.post("/upload/drive/v3/files")
+async def drive_upload_start(request: Request, uploadType: str = ""):
+    """Resumable upload, step one: the metadata; the session URL comes back in Location"""
+    if uploadType != "resumable":
+        return error(400, "The stand-in only takes resumable uploads (uploadType=resumable)")
+    fakes = request.app.state.fakes
+    upload_id = uuid.uuid4().hex
+    fakes.drive_uploads[upload_id] = {
+        "metadata": await request.json() if await request.body() else {},
+        "mime_type": request.headers.get("x-upload-content-type"),
+    }
+    location = f"{str(request.base_url).rstrip('/')}/google/upload/drive/v3/files?uploadType=resumable&upload_id={upload_id}"
+    return Response(status_code=200, headers={"Location": location})
+
+
+@google.put("/upload/drive/v3/files")
+async def drive_upload_content(request: Request, upload_id: str = ""):
+    """Resumable upload, step two: the whole file in one request"""
+    fakes = request.app.state.fakes
+    upload = fakes.drive_uploads.pop(upload_id, None)
+    if upload is None:
+        return error(404, "Upload session not found or already finished", "NOT_FOUND")
+    content = await request.body()
+    metadata = dict(upload["metadata"])
+    if upload["mime_type"]:
+        metadata.setdefault("mimeType", upload["mime_type"])
+    file = drive_file(request, uuid.uuid4().hex, metadata, len(content))
+    fakes.drive_files[file["id"]] = file
+    fakes.drive_content[file["id"]] = content
+    fakes.capture("google", {"api": "drive", "upload": file["name"], "size": len(content)})
+    return JSONResponse(file, status_code=200)
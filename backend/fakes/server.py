@@ -0,0 +1,267 @@
+"""
+Stand-in server
+One process serves every fake: the HTTP APIs on one port, each under its own
+prefix (/imgbb, /discord, /google, /trustpilot, /takeapp), and the SMTP sink
+on another. Fault profiles are applied in front of the HTTP routes by
+FaultInjector and inside the SMTP session. /_fakes is the control API:
+
+    GET  /_fakes                      profiles and counters per service
+    GET  /_fakes/captured/{service}   what was sent (emails, webhooks, rows...)
+    PUT  /_fakes/faults/{service}     change a profile ("all" for every service)
+    POST /_fakes/reset                forget captures, counters and stored data
+"""
+import argparse
+import asyncio
+import math
+import threading
+from collections import OrderedDict, deque
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+from fastapi import Body, FastAPI, HTTPException
+
+from fakes import apis
+from fakes.faults import ERROR, OK, SERVICES, Faults
+from fakes.google import google
+from fakes.smtp import start_smtp
+from serialization import dumps
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_HTTP_PORT = 8025
+DEFAULT_SMTP_PORT = 2525
+CAPTURE_LIMIT = 1000
+STARTUP_TIMEOUT = 10
+
+
+class Fakes:
+    """Everything the stand-ins remember, plus their fault profiles"""
+
+    def __init__(self, seed: int = 1, takeapp_orders: int = 500, trustpilot_reviews: int = 40,
+                 capture_limit: int = CAPTURE_LIMIT):
+        self.seed = seed
+        self.capture_limit = capture_limit
+        self.faults = Faults(seed)
+        self.trustpilot_reviews = trustpilot_reviews
+        self.takeapp_orders = apis.takeapp_orders(takeapp_orders, seed)
+        self.reset()
+
+    def reset(self):
+        self.captured: Dict[str, deque] = {service: deque(maxlen=self.capture_limit) for service in SERVICES}
+        self.images: "OrderedDict[str, bytes]" = OrderedDict()
+        self.review_pages = {}
+        self.spreadsheets = {}
+        self.drive_files = {}
+        self.drive_content = {}
+        self.drive_uploads = {}
+        self.faults.reset_counters()
+
+    def capture(self, service: str, item: dict):
+        self.captured[service].append({"at": datetime.now(timezone.utc).isoformat(), **item})
+
+    def store_image(self, image_id: str, content: bytes):
+        self.images[image_id] = content
+        while len(self.images) > self.capture_limit:
+            self.images.popitem(last=False)
+
+    def summary(self) -> dict:
+        faults = self.faults.summary()
+        return {service: {**faults[service], "captured": len(self.captured[service])} for service in SERVICES}
+
+
+def _response(status: int, payload: dict, headers=()):
+    body = dumps(payload)
+    start = {
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode()), *headers],
+    }
+    return start, {"type": "http.response.body", "body": body}
+
+
+class FaultInjector:
+    """Holds each request to a service for its latency, then fails or throttles it per the profile"""
+
+    def __init__(self, app, faults: Faults):
+        self.app = app
+        self.faults = faults
+
+    async def __call__(self, scope, receive, send):
+        service = scope["path"].split("/", 2)[1] if scope["type"] == "http" else ""
+        if service not in SERVICES:
+            await self.app(scope, receive, send)
+            return
+
+        outcome, retry_after = await self.faults.decide(service)
+        if outcome == OK:
+            await self.app(scope, receive, send)
+            return
+        if outcome == ERROR:
+            status = self.faults.profiles[service].error_status
+            start, body = _response(status, {
+                "message": "Injected failure",
+                "error": {"code": status, "message": "Injected failure", "status": "UNAVAILABLE"},
+            })
+        else:
+            # Retry-After in whole seconds, and Discord's retry_after in fractional ones
+            start, body = _response(429, {
+                "message": "You are being rate limited.",
+                "retry_after": round(retry_after, 3),
+                "global": False,
+                "error": {"code": 429, "message": "Rate limit exceeded", "status": "RESOURCE_EXHAUSTED"},
+            }, [(b"retry-after", str(math.ceil(retry_after)).encode())])
+        await send(start)
+        await send(body)
+
+
+def create_app(fakes: Fakes) -> FastAPI:
+    app = FastAPI(title="Nobeosh integration stand-ins", docs_url=None, redoc_url=None)
+    app.state.fakes = fakes
+    for router in (apis.imgbb, apis.discord, google, apis.trustpilot, apis.takeapp):
+        app.include_router(router)
+
+    @app.get("/_fakes")
+    async def fakes_summary():
+        return fakes.summary()
+
+    @app.get("/_fakes/captured/{service}")
+    async def fakes_captured(service: str, limit: int = 100):
+        if service not in SERVICES:
+            raise HTTPException(status_code=404, detail=f"Unknown service '{service}'")
+        items = list(fakes.captured[service])
+        return items[-limit:] if limit > 0 else items
+
+    @app.put("/_fakes/faults/{service}")
+    async def fakes_set_faults(service: str, changes: dict = Body(...)):
+        services = SERVICES if service == "all" else (service,)
+        if service != "all" and service not in SERVICES:
+            raise HTTPException(status_code=404, detail=f"Unknown service '{service}'")
+        try:
+            profiles = {name: fakes.faults.profiles[name].updated(changes) for name in services}
+        except (TypeError, ValueError) as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        for name, profile in profiles.items():
+            fakes.faults.set_profile(name, profile)
+        return {name: profile.as_dict() for name, profile in profiles.items()}
+
+    @app.post("/_fakes/reset")
+    async def fakes_reset():
+        fakes.reset()
+        return {"success": True}
+
+    app.add_middleware(FaultInjector, faults=fakes.faults)
+    return app
+
+
+def environment(host: str = DEFAULT_HOST, http_port: int = DEFAULT_HTTP_PORT,
+                smtp_port: int = DEFAULT_SMTP_PORT) -> Dict[str, str]:
+    """The settings that point every integration at the stand-ins"""
+    base = f"http://{host}:{http_port}"
+    return {
+        "SMTP_HOST": host,
+        "SMTP_PORT": str(smtp_port),
+        "SMTP_USER": "fakes",
+        "SMTP_PASSWORD": "fakes",
+        "SMTP_STARTTLS": "false",
+        "IMGBB_API_KEY": "fakes",
+        "IMGBB_UPLOAD_URL": f"{base}/imgbb/1/upload",
+        "DISCORD_WEBHOOK_BASE_URL": f"{base}/discord",
+        "GOOGLE_API_BASE_URL": f"{base}/google",
+        "TRUSTPILOT_BASE_URL": f"{base}/trustpilot",
+        "TAKEAPP_BASE_URL": f"{base}/takeapp/v1",
+        "TAKEAPP_API_KEY": "fakes",
+    }
+
+
+async def serve(fakes: Fakes, host: str, http_port: int, smtp_port: int,
+                started: Optional[threading.Event] = None, server_holder: Optional[list] = None):
+    import uvicorn
+
+    smtp = await start_smtp(fakes, host, smtp_port)
+    config = uvicorn.Config(create_app(fakes), host=host, port=http_port, log_level="warning", lifespan="off")
+    server = uvicorn.Server(config)
+    if server_holder is not None:
+        server_holder.append(server)
+
+    async def signal_started():
+        while not server.started and not server.should_exit:
+            await asyncio.sleep(0.05)
+        if started is not None:
+            started.set()
+
+    watcher = asyncio.create_task(signal_started())
+    try:
+        await server.serve()
+    finally:
+        watcher.cancel()
+        smtp.close()
+        await smtp.wait_closed()
+
+
+class Background:
+    """The stand-ins on a thread of their own, e.g. next to the app in a load test"""
+
+    def __init__(self, fakes: Optional[Fakes] = None, host: str = DEFAULT_HOST,
+                 http_port: int = DEFAULT_HTTP_PORT, smtp_port: int = DEFAULT_SMTP_PORT):
+        self.fakes = fakes or Fakes()
+        self.host = host
+        self.http_port = http_port
+        self.smtp_port = smtp_port
+        self.environment = environment(host, http_port, smtp_port)
+        self._started = threading.Event()
+        self._servers = []
+        self._thread = threading.Thread(target=self._run, name="fakes", daemon=True)
+        self._error: Optional[BaseException] = None
+
+    def _run(self):
+        try:
+            asyncio.run(serve(self.fakes, self.host, self.http_port, self.smtp_port, self._started, self._servers))
+        except BaseException as e:
+            self._error = e
+            self._started.set()
+
+    def start(self) -> "Background":
+        self._thread.start()
+        if not self._started.wait(STARTUP_TIMEOUT) or self._error:
+            raise RuntimeError(f"Stand-ins failed to start: {self._error or 'timed out'}")
+        return self
+
+    def stop(self):
+        if self._servers:
+            self._servers[0].should_exit = True
+        self._thread.join(STARTUP_TIMEOUT)
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m fakes", description="Local stand-ins for external integrations")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--http-port", type=int, default=DEFAULT_HTTP_PORT)
+    parser.add_argument("--smtp-port", type=int, default=DEFAULT_SMTP_PORT)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--takeapp-orders", type=int, default=500, help="orders the Take.app fake serves")
+    parser.add_argument("--trustpilot-reviews", type=int, default=40, help="reviews on the Trustpilot page")
+    parser.add_argument("--latency", help="latency for every service, e.g. lognormal:80,0.5")
+    parser.add_argument("--error-rate", type=float, help="share of requests that fail, 0-1")
+    parser.add_argument("--rate-limit", type=float, help="requests per second per service before 429")
+    args = parser.parse_args()
+
+    fakes = Fakes(args.seed, args.takeapp_orders, args.trustpilot_reviews)
+    changes = {key: value for key, value in (
+        ("latency", args.latency), ("error_rate", args.error_rate), ("rate_limit", args.rate_limit),
+    ) if value is not None}
+    if changes:
+        try:
+            for service in SERVICES:
+                fakes.faults.set_profile(service, fakes.faults.profiles[service].updated(changes))
+        except ValueError as e:
+            raise SystemExit(f"❌ {e}")
+
+    print(f"🧪 Stand-ins on http://{args.host}:{args.http_port} and smtp://{args.host}:{args.smtp_port}")
+    for service, profile in fakes.faults.summary().items():
+        print(f"  {service:<11} {profile['profile']}")
+    print("\n# Point the backend at them with:")
+    for key, value in environment(args.host, args.http_port, args.smtp_port).items():
+        print(f"{key}={value}")
+    try:
+        asyncio.run(serve(fakes, args.host, args.http_port, args.smtp_port))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,163 @@
+"""
+SMTP sink
+Speaks enough ESMTP for smtplib - EHLO, AUTH PLAIN/LOGIN (any credentials),
+MAIL, RCPT, DATA, RSET, NOOP, QUIT - and keeps the messages instead of
+delivering them. There is no TLS, so point the services at it with
+SMTP_STARTTLS=false. The "smtp" fault profile applies once per message,
+when the data has been sent: latency before the reply, then 421 (rate
+limited, connection closed) or 451 (injected failure) instead of 250.
+"""
+import asyncio
+import base64
+import logging
+import uuid
+from email import message_from_bytes, policy
+
+from fakes.faults import ERROR, THROTTLED
+
+logger = logging.getLogger(__name__)
+
+HOSTNAME = "fakes.local"
+MAX_MESSAGE_SIZE = 35 * 1024 * 1024
+
+
+def summarize(sender: str, recipients: list, data: bytes) -> dict:
+    message = message_from_bytes(data, policy=policy.default)
+    return {
+        "id": uuid.uuid4().hex[:12],
+        "from": sender,
+        "to": recipients,
+        "subject": message.get("Subject", ""),
+        "size": len(data),
+        "attachments": [part.get_filename() for part in message.iter_attachments()]
+        if message.is_multipart() else [],
+    }
+
+
+class Session:
+    """One client connection"""
+
+    def __init__(self, fakes, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.fakes = fakes
+        self.reader = reader
+        self.writer = writer
+        self.reset()
+
+    def reset(self):
+        self.sender = None
+        self.recipients = []
+
+    async def reply(self, line: str):
+        self.writer.write(line.encode() + b"\r\n")
+        await self.writer.drain()
+
+    async def read_line(self) -> bytes:
+        return (await self.reader.readline()).rstrip(b"\r\n")
+
+    async def read_data(self) -> bytes:
+        lines = []
+        while True:
+            line = await self.reader.readline()
+            if not line or line in (b".\r\n", b".\n"):
+                break
+            # Undo dot-stuffing
+            lines.append(line[1:] if line.startswith(b"..") else line)
+        return b"".join(lines)
+
+    async def auth(self, argument: str) -> bool:
+        mechanism, _, initial = argument.partition(" ")
+        mechanism = mechanism.upper()
+        if mechanism == "PLAIN":
+            if not initial:
+                await self.reply("334 ")
+                await self.read_line()
+        elif mechanism == "LOGIN":
+            await self.reply("334 " + base64.b64encode(b"Username:").decode())
+            await self.read_line()
+            await self.reply("334 " + base64.b64encode(b"Password:").decode())
+            await self.read_line()
+        else:
+            await self.reply("504 5.5.4 Unrecognized authentication type")
+            return True
+        await self.reply("235 2.7.0 Authentication successful")
+        return True
+
+    async def data(self) -> bool:
+        if not self.sender or not self.recipients:
+            await self.reply("503 5.5.1 Bad sequence of commands")
+            return True
+        await self.reply("354 End data with <CR><LF>.<CR><LF>")
+        data = await self.read_data()
+        outcome, retry_after = await self.fakes.faults.decide("smtp")
+        if outcome == THROTTLED:
+            await self.reply(f"421 4.7.0 Too many messages, try again in {retry_after:.1f} s")
+            return False
+        if outcome == ERROR:
+            self.reset()
+            await self.reply("451 4.3.0 Injected failure, try again later")
+            return True
+        message = summarize(self.sender, self.recipients, data)
+        self.fakes.capture("smtp", message)
+        self.reset()
+        await self.reply(f"250 2.0.0 OK queued as {message['id']}")
+        return True
+
+    async def handle(self, line: str) -> bool:
+        """Answer one command; False ends the session"""
+        command, _, argument = line.partition(" ")
+        command = command.upper()
+        if command == "EHLO":
+            await self.reply(f"250-{HOSTNAME}")
+            await self.reply(f"250-SIZE {MAX_MESSAGE_SIZE}")
+            await self.reply("250-8BITMIME")
+            await self.reply("250 AUTH PLAIN LOGIN")
+        elif command == "HELO":
+            await self.reply(f"250 {HOSTNAME}")
+        elif command == "AUTH":
+            return await self.auth(argument)
+        elif command == "MAIL":
+            self.reset()
+            self.sender = argument.partition(":")[2].split(" ")[0].strip("<>")
+            await self.reply("250 2.1.0 OK")
+        elif command == "RCPT":
+            if self.sender is None:
+                await self.reply("503 5.5.1 Need MAIL before RCPT")
+            else:
+                self.recipients.append(argument.partition(":")[2].strip().strip("<>"))
+                await self.reply("250 2.1.5 OK")
+        elif command == "DATA":
+            return await self.data()
+        elif command == "RSET":
+            self.reset()
+            await self.reply("250 2.0.0 OK")
+        elif command == "NOOP":
+            await self.reply("250 2.0.0 OK")
+        elif command == "STARTTLS":
+            await self.reply("454 4.7.0 TLS not available (set SMTP_STARTTLS=false)")
+        elif command == "QUIT":
+            await self.reply("221 2.0.0 Bye")
+            return False
+        else:
+            await self.reply("502 5.5.2 Command not implemented")
+        return True
+
+    async def run(self):
+        try:
+            await self.reply(f"220 {HOSTNAME} ESMTP stand-in")
+            while True:
+                line = await self.reader.readline()
+                if not line:
+                    break
+                if not await self.handle(line.decode("utf-8", "replace").rstrip("\r\n")):
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self.writer.close()
+
+
+async def start_smtp(fakes, host: str, port: int) -> asyncio.AbstractServer:
+    async def on_connect(reader, writer):
+        await Session(fakes, reader, writer).run()
+
+    return await asyncio.start_server(on_connect, host, port)
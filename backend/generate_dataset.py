@@ -0,0 +1,568 @@
+"""
+Synthetic dataset generator for performance work
+Fills a database with production-like volumes so indexes, caches and the
+analytics endpoints can be measured at realistic sizes:
+
+    categories, products (with variations), customers (with materialized
+    order stats and credit balances), orders (with status histories and
+    payment fields), promo codes, promo_usage, credit_logs, visits, wishlists
+
+The data is skewed the way the shop's is: a few products take most of the
+sales (Zipf), a minority of repeat buyers place most orders (log-normal
+activity), traffic grows over the years and follows the time of day, and the
+status mix depends on the order's age (only the last half hour has pending
+orders, like after order_cleanup). Everything is generated in batches and
+written with unordered insert_many while the next batch is built.
+
+    python generate_dataset.py --scale 0.01            # 50 products, 20k orders
+    python generate_dataset.py --drop                  # full size: 5k products, 2M orders
+    python generate_dataset.py --db-name nobeosh_perf --orders 500000 --years 2
+
+Point DB_NAME (or --db-name) at a scratch database on a local mongod: it
+refuses a remote MONGO_URL, and a database that already has orders unless
+`--drop` empties the collections first.
+Old finished orders land in `orders`; the archive job moves them to
+`orders_archive` on the next server start, as it would in production.
+"""
+import argparse
+import asyncio
+import bisect
+import math
+import os
+import random
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+from database import ADMIN, close_clients, ensure_indexes, get_db, remote_hosts  # noqa: E402
+from order_timeline import ORDER_STATUS_HISTORY_LIMIT  # noqa: E402
+
+DEFAULTS = {
+    "products": 5_000,
+    "customers": 200_000,
+    "orders": 2_000_000,
+    "visits": 3_000_000,
+    "wishlists": 250_000,
+    "promo_codes": 200,
+}
+
+BATCH_SIZE = 5_000
+# Traffic density grows linearly from GROWTH_START to 1 across the period
+GROWTH_START = 0.3
+# Zipf exponent for product popularity and log-normal sigma for buyer activity
+PRODUCT_SKEW = 1.1
+BUYER_SIGMA = 1.3
+
+PROMO_SHARE = 0.12
+CREDIT_USE_SHARE = 0.3
+CASHBACK_PERCENT = 5
+CASHBACK_ELIGIBLE_SHARE = 0.6
+
+COLLECTIONS = ("categories", "products", "customers", "orders", "promo_codes", "promo_usage",
+               "credit_logs", "visits", "wishlists")
+
+CATEGORIES = [
+    ("Mobile Games", 30), ("PC Games", 14), ("Streaming", 16), ("Gift Cards", 12), ("Software", 6),
+    ("Music", 5), ("Console", 6), ("VPN & Security", 3), ("Education", 2), ("Social Media", 3),
+    ("Cloud Storage", 2), ("Productivity", 1),
+]
+BRANDS = ["PUBG", "Free Fire", "Valorant", "Mobile Legends", "Genshin", "Steam", "Netflix", "Spotify", "YouTube",
+          "Disney+", "Prime Video", "PlayStation", "Xbox", "Nintendo", "Google Play", "iTunes", "Windows",
+          "Office 365", "Canva", "ChatGPT", "NordVPN", "Discord", "Roblox", "Minecraft", "Call of Duty",
+          "Clash of Clans", "Fortnite", "Apex Legends", "Tinder", "LinkedIn", "Duolingo", "Coursera"]
+PRODUCT_KINDS = ["Top Up", "Premium", "Gift Card", "Subscription", "Pass", "Key", "Bundle", "Credits"]
+VARIATION_LABELS = [["1 Month", "3 Months", "6 Months", "12 Months"],
+                    ["$5", "$10", "$25", "$50", "$100"],
+                    ["60", "325", "660", "1800", "3850", "8100"],
+                    ["Standard", "Deluxe", "Ultimate"],
+                    ["Lifetime"]]
+
+FIRST_NAMES = ["Aarav", "Aayush", "Bibek", "Bikash", "Binod", "Deepak", "Dipesh", "Ganesh", "Hari", "Kiran", "Manish",
+               "Nabin", "Prabin", "Rajesh", "Ramesh", "Sagar", "Sandeep", "Sujan", "Suraj", "Aasha", "Anjali",
+               "Bina", "Gita", "Kritika", "Manisha", "Nisha", "Pooja", "Priya", "Sabina", "Sarita", "Sunita"]
+LAST_NAMES = ["Adhikari", "Basnet", "Bhandari", "Gurung", "KC", "Karki", "Khadka", "Lama", "Magar", "Maharjan",
+              "Pandey", "Poudel", "Rai", "Sharma", "Shrestha", "Tamang", "Thapa", "Tiwari"]
+EMAIL_DOMAINS = [("gmail.com", 80), ("yahoo.com", 8), ("hotmail.com", 5), ("outlook.com", 5), ("icloud.com", 2)]
+PAYMENT_METHODS = [("esewa", 45), ("khalti", 30), ("bank", 15), ("imepay", 10)]
+ADMINS = ["gsnadmin@gameshopnepal.com", "support@gameshopnepal.com", "orders@gameshopnepal.com"]
+USER_AGENTS = [
+    ("Mozilla/5.0 (Linux; Android 13; SM-A536E) AppleWebKit/537.36 Chrome/120.0 Mobile Safari/537.36", 55),
+    ("Mozilla/5.0 (iPhone; CPU iPhone OS 17_2 like Mac OS X) AppleWebKit/605.1.15 Version/17.2 Mobile Safari/604.1", 20),
+    ("Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 Chrome/120.0 Safari/537.36", 20),
+    ("Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 Version/17.2 Safari/605.1.15", 5),
+]
+# Orders per local hour of day (Nepal evenings are busiest); timestamps are UTC
+NEPAL_UTC_OFFSET_HOURS = 5.75
+HOURLY = [2, 1, 1, 1, 1, 2, 3, 4, 5, 6, 6, 6, 7, 7, 7, 7, 8, 9, 10, 11, 11, 9, 6, 4]
+
+
+def weighted(pairs):
+    values, weights = zip(*pairs)
+    return list(values), list(weights)
+
+
+class Generator:
+    def __init__(self, args):
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.now = datetime.now(timezone.utc).replace(microsecond=0)
+        # Midnight, so offsets within a day are the hour of day
+        self.start = (self.now - timedelta(days=365 * args.years)).replace(hour=0, minute=0, second=0)
+        self.span = (self.now - self.start).total_seconds()
+        self.hourly = self.cumulative(HOURLY)
+
+    # ---- helpers ----
+
+    def uid(self) -> str:
+        return str(uuid.UUID(int=self.rng.getrandbits(128), version=4))
+
+    def growth_offsets(self, count: int) -> list:
+        """Sorted offsets (seconds from start) with linearly growing density and a daily curve"""
+        a = GROWTH_START
+        days = self.span / 86400
+        offsets = []
+        while len(offsets) < count:
+            u = self.rng.random()
+            x = -a + math.sqrt(a * a + 2 * u * (a + 0.5))
+            offset = int(x * days) * 86400 + self.local_hour() * 3600
+            # Today's remaining hours haven't happened yet
+            if 0 <= offset < self.span:
+                offsets.append(offset)
+        offsets.sort()
+        return offsets
+
+    def local_hour(self) -> float:
+        """Hours after UTC midnight, drawn from the Nepal time-of-day curve"""
+        return self.pick(self.hourly) + self.rng.random() - NEPAL_UTC_OFFSET_HOURS
+
+    def at(self, offset: float) -> datetime:
+        return min(self.start + timedelta(seconds=offset), self.now)
+
+    @staticmethod
+    def cumulative(weights) -> list:
+        total, cumulative = 0.0, []
+        for weight in weights:
+            total += weight
+            cumulative.append(total)
+        return cumulative
+
+    def pick(self, cumulative: list) -> int:
+        return bisect.bisect(cumulative, self.rng.random() * cumulative[-1])
+
+    # ---- catalog ----
+
+    def catalog(self):
+        names, weights = weighted(CATEGORIES)
+        self.categories = [
+            {"id": self.uid(), "name": name, "slug": name.lower().replace(" ", "-").replace("&", "and"),
+             "updated_at": self.start.isoformat()}
+            for name in names
+        ]
+        category_cumulative = self.cumulative(weights)
+
+        products = []
+        for n in range(self.args.products):
+            category = self.categories[self.pick(category_cumulative)]
+            name = f"{self.rng.choice(BRANDS)} {self.rng.choice(PRODUCT_KINDS)} {n + 1}"
+            labels = self.rng.choice(VARIATION_LABELS)
+            base = self.rng.choice((99, 149, 199, 299, 499, 799, 999))
+            variations = []
+            for i, label in enumerate(labels[:self.rng.randint(1, len(labels))]):
+                price = round(base * (i + 1) * self.rng.uniform(0.9, 1.3))
+                variations.append({
+                    "id": self.uid(), "name": label, "price": price,
+                    "original_price": round(price * self.rng.uniform(1.0, 1.3)),
+                    "cost_price": round(price * self.rng.uniform(0.7, 0.92)),
+                })
+            created = self.at(self.rng.random() * self.span * 0.9)
+            products.append({
+                "id": self.uid(),
+                "name": name,
+                "slug": name.lower().replace(" ", "-").replace("+", "plus"),
+                "description": f"{name}. Instant delivery in Nepal, pay with eSewa or Khalti.",
+                "image_url": f"https://i.ibb.co/synthetic/{n}.png",
+                "category_id": category["id"],
+                "variations": variations,
+                "tags": [category["slug"], name.split()[0].lower()],
+                "sort_order": n,
+                "custom_fields": [],
+                "is_active": self.rng.random() > 0.05,
+                "is_sold_out": self.rng.random() < 0.03,
+                "created_at": created.isoformat(),
+                "updated_at": created.isoformat(),
+            })
+        self.products = products
+        # Popularity rank is independent of catalog order
+        ranks = list(range(len(products)))
+        self.rng.shuffle(ranks)
+        self.product_cumulative = self.cumulative([1 / (rank + 1) ** PRODUCT_SKEW for rank in ranks])
+        self.sellable = [p for p in products if p["is_active"]] or products
+
+    def promo_codes(self):
+        self.promos = []
+        for n in range(self.args.promo_codes):
+            percentage = self.rng.random() < 0.7
+            self.promos.append({
+                "id": self.uid(),
+                "code": f"{self.rng.choice(('DASHAIN', 'TIHAR', 'NEWYEAR', 'GAMER', 'WELCOME', 'FLASH'))}{n}",
+                "discount_type": "percentage" if percentage else "fixed",
+                "discount_value": self.rng.choice((5, 10, 15, 20)) if percentage else self.rng.choice((50, 100, 200)),
+                "min_order_amount": self.rng.choice((0, 0, 500, 1000)),
+                "max_uses": None,
+                "max_uses_per_customer": self.rng.choice((None, 1, 3)),
+                "used_count": 0,
+                "is_active": n >= self.args.promo_codes // 2,
+                "expiry_date": None,
+                "applicable_categories": [],
+                "applicable_products": [],
+                "first_time_only": False,
+                "auto_apply": False,
+                "stackable": False,
+                "created_at": self.at(self.span * n / max(self.args.promo_codes, 1)).isoformat(),
+            })
+        self.promo_cumulative = self.cumulative([1 / (rank + 1) for rank in range(len(self.promos))])
+
+    # ---- customers ----
+
+    def customer_identities(self):
+        count = self.args.customers
+        domains, domain_weights = weighted(EMAIL_DOMAINS)
+        self.customer_ids = [self.uid() for _ in range(count)]
+        self.names = [f"{self.rng.choice(FIRST_NAMES)} {self.rng.choice(LAST_NAMES)}" for _ in range(count)]
+        self.emails = [
+            f"{name.lower().replace(' ', '.')}{n}@{self.rng.choices(domains, weights=domain_weights)[0]}"
+            for n, name in enumerate(self.names)
+        ]
+        # A few customers place most of the orders
+        self.buyer_cumulative = self.cumulative([self.rng.lognormvariate(0, BUYER_SIGMA) for _ in range(count)])
+        self.total_orders = [0] * count
+        self.completed_orders = [0] * count
+        self.total_spent = [0.0] * count
+        self.first_order = [None] * count
+        self.last_order = [None] * count
+        self.balance = [0.0] * count
+
+    def customers(self, start: int, stop: int) -> list:
+        docs = []
+        for n in range(start, stop):
+            signup = self.at(self.rng.random() * self.span).isoformat()
+            if self.first_order[n] and self.first_order[n] < signup:
+                signup = self.first_order[n]
+            docs.append({
+                "id": self.customer_ids[n],
+                "email": self.emails[n],
+                "name": self.names[n],
+                "phone": f"98{n:08d}",
+                "whatsapp_number": f"98{n:08d}",
+                "credit_balance": round(self.balance[n], 2),
+                "total_orders": self.total_orders[n],
+                "completed_orders": self.completed_orders[n],
+                "total_spent": round(self.total_spent[n], 2),
+                "first_order_at": self.first_order[n],
+                "last_order_at": self.last_order[n],
+                "created_at": signup,
+                "last_login": self.last_order[n],
+            })
+        return docs
+
+    # ---- orders ----
+
+    def status_for(self, age: timedelta) -> str:
+        if age < timedelta(minutes=30):
+            return self.rng.choices(("pending", "Confirmed", "Processing"), weights=(50, 35, 15))[0]
+        if age < timedelta(days=2):
+            return self.rng.choices(("Confirmed", "Processing", "Completed", "Cancelled"), weights=(20, 25, 45, 10))[0]
+        return self.rng.choices(("Completed", "Delivered", "Cancelled", "Confirmed", "Processing"),
+                                weights=(80, 5, 12, 1, 2))[0]
+
+    def history(self, order_id: str, status: str, paid: bool, created: datetime) -> list:
+        if status == "Processing":
+            steps = [("Confirmed", "Processing")]
+        elif status in ("Completed", "Delivered"):
+            steps = [("Confirmed", "Processing"), ("Processing", status)] if self.rng.random() < 0.4 \
+                else [("Confirmed", status)]
+        elif status == "Cancelled":
+            steps = [("Confirmed" if paid else "pending", "Cancelled")]
+        else:
+            return []
+        entries, at = [], created
+        for old, new in steps:
+            at += timedelta(minutes=self.rng.randint(5, 600))
+            entries.append({
+                "id": self.uid(), "order_id": order_id, "old_status": old, "new_status": new,
+                "note": None, "updated_by": self.rng.choice(ADMINS), "created_at": min(at, self.now).isoformat(),
+            })
+        return entries[-ORDER_STATUS_HISTORY_LIMIT:]
+
+    def orders(self, offsets: list):
+        methods, method_weights = weighted(PAYMENT_METHODS)
+        orders, usage, logs = [], [], []
+        for offset in offsets:
+            created = self.at(offset)
+            created_at = created.isoformat()
+            n = self.pick(self.buyer_cumulative)
+            order_id = self.uid()
+            email = self.emails[n]
+
+            items = []
+            for _ in range(self.rng.choices((1, 2, 3, 4), weights=(72, 20, 6, 2))[0]):
+                product = self.products[self.pick(self.product_cumulative)]
+                variation = self.rng.choice(product["variations"])
+                items.append({"name": product["name"], "price": variation["price"],
+                              "quantity": self.rng.choices((1, 2, 3), weights=(90, 8, 2))[0],
+                              "variation": variation["name"], "product_id": product["id"],
+                              "variation_id": variation["id"]})
+            subtotal = sum(item["price"] * item["quantity"] for item in items)
+
+            status = self.status_for(self.now - created)
+            paid = status != "pending" and not (status == "Cancelled" and self.rng.random() < 0.5)
+
+            promo_code, discount = None, 0.0
+            if self.promos and self.rng.random() < PROMO_SHARE:
+                promo = self.promos[self.pick(self.promo_cumulative)]
+                if subtotal >= promo["min_order_amount"]:
+                    promo_code = promo["code"]
+                    promo["used_count"] += 1
+                    discount = subtotal * promo["discount_value"] / 100 if promo["discount_type"] == "percentage" \
+                        else min(promo["discount_value"], subtotal)
+                    usage.append({"id": self.uid(), "promo_code": promo_code, "order_id": order_id,
+                                  "customer_email": email, "used_at": created_at})
+
+            credits = 0.0
+            if paid and self.balance[n] >= 20 and self.rng.random() < CREDIT_USE_SHARE:
+                credits = round(min(self.balance[n], (subtotal - discount) * 0.5), 2)
+                logs.append(self.credit_log(n, -credits, f"Used for order {order_id}", order_id, created_at))
+
+            total = round(subtotal - discount - credits, 2)
+            order = {
+                "id": order_id,
+                "customer_name": self.names[n],
+                "customer_phone": f"97798{n:08d}",
+                "customer_email": email,
+                "items": items,
+                "total_amount": total,
+                "total": total,
+                "remark": None,
+                "items_text": ", ".join(
+                    f"{item['quantity']}x {item['name']} ({item['variation']})" for item in items
+                ),
+                "status": status,
+                "payment_screenshot": None,
+                "payment_method": None,
+                "credits_used": credits,
+                "promo_code": promo_code,
+                "status_history": self.history(order_id, status, paid, created),
+                "lookup_keys": [order_id],
+                "created_at": created_at,
+            }
+            if paid:
+                uploaded = min(created + timedelta(minutes=self.rng.randint(2, 20)), self.now)
+                order.update({
+                    "payment_screenshot": f"https://i.ibb.co/synthetic/payment-{order_id[:8]}.png",
+                    "payment_method": self.rng.choices(methods, weights=method_weights)[0],
+                    "payment_uploaded_at": uploaded.isoformat(),
+                    "invoice_url": f"/invoice/{order_id}",
+                    "credits_pending": False,
+                    "credits_deducted": credits > 0,
+                })
+            orders.append(order)
+
+            completed = status in ("Completed", "Delivered")
+            self.total_orders[n] += 1
+            self.total_spent[n] += total
+            self.completed_orders[n] += completed
+            if self.first_order[n] is None:
+                self.first_order[n] = created_at
+            self.last_order[n] = created_at
+
+            if completed and self.rng.random() < CASHBACK_ELIGIBLE_SHARE:
+                cashback = round(total * CASHBACK_PERCENT / 100, 2)
+                if cashback > 0:
+                    logs.append(self.credit_log(n, cashback, f"Cashback for order {order_id}", order_id,
+                                                order["status_history"][-1]["created_at"]))
+        return orders, usage, logs
+
+    def credit_log(self, n: int, amount: float, reason: str, order_id: str, created_at: str) -> dict:
+        before = self.balance[n]
+        self.balance[n] = max(0.0, before + amount)
+        return {"id": self.uid(), "customer_id": self.customer_ids[n], "customer_email": self.emails[n],
+                "amount": amount, "reason": reason, "balance_before": round(before, 2),
+                "balance_after": round(self.balance[n], 2), "order_id": order_id, "created_at": created_at}
+
+    # ---- traffic ----
+
+    def visitor_pool(self) -> list:
+        return [self.uid() for _ in range(max(self.args.customers * 3, 1))]
+
+    def visits(self, visitors: list):
+        """Visits in day-sized batches, unique per visitor and day like /track-visit"""
+        agents, agent_weights = weighted(USER_AGENTS)
+        visitor_cumulative = self.cumulative([1 / (rank + 1) ** 0.6 for rank in range(len(visitors))])
+        days = int(self.span // 86400)
+        a = GROWTH_START
+        per_day_weight = [a + (1 - a) * day / max(days - 1, 1) for day in range(days)]
+        scale = self.args.visits / sum(per_day_weight)
+        for day in range(days):
+            date = self.start + timedelta(days=day)
+            seen, docs = set(), []
+            for _ in range(round(per_day_weight[day] * scale)):
+                visitor = visitors[self.pick(visitor_cumulative)]
+                if visitor in seen:
+                    continue
+                seen.add(visitor)
+                at = date + timedelta(hours=self.local_hour())
+                docs.append({"visitor_id": visitor, "date": at.strftime("%Y-%m-%d"),
+                             "user_agent": self.rng.choices(agents, weights=agent_weights)[0],
+                             "created_at": at.isoformat()})
+            yield docs
+
+    def wishlists(self, visitors: list, count: int) -> list:
+        docs, seen = [], set()
+        while len(docs) < count and len(seen) < count * 2:
+            product = self.products[self.pick(self.product_cumulative)]
+            variation = self.rng.choice(product["variations"])
+            visitor_index = self.rng.randrange(len(visitors))
+            key = (visitor_index, product["id"], variation["id"])
+            if key in seen:
+                continue
+            seen.add(key)
+            email = self.emails[visitor_index] if visitor_index < len(self.emails) and self.rng.random() < 0.3 else None
+            docs.append({
+                "id": self.uid(), "visitor_id": visitors[visitor_index], "product_id": product["id"],
+                "variation_id": variation["id"], "email": email, "price_when_added": variation["price"],
+                "created_at": self.at(self.rng.random() * self.span).isoformat(),
+            })
+        return docs
+
+
+class Writer:
+    """insert_many in batches, one batch in flight while the next is generated"""
+
+    def __init__(self, db, batch_size: int):
+        self.db = db
+        self.batch_size = batch_size
+        self.pending = None
+        self.counts = {}
+
+    async def write(self, collection: str, docs: list):
+        for i in range(0, len(docs), self.batch_size):
+            batch = docs[i:i + self.batch_size]
+            await self.flush()
+            self.pending = asyncio.create_task(self.db[collection].insert_many(batch, ordered=False))
+            self.counts[collection] = self.counts.get(collection, 0) + len(batch)
+
+    async def flush(self):
+        if self.pending is not None:
+            await self.pending
+            self.pending = None
+
+
+async def populate(db, args) -> dict:
+    """Generate and insert the dataset into db; returns the documents written per collection"""
+    started = time.monotonic()
+    gen = Generator(args)
+    writer = Writer(db, args.batch_size)
+
+    gen.catalog()
+    gen.promo_codes()
+    await writer.write("categories", gen.categories)
+    await writer.write("products", gen.products)
+    print(f"✓ {len(gen.categories)} categories, {len(gen.products)} products")
+
+    gen.customer_identities()
+    offsets = gen.growth_offsets(args.orders)
+    for i in range(0, len(offsets), args.batch_size):
+        orders, usage, logs = gen.orders(offsets[i:i + args.batch_size])
+        await writer.write("orders", orders)
+        await writer.write("promo_usage", usage)
+        await writer.write("credit_logs", logs)
+        done = min(i + args.batch_size, len(offsets))
+        if done % (args.batch_size * 20) == 0 or done == len(offsets):
+            rate = done / (time.monotonic() - started)
+            print(f"  … {done:,} / {len(offsets):,} orders ({rate:,.0f}/s)")
+    del offsets
+
+    # Customers go in last so their materialized stats match the orders
+    await writer.write("promo_codes", gen.promos)
+    for i in range(0, args.customers, args.batch_size):
+        await writer.write("customers", gen.customers(i, min(i + args.batch_size, args.customers)))
+    print(f"✓ {writer.counts.get('orders', 0):,} orders, {args.customers:,} customers")
+
+    visitors = gen.visitor_pool()
+    for docs in gen.visits(visitors):
+        await writer.write("visits", docs)
+    await writer.write("wishlists", gen.wishlists(visitors, args.wishlists))
+    await writer.flush()
+
+    if not args.skip_indexes:
+        print("⏳ Creating indexes...")
+        await ensure_indexes(db)
+
+    print(f"✅ Done in {time.monotonic() - started:.0f}s:")
+    for collection, count in writer.counts.items():
+        print(f"  {collection:<12} {count:>12,}")
+    return writer.counts
+
+
+async def generate(args):
+    remote = remote_hosts(os.environ.get("MONGO_URL", ""))
+    if remote:
+        raise SystemExit(f"❌ MONGO_URL points at {', '.join(remote)}: generate into a local mongod only")
+    db = get_db(ADMIN)
+    if not args.drop and await db.orders.estimated_document_count():
+        close_clients()
+        raise SystemExit(
+            f"❌ '{db.name}' already has orders - the fake data can't be told apart from them afterwards. "
+            "Use a scratch database (--db-name) or --drop"
+        )
+    print(f"🎲 Generating into '{db.name}' ({args.years} years, seed {args.seed})")
+
+    if args.drop:
+        if not args.yes and input(f"Drop {', '.join(COLLECTIONS)} in '{db.name}'? [y/N] ").lower() != "y":
+            print("Aborted")
+            return
+        for collection in COLLECTIONS:
+            await db[collection].drop()
+        print("✓ Dropped existing collections")
+
+    await populate(db, args)
+    close_clients()
+
+
+def options(scale: float = 1.0, **overrides) -> argparse.Namespace:
+    """Generator settings: the default volumes times scale, plus any overrides"""
+    settings = {name: max(1, round(default * scale)) for name, default in DEFAULTS.items()}
+    settings.update(years=3, seed=42, batch_size=BATCH_SIZE, skip_indexes=False, drop=False, yes=False)
+    settings.update(overrides)
+    return argparse.Namespace(**settings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk-insert a production-sized synthetic dataset")
+    for name, default in DEFAULTS.items():
+        parser.add_argument(f"--{name.replace('_', '-')}", type=int, default=None, help=f"default {default:,}")
+    parser.add_argument("--scale", type=float, default=1.0, help="multiplier for every default volume")
+    parser.add_argument("--years", type=float, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--drop", action="store_true", help="drop the generated collections first")
+    parser.add_argument("--yes", action="store_true", help="don't ask before dropping")
+    parser.add_argument("--skip-indexes", action="store_true", help="don't run ensure_indexes afterwards")
+    parser.add_argument("--db-name", help="database to fill (default: DB_NAME)")
+    args = parser.parse_args()
+    if args.db_name:
+        os.environ["DB_NAME"] = args.db_name
+    for name in DEFAULTS:
+        if getattr(args, name) is None:
+            setattr(args, name, getattr(options(args.scale), name))
+    asyncio.run(generate(args))
+
+
+if __name__ == "__main__":
+    main()
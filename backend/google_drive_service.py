@@ -5,6 +5,7 @@ Uses service account for simple, admin-controlled storage
 from google.oauth2 import service_account
 from googleapiclient.discovery import build
 from googleapiclient.http import MediaFileUpload, MediaIoBaseUpload
+import httplib2
 import os
 import io
 import logging
@@ -23,9 +24,25 @@ DRIVE_FOLDER_ID = os.getenv('GOOGLE_DRIVE_FOLDER_ID', None)
 # Scopes
 SCOPES = ['https://www.googleapis.com/auth/drive.file']
 
+# Send Drive calls here instead, unauthenticated - for the local stand-in (see fakes/)
+GOOGLE_API_BASE_URL = os.getenv('GOOGLE_API_BASE_URL', '').rstrip('/')
+GOOGLE_API_HOST = 'https://www.googleapis.com'
+
+
+class _RedirectedHttp(httplib2.Http):
+    """Sends the Drive client's requests, uploads included, to GOOGLE_API_BASE_URL"""
+
+    def request(self, uri, method='GET', body=None, headers=None, *args, **kwargs):
+        if uri.startswith(GOOGLE_API_HOST):
+            uri = GOOGLE_API_BASE_URL + uri[len(GOOGLE_API_HOST):]
+        return super().request(uri, method, body, headers, *args, **kwargs)
+
+
 def get_drive_service():
     """Get Google Drive service using service account"""
     try:
+        if GOOGLE_API_BASE_URL:
+            return build('drive', 'v3', http=_RedirectedHttp())
         credentials = service_account.Credentials.from_service_account_file(
             str(SERVICE_ACCOUNT_FILE),
             scopes=SCOPES
@@ -3,6 +3,7 @@ Google Sheets Service for Customer Data Storage
 Uses Service Account authentication via environment variable
 """
 import gspread
+import requests
 from google.oauth2.service_account import Credentials
 import logging
 import os
@@ -18,17 +19,36 @@ SCOPES = [
     "https://www.googleapis.com/auth/drive"
 ]
 
+# Send Sheets calls here instead, unauthenticated - for the local stand-in (see fakes/)
+GOOGLE_API_BASE_URL = os.environ.get('GOOGLE_API_BASE_URL', '').rstrip('/')
+GOOGLE_API_HOSTS = ("https://sheets.googleapis.com", "https://www.googleapis.com")
+
 # Sheet names
 CUSTOMERS_SHEET = "Customers"
 ORDERS_SHEET = "Orders"
 
 _client = None
 
+class _RedirectedSession(requests.Session):
+    """Session that sends gspread's Google API requests to GOOGLE_API_BASE_URL"""
+
+    def request(self, method, url, *args, **kwargs):
+        for host in GOOGLE_API_HOSTS:
+            if url.startswith(host):
+                url = GOOGLE_API_BASE_URL + url[len(host):]
+                break
+        return super().request(method, url, *args, **kwargs)
+
 def get_sheets_client():
     """Get authenticated Google Sheets client"""
     global _client
     if _client is None:
         try:
+            if GOOGLE_API_BASE_URL:
+                _client = gspread.Client(auth=None, session=_RedirectedSession())
+                logger.info(f"Google Sheets client using {GOOGLE_API_BASE_URL}")
+                return _client
+
             if not GOOGLE_SERVICE_ACCOUNT_JSON:
                 logger.warning("GOOGLE_SERVICE_ACCOUNT_JSON environment variable not set")
                 return None
@@ -74,9 +94,10 @@ def sync_customer_to_sheets(customer: dict):
         headers = ["ID", "Email", "Name", "Phone", "WhatsApp", "Created At", "Last Login", "Total Orders", "Total Spent"]
         worksheet = get_or_create_worksheet(spreadsheet, CUSTOMERS_SHEET, headers)
         
-        # Check if customer already exists (by email)
-        try:
-            cell = worksheet.find(customer.get("email", ""), in_column=2)
+        # Check if customer already exists (by email); gspread 6 returns None
+        # rather than raising when nothing matches
+        cell = worksheet.find(customer.get("email", ""), in_column=2)
+        if cell:
             row_num = cell.row
             # Update existing row
             worksheet.update(f"A{row_num}:I{row_num}", [[
@@ -91,7 +112,7 @@ def sync_customer_to_sheets(customer: dict):
                 customer.get("total_spent", 0)
             ]])
             logger.info(f"Updated customer in sheets: {customer.get('email')}")
-        except gspread.exceptions.CellNotFound:
+        else:
             # Add new row
             worksheet.append_row([
                 customer.get("id", ""),
@@ -126,8 +147,8 @@ def sync_order_to_sheets(order: dict):
         worksheet = get_or_create_worksheet(spreadsheet, ORDERS_SHEET, headers)
         
         # Check if order already exists
-        try:
-            cell = worksheet.find(order.get("id", ""), in_column=1)
+        cell = worksheet.find(order.get("id", ""), in_column=1)
+        if cell:
             row_num = cell.row
             # Update existing row
             worksheet.update(f"A{row_num}:J{row_num}", [[
@@ -143,7 +164,7 @@ def sync_order_to_sheets(order: dict):
                 order.get("remark", "")
             ]])
             logger.info(f"Updated order in sheets: {order.get('id')}")
-        except gspread.exceptions.CellNotFound:
+        else:
             # Add new row
             worksheet.append_row([
                 order.get("id", ""),
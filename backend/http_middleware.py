@@ -0,0 +1,117 @@
+"""
+HTTP Middleware
+Rate limiting and security headers as pure ASGI middleware. Unlike
+`@app.middleware("http")` (BaseHTTPMiddleware) they don't run the app in a
+separate task or pipe the response through a memory stream: requests are
+passed straight through, and the only per-request work is a dict lookup
+and, for headers, appending precomputed byte pairs to the start message.
+Bodies are never buffered.
+"""
+import os
+import time
+from collections import defaultdict, deque
+from typing import Deque, Dict
+
+import metrics
+from serialization import dumps
+
+# In-memory rate limiter (for production, use Redis)
+RATE_LIMIT_WINDOW = 60
+GENERAL_LIMIT = int(os.environ.get("RATE_LIMIT_GENERAL", "100"))
+LOGIN_LIMIT = int(os.environ.get("RATE_LIMIT_LOGIN", "30"))
+EXEMPT_PATHS = ("/health", "/metrics")
+
+SECURITY_HEADERS = [
+    (b"x-content-type-options", b"nosniff"),
+    (b"x-frame-options", b"DENY"),
+    (b"x-xss-protection", b"1; mode=block"),
+    (b"strict-transport-security", b"max-age=31536000; includeSubDomains"),
+]
+_SECURITY_HEADER_NAMES = frozenset(name for name, _ in SECURITY_HEADERS)
+
+rate_limit_store: Dict[str, Deque[float]] = defaultdict(deque)
+
+
+def rate_limit_check(ip: str, limit: int = GENERAL_LIMIT, window: int = RATE_LIMIT_WINDOW) -> bool:
+    """Check if IP is rate limited. Returns True if allowed, False if limited."""
+    now = time.time()
+    requests = rate_limit_store[ip]
+    # Timestamps are appended in order, so expired ones are at the front
+    while requests and now - requests[0] >= window:
+        requests.popleft()
+
+    if len(requests) >= limit:
+        return False
+
+    requests.append(now)
+    return True
+
+
+def _json_429(detail: str):
+    body = dumps({"detail": detail})
+    start = {
+        "type": "http.response.start",
+        "status": 429,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+    }
+    return start, {"type": "http.response.body", "body": body}
+
+
+_LOGIN_LIMITED = _json_429("Too many login attempts. Please try again later.")
+_GENERAL_LIMITED = _json_429("Too many requests. Please slow down.")
+_LOGIN_REJECTIONS = metrics.RATE_LIMIT_REJECTIONS.labels("login")
+_GENERAL_REJECTIONS = metrics.RATE_LIMIT_REJECTIONS.labels("general")
+
+
+class RateLimitMiddleware:
+    """Per-IP sliding window; login endpoints get the stricter LOGIN_LIMIT"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in EXEMPT_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        client = scope.get("client")
+        client_ip = client[0] if client else "unknown"
+        if "/auth/login" in scope["path"]:
+            allowed = rate_limit_check(client_ip, limit=LOGIN_LIMIT)
+            rejection, counter = _LOGIN_LIMITED, _LOGIN_REJECTIONS
+        else:
+            allowed = rate_limit_check(client_ip, limit=GENERAL_LIMIT)
+            rejection, counter = _GENERAL_LIMITED, _GENERAL_REJECTIONS
+
+        if allowed:
+            await self.app(scope, receive, send)
+            return
+        counter.inc()
+        start, body = rejection
+        # Copy the start message: later middleware may append to its headers
+        await send({**start, "headers": list(start["headers"])})
+        await send(body)
+
+
+class SecurityHeadersMiddleware:
+    """Adds SECURITY_HEADERS to every response, replacing any the app set"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start":
+                headers = [
+                    header for header in message.get("headers", ())
+                    if header[0].lower() not in _SECURITY_HEADER_NAMES
+                ]
+                headers.extend(SECURITY_HEADERS)
+                message["headers"] = headers
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
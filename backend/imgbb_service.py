@@ -7,9 +7,12 @@ import base64
 import logging
 import os
 
+import metrics
+
 logger = logging.getLogger(__name__)
 
-IMGBB_UPLOAD_URL = "https://api.imgbb.com/1/upload"
+# Overridable so uploads can go to a local stand-in (see fakes/)
+IMGBB_UPLOAD_URL = os.environ.get("IMGBB_UPLOAD_URL", "https://api.imgbb.com/1/upload")
 
 def get_imgbb_api_key():
     """Get API key dynamically to pick up env changes"""
@@ -42,7 +45,7 @@ async def upload_to_imgbb(image_bytes: bytes, filename: str) -> dict:
         }
         
         # Upload to ImgBB
-        async with httpx.AsyncClient(timeout=30.0) as client:
+        async with httpx.AsyncClient(timeout=30.0, transport=metrics.http_transport(metrics.IMGBB)) as client:
             response = await client.post(IMGBB_UPLOAD_URL, data=payload)
             response.raise_for_status()
             result = response.json()
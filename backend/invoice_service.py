@@ -0,0 +1,310 @@
+"""
+Invoice Rendering Service
+Renders PDF and HTML invoices in a process pool and caches the artifacts on
+disk, content-addressed by SHA-256 and keyed by order version, so an invoice
+is only re-rendered when the order actually changes.
+"""
+import asyncio
+import hashlib
+import html
+import io
+import json
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+ROOT_DIR = Path(__file__).parent
+INVOICES_DIR = ROOT_DIR / "invoices"
+
+INVOICE_RENDER_WORKERS = int(os.environ.get("INVOICE_RENDER_WORKERS", "2"))
+
+# Only these fields show up on an invoice, so only they bump its version
+INVOICE_FIELDS = (
+    "id", "status", "customer_name", "customer_email", "customer_phone", "items",
+    "total_amount", "total", "subtotal", "service_charge", "tax", "credits_used",
+    "promo_code", "payment_method", "payment_uploaded_at", "created_at"
+)
+
+FORMATS = {
+    "pdf": "application/pdf",
+    "html": "text/html; charset=utf-8",
+}
+
+STORE_NAME = "GameShop Nepal"
+STORE_CONTACT = "WhatsApp: +977 9743488871"
+
+_pool = None
+_inflight = {}
+
+
+def invoice_number(order_id: str) -> str:
+    return f"INV-{order_id[:8].upper()}"
+
+
+def invoice_data(order: dict) -> dict:
+    """Subset of the order the renderers need (kept small and picklable)"""
+    data = {k: order.get(k) for k in INVOICE_FIELDS}
+    data["items"] = [
+        {
+            "name": item.get("name", ""),
+            "variation": item.get("variation"),
+            "quantity": item.get("quantity", 1),
+            "price": item.get("price", 0),
+        }
+        for item in (order.get("items") or [])
+    ]
+    return data
+
+
+def invoice_version(order: dict) -> str:
+    """Stable hash of the invoice-relevant order fields"""
+    payload = json.dumps(invoice_data(order), sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()[:16]
+
+
+def _money(value) -> str:
+    try:
+        return f"Rs {float(value or 0):,.2f}"
+    except (TypeError, ValueError):
+        return "Rs 0.00"
+
+
+def _totals(data: dict) -> list:
+    total = data.get("total") or data.get("total_amount") or 0
+    rows = [("Subtotal", data.get("subtotal") or total)]
+    if data.get("service_charge"):
+        rows.append(("Service Charge", data["service_charge"]))
+    if data.get("tax"):
+        rows.append(("Tax", data["tax"]))
+    if data.get("credits_used"):
+        rows.append(("Store Credits", -float(data["credits_used"])))
+    rows.append(("Total", total))
+    return rows
+
+
+def render_invoice_html(data: dict) -> bytes:
+    """Render a standalone, printable HTML invoice"""
+    esc = lambda v: html.escape(str(v if v is not None else ""))
+    items_html = "".join(
+        f"<tr><td>{esc(item['name'])}{' (' + esc(item['variation']) + ')' if item.get('variation') else ''}</td>"
+        f"<td class='num'>{esc(item['quantity'])}</td>"
+        f"<td class='num'>{_money(item['price'])}</td>"
+        f"<td class='num'>{_money(float(item['price'] or 0) * int(item['quantity'] or 1))}</td></tr>"
+        for item in data["items"]
+    )
+    totals_html = "".join(
+        f"<tr><td colspan='3' class='num'>{label}</td><td class='num'>{_money(value)}</td></tr>"
+        for label, value in _totals(data)
+    )
+    document = f"""<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>{invoice_number(data['id'])} - {STORE_NAME}</title>
+<style>
+body {{ font-family: Arial, sans-serif; color: #111; max-width: 800px; margin: 0 auto; padding: 24px; }}
+h1 {{ color: #D4920D; margin: 0; }}
+table {{ width: 100%; border-collapse: collapse; margin-top: 24px; }}
+th, td {{ padding: 8px; border-bottom: 1px solid #ddd; text-align: left; }}
+.num {{ text-align: right; }}
+.meta {{ color: #555; font-size: 14px; }}
+</style>
+</head>
+<body>
+<h1>{STORE_NAME}</h1>
+<p class="meta">Invoice {esc(invoice_number(data['id']))} &middot; Status: {esc(data.get('status') or 'Pending')}</p>
+<p class="meta">Date: {esc((data.get('created_at') or '')[:10])}</p>
+<p><strong>Bill to:</strong> {esc(data.get('customer_name') or 'Customer')}<br>{esc(data.get('customer_email'))}<br>{esc(data.get('customer_phone'))}</p>
+<table>
+<thead><tr><th>Item</th><th class="num">Qty</th><th class="num">Price</th><th class="num">Amount</th></tr></thead>
+<tbody>{items_html}{totals_html}</tbody>
+</table>
+<p class="meta">Payment method: {esc(data.get('payment_method') or 'N/A')}</p>
+<p class="meta">This is a computer-generated invoice. No signature required. {STORE_CONTACT}</p>
+</body>
+</html>"""
+    return document.encode("utf-8")
+
+
+def render_invoice_pdf(data: dict) -> bytes:
+    """Render the invoice as a PDF (runs inside a worker process)"""
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfgen import canvas
+
+    buffer = io.BytesIO()
+    # invariant=1 keeps the output byte-identical for the same input,
+    # which is what makes content addressing useful
+    pdf = canvas.Canvas(buffer, pagesize=A4, invariant=1)
+    width, height = A4
+    y = height - 60
+
+    pdf.setFont("Helvetica-Bold", 20)
+    pdf.drawString(50, y, STORE_NAME)
+    pdf.setFont("Helvetica", 10)
+    pdf.drawRightString(width - 50, y, invoice_number(data["id"]))
+    y -= 18
+    pdf.drawRightString(width - 50, y, f"Status: {data.get('status') or 'Pending'}")
+    pdf.drawString(50, y, f"Date: {(data.get('created_at') or '')[:10]}")
+
+    y -= 36
+    pdf.setFont("Helvetica-Bold", 11)
+    pdf.drawString(50, y, "Bill to")
+    pdf.setFont("Helvetica", 10)
+    for line in (data.get("customer_name") or "Customer", data.get("customer_email"), data.get("customer_phone")):
+        if line:
+            y -= 14
+            pdf.drawString(50, y, str(line))
+
+    y -= 30
+    pdf.setFont("Helvetica-Bold", 10)
+    pdf.drawString(50, y, "Item")
+    pdf.drawRightString(360, y, "Qty")
+    pdf.drawRightString(450, y, "Price")
+    pdf.drawRightString(width - 50, y, "Amount")
+    pdf.line(50, y - 4, width - 50, y - 4)
+    pdf.setFont("Helvetica", 10)
+
+    for item in data["items"]:
+        y -= 18
+        if y < 100:
+            pdf.showPage()
+            pdf.setFont("Helvetica", 10)
+            y = height - 60
+        name = item["name"] + (f" ({item['variation']})" if item.get("variation") else "")
+        pdf.drawString(50, y, name[:60])
+        pdf.drawRightString(360, y, str(item["quantity"]))
+        pdf.drawRightString(450, y, _money(item["price"]))
+        pdf.drawRightString(width - 50, y, _money(float(item["price"] or 0) * int(item["quantity"] or 1)))
+
+    y -= 10
+    pdf.line(300, y, width - 50, y)
+    for label, value in _totals(data):
+        y -= 16
+        pdf.setFont("Helvetica-Bold" if label == "Total" else "Helvetica", 10)
+        pdf.drawRightString(450, y, label)
+        pdf.drawRightString(width - 50, y, _money(value))
+
+    pdf.setFont("Helvetica", 8)
+    pdf.drawString(50, 50, f"Payment method: {data.get('payment_method') or 'N/A'}")
+    pdf.drawString(50, 38, f"This is a computer-generated invoice. No signature required. {STORE_CONTACT}")
+    pdf.save()
+    return buffer.getvalue()
+
+
+RENDERERS = {
+    "pdf": render_invoice_pdf,
+    "html": render_invoice_html,
+}
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        # spawn: never fork a process that has Motor's threads running
+        _pool = ProcessPoolExecutor(
+            max_workers=INVOICE_RENDER_WORKERS,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return _pool
+
+
+def shutdown_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def artifact_path(sha256: str, fmt: str) -> Path:
+    return INVOICES_DIR / sha256[:2] / f"{sha256}.{fmt}"
+
+
+def _write_artifact(content: bytes, fmt: str) -> str:
+    sha256 = hashlib.sha256(content).hexdigest()
+    path = artifact_path(sha256, fmt)
+    if not path.exists():
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        tmp_path.write_bytes(content)
+        tmp_path.replace(path)
+    return sha256
+
+
+async def _render_and_store(db, order: dict, fmt: str, version: str) -> dict:
+    loop = asyncio.get_running_loop()
+    content = await loop.run_in_executor(_get_pool(), RENDERERS[fmt], invoice_data(order))
+    sha256 = await asyncio.to_thread(_write_artifact, content, fmt)
+
+    artifact = {
+        "order_id": order["id"],
+        "format": fmt,
+        "version": version,
+        "sha256": sha256,
+        "size": len(content),
+        "rendered_at": datetime.now(timezone.utc).isoformat()
+    }
+    await db.invoice_artifacts.update_one(
+        {"order_id": order["id"], "format": fmt},
+        {"$set": artifact},
+        upsert=True
+    )
+    logger.info(f"Rendered {fmt} invoice for order {order['id']} ({len(content)} bytes)")
+    return artifact
+
+
+async def get_invoice_artifact(db, order: dict, fmt: str = "pdf") -> dict:
+    """
+    Return artifact metadata for the order's current version, rendering it
+    only if the order changed since the last render.
+
+    The returned dict has `sha256`, `path`, `media_type` and `version`.
+    """
+    if fmt not in RENDERERS:
+        raise ValueError(f"Unsupported invoice format: {fmt}")
+
+    version = invoice_version(order)
+    artifact = await db.invoice_artifacts.find_one({"order_id": order["id"], "format": fmt}, {"_id": 0})
+
+    if not artifact or artifact.get("version") != version or not artifact_path(artifact["sha256"], fmt).exists():
+        # Concurrent requests for the same invoice share a single render
+        key = (order["id"], fmt, version)
+        task = _inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(_render_and_store(db, order, fmt, version))
+            _inflight[key] = task
+            task.add_done_callback(lambda _t, key=key: _inflight.pop(key, None))
+        artifact = await task
+
+    return {
+        **artifact,
+        "path": artifact_path(artifact["sha256"], fmt),
+        "media_type": FORMATS[fmt],
+    }
+
+
+async def load_invoice_pdf(db, order: dict) -> Optional[bytes]:
+    """PDF bytes for attaching to emails (cached render)"""
+    try:
+        artifact = await get_invoice_artifact(db, order, "pdf")
+        return await asyncio.to_thread(artifact["path"].read_bytes)
+    except Exception as e:
+        logger.error(f"Failed to render invoice PDF for order {order.get('id')}: {e}")
+        return None
+
+
+def _log_prerender_failure(task: asyncio.Future):
+    if not task.cancelled() and task.exception():
+        logger.error(f"Invoice prerender failed: {task.exception()}")
+
+
+def schedule_prerender(db, order: dict):
+    """Render both formats in the background so the first view is a cache hit"""
+    for fmt in RENDERERS:
+        task = asyncio.ensure_future(get_invoice_artifact(db, order, fmt))
+        task.add_done_callback(_log_prerender_failure)
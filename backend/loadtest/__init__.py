@@ -0,0 +1,24 @@
+"""
+Load Testing Harness
+An asyncio load generator for the storefront, checkout and admin flows.
+Virtual users loop over weighted scenarios (browse, search, product page,
+checkout with promo + credits, payment screenshot, admin dashboard) against
+either the ASGI app in-process or a running server over HTTP, both backed
+by the MongoDB in MONGO_URL / DB_NAME (a local mongod, not production).
+
+    python -m loadtest --fakes --users 50 --duration 60
+    python -m loadtest --mix browse
+    python -m loadtest --target http://localhost:8001 --mix checkout --allow-real-integrations
+    python -m loadtest --save-baseline        # store this run as the baseline
+    python -m loadtest --baseline             # compare against it, exit 1 on regression
+    FAKE_GOOGLE_LATENCY=lognormal:300,0.5 python -m loadtest --fakes
+
+Orders (with their status history and invoices), customers and the promo
+code it creates are tagged and removed at the end of the run (`--keep-data`
+leaves them). A checkout sends confirmation email, appends to the Google
+Sheet and posts to the products' Discord webhooks, so mixes with checkout
+scenarios only run with `--fakes`, which points them at the local stand-ins
+(see fakes/) so their latency and failures show up in the numbers, or with
+`--allow-real-integrations` when the server under test has them unconfigured
+or pointed at `python -m fakes`. MONGO_URL must be a local mongod.
+"""
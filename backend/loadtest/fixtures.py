@@ -0,0 +1,120 @@
+"""
+Load test fixtures
+Writes what the scenarios need straight into the database under test: a
+promo code, customers with enough store credit for every checkout and, on an
+empty database, a small catalog. Everything is tagged so `cleanup` can take
+it out again together with the orders the run created.
+"""
+import uuid
+from datetime import datetime, timezone
+from typing import List, Optional
+
+import order_bulk_ops
+from order_bulk_ops import DELETED
+
+PROMO_CODE = "LOADTEST10"
+PROMO_PERCENT = 10
+CUSTOMER_PREFIX = "loadtest-"
+CUSTOMER_DOMAIN = "example.com"
+CREDIT_BALANCE = 1_000_000_000
+SCREENSHOT_URL = "https://i.ibb.co/loadtest/payment.png"
+# Only given to seeded products with --fakes, which sends it to the Discord stand-in
+FAKE_WEBHOOK = "https://discord.com/api/webhooks/loadtest/token"
+
+# Only seeded when the database has no active products
+SEED_CATEGORIES = ["Gaming", "Streaming", "Gift Cards", "Software"]
+SEED_PRODUCTS = [
+    ("PUBG UC", "Gaming", [("60 UC", 120), ("325 UC", 550), ("660 UC", 1100)]),
+    ("Free Fire Diamonds", "Gaming", [("100 Diamonds", 110), ("520 Diamonds", 520)]),
+    ("Valorant Points", "Gaming", [("475 VP", 650), ("1000 VP", 1300)]),
+    ("Netflix Premium", "Streaming", [("1 Month", 499), ("3 Months", 1399)]),
+    ("Spotify Premium", "Streaming", [("1 Month", 199), ("6 Months", 1099)]),
+    ("YouTube Premium", "Streaming", [("1 Month", 249)]),
+    ("Steam Wallet", "Gift Cards", [("$5", 750), ("$10", 1450), ("$20", 2850)]),
+    ("Google Play Gift Card", "Gift Cards", [("$10", 1500), ("$25", 3650)]),
+    ("Windows 11 Pro", "Software", [("Lifetime", 1999)]),
+    ("Microsoft Office 365", "Software", [("1 Year", 2499)]),
+]
+
+
+def customer_email(n: int) -> str:
+    return f"{CUSTOMER_PREFIX}{n}@{CUSTOMER_DOMAIN}"
+
+
+async def prepare(db, customers: int, webhooks: Optional[List[str]] = None) -> dict:
+    """Create the promo code and customers, and a catalog (with `webhooks`) if there is none"""
+    now = datetime.now(timezone.utc).isoformat()
+
+    await db.promo_codes.update_one(
+        {"code": PROMO_CODE},
+        {
+            "$set": {"is_active": True, "discount_type": "percentage", "discount_value": PROMO_PERCENT,
+                     "min_order_amount": 0, "max_uses": None, "max_uses_per_customer": None,
+                     "first_time_only": False, "applicable_categories": [], "applicable_products": [],
+                     "expiry_date": None, "loadtest": True},
+            "$setOnInsert": {"id": str(uuid.uuid4()), "code": PROMO_CODE, "used_count": 0, "created_at": now},
+        },
+        upsert=True,
+    )
+
+    for n in range(customers):
+        await db.customers.update_one(
+            {"email": customer_email(n)},
+            {
+                "$set": {"credit_balance": CREDIT_BALANCE, "loadtest": True},
+                "$setOnInsert": {"id": str(uuid.uuid4()), "name": f"Load Test {n}",
+                                 "phone": f"98{n:08d}", "created_at": now},
+            },
+            upsert=True,
+        )
+
+    seeded = 0
+    if not await db.products.count_documents({"is_active": True}, limit=1):
+        seeded = await seed_catalog(db, now, webhooks or [])
+    return {"customers": customers, "seeded_products": seeded}
+
+
+async def seed_catalog(db, now: str, webhooks: List[str]) -> int:
+    categories = {
+        name: {"id": str(uuid.uuid4()), "name": name, "slug": name.lower().replace(" ", "-"), "loadtest": True}
+        for name in SEED_CATEGORIES
+    }
+    products = []
+    for sort_order, (name, category, variations) in enumerate(SEED_PRODUCTS):
+        products.append({
+            "id": str(uuid.uuid4()),
+            "name": name,
+            "slug": name.lower().replace(" ", "-"),
+            "description": f"{name} - instant delivery",
+            "image_url": "https://i.ibb.co/loadtest/product.png",
+            "category_id": categories[category]["id"],
+            "variations": [
+                {"id": str(uuid.uuid4()), "name": label, "price": price, "cost_price": round(price * 0.85)}
+                for label, price in variations
+            ],
+            "tags": [category.lower()],
+            "discord_webhooks": webhooks,
+            "sort_order": sort_order,
+            "is_active": True,
+            "is_sold_out": False,
+            "created_at": now,
+            "loadtest": True,
+        })
+    await db.categories.insert_many(list(categories.values()))
+    await db.products.insert_many(products)
+    return len(products)
+
+
+async def cleanup(db) -> dict:
+    """Remove everything the run created"""
+    by_customer = {"customer_email": {"$regex": f"^{CUSTOMER_PREFIX}"}}
+    # The bulk delete also takes the orders' status history, invoices and promo usage
+    order_ids = await db.orders.distinct("id", by_customer)
+    results = await order_bulk_ops.delete_orders(db, order_ids)
+    await db.promo_usage.delete_many(by_customer)
+    await db.credit_logs.delete_many(by_customer)
+    await db.customers.delete_many({"loadtest": True})
+    await db.promo_codes.delete_many({"loadtest": True})
+    await db.products.delete_many({"loadtest": True})
+    await db.categories.delete_many({"loadtest": True})
+    return {"orders": sum(1 for result in results.values() if result == DELETED)}
@@ -0,0 +1,243 @@
+"""
+Load test runner
+Starts the virtual users against the chosen target, ramps them up, drops the
+warm-up period from the numbers and prints (or saves, or compares) the
+results. See `python -m loadtest --help`.
+
+It refuses to start against anything but a local mongod, and refuses mixes
+that place orders unless their email, Sheets and Discord calls go to the
+stand-ins (`--fakes`) or that is explicitly accepted.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict
+
+import httpx
+
+from loadtest import fixtures, scenarios
+from loadtest.stats import Stats, compare, format_report
+
+BASELINE_DIR = Path(__file__).parent / "baselines"
+INPROCESS = "inprocess"
+REQUEST_TIMEOUT = 30
+
+ADMIN_EMAIL = os.environ.get("LOADTEST_ADMIN_EMAIL", "gsnadmin")
+ADMIN_PASSWORD = os.environ.get("LOADTEST_ADMIN_PASSWORD", "gsnadmin")
+
+
+class VisitorTransport(httpx.ASGITransport):
+    """
+    Sends each request from a new client address. The per-IP rate limiter
+    still does its normal work on every request, but a closed-loop user
+    sending hundreds of requests a minute is never throttled by it.
+    """
+
+    _requests = 0
+
+    async def handle_async_request(self, request):
+        n = VisitorTransport._requests = VisitorTransport._requests + 1
+        self.client = (f"10.{n >> 16 & 255}.{n >> 8 & 255}.{n & 255}", 50000)
+        return await super().handle_async_request(request)
+
+
+@asynccontextmanager
+async def open_target(target: str):
+    """Yields (client factory, database) for the app in-process or a server URL"""
+    if target == INPROCESS:
+        import server
+
+        await server.app.router.startup()
+        try:
+            def make_client(user: int) -> httpx.AsyncClient:
+                transport = VisitorTransport(app=server.app)
+                return httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=REQUEST_TIMEOUT)
+
+            yield make_client, server.admin_db
+        finally:
+            await server.app.router.shutdown()
+    else:
+        import database
+
+        # All users share this machine's address: start the server with RATE_LIMIT_GENERAL
+        # raised above users x requests per minute, or most requests come back 429
+        def make_client(user: int) -> httpx.AsyncClient:
+            return httpx.AsyncClient(base_url=target.rstrip("/"), timeout=REQUEST_TIMEOUT)
+
+        # The server must be using the same MONGO_URL / DB_NAME as this process
+        db = database.get_db(database.ADMIN)
+        try:
+            yield make_client, db
+        finally:
+            database.close_clients()
+
+
+def check_safe(args):
+    """Exit before anything connects if the run could touch production data or integrations"""
+    import database  # loads .env, like the app will
+
+    if not os.environ.get("MONGO_URL"):
+        raise SystemExit("❌ MONGO_URL is not set")
+    remote = database.remote_hosts(os.environ["MONGO_URL"])
+    if remote:
+        raise SystemExit(f"❌ MONGO_URL points at {', '.join(remote)}: load tests only run against a local mongod")
+    checkouts = set(scenarios.MIXES[args.mix]) & scenarios.CHECKOUT_SCENARIOS
+    if checkouts and not (args.fakes or args.allow_real_integrations):
+        raise SystemExit(
+            f"❌ Mix '{args.mix}' places orders ({', '.join(sorted(checkouts))}), which sends email, writes to "
+            "the Google Sheet and posts to the products' Discord webhooks. Run with --fakes, or with "
+            "--allow-real-integrations if the server under test has them unconfigured or pointed at stand-ins "
+            "(or use --mix browse)"
+        )
+
+
+async def admin_login(client: httpx.AsyncClient) -> str:
+    response = await client.post("/api/auth/login", json={"email": ADMIN_EMAIL, "password": ADMIN_PASSWORD})
+    response.raise_for_status()
+    return response.json()["token"]
+
+
+async def virtual_user(make_client: Callable, user: int, stats: Stats, catalog, mix: Dict[str, int],
+                       admin_token, start_after: float, deadline: float, think: float, seed: int):
+    rng = random.Random(seed * 100003 + user)
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    await asyncio.sleep(start_after)
+    async with make_client(user) as client:
+        session = scenarios.Session(client, stats, catalog, user, rng, admin_token)
+        while time.monotonic() < deadline:
+            name = rng.choices(names, weights=weights)[0]
+            session.failed = False
+            start = time.perf_counter()
+            try:
+                await scenarios.SCENARIOS[name](session)
+            except Exception:
+                # A response that didn't parse as expected
+                session.failed = True
+            stats.record_scenario(name, (time.perf_counter() - start) * 1000, not session.failed)
+            # Yield even without think time: a visit served entirely from caches never
+            # awaits real I/O in-process, and would starve the other users
+            await asyncio.sleep(rng.uniform(0, 2 * think) if think else 0)
+
+
+async def run(args, webhooks=None) -> dict:
+    mix = scenarios.MIXES[args.mix]
+    stats = Stats()
+    async with open_target(args.target) as (make_client, db):
+        prepared = await fixtures.prepare(db, args.users, webhooks)
+        if prepared["seeded_products"]:
+            print(f"🌱 Seeded {prepared['seeded_products']} products (database had no catalog)")
+        try:
+            async with make_client(args.users) as client:
+                catalog = await scenarios.Catalog.load(client)
+                admin_token = await admin_login(client) if set(mix) & scenarios.ADMIN_SCENARIOS else None
+            if not catalog.products:
+                raise SystemExit("❌ No orderable products in the catalog")
+
+            print(
+                f"🚀 {args.users} users, mix '{args.mix}', {args.duration} s "
+                f"(+{args.warmup} s warm-up) against {args.target}"
+            )
+            stats.recording = False
+            now = time.monotonic()
+            deadline = now + args.warmup + args.duration
+            users = [
+                asyncio.create_task(virtual_user(
+                    make_client, user, stats, catalog, mix, admin_token,
+                    args.ramp * user / args.users, deadline, args.think, args.seed,
+                ))
+                for user in range(args.users)
+            ]
+            await asyncio.sleep(args.warmup)
+            stats.recording = True
+            measured_from = time.monotonic()
+            await asyncio.gather(*users)
+            elapsed = time.monotonic() - measured_from
+        finally:
+            if not args.keep_data:
+                removed = await fixtures.cleanup(db)
+                print(f"🧹 Removed {removed['orders']} load test orders and fixtures")
+
+    summary = stats.summary(elapsed)
+    summary["settings"] = {
+        "target": INPROCESS if args.target == INPROCESS else "http",
+        "mix": args.mix,
+        "users": args.users,
+        "duration": args.duration,
+        "think": args.think,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+    }
+    return summary
+
+
+def baseline_path(args) -> Path:
+    target = INPROCESS if args.target == INPROCESS else "http"
+    return BASELINE_DIR / f"{args.mix}-{target}-{args.users}u.json"
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m loadtest", description="Nobeosh load generator")
+    parser.add_argument("--target", default=INPROCESS, help=f"'{INPROCESS}' (default) or a base URL")
+    parser.add_argument("--mix", default="storefront", choices=sorted(scenarios.MIXES))
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=30, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=5, help="seconds run but not measured")
+    parser.add_argument("--ramp", type=float, default=5, help="seconds over which users start")
+    parser.add_argument("--think", type=float, default=0, help="mean pause between visits, seconds")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", help="write the summary to this file")
+    parser.add_argument("--save-baseline", action="store_true", help="store this run as the baseline")
+    parser.add_argument("--baseline", nargs="?", const="", default=None,
+                        help="compare with a baseline (default: the stored one for these settings)")
+    parser.add_argument("--keep-data", action="store_true", help="don't remove orders and fixtures")
+    parser.add_argument("--fakes", action="store_true",
+                        help="send email, webhooks, Sheets... to local stand-ins (FAKE_* settings apply)")
+    parser.add_argument("--allow-real-integrations", action="store_true",
+                        help="run checkout scenarios without --fakes (the integrations must be safe to call)")
+    args = parser.parse_args()
+    check_safe(args)
+
+    stand_ins = None
+    if args.fakes:
+        if args.target != INPROCESS:
+            raise SystemExit("❌ --fakes runs in-process only: start `python -m fakes` and the server with its settings")
+        from fakes.server import Background
+
+        # Before the app is imported: the services read their settings at import time
+        stand_ins = Background().start()
+        os.environ.update(stand_ins.environment)
+        print(f"🧪 Integrations go to the stand-ins on port {stand_ins.http_port} (SMTP {stand_ins.smtp_port})")
+    try:
+        summary = asyncio.run(run(args, [fixtures.FAKE_WEBHOOK] if stand_ins else None))
+    finally:
+        if stand_ins:
+            stand_ins.stop()
+    if stand_ins:
+        summary["integrations"] = stand_ins.fakes.summary()
+    print(format_report(summary))
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(summary, indent=2))
+    if args.save_baseline:
+        path = baseline_path(args)
+        path.parent.mkdir(exist_ok=True)
+        path.write_text(json.dumps(summary, indent=2))
+        print(f"💾 Baseline saved to {path}")
+    if args.baseline is not None:
+        path = Path(args.baseline) if args.baseline else baseline_path(args)
+        if not path.exists():
+            raise SystemExit(f"❌ No baseline at {path} (run with --save-baseline first)")
+        regressions = compare(summary, json.loads(path.read_text()))
+        if regressions:
+            print(f"❌ {len(regressions)} regressions against {path.name}:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print(f"✅ No regressions against {path.name}")
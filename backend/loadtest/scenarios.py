@@ -0,0 +1,200 @@
+"""
+Load test scenarios
+Each scenario is one visit, written as the requests the frontend makes for
+it. A `Session` is one virtual user: it owns an HTTP client, records every
+request under a stable name (the route, not the URL) and picks products with
+a popularity skew, so a few products take most of the traffic like in the
+real shop.
+"""
+import random
+import time
+from typing import Awaitable, Callable, Dict, List, Optional
+
+import httpx
+
+from loadtest import fixtures
+from loadtest.stats import Stats
+
+OK = (200,)
+
+
+class Catalog:
+    """What the storefront shows, fetched once before the run"""
+
+    def __init__(self, products: List[dict], categories: List[dict]):
+        self.products = [p for p in products if p.get("variations") and not p.get("whatsapp_only")]
+        self.categories = [c["id"] for c in categories]
+        # Zipf-like popularity: the n-th product is 1/n as likely as the first
+        self.weights = [1 / (rank + 1) for rank in range(len(self.products))]
+        words = {word.lower() for p in self.products for word in p["name"].split() if len(word) >= 3}
+        self.search_terms = sorted(words) or ["netflix"]
+
+    @classmethod
+    async def load(cls, client: httpx.AsyncClient) -> "Catalog":
+        products = (await client.get("/api/products")).raise_for_status().json()
+        categories = (await client.get("/api/categories")).raise_for_status().json()
+        return cls(products, categories)
+
+
+class Session:
+    def __init__(self, client: httpx.AsyncClient, stats: Stats, catalog: Catalog, user: int,
+                 rng: random.Random, admin_token: Optional[str] = None):
+        self.client = client
+        self.stats = stats
+        self.catalog = catalog
+        self.user = user
+        self.rng = rng
+        self.email = fixtures.customer_email(user)
+        self.admin_headers = {"Authorization": f"Bearer {admin_token}"} if admin_token else {}
+        self.failed = False
+
+    async def request(self, method: str, url: str, name: str, expect=OK, **kwargs) -> Optional[httpx.Response]:
+        """Send one request and record it; returns None (and fails the scenario) if unexpected"""
+        start = time.perf_counter()
+        try:
+            response = await self.client.request(method, "/api" + url, **kwargs)
+            status = response.status_code
+        except httpx.HTTPError:
+            response, status = None, 0
+        ok = status in expect
+        self.stats.record_request(f"{method} {name}", (time.perf_counter() - start) * 1000, status, ok)
+        if not ok:
+            self.failed = True
+            return None
+        return response
+
+    async def get(self, url: str, name: Optional[str] = None, **kwargs) -> Optional[httpx.Response]:
+        return await self.request("GET", url, name or url, **kwargs)
+
+    def pick_product(self) -> dict:
+        return self.rng.choices(self.catalog.products, weights=self.catalog.weights)[0]
+
+    def pick_cart(self) -> List[dict]:
+        items = {}
+        for _ in range(self.rng.choices((1, 2, 3), weights=(70, 22, 8))[0]):
+            product = self.pick_product()
+            variation = self.rng.choice(product["variations"])
+            key = (product["id"], variation["id"])
+            item = items.setdefault(key, {
+                "name": product["name"], "price": variation["price"], "quantity": 0,
+                "variation": variation["name"], "product_id": product["id"], "variation_id": variation["id"],
+            })
+            item["quantity"] += 1
+        return list(items.values())
+
+
+# ==================== STOREFRONT ====================
+
+async def browse_catalog(session: Session):
+    await session.get("/categories")
+    await session.get("/products")
+    if session.catalog.categories:
+        category = session.rng.choice(session.catalog.categories)
+        await session.get("/products", params={"category_id": category}, name="/products?category_id")
+    await session.get("/bundles")
+
+
+async def search(session: Session):
+    term = session.rng.choice(session.catalog.search_terms)
+    # Autocomplete fires as the user types, then the results page
+    for length in range(2, min(len(term), 4) + 1):
+        await session.get("/products/search/suggestions", params={"q": term[:length]})
+    sort_by = session.rng.choice(("relevance", "relevance", "price_low", "newest"))
+    await session.get("/products/search/advanced", params={"q": term, "sort_by": sort_by})
+
+
+async def product_page(session: Session):
+    product = session.pick_product()
+    await session.get(f"/products/{product.get('slug') or product['id']}", name="/products/{product_id}")
+    await session.get(f"/products/{product['id']}/related", name="/products/{product_id}/related")
+    await session.get("/reviews")
+    await session.get("/reviews/summary")
+
+
+# ==================== CHECKOUT ====================
+
+async def _place_order(session: Session) -> Optional[str]:
+    cart = session.pick_cart()
+    subtotal = sum(item["price"] * item["quantity"] for item in cart)
+
+    balance = await session.get("/credits/balance", params={"email": session.email})
+    if balance is None:
+        return None
+    promo = await session.request(
+        "POST", "/promo-codes/validate", "/promo-codes/validate",
+        params={"code": fixtures.PROMO_CODE, "subtotal": subtotal, "customer_email": session.email},
+        json=[{"product_id": item["product_id"]} for item in cart],
+    )
+    if promo is None:
+        return None
+    discount = promo.json()["discount_amount"]
+    credits = min(balance.json()["credit_balance"], round(subtotal * 0.05))
+
+    order = await session.request("POST", "/orders/create", "/orders/create", json={
+        "customer_name": f"Load Test {session.user}",
+        "customer_phone": f"98{session.user:08d}",
+        "customer_email": session.email,
+        "items": cart,
+        "total_amount": round(subtotal - discount - credits, 2),
+        "remark": "loadtest",
+        "credits_used": credits,
+        "promo_code": fixtures.PROMO_CODE,
+    })
+    return order.json()["order_id"] if order is not None else None
+
+
+async def checkout(session: Session):
+    """Cart to order with a promo code and store credit, abandoned before paying"""
+    await _place_order(session)
+
+
+async def payment_screenshot(session: Session):
+    """Checkout, then submit the payment screenshot and open the tracking page"""
+    order_id = await _place_order(session)
+    if order_id is None:
+        return
+    await session.request(
+        "POST", f"/orders/{order_id}/payment-screenshot", "/orders/{order_id}/payment-screenshot",
+        json={"screenshot_url": fixtures.SCREENSHOT_URL, "payment_method": session.rng.choice(("esewa", "khalti"))},
+    )
+    await session.get(f"/orders/track/{order_id}", name="/orders/track/{order_id}")
+
+
+# ==================== ADMIN ====================
+
+async def admin_dashboard(session: Session):
+    """What the admin dashboard loads on open"""
+    headers = session.admin_headers
+    await session.get("/analytics/overview", headers=headers)
+    await session.get("/analytics/revenue-chart", params={"days": 30}, headers=headers)
+    await session.get("/analytics/top-products", params={"limit": 10}, headers=headers)
+    await session.get("/analytics/order-status", headers=headers)
+    await session.get("/orders", headers=headers)
+
+
+Scenario = Callable[[Session], Awaitable[None]]
+
+SCENARIOS: Dict[str, Scenario] = {
+    "browse_catalog": browse_catalog,
+    "search": search,
+    "product_page": product_page,
+    "checkout": checkout,
+    "payment_screenshot": payment_screenshot,
+    "admin_dashboard": admin_dashboard,
+}
+
+ADMIN_SCENARIOS = frozenset(("admin_dashboard",))
+# Create real orders: email, Google Sheets and Discord run for each one
+CHECKOUT_SCENARIOS = frozenset(("checkout", "payment_screenshot"))
+
+# Weights per scenario; "storefront" is a normal day, "sale" a promo launch,
+# "browse" the storefront without placing orders
+MIXES: Dict[str, Dict[str, int]] = {
+    "storefront": {"browse_catalog": 35, "search": 15, "product_page": 30, "checkout": 8,
+                   "payment_screenshot": 10, "admin_dashboard": 2},
+    "sale": {"browse_catalog": 20, "search": 10, "product_page": 25, "checkout": 15,
+             "payment_screenshot": 28, "admin_dashboard": 2},
+    "browse": {"browse_catalog": 40, "search": 20, "product_page": 38, "admin_dashboard": 2},
+    "checkout": {"checkout": 40, "payment_screenshot": 60},
+    "admin": {"admin_dashboard": 100},
+}
@@ -0,0 +1,151 @@
+"""
+Load test statistics: latency percentiles, throughput and error rates per
+request name and per scenario, plus the comparison against a stored baseline.
+"""
+import math
+from typing import Dict, List, Optional
+
+PERCENTILES = (50, 90, 95, 99)
+
+# A run regresses when it is worse than the baseline by more than these
+LATENCY_TOLERANCE = 0.25
+RPS_TOLERANCE = 0.20
+ERROR_RATE_TOLERANCE = 0.01
+# Latency differences below this are noise, whatever the ratio
+LATENCY_SLACK_MS = 2.0
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+class Series:
+    """Latencies (ms) and outcomes for one request name or scenario"""
+
+    __slots__ = ("latencies", "errors", "statuses")
+
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.errors = 0
+        self.statuses: Dict[str, int] = {}
+
+    def record(self, latency_ms: float, status: int, ok: bool):
+        self.latencies.append(latency_ms)
+        if not ok:
+            self.errors += 1
+        key = str(status) if status else "error"
+        self.statuses[key] = self.statuses.get(key, 0) + 1
+
+    def summary(self, elapsed: float) -> dict:
+        values = sorted(self.latencies)
+        count = len(values)
+        result = {
+            "count": count,
+            "rps": round(count / elapsed, 2) if elapsed else 0,
+            "error_rate": round(self.errors / count, 4) if count else 0,
+            "mean_ms": round(sum(values) / count, 2) if count else 0,
+            "max_ms": round(values[-1], 2) if values else 0,
+        }
+        for pct in PERCENTILES:
+            result[f"p{pct}_ms"] = round(percentile(values, pct), 2)
+        result["statuses"] = dict(sorted(self.statuses.items()))
+        return result
+
+
+class Stats:
+    def __init__(self):
+        self.requests: Dict[str, Series] = {}
+        self.scenarios: Dict[str, Series] = {}
+        self.total = Series()
+        self.recording = True
+
+    def record_request(self, name: str, latency_ms: float, status: int, ok: bool):
+        if not self.recording:
+            return
+        series = self.requests.get(name)
+        if series is None:
+            series = self.requests[name] = Series()
+        series.record(latency_ms, status, ok)
+        self.total.record(latency_ms, status, ok)
+
+    def record_scenario(self, name: str, latency_ms: float, ok: bool):
+        if not self.recording:
+            return
+        series = self.scenarios.get(name)
+        if series is None:
+            series = self.scenarios[name] = Series()
+        series.record(latency_ms, 0 if not ok else 200, ok)
+
+    def summary(self, elapsed: float) -> dict:
+        return {
+            "elapsed_seconds": round(elapsed, 2),
+            "overall": self.total.summary(elapsed),
+            "requests": {name: series.summary(elapsed) for name, series in sorted(self.requests.items())},
+            "scenarios": {name: series.summary(elapsed) for name, series in sorted(self.scenarios.items())},
+        }
+
+
+def format_report(summary: dict) -> str:
+    lines = []
+    header = f"  {'':<44} {'count':>7} {'rps':>8} {'err%':>6} {'p50':>8} {'p90':>8} {'p95':>8} {'p99':>8} {'max':>8}"
+
+    def row(name: str, s: dict) -> str:
+        return (
+            f"  {name[:44]:<44} {s['count']:>7} {s['rps']:>8.1f} {s['error_rate'] * 100:>5.1f}% "
+            f"{s['p50_ms']:>8.1f} {s['p90_ms']:>8.1f} {s['p95_ms']:>8.1f} {s['p99_ms']:>8.1f} {s['max_ms']:>8.1f}"
+        )
+
+    lines.append(f"📊 Requests over {summary['elapsed_seconds']} s (latencies in ms)")
+    lines.append(header)
+    for name, s in summary["requests"].items():
+        lines.append(row(name, s))
+    lines.append(row("TOTAL", summary["overall"]))
+    lines.append("")
+    lines.append("📊 Scenarios (end to end)")
+    lines.append(header)
+    for name, s in summary["scenarios"].items():
+        lines.append(row(name, s))
+    if summary.get("integrations"):
+        lines.append("")
+        lines.append("🧪 Integration stand-ins")
+        lines.append(f"  {'':<12} {'calls':>7} {'errors':>7} {'429':>7} {'added s':>9}  profile")
+        for name, s in summary["integrations"].items():
+            profile = s["profile"]
+            lines.append(
+                f"  {name:<12} {s['requests']:>7} {s['errors']:>7} {s['throttled']:>7} {s['delay_seconds']:>9.1f}  "
+                f"{profile['latency']}, {profile['error_rate'] * 100:g}% errors, "
+                f"{profile['rate_limit'] or 'no'} req/s limit"
+            )
+    return "\n".join(lines)
+
+
+def _latency_regressed(current: float, baseline: float) -> bool:
+    return current - baseline > LATENCY_SLACK_MS and current > baseline * (1 + LATENCY_TOLERANCE)
+
+
+def compare(summary: dict, baseline: dict, check_rps: bool = True) -> List[str]:
+    """Regressions of this run against a baseline summary, as readable lines"""
+    regressions = []
+
+    def check(label: str, current: Optional[dict], base: Optional[dict], rps: bool):
+        if not current or not base or not current["count"]:
+            return
+        for key in ("p50_ms", "p95_ms", "p99_ms"):
+            if _latency_regressed(current[key], base[key]):
+                regressions.append(f"{label} {key} {base[key]:.1f} -> {current[key]:.1f}")
+        if current["error_rate"] > base["error_rate"] + ERROR_RATE_TOLERANCE:
+            regressions.append(
+                f"{label} error rate {base['error_rate'] * 100:.1f}% -> {current['error_rate'] * 100:.1f}%"
+            )
+        if rps and current["rps"] < base["rps"] * (1 - RPS_TOLERANCE):
+            regressions.append(f"{label} rps {base['rps']:.1f} -> {current['rps']:.1f}")
+
+    # Throughput is only comparable for the whole run; per-request rps follows the mix
+    check("TOTAL", summary["overall"], baseline.get("overall"), check_rps)
+    for name, current in summary["requests"].items():
+        check(name, current, baseline.get("requests", {}).get(name), False)
+    return regressions
@@ -0,0 +1,169 @@
+"""
+Event Loop Watchdog
+Finds the synchronous calls that stall the event loop (smtplib, gspread,
+googleapiclient, file writes...) in production.
+
+Two halves:
+    heartbeat  a coroutine on the loop that wakes every WATCHDOG_INTERVAL
+               and records how late it was (event loop lag metrics)
+    watchdog   a daemon thread that notices when the heartbeat is overdue
+               by more than LOOP_BLOCK_THRESHOLD_MS and grabs the loop
+               thread's stack while it is still stuck
+
+When the loop recovers, the heartbeat logs the stall with its length, the
+route it happened in, the innermost frame of our own code and the stack,
+and counts it in the metrics. Recent stalls are kept for the admin report.
+"""
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+ROOT_DIR = Path(__file__).parent
+
+WATCHDOG_INTERVAL = float(os.environ.get("LOOP_WATCHDOG_INTERVAL", "0.1"))
+# 0 keeps the lag metrics but disables stack capture
+LOOP_BLOCK_THRESHOLD_MS = float(os.environ.get("LOOP_BLOCK_THRESHOLD_MS", "250"))
+# Frames shown in logs (innermost); the whole stack is searched for the route
+STACK_LIMIT = 25
+MAX_FRAMES = 200
+RECENT_STALLS = 50
+
+
+def _own_code(filename: str) -> bool:
+    return filename.startswith(str(ROOT_DIR)) and "site-packages" not in filename
+
+
+class LoopWatchdog:
+    def __init__(self, interval: float = WATCHDOG_INTERVAL, threshold_ms: float = LOOP_BLOCK_THRESHOLD_MS):
+        self.interval = interval
+        self.threshold = threshold_ms / 1000
+        self.recent = deque(maxlen=RECENT_STALLS)
+        self._app = None
+        self._loop_thread_id: Optional[int] = None
+        # Heartbeat state, written by the loop and read by the thread
+        self._beat = 0
+        self._beat_at = 0.0
+        # (beat, [(code, lineno)]) captured by the thread for the current stall
+        self._capture: Optional[tuple] = None
+        self._endpoints: Optional[Dict[object, str]] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self, app):
+        """Call from the running loop (startup event)"""
+        if self.interval <= 0:
+            return
+        self._app = app
+        self._loop_thread_id = threading.get_ident()
+        self._beat_at = time.monotonic()
+        asyncio.create_task(self.heartbeat())
+        if self.threshold > 0:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    # ---- loop side ----
+
+    async def heartbeat(self):
+        lag_histogram = metrics.LOOP_LAG.labels()
+        lag_max = metrics.LOOP_LAG_MAX.labels()
+        while True:
+            start = time.monotonic()
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            lag = max(0.0, now - start - self.interval)
+
+            capture = self._capture
+            self._beat += 1
+            self._beat_at = now
+            self._capture = None
+
+            lag_histogram.observe(lag)
+            if lag > lag_max.value:
+                lag_max.set(lag)
+            if capture is not None and lag >= self.threshold:
+                self._report(lag, capture[1])
+
+    def _report(self, duration: float, frames: List[tuple]):
+        route = self._route_for(frames)
+        stack = [
+            traceback.FrameSummary(code.co_filename, lineno, code.co_name)
+            for code, lineno in frames[-STACK_LIMIT:]
+        ]
+        site = next((frame for frame in reversed(stack) if _own_code(frame.filename)), stack[-1] if stack else None)
+        site_text = f"{Path(site.filename).name}:{site.lineno} in {site.name}" if site else "unknown"
+
+        metrics.LOOP_BLOCKS.labels(route).inc()
+        metrics.LOOP_BLOCK_DURATION.labels(route).observe(duration)
+        logger.warning(
+            f"⏱️ Event loop blocked for {duration * 1000:.0f} ms in {route} at {site_text}\n"
+            + "".join(traceback.format_list(stack))
+        )
+        self.recent.append({
+            "at": datetime.now(timezone.utc).isoformat(),
+            "duration_ms": round(duration * 1000, 1),
+            "route": route,
+            "site": site_text,
+            "stack": [f"{Path(frame.filename).name}:{frame.lineno} in {frame.name}" for frame in stack],
+        })
+
+    def _route_for(self, frames: List[tuple]) -> str:
+        """Route template of the innermost endpoint on the stack, if any"""
+        if self._endpoints is None:
+            self._endpoints = {
+                route.endpoint.__code__: route.path
+                for route in getattr(self._app, "routes", [])
+                if hasattr(getattr(route, "endpoint", None), "__code__")
+            }
+        for code, _ in reversed(frames):
+            route = self._endpoints.get(code)
+            if route:
+                return route
+        return metrics.BACKGROUND
+
+    # ---- watchdog thread ----
+
+    def _watch(self):
+        check_every = min(self.interval, self.threshold) / 2
+        while not self._stop.wait(check_every):
+            beat = self._beat
+            overdue = time.monotonic() - self._beat_at - self.interval
+            if overdue < self.threshold or (self._capture is not None and self._capture[0] == beat):
+                continue
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+            frames = []
+            # Code objects and line numbers only - reading locals would race the loop thread
+            while frame is not None and len(frames) < MAX_FRAMES:
+                frames.append((frame.f_code, frame.f_lineno))
+                frame = frame.f_back
+            frames.reverse()
+            # Only keep it if the loop is still on the same beat
+            if self._beat == beat:
+                self._capture = (beat, frames)
+
+    def report(self) -> dict:
+        return {
+            "threshold_ms": self.threshold * 1000,
+            "interval_ms": self.interval * 1000,
+            "stalls": list(reversed(self.recent)),
+        }
+
+
+watchdog = LoopWatchdog()
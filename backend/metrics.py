@@ -0,0 +1,464 @@
+"""
+Metrics
+In-process counters, gauges and histograms rendered in the Prometheus text
+format at `/metrics`, which is only served when METRICS_TOKEN is set and
+the scraper sends it as a bearer token. Covers:
+
+    HTTP        per-route request counts and latency, requests in flight
+    MongoDB     command durations/failures per workload (pymongo CommandListener)
+    Outbound    Discord / ImgBB / Take.app / Trustpilot / SMTP call timings
+    Tasks       background job runs, durations and last success
+    Event loop  scheduling lag and blocking stalls (fed by loop_watchdog)
+    Rate limit  rejections per bucket
+
+Hot paths never format label strings: `metric.labels(...)` returns a child
+that is created once and cached, and modules bind the children they use at
+import time. Recording a value is a lock plus an add.
+"""
+import asyncio
+import bisect
+import contextvars
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import httpx
+from pymongo import monitoring
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+PREFIX = "nobeosh_"
+
+# Bearer token the scraper must send; /metrics is not served without one
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN", "")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DB_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+TASK_BUCKETS = (0.1, 0.5, 1.0, 5.0, 15.0, 60.0, 300.0, 900.0)
+LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+# Outbound services
+DISCORD = "discord"
+IMGBB = "imgbb"
+TAKEAPP = "takeapp"
+TRUSTPILOT = "trustpilot"
+SMTP = "smtp"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if value == int(value):
+        return str(int(value))
+    return repr(value)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = PREFIX + name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values: str):
+        """The child for a label set; cache it rather than calling this per event"""
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def _label_text(self, values: Tuple[str, ...], extra: str = "") -> str:
+        pairs = [f'{name}="{_escape(value)}"' for name, value in zip(self.labelnames, values)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in list(self._children.items()):
+            lines.extend(self._render_child(values, child))
+        return lines
+
+    def _render_child(self, values, child) -> List[str]:
+        return [f"{self.name}{self._label_text(values)} {_format_value(child.value)}"]
+
+
+class _Value:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1.0):
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value: float):
+        self.value = value
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount: float = 1.0):
+        self.labels().inc(amount)
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount: float = 1.0):
+        self.labels().inc(amount)
+
+    def dec(self, amount: float = 1.0):
+        self.labels().dec(amount)
+
+    def set(self, value: float):
+        self.labels().set(value)
+
+
+class _HistogramValue:
+    __slots__ = ("bounds", "counts", "sum", "_lock")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        # One slot per bucket plus +Inf; made cumulative when rendered
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect.bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    @contextmanager
+    def time(self):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value: float):
+        self.labels().observe(value)
+
+    def _render_child(self, values, child) -> List[str]:
+        with child._lock:
+            counts = list(child.counts)
+            total = child.sum
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += count
+            le = f'le="{_format_value(bound)}"'
+            lines.append(f"{self.name}_bucket{self._label_text(values, le)} {cumulative}")
+        labels = self._label_text(values)
+        lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+        lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+REGISTRY: List[_Metric] = []
+
+
+def render() -> bytes:
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return ("\n".join(lines) + "\n").encode()
+
+
+# ==================== METRIC DEFINITIONS ====================
+
+HTTP_REQUESTS = Counter("http_requests_total", "HTTP requests by route template and status class",
+                        ("method", "route", "status"))
+HTTP_LATENCY = Histogram("http_request_duration_seconds", "HTTP request latency by route template",
+                         ("method", "route"))
+HTTP_IN_FLIGHT = Gauge("http_requests_in_flight", "HTTP requests currently being served")
+
+MONGO_LATENCY = Histogram("mongo_command_duration_seconds", "MongoDB command round trip by workload",
+                          ("workload", "command"), buckets=DB_BUCKETS)
+MONGO_FAILURES = Counter("mongo_command_failures_total", "Failed MongoDB commands by workload",
+                         ("workload", "command"))
+MONGO_IN_FLIGHT = Gauge("mongo_commands_in_flight", "MongoDB commands awaiting a reply", ("workload",))
+
+OUTBOUND_LATENCY = Histogram("outbound_request_duration_seconds", "Calls to third-party services",
+                             ("service",))
+OUTBOUND_FAILURES = Counter("outbound_request_failures_total",
+                            "Third-party calls that raised or returned 5xx", ("service",))
+OUTBOUND_IN_FLIGHT = Gauge("outbound_requests_in_flight", "Third-party calls in progress", ("service",))
+
+TASK_RUNS = Counter("background_task_runs_total", "Background job runs by outcome", ("task", "outcome"))
+TASK_DURATION = Histogram("background_task_duration_seconds", "Background job run time", ("task",),
+                          buckets=TASK_BUCKETS)
+TASK_LAST_SUCCESS = Gauge("background_task_last_success_timestamp_seconds",
+                          "Unix time of the last successful run", ("task",))
+
+LOOP_LAG = Histogram("event_loop_lag_seconds", "How late the event loop woke a sleeping task",
+                     buckets=LAG_BUCKETS)
+LOOP_LAG_MAX = Gauge("event_loop_lag_max_seconds", "Worst event loop lag since the last scrape")
+LOOP_BLOCKS = Counter("event_loop_blocks_total", "Stalls over the watchdog threshold by route", ("route",))
+LOOP_BLOCK_DURATION = Histogram("event_loop_block_duration_seconds", "Length of watchdog-detected stalls",
+                                ("route",), buckets=LAG_BUCKETS)
+
+RATE_LIMIT_REJECTIONS = Counter("rate_limit_rejections_total", "Requests refused by the rate limiter",
+                                ("bucket",))
+
+
+# ==================== HTTP ====================
+
+_STATUS_CLASSES = {n: f"{n}xx" for n in range(1, 6)}
+UNMATCHED_ROUTE = "unmatched"
+BACKGROUND = "background"
+
+# The ASGI scope of the request being served, or the name of the running job.
+# Motor copies the context into its executor threads, so driver callbacks
+# (command listeners) can see it too.
+_current: contextvars.ContextVar[Union[dict, str, None]] = contextvars.ContextVar("metrics_current", default=None)
+_route_templates: Dict[object, str] = {}
+
+
+def route_template(scope: dict) -> str:
+    """`/api/orders/{order_id}` for a routed scope, from the endpoint the router left in it"""
+    endpoint = scope.get("endpoint")
+    if endpoint is None:
+        return UNMATCHED_ROUTE
+    template = _route_templates.get(endpoint)
+    if template is None:
+        for route in scope["app"].routes:
+            _route_templates.setdefault(getattr(route, "endpoint", None), getattr(route, "path", UNMATCHED_ROUTE))
+        template = _route_templates.setdefault(endpoint, UNMATCHED_ROUTE)
+    return template
+
+
+def current_route() -> str:
+    """Route template (or `task:<name>`) the current code is running for"""
+    current = _current.get()
+    if current is None:
+        return BACKGROUND
+    if isinstance(current, str):
+        return current
+    return route_template(current)
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI request timing. The route label is the matched path template
+    (`/api/orders/{order_id}`), read from the endpoint the router left in
+    the scope, so ids never become label values. Event streams are counted
+    but not timed - their duration is the connection's lifetime.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        # (method, route, status class) -> counter child; (method, route) -> histogram child
+        self._counters: Dict[tuple, _Value] = {}
+        self._latencies: Dict[tuple, _HistogramValue] = {}
+        self._in_flight = HTTP_IN_FLIGHT.labels()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status_code = 500
+        streaming = False
+
+        async def send_wrapper(message):
+            nonlocal status_code, streaming
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                for name, value in message.get("headers", ()):
+                    if name == b"content-type":
+                        streaming = value.startswith(b"text/event-stream")
+                        break
+            await send(message)
+
+        self._in_flight.inc()
+        token = _current.set(scope)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+            self._in_flight.dec()
+            elapsed = time.perf_counter() - start
+            method = scope["method"]
+            route = route_template(scope)
+            status = _STATUS_CLASSES.get(status_code // 100, "5xx")
+
+            key = (method, route, status)
+            counter = self._counters.get(key)
+            if counter is None:
+                counter = self._counters[key] = HTTP_REQUESTS.labels(*key)
+            counter.inc()
+
+            if not streaming:
+                key = (method, route)
+                latency = self._latencies.get(key)
+                if latency is None:
+                    latency = self._latencies[key] = HTTP_LATENCY.labels(*key)
+                latency.observe(elapsed)
+
+
+# ==================== MONGODB ====================
+
+class MongoCommandListener(monitoring.CommandListener):
+    """Times every command on one workload's client (called from driver threads)"""
+
+    def __init__(self, workload: str):
+        self.workload = workload
+        self._in_flight = MONGO_IN_FLIGHT.labels(workload)
+        self._latencies: Dict[str, _HistogramValue] = {}
+
+    def _latency(self, command_name: str) -> _HistogramValue:
+        latency = self._latencies.get(command_name)
+        if latency is None:
+            latency = self._latencies[command_name] = MONGO_LATENCY.labels(self.workload, command_name)
+        return latency
+
+    def started(self, event):
+        self._in_flight.inc()
+
+    def succeeded(self, event):
+        self._in_flight.dec()
+        self._latency(event.command_name).observe(event.duration_micros / 1e6)
+
+    def failed(self, event):
+        self._in_flight.dec()
+        self._latency(event.command_name).observe(event.duration_micros / 1e6)
+        MONGO_FAILURES.labels(self.workload, event.command_name).inc()
+
+
+# ==================== OUTBOUND ====================
+
+class _OutboundTracker:
+    __slots__ = ("latency", "failures", "in_flight")
+
+    def __init__(self, service: str):
+        self.latency = OUTBOUND_LATENCY.labels(service)
+        self.failures = OUTBOUND_FAILURES.labels(service)
+        self.in_flight = OUTBOUND_IN_FLIGHT.labels(service)
+
+    @contextmanager
+    def track(self):
+        self.in_flight.inc()
+        start = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            self.failures.inc()
+            raise
+        finally:
+            self.in_flight.dec()
+            self.latency.observe(time.perf_counter() - start)
+
+
+_outbound: Dict[str, _OutboundTracker] = {}
+
+
+def _tracker(service: str) -> _OutboundTracker:
+    tracker = _outbound.get(service)
+    if tracker is None:
+        tracker = _outbound[service] = _OutboundTracker(service)
+    return tracker
+
+
+def outbound_call(service: str):
+    """Time a block that talks to a third party (for non-httpx clients such as smtplib)"""
+    return _tracker(service).track()
+
+
+class _InstrumentedTransport(httpx.AsyncBaseTransport):
+    """Times each request up to response headers; streamed bodies are the caller's time"""
+
+    def __init__(self, service: str, transport: httpx.AsyncBaseTransport):
+        self._tracker = _tracker(service)
+        self._transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        with self._tracker.track():
+            response = await self._transport.handle_async_request(request)
+        if response.status_code >= 500:
+            self._tracker.failures.inc()
+        return response
+
+    async def aclose(self):
+        await self._transport.aclose()
+
+
+def http_transport(service: str, transport: Optional[httpx.AsyncBaseTransport] = None) -> httpx.AsyncBaseTransport:
+    """Transport for `httpx.AsyncClient(transport=...)` that records calls under `service`"""
+    return _InstrumentedTransport(service, transport or httpx.AsyncHTTPTransport())
+
+
+# ==================== BACKGROUND TASKS ====================
+
+@contextmanager
+def task_run(task: str):
+    """Wrap one run of a scheduled job"""
+    start = time.perf_counter()
+    token = _current.set(f"task:{task}")
+    try:
+        yield
+    except asyncio.CancelledError:
+        raise
+    except BaseException:
+        TASK_RUNS.labels(task, "failure").inc()
+        raise
+    else:
+        TASK_RUNS.labels(task, "success").inc()
+        TASK_LAST_SUCCESS.labels(task).set(time.time())
+    finally:
+        _current.reset(token)
+        TASK_DURATION.labels(task).observe(time.perf_counter() - start)
+
+
+def scrape() -> bytes:
+    """Render everything, then reset the per-scrape maximum"""
+    body = render()
+    LOOP_LAG_MAX.set(0.0)
+    return body
@@ -12,6 +12,8 @@ from pathlib import Path
 from dotenv import load_dotenv
 from datetime import datetime, timezone
 
+import metrics
+
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
@@ -22,6 +24,7 @@ SMTP_HOST = os.environ.get("SMTP_HOST", "smtp.gmail.com")
 SMTP_PORT = int(os.environ.get("SMTP_PORT", "587"))
 SMTP_USER = os.environ.get("SMTP_USER", "")
 SMTP_PASSWORD = os.environ.get("SMTP_PASSWORD", "")
+SMTP_STARTTLS = os.environ.get("SMTP_STARTTLS", "true").lower() != "false"
 SMTP_FROM_EMAIL = os.environ.get("SMTP_FROM_EMAIL", "gameshopnepal.buy@gmail.com")
 SMTP_FROM_NAME = os.environ.get("SMTP_FROM_NAME", "GameShop Nepal")
 
@@ -355,9 +358,13 @@ def send_newsletter(to_emails: List[str], subject: str, html_body: str) -> Dict:
     failed_emails = []
     
     try:
-        with smtplib.SMTP(SMTP_HOST, SMTP_PORT) as server:
-            server.starttls()
-            server.login(SMTP_USER, SMTP_PASSWORD)
+        with metrics.outbound_call(metrics.SMTP):
+            server = smtplib.SMTP(SMTP_HOST, SMTP_PORT)
+        with server:
+            with metrics.outbound_call(metrics.SMTP):
+                if SMTP_STARTTLS:
+                    server.starttls()
+                server.login(SMTP_USER, SMTP_PASSWORD)
             
             for email in to_emails:
                 try:
@@ -367,7 +374,8 @@ def send_newsletter(to_emails: List[str], subject: str, html_body: str) -> Dict:
                     msg["To"] = email
                     msg.attach(MIMEText(html_body, "html"))
                     
-                    server.send_message(msg)
+                    with metrics.outbound_call(metrics.SMTP):
+                        server.send_message(msg)
                     sent_count += 1
                     logger.info(f"Newsletter sent to {email}")
                 except Exception as e:
@@ -0,0 +1,208 @@
+"""
+Hot/cold order tiering
+Finished orders (completed or cancelled) older than ARCHIVE_AFTER_DAYS are
+moved out of `orders` into `orders_archive` in compact form, with any legacy
+`order_status_history` entries folded into the embedded history. The hot
+collection keeps only the working set; the read helpers here fall through to
+the archive so tracking, invoices and customer history keep working, and the
+aggregate/count helpers span both tiers for all-time analytics.
+
+Run directly to archive everything that is due:
+    python order_archive.py
+"""
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import List, Optional
+
+from dotenv import load_dotenv
+from pymongo import ReplaceOne
+
+from database import with_retry
+from metrics import task_run
+from order_timeline import ORDER_STATUS_HISTORY_LIMIT, lookup_keys_for
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_AFTER_DAYS = int(os.environ.get("ORDER_ARCHIVE_AFTER_DAYS", "180"))
+# Seconds between scheduled runs; 0 disables the background job
+ARCHIVE_INTERVAL = int(os.environ.get("ORDER_ARCHIVE_INTERVAL", "3600"))
+ARCHIVE_BATCH_SIZE = 500
+
+# Statuses are stored as typed by admins, so match the usual spellings exactly
+# (an exact $in stays on the (status, created_at) index, a regex would not)
+ARCHIVABLE_STATUSES = [
+    variant
+    for status in ("completed", "delivered", "cancelled", "canceled")
+    for variant in (status, status.capitalize(), status.upper())
+]
+
+# Only meaningful while an order is in flight
+EPHEMERAL_FIELDS = ("credits_pending", "payment_screenshot_pending")
+
+
+def compact_order(order: dict, legacy_history: Optional[List[dict]] = None) -> dict:
+    """Archive form: no empty fields, no duplicate total, full history embedded"""
+    compact = {
+        key: value for key, value in order.items()
+        if key != "_id" and key not in EPHEMERAL_FIELDS and value not in (None, "", [])
+    }
+    if compact.get("total") == compact.get("total_amount"):
+        compact.pop("total", None)
+
+    history = list(order.get("status_history") or [])
+    if legacy_history:
+        known = {entry.get("id") for entry in history}
+        history = sorted(
+            history + [entry for entry in legacy_history if entry.get("id") not in known],
+            key=lambda entry: entry.get("created_at") or ""
+        )
+    compact["status_history"] = history[-ORDER_STATUS_HISTORY_LIMIT:]
+    compact["lookup_keys"] = order.get("lookup_keys") or lookup_keys_for(order)
+    compact["archived_at"] = datetime.now(timezone.utc).isoformat()
+    return compact
+
+
+def expand_order(order: Optional[dict]) -> Optional[dict]:
+    """Give an archived order back the shape readers of `orders` expect"""
+    if order is None:
+        return None
+    if "total_amount" in order:
+        order.setdefault("total", order["total_amount"])
+    order.setdefault("status_history", [])
+    return order
+
+
+async def move_to_archive(db, orders: List[dict]) -> List[str]:
+    """
+    Copy full order documents into the archive, then drop the hot copies.
+    The copy is an upsert keyed by id, so a run that dies between the two
+    steps is finished by the next one.
+    """
+    if not orders:
+        return []
+    order_ids = [order["id"] for order in orders]
+
+    legacy = {}
+    async for entry in db.order_status_history.find({"order_id": {"$in": order_ids}}, {"_id": 0}):
+        legacy.setdefault(entry["order_id"], []).append(entry)
+
+    operations = [
+        ReplaceOne({"id": order["id"]}, compact_order(order, legacy.get(order["id"])), upsert=True)
+        for order in orders
+    ]
+    await with_retry(lambda: db.orders_archive.bulk_write(operations, ordered=False), description="order archive copy")
+    await db.orders.delete_many({"id": {"$in": order_ids}})
+    await db.order_status_history.delete_many({"order_id": {"$in": order_ids}})
+    return order_ids
+
+
+async def archive_old_orders(db, older_than_days: int = ARCHIVE_AFTER_DAYS,
+                             batch_size: int = ARCHIVE_BATCH_SIZE) -> int:
+    """Archive finished orders older than the cutoff, one batch at a time"""
+    cutoff = (datetime.now(timezone.utc) - timedelta(days=older_than_days)).isoformat()
+    query = {"status": {"$in": ARCHIVABLE_STATUSES}, "created_at": {"$lt": cutoff}}
+
+    archived = 0
+    while True:
+        batch = await db.orders.find(query, {"_id": 0}).sort("created_at", 1).to_list(batch_size)
+        if not batch:
+            break
+        archived += len(await move_to_archive(db, batch))
+        if len(batch) < batch_size:
+            break
+        # Let request handlers in between batches
+        await asyncio.sleep(0)
+
+    if archived:
+        logger.info(f"📦 Archived {archived} orders older than {older_than_days} days")
+    return archived
+
+
+async def run_archive_task(db):
+    """Scheduled archival of finished orders"""
+    if ARCHIVE_INTERVAL <= 0:
+        return
+    while True:
+        try:
+            with task_run("order_archive"):
+                await archive_old_orders(db)
+        except Exception as e:
+            logger.error(f"Error in order archive task: {e}")
+        await asyncio.sleep(ARCHIVE_INTERVAL)
+
+
+async def find_order_with_collection(db, query: dict, projection: Optional[dict] = None):
+    """(order, the collection holding it) - for writes that must go to the order's own tier"""
+    projection = projection or {"_id": 0}
+    order = await db.orders.find_one(query, projection)
+    if order is not None:
+        return order, db.orders
+    order = expand_order(await db.orders_archive.find_one(query, projection))
+    return order, db.orders_archive if order is not None else None
+
+
+async def find_order(db, query: dict, projection: Optional[dict] = None) -> Optional[dict]:
+    """find_one on the hot orders, falling through to the archive"""
+    order, _ = await find_order_with_collection(db, query, projection)
+    return order
+
+
+async def find_orders(db, query: dict, projection: Optional[dict] = None, limit: int = 100) -> List[dict]:
+    """Newest-first orders from both tiers, up to limit"""
+    projection = projection or {"_id": 0}
+    orders = await db.orders.find(query, projection).sort("created_at", -1).to_list(limit)
+    if len(orders) < limit:
+        archived = await db.orders_archive.find(query, projection).sort("created_at", -1).to_list(limit - len(orders))
+        # The tiers overlap in time (an old order that is still open stays hot),
+        # so merge by date rather than append
+        orders = sorted(
+            orders + [expand_order(order) for order in archived],
+            key=lambda order: order.get("created_at") or "",
+            reverse=True
+        )
+    return orders
+
+
+async def aggregate_tiers(db, pipeline: list, length: Optional[int] = None) -> List[dict]:
+    """Run one pipeline over the hot and archived orders; groups come back per tier for the caller to merge"""
+    hot, archived = await asyncio.gather(
+        db.orders.aggregate(pipeline).to_list(length),
+        db.orders_archive.aggregate(pipeline).to_list(length),
+    )
+    return hot + archived
+
+
+async def count_tiers(db, query: dict) -> int:
+    hot, archived = await asyncio.gather(db.orders.count_documents(query), db.orders_archive.count_documents(query))
+    return hot + archived
+
+
+async def ensure_archive_indexes(db):
+    await db.orders.create_index([("status", 1), ("created_at", 1)])
+    await db.orders_archive.create_index("id", unique=True)
+    await db.orders_archive.create_index("lookup_keys")
+    await db.orders_archive.create_index([("customer_email", 1), ("created_at", -1)])
+    await db.orders_archive.create_index("customer_phone")
+    # All-time analytics read the archive with the same filters as the hot orders
+    await db.orders_archive.create_index([("status", 1), ("created_at", 1)])
+    await db.orders_archive.create_index("created_at")
+
+
+async def main():
+    from database import ADMIN, close_clients, get_db
+
+    load_dotenv(Path(__file__).parent / '.env')
+    db = get_db(ADMIN)
+
+    print(f"📦 Archiving finished orders older than {ARCHIVE_AFTER_DAYS} days...")
+    await ensure_archive_indexes(db)
+    archived = await archive_old_orders(db)
+    print(f"✅ Archived {archived} orders")
+    close_clients()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,144 @@
+"""
+Bulk Order Operations
+Deletes or archives many orders with one `$in` operation per collection per
+chunk, cascading to the records that hang off an order, and reports a result
+per requested id. Deletes reach archived orders too; archiving an order that
+is already archived reports it as archived.
+"""
+import logging
+from typing import Dict, List
+
+import customer_stats
+import order_archive
+
+logger = logging.getLogger(__name__)
+
+# Bounded so a huge selection never builds a giant $in or holds every order in memory
+BULK_CHUNK_SIZE = 500
+
+DELETED = "deleted"
+ARCHIVED = "archived"
+NOT_FOUND = "not_found"
+FAILED = "failed"
+
+# Everything needed to undo an order's side effects
+CASCADE_PROJECTION = {
+    "_id": 0, "id": 1, "customer_email": 1, "customer_phone": 1,
+    "total_amount": 1, "total": 1, "status": 1
+}
+
+
+def _chunks(ids: List[str], size: int):
+    for start in range(0, len(ids), size):
+        yield ids[start:start + size]
+
+
+def _mark_missing(order_ids: List[str], found: List[str], results: Dict[str, str]):
+    found_set = set(found)
+    for order_id in order_ids:
+        if order_id not in found_set:
+            results[order_id] = NOT_FOUND
+
+
+async def _release_promo_usage(db, order_ids: List[str]):
+    """Delete promo usage records for the orders and give the uses back to their codes"""
+    released = {}
+    async for usage in db.promo_usage.aggregate([
+        {"$match": {"order_id": {"$in": order_ids}}},
+        {"$group": {"_id": "$promo_code", "count": {"$sum": 1}}}
+    ]):
+        if usage["_id"]:
+            released[usage["_id"]] = usage["count"]
+
+    await db.promo_usage.delete_many({"order_id": {"$in": order_ids}})
+    for code, count in released.items():
+        await db.promo_codes.update_one({"code": code}, {"$inc": {"used_count": -count}})
+
+
+async def _delete_chunk(db, order_ids: List[str], results: Dict[str, str]):
+    hot = await db.orders.find({"id": {"$in": order_ids}}, CASCADE_PROJECTION).to_list(len(order_ids))
+    hot_ids = [order["id"] for order in hot]
+    hot_set = set(hot_ids)
+    remaining = [order_id for order_id in order_ids if order_id not in hot_set]
+    archived = []
+    # Ids not in the hot collection may have been archived
+    if remaining:
+        archived = await db.orders_archive.find(
+            {"id": {"$in": remaining}}, CASCADE_PROJECTION
+        ).to_list(len(remaining))
+    orders = hot + archived
+    found = [order["id"] for order in orders]
+    _mark_missing(order_ids, found, results)
+    if not found:
+        return
+
+    if hot_ids:
+        await db.orders.delete_many({"id": {"$in": hot_ids}})
+    if archived:
+        await db.orders_archive.delete_many({"id": {"$in": [order["id"] for order in archived]}})
+
+    # Only reported deleted once everything hanging off them is undone too
+    try:
+        await db.order_status_history.delete_many({"order_id": {"$in": found}})
+        await db.invoice_artifacts.delete_many({"order_id": {"$in": found}})
+        await _release_promo_usage(db, found)
+        await customer_stats.record_orders_removed(db, orders)
+    except Exception as e:
+        logger.error(
+            f"Orders deleted but their cleanup failed ({e}); promo counts and customer stats "
+            f"may be off until the next rebuild: {', '.join(found)}"
+        )
+        raise
+
+    for order_id in found:
+        results[order_id] = DELETED
+
+
+async def _archive_chunk(db, order_ids: List[str], results: Dict[str, str]):
+    orders = await db.orders.find({"id": {"$in": order_ids}}, {"_id": 0}).to_list(len(order_ids))
+    found = [order["id"] for order in orders]
+    found_set = set(found)
+    remaining = [order_id for order_id in order_ids if order_id not in found_set]
+    already_archived = await db.orders_archive.distinct("id", {"id": {"$in": remaining}}) if remaining else []
+    _mark_missing(order_ids, found + already_archived, results)
+    for order_id in already_archived:
+        results[order_id] = ARCHIVED
+    if not found:
+        return
+
+    # Archived orders still count toward customer stats and promo limits,
+    # so only the hot copies are removed
+    await order_archive.move_to_archive(db, orders)
+
+    for order_id in found:
+        results[order_id] = ARCHIVED
+
+
+async def bulk_order_operation(db, order_ids: List[str], archive: bool = False,
+                               chunk_size: int = BULK_CHUNK_SIZE) -> Dict[str, str]:
+    """
+    Delete (or archive) orders in chunks. Returns {order_id: result}; a chunk
+    that fails marks its ids as failed and the remaining chunks still run.
+    """
+    unique_ids = list(dict.fromkeys(order_ids))
+    results: Dict[str, str] = {}
+    apply_chunk = _archive_chunk if archive else _delete_chunk
+
+    for chunk in _chunks(unique_ids, chunk_size):
+        try:
+            await apply_chunk(db, chunk, results)
+        except Exception as e:
+            logger.error(f"Bulk order {'archive' if archive else 'delete'} failed for {len(chunk)} orders: {e}")
+            for order_id in chunk:
+                if order_id not in results:
+                    results[order_id] = FAILED
+
+    return {order_id: results[order_id] for order_id in unique_ids}
+
+
+async def delete_orders(db, order_ids: List[str]) -> Dict[str, str]:
+    return await bulk_order_operation(db, order_ids)
+
+
+async def archive_orders(db, order_ids: List[str]) -> Dict[str, str]:
+    return await bulk_order_operation(db, order_ids, archive=True)
@@ -4,38 +4,44 @@ Background task to auto-delete pending orders after 30 minutes
 import asyncio
 import logging
 from datetime import datetime, timezone, timedelta
-from motor.motor_asyncio import AsyncIOMotorClient
-import os
-from dotenv import load_dotenv
+from customer_stats import record_orders_removed
+from database import with_retry
+from metrics import task_run
 
-load_dotenv()
 logger = logging.getLogger(__name__)
 
-async def cleanup_old_pending_orders():
+async def cleanup_old_pending_orders(db):
     """Delete pending orders older than 30 minutes"""
-    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
-    db = client[os.environ['DB_NAME']]
-    
     # Calculate cutoff time (30 minutes ago)
     cutoff_time = datetime.now(timezone.utc) - timedelta(minutes=30)
     cutoff_time_str = cutoff_time.isoformat()
     
     # Find and delete old pending orders
-    result = await db.orders.delete_many({
-        "status": "pending",
-        "created_at": {"$lt": cutoff_time_str}
-    })
+    expired = await with_retry(
+        lambda: db.orders.find(
+            {"status": "pending", "created_at": {"$lt": cutoff_time_str}},
+            {"_id": 0, "id": 1, "customer_email": 1, "customer_phone": 1, "total_amount": 1, "total": 1, "status": 1}
+        ).to_list(None),
+        description="pending order sweep"
+    )
     
-    if result.deleted_count > 0:
-        logger.info(f"🗑️ Auto-deleted {result.deleted_count} pending orders older than 30 minutes")
+    # Delete one at a time so an order paid in the meantime is neither
+    # deleted nor taken out of the customer's stats
+    deleted = []
+    for order in expired:
+        if await db.orders.find_one_and_delete({"id": order["id"], "status": "pending"}, {"_id": 1}):
+            deleted.append(order)
     
-    client.close()
+    if deleted:
+        await record_orders_removed(db, deleted)
+        logger.info(f"🗑️ Auto-deleted {len(deleted)} pending orders older than 30 minutes")
 
-async def run_cleanup_task():
+async def run_cleanup_task(db):
     """Run cleanup task every 5 minutes"""
     while True:
         try:
-            await cleanup_old_pending_orders()
+            with task_run("order_cleanup"):
+                await cleanup_old_pending_orders(db)
         except Exception as e:
             logger.error(f"Error in cleanup task: {e}")
         
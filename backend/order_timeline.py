@@ -0,0 +1,123 @@
+"""
+Embedded order status timeline
+Orders carry their own bounded `status_history` and a `lookup_keys` array
+(internal id + Take.app id/number) so public tracking is one indexed read.
+
+Existing orders are migrated in the background at startup; to run the
+migration by hand:
+    python order_timeline.py
+"""
+import asyncio
+import logging
+from pathlib import Path
+from typing import Optional
+
+from dotenv import load_dotenv
+from pymongo import UpdateOne
+
+logger = logging.getLogger(__name__)
+
+# Same cap the old order_status_history reads used
+ORDER_STATUS_HISTORY_LIMIT = 50
+
+MIGRATION_BATCH_SIZE = 500
+
+# Set once every order has lookup_keys; until then tracking also tries the old lookup
+backfill_done = False
+
+
+def lookup_keys_for(order: dict) -> list:
+    """Every identifier a customer might use to track this order"""
+    keys = [order.get("id"), order.get("takeapp_order_id"), order.get("takeapp_order_number")]
+    return list(dict.fromkeys(str(k) for k in keys if k))
+
+
+def push_status_history(entry: dict) -> dict:
+    """$push spec that appends a status entry and keeps only the newest entries"""
+    return {"status_history": {"$each": [entry], "$slice": -ORDER_STATUS_HISTORY_LIMIT}}
+
+
+async def ensure_order_timeline_indexes(db):
+    await db.orders.create_index("lookup_keys")
+    await db.orders.create_index("id")
+
+
+async def migrate_order_timeline(db, batch_size: int = MIGRATION_BATCH_SIZE) -> int:
+    """Fold order_status_history into orders and backfill lookup_keys (idempotent)"""
+    migrated = 0
+    cursor = db.orders.find(
+        {"$or": [{"lookup_keys": {"$exists": False}}, {"status_history": {"$exists": False}}]},
+        {"_id": 0, "id": 1, "takeapp_order_id": 1, "takeapp_order_number": 1, "status_history": 1}
+    ).batch_size(batch_size)
+
+    batch = []
+    async for order in cursor:
+        if order.get("id"):
+            batch.append(order)
+        if len(batch) >= batch_size:
+            migrated += await _migrate_batch(db, batch)
+            batch = []
+    if batch:
+        migrated += await _migrate_batch(db, batch)
+
+    return migrated
+
+
+def merge_history(embedded: Optional[list], legacy: Optional[list]) -> list:
+    """Embedded entries (pushed since the switch) plus legacy ones not already there, oldest first"""
+    history = list(embedded or [])
+    known = {entry.get("id") for entry in history}
+    history += [entry for entry in legacy or [] if entry.get("id") not in known]
+    history.sort(key=lambda entry: entry.get("created_at") or "")
+    return history[-ORDER_STATUS_HISTORY_LIMIT:]
+
+
+async def _migrate_batch(db, orders: list) -> int:
+    order_ids = [o["id"] for o in orders]
+    histories = {}
+    async for entry in db.order_status_history.find(
+        {"order_id": {"$in": order_ids}}, {"_id": 0}
+    ).sort("created_at", 1):
+        histories.setdefault(entry["order_id"], []).append(entry)
+
+    operations = [
+        UpdateOne(
+            {"id": order["id"]},
+            {"$set": {
+                "lookup_keys": lookup_keys_for(order),
+                "status_history": merge_history(order.get("status_history"), histories.get(order["id"]))
+            }}
+        )
+        for order in orders
+    ]
+    result = await db.orders.bulk_write(operations, ordered=False)
+    return result.modified_count
+
+
+async def run_startup_migration(db):
+    """Backfill orders written before the embedded timeline; a no-op once done"""
+    global backfill_done
+    try:
+        migrated = await migrate_order_timeline(db)
+        backfill_done = True
+        if migrated:
+            logger.info(f"Migrated {migrated} orders to the embedded status timeline")
+    except Exception as e:
+        logger.error(f"Order timeline migration failed: {e}")
+
+
+async def main():
+    from database import ADMIN, close_clients, get_db
+
+    load_dotenv(Path(__file__).parent / '.env')
+    db = get_db(ADMIN)
+
+    print("🔄 Migrating order status history into orders...")
+    await ensure_order_timeline_indexes(db)
+    migrated = await migrate_order_timeline(db)
+    print(f"✅ Migrated {migrated} orders")
+    close_clients()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
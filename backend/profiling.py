@@ -0,0 +1,389 @@
+"""
+On-demand Profiling
+Admin-only CPU and memory profiling that costs nothing until it is used.
+
+CPU - a sampling profiler: a thread that exists only while a profile is
+running reads the interpreter stacks every PROFILE_SAMPLE_INTERVAL and
+aggregates them into folded stacks (`frame;frame;frame count`), the input
+format of flamegraph.pl, speedscope and friends.
+
+    Single request  send `X-Profile-Token` (from POST /api/admin/profiling/token,
+                    an HMAC-signed expiry) with any request. Only samples in
+                    which that request is on the loop thread's stack count,
+                    so concurrent traffic doesn't leak into its profile. The
+                    response carries `X-Profile-Id`.
+    Window          POST /api/admin/profiling/cpu?seconds=N samples the event
+                    loop (or every thread) for N seconds.
+
+Memory - tracemalloc is off unless started from the admin endpoints;
+snapshots are grouped by module and diffed against the previous snapshot.
+"""
+import asyncio
+import hashlib
+import hmac
+import os
+import secrets
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import Counter, deque
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import metrics
+
+PROFILE_HEADER = b"x-profile-token"
+PROFILE_ID_HEADER = b"x-profile-id"
+# Tokens are only valid on processes that share the secret; without one each
+# process signs with its own random key
+PROFILING_SECRET = (os.environ.get("PROFILING_SECRET") or secrets.token_hex(32)).encode()
+PROFILE_SAMPLE_INTERVAL = float(os.environ.get("PROFILE_SAMPLE_INTERVAL", "0.005"))
+MAX_TOKEN_MINUTES = 60
+MAX_WINDOW_SECONDS = 120
+MAX_ACTIVE_SESSIONS = 4
+MAX_STACK_DEPTH = 256
+RECENT_REPORTS = 20
+
+ROOT_DIR = Path(__file__).parent
+BACKGROUND_THREAD_PREFIX = "profiler"
+
+
+# ==================== TOKENS ====================
+
+def _signature(expires: int) -> str:
+    return hmac.new(PROFILING_SECRET, f"profile:{expires}".encode(), hashlib.sha256).hexdigest()
+
+
+def issue_token(minutes: int) -> Tuple[str, datetime]:
+    expires = int(time.time()) + 60 * max(1, min(minutes, MAX_TOKEN_MINUTES))
+    return f"{expires}.{_signature(expires)}", datetime.fromtimestamp(expires, timezone.utc)
+
+
+def verify_token(token: str) -> bool:
+    expires, _, signature = token.partition(".")
+    if not expires.isdigit() or int(expires) < time.time():
+        return False
+    return hmac.compare_digest(signature, _signature(int(expires)))
+
+
+# ==================== CPU ====================
+
+def _frame_label(code) -> str:
+    return f"{code.co_qualname} ({Path(code.co_filename).name}:{code.co_firstlineno})"
+
+
+class ProfileReport:
+    def __init__(self, kind: str, label: str):
+        self.id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.label = label
+        self.started_at = datetime.now(timezone.utc).isoformat()
+        self._start = time.perf_counter()
+        self.duration_ms = 0.0
+        # Tuple of code objects (root first) -> samples
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.idle_samples = 0
+        self.finished = False
+
+    def finish(self):
+        self.duration_ms = round((time.perf_counter() - self._start) * 1000, 1)
+        self.finished = True
+
+    def folded(self) -> str:
+        """Brendan Gregg's collapsed-stack format"""
+        lines = [
+            ";".join(label if isinstance(label, str) else _frame_label(label) for label in stack) + f" {count}"
+            for stack, count in self.stacks.most_common()
+        ]
+        return "\n".join(lines) + "\n"
+
+    def top_functions(self, limit: int = 15) -> List[dict]:
+        """Where samples landed (self time), most first"""
+        leaves: Counter = Counter()
+        for stack, count in self.stacks.items():
+            leaf = stack[-1]
+            leaves[leaf if isinstance(leaf, str) else _frame_label(leaf)] += count
+        return [
+            {"function": name, "samples": count, "percent": round(100 * count / self.samples, 1)}
+            for name, count in leaves.most_common(limit)
+        ] if self.samples else []
+
+    def summary(self) -> dict:
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "label": self.label,
+            "started_at": self.started_at,
+            "duration_ms": self.duration_ms,
+            "finished": self.finished,
+            "samples": self.samples,
+            "idle_samples": self.idle_samples,
+            "sample_interval_ms": PROFILE_SAMPLE_INTERVAL * 1000,
+            "top_functions": self.top_functions(),
+        }
+
+
+def _stack(frame, stop=None) -> Optional[tuple]:
+    """Code objects from `stop` (or the root) down to `frame`; None if `stop` is not on the stack"""
+    codes = []
+    while frame is not None and len(codes) < MAX_STACK_DEPTH:
+        codes.append(frame.f_code)
+        if frame is stop:
+            break
+        frame = frame.f_back
+    else:
+        if stop is not None:
+            return None
+    codes.reverse()
+    return tuple(codes)
+
+
+class _RequestSession:
+    """Samples taken while one request's middleware frame is on the loop stack"""
+
+    def __init__(self, anchor, report: ProfileReport):
+        self.anchor = anchor
+        self.report = report
+
+    def sample(self, frames: Dict[int, object], loop_thread_id: int):
+        stack = _stack(frames.get(loop_thread_id), stop=self.anchor)
+        if stack is None:
+            # Suspended on I/O (or another request holds the loop)
+            self.report.idle_samples += 1
+        else:
+            self.report.stacks[stack] += 1
+            self.report.samples += 1
+
+
+class _WindowSession:
+    """Everything on the loop thread (or every thread) until the deadline"""
+
+    def __init__(self, seconds: float, all_threads: bool, report: ProfileReport):
+        self.deadline = time.monotonic() + seconds
+        self.all_threads = all_threads
+        self.report = report
+
+    def sample(self, frames: Dict[int, object], loop_thread_id: int):
+        if self.all_threads:
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            targets = [
+                (thread_id, "event-loop" if thread_id == loop_thread_id else names.get(thread_id, str(thread_id)))
+                for thread_id in frames
+            ]
+        else:
+            targets = [(loop_thread_id, "event-loop")]
+
+        for thread_id, name in targets:
+            if name.startswith(BACKGROUND_THREAD_PREFIX):
+                continue
+            stack = _stack(frames.get(thread_id))
+            if not stack:
+                continue
+            # The loop waiting in select() is idle, not CPU
+            if thread_id == loop_thread_id and stack[-1].co_name == "select":
+                self.report.idle_samples += 1
+                continue
+            self.report.stacks[(name,) + stack] += 1
+            self.report.samples += 1
+
+
+class CPUProfiler:
+    def __init__(self, interval: float = PROFILE_SAMPLE_INTERVAL):
+        self.interval = interval
+        self.reports = deque(maxlen=RECENT_REPORTS)
+        self._sessions: List[object] = []
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._loop_thread_id: Optional[int] = None
+
+    @property
+    def active(self) -> int:
+        return len(self._sessions)
+
+    def _add(self, session) -> bool:
+        with self._lock:
+            if len(self._sessions) >= MAX_ACTIVE_SESSIONS:
+                return False
+            self._loop_thread_id = threading.get_ident()
+            self._sessions.append(session)
+            self.reports.append(session.report)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=f"{BACKGROUND_THREAD_PREFIX}-sampler", daemon=True)
+                self._thread.start()
+        return True
+
+    def _remove(self, session):
+        with self._lock:
+            if session in self._sessions:
+                self._sessions.remove(session)
+        session.report.finish()
+
+    def _run(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                expired = [s for s in self._sessions if isinstance(s, _WindowSession) and now >= s.deadline]
+                for session in expired:
+                    self._sessions.remove(session)
+                    session.report.finish()
+                if not self._sessions:
+                    self._thread = None
+                    return
+                sessions = list(self._sessions)
+            frames = sys._current_frames()
+            for session in sessions:
+                session.sample(frames, self._loop_thread_id)
+            del frames
+            time.sleep(self.interval)
+
+    def start_window(self, seconds: float, all_threads: bool = False) -> Optional[ProfileReport]:
+        seconds = max(0.1, min(seconds, MAX_WINDOW_SECONDS))
+        label = f"window {seconds:g}s" + (" all threads" if all_threads else "")
+        session = _WindowSession(seconds, all_threads, ProfileReport("window", label))
+        return session.report if self._add(session) else None
+
+    def get(self, report_id: str) -> Optional[ProfileReport]:
+        return next((report for report in self.reports if report.id == report_id), None)
+
+
+cpu_profiler = CPUProfiler()
+
+
+class ProfilingMiddleware:
+    """Profiles requests that carry a valid X-Profile-Token; a header scan otherwise"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        token = None
+        for name, value in scope["headers"]:
+            if name == PROFILE_HEADER:
+                token = value.decode("latin-1")
+                break
+        if token is None or not verify_token(token):
+            await self.app(scope, receive, send)
+            return
+
+        report = ProfileReport("request", f"{scope['method']} {scope['path']}")
+        # This coroutine's frame stays on the loop stack for the whole request
+        session = _RequestSession(sys._getframe(), report)
+        if not cpu_profiler._add(session):
+            await self.app(scope, receive, send)
+            return
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [(PROFILE_ID_HEADER, report.id.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            cpu_profiler._remove(session)
+            report.label = f"{scope['method']} {metrics.route_template(scope)}"
+
+
+# ==================== MEMORY ====================
+
+def _module_for(filename: str) -> str:
+    """`server`, `motor.core`, `<frozen ...>` - whatever locates the allocation best"""
+    path = Path(filename)
+    for marker in ("site-packages", "dist-packages"):
+        if marker in path.parts:
+            parts = path.parts[path.parts.index(marker) + 1:]
+            return ".".join(parts).removesuffix(".py").removesuffix(".__init__")
+    try:
+        return ".".join(path.relative_to(ROOT_DIR).with_suffix("").parts)
+    except ValueError:
+        return path.stem if path.suffix == ".py" else filename
+
+
+def _group_by_module(stats) -> List[dict]:
+    modules: Dict[str, List[int]] = {}
+    for stat in stats:
+        size_diff = getattr(stat, "size_diff", stat.size)
+        count_diff = getattr(stat, "count_diff", stat.count)
+        entry = modules.setdefault(_module_for(stat.traceback[0].filename), [0, 0, 0, 0])
+        entry[0] += stat.size
+        entry[1] += stat.count
+        entry[2] += size_diff
+        entry[3] += count_diff
+    return [
+        {"module": module, "size_kb": round(size / 1024, 1), "count": count,
+         "size_diff_kb": round(size_diff / 1024, 1), "count_diff": count_diff}
+        for module, (size, count, size_diff, count_diff) in modules.items()
+    ]
+
+
+class MemoryProfiler:
+    def __init__(self):
+        self._previous: Optional[tracemalloc.Snapshot] = None
+        self._lock = asyncio.Lock()
+
+    @property
+    def running(self) -> bool:
+        return tracemalloc.is_tracing()
+
+    def start(self, frames: int = 1):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(max(1, min(frames, 25)))
+            self._previous = None
+
+    def stop(self):
+        tracemalloc.stop()
+        self._previous = None
+
+    def _snapshot(self) -> tracemalloc.Snapshot:
+        return tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            tracemalloc.Filter(False, "<unknown>"),
+        ))
+
+    def _report(self, diff: bool, limit: int, group_by: str) -> dict:
+        snapshot = self._snapshot()
+        previous = self._previous
+        self._previous = snapshot
+        key_type = "filename" if group_by == "module" else "lineno"
+        if diff and previous is not None:
+            stats = snapshot.compare_to(previous, key_type)
+            sort_key = lambda entry: abs(entry.get("size_diff_kb", 0))  # noqa: E731
+        else:
+            stats = snapshot.statistics(key_type)
+            sort_key = lambda entry: entry["size_kb"]  # noqa: E731
+
+        if group_by == "module":
+            entries = _group_by_module(stats)
+        else:
+            entries = [
+                {"location": f"{_module_for(stat.traceback[0].filename)}:{stat.traceback[0].lineno}",
+                 "size_kb": round(stat.size / 1024, 1), "count": stat.count,
+                 "size_diff_kb": round(getattr(stat, "size_diff", stat.size) / 1024, 1),
+                 "count_diff": getattr(stat, "count_diff", stat.count)}
+                for stat in stats
+            ]
+        entries.sort(key=sort_key, reverse=True)
+        current, peak = tracemalloc.get_traced_memory()
+        return {
+            "compared_to_previous": diff and previous is not None,
+            "traced_kb": round(current / 1024, 1),
+            "peak_kb": round(peak / 1024, 1),
+            "taken_at": datetime.now(timezone.utc).isoformat(),
+            "entries": entries[:limit],
+        }
+
+    async def report(self, diff: bool = False, limit: int = 25, group_by: str = "module") -> dict:
+        """Snapshot (off the loop) and summarise; the snapshot becomes the next diff's baseline"""
+        async with self._lock:
+            return await asyncio.to_thread(self._report, diff, limit, group_by)
+
+
+memory_profiler = MemoryProfiler()
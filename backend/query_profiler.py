@@ -0,0 +1,307 @@
+"""
+Slow Query Profiler
+A pymongo CommandListener that records every find / aggregate / count /
+distinct / update / delete / findAndModify slower than SLOW_QUERY_MS. Commands
+are grouped by normalized shape (collection + filter/sort/pipeline with the
+values replaced by "?"), together with the routes that issued them.
+
+The first time a shape turns up slow, its command is explained in the
+background (queryPlanner verbosity, so nothing is re-run) and the plan is
+checked for collection scans and in-memory sorts. Only shapes are kept -
+sample values are dropped once the explain has run.
+
+`GET /api/admin/slow-queries` lists the worst shapes by total time.
+"""
+import asyncio
+import json
+import logging
+import os
+import threading
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from pymongo import monitoring
+
+import database
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# 0 disables the profiler (the listener is not registered at all)
+SLOW_QUERY_MS = float(os.environ.get("SLOW_QUERY_MS", "100"))
+MAX_SHAPES = 500
+MAX_ROUTES_PER_SHAPE = 10
+EXPLAIN_TIMEOUT_SECONDS = 5
+
+PROFILED_COMMANDS = frozenset(("find", "aggregate", "count", "distinct", "update", "delete", "findAndModify"))
+
+# Everything else in a command document is transport detail
+COMMAND_FIELDS = {
+    "find": ("filter", "sort", "projection", "hint", "limit", "skip"),
+    "aggregate": ("pipeline", "hint"),
+    "count": ("query", "hint", "limit", "skip"),
+    "distinct": ("key", "query"),
+    "update": ("updates",),
+    "delete": ("deletes",),
+    "findAndModify": ("query", "sort", "update", "remove", "upsert"),
+}
+
+PLACEHOLDER = "?"
+
+
+def normalize(value: Any) -> Any:
+    """Query values become "?"; operators, field names and `$field` references stay"""
+    if isinstance(value, dict):
+        return {key: normalize(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        shapes = []
+        for item in value:
+            shape = normalize(item)
+            if shape not in shapes:
+                shapes.append(shape)
+        return shapes
+    if isinstance(value, str) and value.startswith("$"):
+        return value
+    return PLACEHOLDER
+
+
+def command_shape(command_name: str, command: dict) -> Dict[str, Any]:
+    """The parts of a command that decide its plan, with values stripped"""
+    if command_name == "update":
+        statement = (command.get("updates") or [{}])[0]
+        return {"filter": normalize(statement.get("q", {})), "multi": bool(statement.get("multi"))}
+    if command_name == "delete":
+        statement = (command.get("deletes") or [{}])[0]
+        return {"filter": normalize(statement.get("q", {})), "multi": statement.get("limit") == 0}
+    if command_name == "aggregate":
+        return {"pipeline": [normalize_stage(stage) for stage in command.get("pipeline", [])]}
+
+    shape = {}
+    filter_key = "filter" if command_name == "find" else "query"
+    if command.get(filter_key):
+        shape["filter"] = normalize(command[filter_key])
+    if command.get("sort"):
+        # Sort directions pick the index, so keep them
+        shape["sort"] = dict(command["sort"])
+    if command_name == "distinct":
+        shape["key"] = command.get("key")
+    return shape
+
+
+def normalize_stage(stage: dict) -> dict:
+    """Pipeline stage shape; $sort/$limit/$skip keep their literal spec"""
+    name = next(iter(stage), None)
+    if name in ("$sort", "$limit", "$skip", "$count"):
+        return stage
+    return normalize(stage)
+
+
+def explainable(command_name: str, command: dict) -> dict:
+    """The command with only plan-relevant fields, ready to wrap in `explain`"""
+    body = {command_name: command[command_name]}
+    for field in COMMAND_FIELDS[command_name]:
+        if field in command:
+            body[field] = command[field]
+    if command_name in ("update", "delete"):
+        # explain takes a single statement
+        key = "updates" if command_name == "update" else "deletes"
+        body[key] = list(body.get(key, []))[:1]
+    if command_name == "aggregate":
+        body["cursor"] = {}
+    return body
+
+
+def plan_stages(explain: Any) -> List[dict]:
+    """Every stage of the winning plan(s), wherever this server version nests them"""
+    stages = []
+
+    def walk(node):
+        if isinstance(node, dict):
+            if isinstance(node.get("stage"), str):
+                stages.append(node)
+            for key, value in node.items():
+                if key not in ("rejectedPlans", "allPlansExecution"):
+                    walk(value)
+        elif isinstance(node, list):
+            for item in node:
+                walk(item)
+
+    walk(explain)
+    return stages
+
+
+def summarize_plan(explain: dict) -> dict:
+    stages = plan_stages(explain)
+    names = [stage["stage"] for stage in stages]
+    return {
+        "stages": sorted(set(names)),
+        "collscan": "COLLSCAN" in names,
+        "in_memory_sort": "SORT" in names,
+        "indexes": sorted({stage["indexName"] for stage in stages if stage.get("indexName")}),
+    }
+
+
+class SlowShape:
+    __slots__ = ("key", "database", "collection", "command", "shape", "count", "total_ms", "max_ms",
+                 "first_seen", "last_seen", "routes", "plan", "explain_error")
+
+    def __init__(self, key: str, database: str, collection: str, command: str, shape: dict):
+        self.key = key
+        self.database = database
+        self.collection = collection
+        self.command = command
+        self.shape = shape
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.first_seen = datetime.now(timezone.utc).isoformat()
+        self.last_seen = self.first_seen
+        self.routes: Dict[str, int] = {}
+        self.plan: Optional[dict] = None
+        self.explain_error: Optional[str] = None
+
+    def record(self, duration_ms: float, route: str):
+        self.count += 1
+        self.total_ms += duration_ms
+        self.max_ms = max(self.max_ms, duration_ms)
+        self.last_seen = datetime.now(timezone.utc).isoformat()
+        if route in self.routes or len(self.routes) < MAX_ROUTES_PER_SHAPE:
+            self.routes[route] = self.routes.get(route, 0) + 1
+
+    def to_dict(self) -> dict:
+        return {
+            "collection": self.collection,
+            "command": self.command,
+            "shape": self.shape,
+            "count": self.count,
+            "total_ms": round(self.total_ms, 1),
+            "avg_ms": round(self.total_ms / self.count, 1) if self.count else 0,
+            "max_ms": round(self.max_ms, 1),
+            "first_seen": self.first_seen,
+            "last_seen": self.last_seen,
+            "routes": dict(sorted(self.routes.items(), key=lambda item: -item[1])),
+            "plan": self.plan,
+            "explain_error": self.explain_error,
+        }
+
+
+class QueryProfiler(monitoring.CommandListener):
+    """
+    Listener callbacks run on the driver's threads: they only touch dicts
+    under a lock and hand new shapes to the event loop for explaining.
+    """
+
+    def __init__(self, threshold_ms: float = SLOW_QUERY_MS):
+        self.threshold_ms = threshold_ms
+        self.enabled = threshold_ms > 0
+        # (connection, request id) -> (database, command name, command, route)
+        self._pending: Dict[Tuple[Any, int], tuple] = {}
+        self._shapes: Dict[str, SlowShape] = {}
+        self._lock = threading.Lock()
+        self.dropped = 0
+        self._db = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+
+    # ---- listener ----
+
+    def started(self, event):
+        if event.command_name in PROFILED_COMMANDS:
+            self._pending[(event.connection_id, event.request_id)] = (
+                event.database_name, event.command_name, event.command, metrics.current_route()
+            )
+
+    def succeeded(self, event):
+        pending = self._pending.pop((event.connection_id, event.request_id), None)
+        if pending is not None:
+            duration_ms = event.duration_micros / 1000
+            if duration_ms >= self.threshold_ms:
+                self._record(pending, duration_ms)
+
+    def failed(self, event):
+        self._pending.pop((event.connection_id, event.request_id), None)
+
+    def _record(self, pending: tuple, duration_ms: float):
+        database, command_name, command, route = pending
+        collection = command.get(command_name)
+        if not isinstance(collection, str):
+            collection = f"<{database}>"
+        shape = command_shape(command_name, command)
+        key = json.dumps([database, collection, command_name, shape], sort_keys=True, default=str)
+
+        with self._lock:
+            slow = self._shapes.get(key)
+            is_new = slow is None
+            if is_new:
+                if len(self._shapes) >= MAX_SHAPES:
+                    self.dropped += 1
+                    return
+                slow = self._shapes[key] = SlowShape(key, database, collection, command_name, shape)
+            slow.record(duration_ms, route)
+
+        if is_new:
+            logger.warning(f"🐢 Slow {command_name} on {collection} from {route}: {duration_ms:.0f} ms {shape}")
+            self._schedule_explain(key, explainable(command_name, command))
+
+    # ---- explain ----
+
+    def _schedule_explain(self, key: str, command: dict):
+        if self._loop is None or self._loop.is_closed():
+            return
+        try:
+            self._loop.call_soon_threadsafe(self._queue.put_nowait, (key, command))
+        except RuntimeError:
+            # Loop shutting down
+            pass
+
+    async def run_explain_worker(self, db):
+        """Explain new slow shapes one at a time, off the request path"""
+        if not self.enabled:
+            return
+        self._db = db
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+        while True:
+            key, command = await self._queue.get()
+            slow = self._shapes.get(key)
+            if slow is None:
+                continue
+            try:
+                with database.time_budget(EXPLAIN_TIMEOUT_SECONDS):
+                    explain = await self._db.client[slow.database].command(
+                        {"explain": command, "verbosity": "queryPlanner"}
+                    )
+                slow.plan = summarize_plan(explain)
+                if slow.plan["collscan"] or slow.plan["in_memory_sort"]:
+                    logger.warning(f"🐢 {slow.command} on {slow.collection} plan {slow.plan['stages']}: {slow.shape}")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                slow.explain_error = str(e)
+
+    # ---- report ----
+
+    def report(self, limit: int = 20, sort: str = "total_ms") -> dict:
+        with self._lock:
+            shapes = [shape.to_dict() for shape in self._shapes.values()]
+        shapes.sort(key=lambda shape: shape.get(sort) or 0, reverse=True)
+        return {
+            "threshold_ms": self.threshold_ms,
+            "shapes_tracked": len(shapes),
+            "shapes_dropped": self.dropped,
+            "generated_at": datetime.now(timezone.utc).isoformat(),
+            "shapes": shapes[:limit],
+        }
+
+    def reset(self):
+        with self._lock:
+            self._shapes.clear()
+            self.dropped = 0
+
+
+profiler = QueryProfiler()
+
+
+def listeners() -> list:
+    """Listeners to register on every client (none when profiling is off)"""
+    return [profiler] if profiler.enabled else []
@@ -0,0 +1,226 @@
+"""
+Review Ingestion Service
+Imports Trustpilot reviews with a conditional fetch (ETag / Last-Modified),
+parses the page off the event loop, and upserts everything in one bulk_write
+keyed by a content hash. Also keeps the store-wide rating summary cached for
+the storefront and the SEO schema.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import uuid
+from datetime import datetime, timezone
+from typing import Callable, List, Optional, Tuple
+
+import httpx
+from pymongo import UpdateOne
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+TRUSTPILOT_DOMAIN = os.environ.get("TRUSTPILOT_DOMAIN", "gameshopnepal.com")
+TRUSTPILOT_BASE_URL = os.environ.get("TRUSTPILOT_BASE_URL", "https://www.trustpilot.com").rstrip("/")
+TRUSTPILOT_API_URL = os.environ.get("TRUSTPILOT_API_URL", "https://api.trustpilot.com").rstrip("/")
+TRUSTPILOT_SOURCE = "trustpilot"
+
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+
+JSON_LD_RE = re.compile(r'<script type="application/ld\+json"[^>]*>(.*?)</script>', re.DOTALL)
+NEXT_DATA_RE = re.compile(r'<script id="__NEXT_DATA__"[^>]*>(.*?)</script>', re.DOTALL)
+
+_client: Optional[httpx.AsyncClient] = None
+
+
+def get_client() -> httpx.AsyncClient:
+    """Shared client so repeated syncs reuse connections"""
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(
+            timeout=15.0,
+            headers={"User-Agent": USER_AGENT},
+            transport=metrics.http_transport(metrics.TRUSTPILOT)
+        )
+    return _client
+
+
+async def close_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def content_hash(source: str, reviewer_name: str, comment: str) -> str:
+    """Stable dedupe key for an external review"""
+    normalized = "\x1f".join([source, (reviewer_name or "").strip().lower(), " ".join((comment or "").split())])
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+def parse_trustpilot_html(html: str) -> List[dict]:
+    """Extract reviews from JSON-LD and __NEXT_DATA__ (CPU-bound, run in a thread)"""
+    now = datetime.now(timezone.utc).isoformat()
+    reviews = []
+
+    for match in JSON_LD_RE.findall(html):
+        try:
+            data = json.loads(match)
+        except json.JSONDecodeError:
+            continue
+        if isinstance(data, dict) and data.get("@type") == "LocalBusiness":
+            for review in data.get("review", []):
+                reviews.append({
+                    "reviewer_name": review.get("author", {}).get("name", "Anonymous"),
+                    "rating": int(review.get("reviewRating", {}).get("ratingValue", 5)),
+                    "comment": review.get("reviewBody", ""),
+                    "review_date": review.get("datePublished", now)
+                })
+
+    for match in NEXT_DATA_RE.findall(html):
+        try:
+            data = json.loads(match)
+        except json.JSONDecodeError:
+            continue
+        for review in data.get("props", {}).get("pageProps", {}).get("reviews", []):
+            dates = review.get("dates", {})
+            reviews.append({
+                "reviewer_name": review.get("consumer", {}).get("displayName", "Anonymous"),
+                "rating": int(review.get("rating", 5)),
+                "comment": review.get("text", review.get("title", "")),
+                "review_date": dates.get("publishedDate") or dates.get("experiencedDate") or now
+            })
+
+    return reviews
+
+
+async def fetch_trustpilot_reviews(db) -> Tuple[Optional[List[dict]], dict]:
+    """
+    Fetch and parse the Trustpilot page. Returns the reviews (None when the
+    page is unchanged since the last fetch, 304) and the page's validators,
+    for save_page_validators once the reviews are stored.
+    """
+    validators = await db.trustpilot_config.find_one({"key": "page_validators"}) or {}
+    headers = {}
+    if validators.get("etag"):
+        headers["If-None-Match"] = validators["etag"]
+    if validators.get("last_modified"):
+        headers["If-Modified-Since"] = validators["last_modified"]
+
+    response = await get_client().get(f"{TRUSTPILOT_BASE_URL}/review/{TRUSTPILOT_DOMAIN}", headers=headers)
+    if response.status_code == 304:
+        return None, {}
+    response.raise_for_status()
+
+    reviews = await asyncio.to_thread(parse_trustpilot_html, response.text)
+    return reviews, {"etag": response.headers.get("etag"), "last_modified": response.headers.get("last-modified")}
+
+
+async def save_page_validators(db, validators: dict):
+    """Remember the page version - only after its reviews were ingested, or a 304 would skip them for good"""
+    await db.trustpilot_config.update_one(
+        {"key": "page_validators"},
+        {"$set": {"key": "page_validators", **validators}},
+        upsert=True
+    )
+
+
+async def ingest_reviews(db, reviews: List[dict], source: str = TRUSTPILOT_SOURCE) -> int:
+    """Upsert reviews in a single bulk_write; returns how many were new"""
+    now = datetime.now(timezone.utc).isoformat()
+    operations = {}
+    for review in reviews:
+        key = content_hash(source, review["reviewer_name"], review["comment"])
+        operations[key] = UpdateOne(
+            {"content_hash": key},
+            {"$setOnInsert": {
+                "id": f"tp-{uuid.uuid4().hex[:8]}",
+                "content_hash": key,
+                "reviewer_name": review["reviewer_name"],
+                "rating": review["rating"],
+                "comment": review["comment"],
+                "review_date": review["review_date"],
+                "created_at": now,
+                "source": source
+            }},
+            upsert=True
+        )
+    if not operations:
+        return 0
+    result = await db.reviews.bulk_write(list(operations.values()), ordered=False)
+    return result.upserted_count
+
+
+async def ensure_review_indexes(db):
+    """Backfill content hashes on previously synced reviews, then index them"""
+    seen = set()
+    operations = []
+    async for review in db.reviews.find(
+        {"source": TRUSTPILOT_SOURCE, "content_hash": {"$exists": False}},
+        {"_id": 1, "reviewer_name": 1, "comment": 1}
+    ):
+        key = content_hash(TRUSTPILOT_SOURCE, review.get("reviewer_name"), review.get("comment"))
+        # Older duplicates keep no hash rather than breaking the unique index
+        if key in seen or await db.reviews.find_one({"content_hash": key}, {"_id": 1}):
+            continue
+        seen.add(key)
+        operations.append(UpdateOne({"_id": review["_id"]}, {"$set": {"content_hash": key}}))
+    if operations:
+        await db.reviews.bulk_write(operations, ordered=False)
+
+    await db.reviews.create_index(
+        "content_hash",
+        unique=True,
+        partialFilterExpression={"content_hash": {"$exists": True}}
+    )
+    await db.reviews.create_index([("review_date", -1)])
+
+
+class RatingSummary:
+    """Cached store-wide rating, refreshed after review writes"""
+
+    def __init__(self):
+        self.rating_value: Optional[float] = None
+        self.review_count = 0
+        self.loaded = False
+        self._listeners: List[Callable[[], None]] = []
+
+    def on_change(self, listener: Callable[[], None]):
+        self._listeners.append(listener)
+
+    async def refresh(self, db):
+        result = await db.reviews.aggregate([
+            {"$group": {"_id": None, "avg": {"$avg": "$rating"}, "count": {"$sum": 1}}}
+        ]).to_list(1)
+        if result and result[0]["count"]:
+            self.rating_value = round(result[0]["avg"], 1)
+            self.review_count = result[0]["count"]
+        else:
+            self.rating_value, self.review_count = None, 0
+        self.loaded = True
+        for listener in self._listeners:
+            listener()
+
+    async def ensure_loaded(self, db):
+        if not self.loaded:
+            await self.refresh(db)
+
+    def to_dict(self) -> dict:
+        return {"rating_value": self.rating_value, "review_count": self.review_count}
+
+    def aggregate_rating(self) -> Optional[dict]:
+        """schema.org AggregateRating, or None when there are no reviews"""
+        if not self.review_count:
+            return None
+        return {
+            "@type": "AggregateRating",
+            "ratingValue": self.rating_value,
+            "reviewCount": self.review_count,
+            "bestRating": 5,
+            "worstRating": 1
+        }
+
+
+rating_summary = RatingSummary()
@@ -2,19 +2,16 @@
 Seed database with initial data from mockData.js
 """
 import asyncio
-from motor.motor_asyncio import AsyncIOMotorClient
-import os
 from datetime import datetime, timezone
 from dotenv import load_dotenv
 from pathlib import Path
+from database import ADMIN, get_db
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
 # MongoDB connection
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+db = get_db(ADMIN)
 
 async def seed_database():
     print("🌱 Starting database seeding...")
@@ -0,0 +1,171 @@
+"""
+SEO Metadata Service
+Materializes SEO meta (title, description, JSON-LD schema) per product and
+blog slug when the underlying document changes, and serves it from memory.
+The store-wide review rating (cached by review_service) is folded into
+every product's schema.
+"""
+import asyncio
+import logging
+import re
+from typing import Dict, Optional
+
+from review_service import rating_summary
+
+logger = logging.getLogger(__name__)
+
+STORE_NAME = "GameShop Nepal"
+
+DEFAULT_META = {
+    "title": "GameShop Nepal - Digital Products at Best Prices",
+    "description": "Buy Netflix, Spotify, YouTube Premium, PUBG UC and more at the best prices in Nepal. Instant delivery, 100% genuine products.",
+    "keywords": "digital products Nepal, Netflix Nepal, Spotify Nepal, gaming topup Nepal"
+}
+
+PRODUCT_FIELDS = {"_id": 0, "id": 1, "slug": 1, "name": 1, "description": 1, "image_url": 1, "variations.price": 1, "is_sold_out": 1}
+BLOG_FIELDS = {"_id": 0, "id": 1, "slug": 1, "title": 1, "excerpt": 1, "content": 1, "image_url": 1, "created_at": 1}
+
+_TAG_RE = re.compile(r"<[^>]+>")
+
+
+def _plain_text(value: Optional[str], limit: int) -> str:
+    return _TAG_RE.sub("", value or "").strip()[:limit]
+
+
+def product_meta(product: dict, rating: Optional[dict] = None) -> dict:
+    prices = [v.get("price", 0) for v in product.get("variations") or []]
+    min_price = min(prices) if prices else 0
+    name = product["name"]
+
+    schema = {
+        "@context": "https://schema.org",
+        "@type": "Product",
+        "name": name,
+        "description": _plain_text(product.get("description"), 200),
+        "image": product.get("image_url"),
+        "offers": {
+            "@type": "AggregateOffer",
+            "lowPrice": min_price,
+            "priceCurrency": "NPR",
+            "availability": "https://schema.org/InStock" if not product.get("is_sold_out") else "https://schema.org/OutOfStock"
+        }
+    }
+    if rating:
+        schema["aggregateRating"] = rating
+
+    return {
+        "title": f"{name} - Buy Online | {STORE_NAME}",
+        "description": f"Buy {name} at the best price in Nepal. Starting from Rs {min_price}. Instant delivery, 100% genuine products.",
+        "keywords": f"{name}, buy {name} Nepal, {name} price Nepal, digital products Nepal",
+        "og_image": product.get("image_url"),
+        "schema": schema
+    }
+
+
+def blog_meta(post: dict) -> dict:
+    return {
+        "title": f"{post['title']} | {STORE_NAME} Blog",
+        "description": post.get("excerpt") or _plain_text(post.get("content"), 160),
+        "keywords": f"{post['title']}, gaming blog Nepal, digital products guide",
+        "og_image": post.get("image_url"),
+        "schema": {
+            "@context": "https://schema.org",
+            "@type": "BlogPosting",
+            "headline": post["title"],
+            "description": post.get("excerpt", ""),
+            "image": post.get("image_url"),
+            "datePublished": post.get("created_at"),
+            "author": {"@type": "Organization", "name": STORE_NAME}
+        }
+    }
+
+
+class SeoMetaStore:
+    """In-memory slug -> meta maps, kept current by the write handlers"""
+
+    def __init__(self):
+        self._products: Dict[str, dict] = {}
+        self._blog: Dict[str, dict] = {}
+        # id -> slug, so renames and deletes drop the old slug
+        self._product_slugs: Dict[str, str] = {}
+        self._blog_slugs: Dict[str, str] = {}
+        self._rating: Optional[dict] = None
+        self._loaded = False
+        self._lock = asyncio.Lock()
+
+    async def load(self, db):
+        """Materialize everything (startup and bulk catalog changes)"""
+        async with self._lock:
+            await rating_summary.ensure_loaded(db)
+            self._rating = rating_summary.aggregate_rating()
+            products, product_slugs = {}, {}
+            async for product in db.products.find({}, PRODUCT_FIELDS):
+                if product.get("slug"):
+                    products[product["slug"]] = product_meta(product, self._rating)
+                    product_slugs[product["id"]] = product["slug"]
+            blog, blog_slugs = {}, {}
+            async for post in db.blog_posts.find({}, BLOG_FIELDS):
+                if post.get("slug"):
+                    blog[post["slug"]] = blog_meta(post)
+                    blog_slugs[post["id"]] = post["slug"]
+            self._products, self._product_slugs = products, product_slugs
+            self._blog, self._blog_slugs = blog, blog_slugs
+            self._loaded = True
+        logger.info(f"SEO meta loaded: {len(products)} products, {len(blog)} blog posts")
+
+    async def _ensure_loaded(self, db):
+        if not self._loaded:
+            await self.load(db)
+
+    async def refresh_product(self, db, product_id: str):
+        self.remove_product(product_id)
+        product = await db.products.find_one({"id": product_id}, PRODUCT_FIELDS)
+        if product and product.get("slug"):
+            self._products[product["slug"]] = product_meta(product, self._rating)
+            self._product_slugs[product_id] = product["slug"]
+
+    def remove_product(self, product_id: str):
+        slug = self._product_slugs.pop(product_id, None)
+        if slug:
+            self._products.pop(slug, None)
+
+    async def refresh_blog(self, db, post_id: str):
+        self.remove_blog(post_id)
+        post = await db.blog_posts.find_one({"id": post_id}, BLOG_FIELDS)
+        if post and post.get("slug"):
+            self._blog[post["slug"]] = blog_meta(post)
+            self._blog_slugs[post_id] = post["slug"]
+
+    def remove_blog(self, post_id: str):
+        slug = self._blog_slugs.pop(post_id, None)
+        if slug:
+            self._blog.pop(slug, None)
+
+    def apply_rating(self):
+        """Patch the cached aggregate rating into every product schema"""
+        self._rating = rating_summary.aggregate_rating()
+        for meta in self._products.values():
+            if self._rating:
+                meta["schema"]["aggregateRating"] = self._rating
+            else:
+                meta["schema"].pop("aggregateRating", None)
+
+    async def get(self, db, page_type: str, slug: str) -> dict:
+        await self._ensure_loaded(db)
+        if page_type == "product":
+            return self._products.get(slug, DEFAULT_META)
+        if page_type == "blog":
+            return self._blog.get(slug, DEFAULT_META)
+        return DEFAULT_META
+
+    async def get_many(self, db, products=(), blog=()) -> dict:
+        """Meta for many slugs at once; unknown slugs are left out"""
+        await self._ensure_loaded(db)
+        return {
+            "products": {slug: self._products[slug] for slug in products if slug in self._products},
+            "blog": {slug: self._blog[slug] for slug in blog if slug in self._blog},
+        }
+
+
+seo_store = SeoMetaStore()
+rating_summary.on_change(seo_store.apply_rating)
@@ -0,0 +1,112 @@
+"""
+Response Serialization
+`ORJSONResponse` is the app's default response class. `DocumentShape` turns
+a Pydantic response model into a MongoDB projection plus default filling, so
+trusted documents can be returned in the model's shape without a second
+validation pass: fields the model doesn't declare (or that are excluded,
+like `discord_webhooks` and `variations.cost_price` on public products) are
+never read from the database.
+
+Endpoints keep `response_model=` for the OpenAPI schema and return
+`json_response(...)`; FastAPI passes Response objects through untouched.
+"""
+import copy
+import typing
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List, Optional, Type
+
+import orjson
+from bson import ObjectId
+from pydantic import BaseModel
+from pydantic_core import PydanticUndefined
+from starlette.responses import JSONResponse
+
+
+def _default(value: Any):
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (set, frozenset, tuple)):
+        return list(value)
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+def dumps(content: Any) -> bytes:
+    return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+class ORJSONResponse(JSONResponse):
+    """JSONResponse rendered by orjson (subclassing JSONResponse keeps OpenAPI schemas)"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def json_response(content: Any, status_code: int = 200, headers: Optional[Dict[str, str]] = None) -> ORJSONResponse:
+    return ORJSONResponse(content=content, status_code=status_code, headers=headers)
+
+
+def _nested_model(annotation) -> Optional[Type[BaseModel]]:
+    """The model inside Optional[M] / List[M] / M, if any"""
+    for arg in (annotation, *typing.get_args(annotation)):
+        if isinstance(arg, type) and issubclass(arg, BaseModel):
+            return arg
+        for inner in typing.get_args(arg):
+            if isinstance(inner, type) and issubclass(inner, BaseModel):
+                return inner
+    return None
+
+
+class DocumentShape:
+    """Projection and defaults that make a stored document look like `model`"""
+
+    def __init__(self, model: Type[BaseModel], exclude: Iterable[str] = ()):
+        self.model = model
+        exclude = set(exclude)
+        self.projection: Dict[str, int] = {"_id": 0}
+        # name -> (default, default_factory, nested shape)
+        self._fields: Dict[str, tuple] = {}
+
+        for name, field in model.model_fields.items():
+            nested_model = _nested_model(field.annotation)
+            nested = None
+            if nested_model is not None:
+                prefix = f"{name}."
+                nested = DocumentShape(
+                    nested_model,
+                    exclude=[path[len(prefix):] for path in exclude if path.startswith(prefix)]
+                )
+            if name not in exclude:
+                if nested is not None:
+                    for sub_field in nested.projection:
+                        if sub_field != "_id":
+                            self.projection[f"{name}.{sub_field}"] = 1
+                else:
+                    self.projection[name] = 1
+            self._fields[name] = (field.default, field.default_factory, nested)
+
+    def fill(self, document: dict) -> dict:
+        """Add the defaults validation would have added (in place)"""
+        for name, (default, factory, nested) in self._fields.items():
+            if name not in document:
+                if factory is not None:
+                    document[name] = factory()
+                elif default is not PydanticUndefined:
+                    document[name] = copy.copy(default)
+            elif nested is not None:
+                value = document[name]
+                if isinstance(value, list):
+                    for item in value:
+                        if isinstance(item, dict):
+                            nested.fill(item)
+                elif isinstance(value, dict):
+                    nested.fill(value)
+        return document
+
+    def fill_many(self, documents: List[dict]) -> List[dict]:
+        for document in documents:
+            self.fill(document)
+        return documents
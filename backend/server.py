@@ -1,30 +1,50 @@
 from fastapi import FastAPI, APIRouter, HTTPException, Depends, status, UploadFile, File, Form, Body, Request, Header
-import fastapi
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, StreamingResponse, Response
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
 import os
 import logging
 import asyncio
 import string
+import time
 import random
 from pathlib import Path
 from pydantic import BaseModel, Field, ConfigDict
-from typing import List, Optional
+from typing import Any, Awaitable, Callable, List, Optional, Tuple
 import uuid
 from datetime import datetime, timezone, timedelta
 import hashlib
+import hmac
 import jwt
 import secrets
 import shutil
-import httpx
 from email_service import send_email, get_order_confirmation_email, get_order_status_update_email, get_welcome_email
 from imgbb_service import upload_to_imgbb
 import google_sheets_service
 from discord_service import send_discord_order_notification, send_discord_order_status_update
 from order_cleanup import run_cleanup_task
+from ticker_service import ticker
+import order_timeline
+from order_timeline import push_status_history
+import invoice_service
+from seo_service import seo_store
+import review_service
+from review_service import rating_summary
+import customer_stats
+import takeapp_sync
+import order_bulk_ops
+import order_archive
+import database
+import metrics
+import query_profiler
+import loop_watchdog
+import profiling
+from compression import CompressionMiddleware, IDENTITY
+from http_middleware import RateLimitMiddleware, SecurityHeadersMiddleware
+from serialization import DocumentShape, ORJSONResponse, json_response
+from sitemap_service import sitemap_cache, PRODUCTS as SITEMAP_PRODUCTS, BLOG as SITEMAP_BLOG, CATEGORIES as SITEMAP_CATEGORIES
+from event_stream import order_events, format_sse, stream_events, public_order_event, ORDER_CREATED, PAYMENT_UPLOADED, STATUS_CHANGED
 
 
 ROOT_DIR = Path(__file__).parent
@@ -34,84 +54,39 @@ load_dotenv(ROOT_DIR / '.env')
 UPLOADS_DIR = ROOT_DIR / "uploads"
 UPLOADS_DIR.mkdir(exist_ok=True)
 
-# MongoDB connection
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+# MongoDB connection - storefront traffic, admin/background work and reporting
+# reads each go through their own pool (see database.py)
+db = database.get_db()
+admin_db = database.get_db(database.ADMIN)
+reporting_db = database.get_reporting_db()
 
 # JWT Config
 JWT_SECRET = os.environ.get('JWT_SECRET', secrets.token_hex(32))
 JWT_ALGORITHM = "HS256"
 JWT_EXPIRATION_HOURS = 24
 
+# Live ticker SSE heartbeat interval
+TICKER_HEARTBEAT_SECONDS = 15
+
 # Take.app Config
 TAKEAPP_API_KEY = os.environ.get('TAKEAPP_API_KEY', '')
-TAKEAPP_BASE_URL = "https://api.take.app/v1"
+TAKEAPP_BASE_URL = os.environ.get('TAKEAPP_BASE_URL', 'https://api.take.app/v1')
 
 # Create the main app
-app = FastAPI()
+app = FastAPI(default_response_class=ORJSONResponse)
 api_router = APIRouter(prefix="/api")
 security = HTTPBearer()
+optional_security = HTTPBearer(auto_error=False)
 
 # Logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-# ==================== RATE LIMITING ====================
-from collections import defaultdict
-from time import time
-
-# In-memory rate limiter (for production, use Redis)
-rate_limit_store = defaultdict(list)
-
-def rate_limit_check(ip: str, limit: int = 100, window: int = 60):
-    """Check if IP is rate limited. Returns True if allowed, False if limited."""
-    now = time()
-    # Clean old requests
-    rate_limit_store[ip] = [req_time for req_time in rate_limit_store[ip] if now - req_time < window]
-    
-    if len(rate_limit_store[ip]) >= limit:
-        return False
-    
-    rate_limit_store[ip].append(now)
-    return True
-
-@app.middleware("http")
-async def rate_limit_middleware(request: Request, call_next):
-    """Rate limiting middleware"""
-    client_ip = request.client.host
-    
-    # Skip rate limiting for health checks
-    if request.url.path == "/health":
-        return await call_next(request)
-    
-    # More relaxed for login endpoints (30 attempts per minute)
-    if "/auth/login" in request.url.path:
-        if not rate_limit_check(client_ip, limit=30, window=60):
-            return fastapi.responses.JSONResponse(
-                status_code=429,
-                content={"detail": "Too many login attempts. Please try again later."}
-            )
-    else:
-        # General rate limit
-        if not rate_limit_check(client_ip, limit=100, window=60):
-            return fastapi.responses.JSONResponse(
-                status_code=429,
-                content={"detail": "Too many requests. Please slow down."}
-            )
-    
-    return await call_next(request)
-
-# ==================== SECURITY HEADERS ====================
-@app.middleware("http")
-async def security_headers_middleware(request: Request, call_next):
-    """Add security headers"""
-    response = await call_next(request)
-    response.headers["X-Content-Type-Options"] = "nosniff"
-    response.headers["X-Frame-Options"] = "DENY"
-    response.headers["X-XSS-Protection"] = "1; mode=block"
-    response.headers["Strict-Transport-Security"] = "max-age=31536000; includeSubDomains"
-    return response
+# ==================== RATE LIMITING / SECURITY HEADERS ====================
+# Pure ASGI (see http_middleware.py); security headers wrap the rate limiter
+# so 429s carry them too
+app.add_middleware(RateLimitMiddleware)
+app.add_middleware(SecurityHeadersMiddleware)
 
 # ==================== MODELS ====================
 
@@ -351,9 +326,39 @@ def create_token(user_id: str) -> str:
 ADMIN_USERNAME = os.environ.get("ADMIN_USERNAME", "gsnadmin")
 ADMIN_PASSWORD = os.environ.get("ADMIN_PASSWORD", "gsnadmin")
 
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+async def load_admin(user_id: str) -> dict:
+    """The admin principal for a user id from a verified token"""
+    # Check if it's the new admin system (search by id field, not _id)
+    admin = await db.admins.find_one({"id": user_id})
+    if admin and admin.get("is_active"):
+        return {
+            "id": admin.get("id"),
+            "username": admin.get("username"),
+            "email": admin.get("email"),
+            "name": admin.get("name"),
+            "role": admin.get("role"),
+            "permissions": admin.get("permissions", []),
+            "is_admin": True,
+            "is_main_admin": admin.get("role") == "main_admin" or admin.get("is_main_admin")
+        }
+    
+    # Fallback to old admin system (for backward compatibility)
+    if user_id == "admin-fixed" or user_id == "admin_main":
+        return {
+            "id": user_id,
+            "email": ADMIN_USERNAME,
+            "name": "Main Admin",
+            "is_admin": True,
+            "is_main_admin": True,
+            "permissions": ["all"]
+        }
+    
+    logger.error(f"User not found for user_id: {user_id}")
+    raise HTTPException(status_code=401, detail="Invalid user")
+
+async def resolve_admin_token(token: str) -> dict:
+    """Decode an admin JWT and load the admin principal"""
     try:
-        token = credentials.credentials
         payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
         user_id = payload.get("user_id")
         
@@ -361,33 +366,7 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
             logger.error(f"No user_id in token payload: {payload}")
             raise HTTPException(status_code=401, detail="Invalid token: no user_id")
         
-        # Check if it's the new admin system (search by id field, not _id)
-        admin = await db.admins.find_one({"id": user_id})
-        if admin and admin.get("is_active"):
-            return {
-                "id": admin.get("id"),
-                "username": admin.get("username"),
-                "email": admin.get("email"),
-                "name": admin.get("name"),
-                "role": admin.get("role"),
-                "permissions": admin.get("permissions", []),
-                "is_admin": True,
-                "is_main_admin": admin.get("role") == "main_admin" or admin.get("is_main_admin")
-            }
-        
-        # Fallback to old admin system (for backward compatibility)
-        if user_id == "admin-fixed" or user_id == "admin_main":
-            return {
-                "id": user_id,
-                "email": ADMIN_USERNAME,
-                "name": "Main Admin",
-                "is_admin": True,
-                "is_main_admin": True,
-                "permissions": ["all"]
-            }
-        
-        logger.error(f"User not found for user_id: {user_id}")
-        raise HTTPException(status_code=401, detail="Invalid user")
+        return await load_admin(user_id)
     except jwt.ExpiredSignatureError:
         logger.error("Token expired")
         raise HTTPException(status_code=401, detail="Token expired")
@@ -395,12 +374,67 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
         logger.error(f"Invalid token: {str(e)}")
         raise HTTPException(status_code=401, detail="Invalid token")
 
+# EventSource can't send headers, so SSE endpoints take a token in the query
+# string - a short-lived, stream-only one, never the admin JWT (URLs end up in
+# access logs, proxy logs and browser history)
+STREAM_TOKEN_SECONDS = 120
+
+def _stream_signature(user_id: str, expires: int) -> str:
+    return hmac.new(JWT_SECRET.encode(), f"stream:{user_id}:{expires}".encode(), hashlib.sha256).hexdigest()
+
+def issue_stream_token(user_id: str) -> Tuple[str, datetime]:
+    expires = int(time.time()) + STREAM_TOKEN_SECONDS
+    return f"{user_id}.{expires}.{_stream_signature(user_id, expires)}", datetime.fromtimestamp(expires, timezone.utc)
+
+def stream_token_user(token: str) -> Optional[str]:
+    """The user id a valid, unexpired stream token was issued to"""
+    parts = token.rsplit(".", 2)
+    if len(parts) != 3 or not parts[1].isdigit() or int(parts[1]) < time.time():
+        return None
+    user_id, expires, signature = parts
+    return user_id if hmac.compare_digest(signature, _stream_signature(user_id, int(expires))) else None
+
+async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    return await resolve_admin_token(credentials.credentials)
+
+async def get_optional_admin(credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security)) -> Optional[dict]:
+    """Admin user when a valid admin token is sent, otherwise None (public endpoints)"""
+    if not credentials:
+        return None
+    try:
+        return await resolve_admin_token(credentials.credentials)
+    except HTTPException:
+        return None
+
+async def get_current_user_for_stream(
+    token: Optional[str] = None,
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security)
+):
+    """Admin auth for SSE endpoints: the Authorization header, or ?token= from /admin/stream-token"""
+    if credentials:
+        return await resolve_admin_token(credentials.credentials)
+    if token:
+        user_id = stream_token_user(token)
+        if not user_id:
+            raise HTTPException(status_code=401, detail="Invalid or expired stream token")
+        return await load_admin(user_id)
+    raise HTTPException(status_code=401, detail="Not authenticated")
+
 def check_permission(user: dict, required_permission: str) -> bool:
     """Check if user has required permission"""
     if user.get("permissions") and "all" in user["permissions"]:
         return True
     return required_permission in user.get("permissions", [])
 
+# ==================== RESPONSE SHAPES ====================
+# Stored documents are trusted: project them straight to the response model
+# instead of re-validating every field (response_model still drives OpenAPI)
+PUBLIC_PRODUCT_SHAPE = DocumentShape(Product, exclude=("discord_webhooks", "variations.cost_price"))
+ADMIN_PRODUCT_SHAPE = DocumentShape(Product)
+CATEGORY_SHAPE = DocumentShape(Category)
+REVIEW_SHAPE = DocumentShape(Review)
+FAQ_SHAPE = DocumentShape(FAQItem)
+
 # ==================== AUTH ROUTES ====================
 
 @api_router.post("/auth/register")
@@ -706,6 +740,7 @@ async def send_customer_otp(request: OTPRequest):
             "last_login": None
         }
         await db.customers.insert_one(customer_data)
+        await customer_stats.refresh_customer_stats(db, email=email, phone=request.whatsapp_number)
         logger.info(f"New customer created: {email}")
     else:
         # Update whatsapp_number if provided
@@ -844,6 +879,7 @@ async def verify_customer_otp(verify: OTPVerify):
             "last_login": datetime.now(timezone.utc).isoformat()
         }
         await db.customers.insert_one(customer)
+        await customer_stats.refresh_customer_stats(db, email=email)
     
     # Sync customer to Google Sheets (in background)
     try:
@@ -895,78 +931,42 @@ async def get_customer_profile(current_customer: dict = Depends(get_current_cust
 
 @api_router.get("/customer/orders")
 async def get_customer_orders(current_customer: dict = Depends(get_current_customer)):
-    """Get customer's order history with status history"""
-    orders = await db.orders.find(
-        {"customer_email": current_customer["email"]},
-        {"_id": 0}
-    ).sort("created_at", -1).to_list(100)
-    
-    # Batch fetch all status histories to avoid N+1 query
-    order_ids = [order.get("id") for order in orders if order.get("id")]
-    if order_ids:
-        all_histories = await db.order_status_history.find(
-            {"order_id": {"$in": order_ids}},
-            {"_id": 0}
-        ).sort("created_at", 1).to_list(5000)
-        
-        # Group histories by order_id
-        history_map = {}
-        for h in all_histories:
-            oid = h.get("order_id")
-            if oid not in history_map:
-                history_map[oid] = []
-            history_map[oid].append(h)
-        
-        # Assign histories to orders
-        for order in orders:
-            order["status_history"] = history_map.get(order.get("id"), [])
-    else:
-        for order in orders:
-            order["status_history"] = []
+    """Get customer's order history with status history (embedded on each order)"""
+    orders = await order_archive.find_orders(
+        db, {"customer_email": current_customer["email"]}, {"_id": 0, "lookup_keys": 0}, limit=100
+    )
+    
+    for order in orders:
+        order.setdefault("status_history", [])
     
     return orders
 
 @api_router.get("/customer/orders/{order_id}")
 async def get_customer_order_detail(order_id: str, current_customer: dict = Depends(get_current_customer)):
     """Get specific order details"""
-    order = await db.orders.find_one({
+    order = await order_archive.find_order(db, {
         "id": order_id,
         "customer_email": current_customer["email"]
-    }, {"_id": 0})
+    }, {"_id": 0, "lookup_keys": 0})
     
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
     
-    # Get status history
-    history = await db.order_status_history.find(
-        {"order_id": order_id},
-        {"_id": 0}
-    ).sort("created_at", 1).to_list(50)
-    
-    order["status_history"] = history
+    order.setdefault("status_history", [])
     return order
 
 @api_router.get("/customer/stats")
 async def get_customer_stats(current_customer: dict = Depends(get_current_customer)):
-    """Get customer statistics"""
+    """Get customer statistics (maintained on the customer document)"""
     email = current_customer["email"]
     
-    # Count orders
-    total_orders = await db.orders.count_documents({"customer_email": email})
-    
-    # Calculate total spent with projection (only fetch total_amount)
-    orders = await db.orders.find(
-        {"customer_email": email}, 
-        {"total_amount": 1, "_id": 0}
-    ).to_list(1000)
-    total_spent = sum(order.get("total_amount", 0) for order in orders)
-    
     # Count wishlist items
     wishlist_count = await db.wishlists.count_documents({"email": email})
     
     return {
-        "total_orders": total_orders,
-        "total_spent": total_spent,
+        "total_orders": current_customer.get("total_orders", 0),
+        "total_spent": current_customer.get("total_spent", 0),
+        "completed_orders": current_customer.get("completed_orders", 0),
         "wishlist_items": wishlist_count,
         "member_since": current_customer.get("created_at", "")[:10]
     }
@@ -1046,14 +1046,15 @@ async def get_uploaded_image(filename: str):
 
 @api_router.get("/categories", response_model=List[Category])
 async def get_categories():
-    categories = await db.categories.find({}, {"_id": 0}).to_list(100)
-    return categories
+    categories = await db.categories.find({}, CATEGORY_SHAPE.projection).to_list(100)
+    return json_response(CATEGORY_SHAPE.fill_many(categories))
 
 @api_router.post("/categories", response_model=Category)
 async def create_category(category_data: CategoryCreate, current_user: dict = Depends(get_current_user)):
     slug = category_data.name.lower().replace(" ", "-").replace("&", "and")
     category = Category(name=category_data.name, slug=slug)
-    await db.categories.insert_one(category.model_dump())
+    await db.categories.insert_one({**category.model_dump(), "updated_at": datetime.now(timezone.utc).isoformat()})
+    sitemap_cache.invalidate(SITEMAP_CATEGORIES)
     return category
 
 @api_router.put("/categories/{category_id}", response_model=Category)
@@ -1063,7 +1064,8 @@ async def update_category(category_id: str, category_data: CategoryCreate, curre
         raise HTTPException(status_code=404, detail="Category not found")
 
     slug = category_data.name.lower().replace(" ", "-").replace("&", "and")
-    await db.categories.update_one({"id": category_id}, {"$set": {"name": category_data.name, "slug": slug}})
+    await db.categories.update_one({"id": category_id}, {"$set": {"name": category_data.name, "slug": slug, "updated_at": datetime.now(timezone.utc).isoformat()}})
+    sitemap_cache.invalidate(SITEMAP_CATEGORIES)
     updated = await db.categories.find_one({"id": category_id}, {"_id": 0})
     return updated
 
@@ -1072,31 +1074,24 @@ async def delete_category(category_id: str, current_user: dict = Depends(get_cur
     result = await db.categories.delete_one({"id": category_id})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Category not found")
+    sitemap_cache.invalidate(SITEMAP_CATEGORIES)
     return {"message": "Category deleted"}
 
 # ==================== PRODUCT ROUTES ====================
 
 @api_router.get("/products", response_model=List[Product])
-async def get_products(category_id: Optional[str] = None, active_only: bool = True):
+async def get_products(category_id: Optional[str] = None, active_only: bool = True, admin: Optional[dict] = Depends(get_optional_admin)):
     query = {}
     if category_id:
         query["category_id"] = category_id
     if active_only:
         query["is_active"] = True
 
-    products = await db.products.find(query, {"_id": 0}).sort([("sort_order", 1), ("created_at", -1)]).to_list(1000)
-    
-    # Convert datetime fields to ISO strings and hide sensitive data
-    for product in products:
-        if "created_at" in product and isinstance(product["created_at"], datetime):
-            product["created_at"] = product["created_at"].isoformat()
-        if "updated_at" in product and isinstance(product["updated_at"], datetime):
-            product["updated_at"] = product["updated_at"].isoformat()
-        # Hide Discord webhooks from public API response (set to empty array for model validation)
-        if "discord_webhooks" in product:
-            product["discord_webhooks"] = []
-    
-    return products
+    # Discord webhooks and cost prices are never read for the public - the admin
+    # product editor loads this list too, so it gets the full documents
+    shape = ADMIN_PRODUCT_SHAPE if admin else PUBLIC_PRODUCT_SHAPE
+    products = await db.products.find(query, shape.projection).sort([("sort_order", 1), ("created_at", -1)]).to_list(1000)
+    return json_response(shape.fill_many(products))
 
 @api_router.get("/products/search/advanced")
 async def advanced_product_search(
@@ -1188,47 +1183,28 @@ async def reorder_products(order_data: ProductOrderUpdate, current_user: dict =
 @api_router.get("/products/{product_id}", response_model=Product)
 async def get_product(product_id: str):
     # First try to find by slug
-    product = await db.products.find_one({"slug": product_id}, {"_id": 0})
+    product = await db.products.find_one({"slug": product_id}, PUBLIC_PRODUCT_SHAPE.projection)
     if not product:
         # Then try by ID
-        product = await db.products.find_one({"id": product_id}, {"_id": 0})
+        product = await db.products.find_one({"id": product_id}, PUBLIC_PRODUCT_SHAPE.projection)
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
     
-    # Convert datetime fields to ISO strings
-    if "created_at" in product and isinstance(product["created_at"], datetime):
-        product["created_at"] = product["created_at"].isoformat()
-    if "updated_at" in product and isinstance(product["updated_at"], datetime):
-        product["updated_at"] = product["updated_at"].isoformat()
-    
-    # Remove Discord webhooks from public API response (keep discord_webhooks as empty list for model validation)
-    if "discord_webhooks" in product:
-        product["discord_webhooks"] = []
-    
-    return product
+    # Discord webhooks and cost prices are excluded by the projection
+    return json_response(PUBLIC_PRODUCT_SHAPE.fill(product))
 
 @api_router.get("/admin/products/{product_id}", response_model=Product)
 async def get_product_admin(product_id: str, current_user: dict = Depends(get_current_user)):
     """Admin endpoint that includes discord_webhooks"""
     # First try to find by slug
-    product = await db.products.find_one({"slug": product_id}, {"_id": 0})
+    product = await db.products.find_one({"slug": product_id}, ADMIN_PRODUCT_SHAPE.projection)
     if not product:
         # Then try by ID
-        product = await db.products.find_one({"id": product_id}, {"_id": 0})
+        product = await db.products.find_one({"id": product_id}, ADMIN_PRODUCT_SHAPE.projection)
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
     
-    # Convert datetime fields to ISO strings
-    if "created_at" in product and isinstance(product["created_at"], datetime):
-        product["created_at"] = product["created_at"].isoformat()
-    if "updated_at" in product and isinstance(product["updated_at"], datetime):
-        product["updated_at"] = product["updated_at"].isoformat()
-    
-    # Keep discord_webhooks for admin
-    if "discord_webhooks" not in product:
-        product["discord_webhooks"] = []
-    
-    return product
+    return json_response(ADMIN_PRODUCT_SHAPE.fill(product))
 
 @api_router.get("/products/{product_id}/related")
 async def get_related_products(product_id: str, limit: int = 4):
@@ -1312,6 +1288,9 @@ async def create_product(product_data: ProductCreate, current_user: dict = Depen
     
     product = Product(**product_dict)
     await db.products.insert_one(product.model_dump())
+    await ticker.refresh_product_pool(db)
+    sitemap_cache.invalidate(SITEMAP_PRODUCTS)
+    await seo_store.refresh_product(db, product.id)
     return product
 
 @api_router.put("/products/{product_id}", response_model=Product)
@@ -1333,8 +1312,12 @@ async def update_product(product_id: str, product_data: ProductCreate, current_u
     else:
         # Keep existing slug or generate new one
         update_data["slug"] = existing.get("slug") or generate_slug(product_data.name)
+    update_data["updated_at"] = datetime.now(timezone.utc).isoformat()
     
     await db.products.update_one({"id": product_id}, {"$set": update_data})
+    await ticker.refresh_product_pool(db)
+    sitemap_cache.invalidate(SITEMAP_PRODUCTS)
+    await seo_store.refresh_product(db, product_id)
     updated = await db.products.find_one({"id": product_id}, {"_id": 0})
     return updated
 
@@ -1343,6 +1326,9 @@ async def delete_product(product_id: str, current_user: dict = Depends(get_curre
     result = await db.products.delete_one({"id": product_id})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Product not found")
+    await ticker.refresh_product_pool(db)
+    sitemap_cache.invalidate(SITEMAP_PRODUCTS)
+    seo_store.remove_product(product_id)
     return {"message": "Product deleted"}
 
 # ==================== REVIEW ROUTES ====================
@@ -1350,16 +1336,15 @@ async def delete_product(product_id: str, current_user: dict = Depends(get_curre
 @api_router.get("/reviews", response_model=List[Review])
 async def get_reviews():
     # Limit to 20 most recent reviews for display
-    reviews = await db.reviews.find({}, {"_id": 0}).sort("review_date", -1).to_list(20)
-    
-    # Convert datetime fields to ISO strings
-    for review in reviews:
-        if "created_at" in review and isinstance(review["created_at"], datetime):
-            review["created_at"] = review["created_at"].isoformat()
-        if "review_date" in review and isinstance(review["review_date"], datetime):
-            review["review_date"] = review["review_date"].isoformat()
-    
-    return reviews
+    reviews = await db.reviews.find({}, REVIEW_SHAPE.projection).sort("review_date", -1).to_list(20)
+    # orjson writes datetimes as ISO strings, same as the old isoformat() pass
+    return json_response(REVIEW_SHAPE.fill_many(reviews))
+
+@api_router.get("/reviews/summary")
+async def get_reviews_summary():
+    """Store-wide average rating and review count (cached)"""
+    await rating_summary.ensure_loaded(db)
+    return rating_summary.to_dict()
 
 @api_router.post("/reviews", response_model=Review)
 async def create_review(review_data: ReviewCreate, current_user: dict = Depends(get_current_user)):
@@ -1370,6 +1355,7 @@ async def create_review(review_data: ReviewCreate, current_user: dict = Depends(
         review_date=review_data.review_date or datetime.now(timezone.utc).isoformat()
     )
     await db.reviews.insert_one(review.model_dump())
+    await rating_summary.refresh(db)
     return review
 
 @api_router.put("/reviews/{review_id}", response_model=Review)
@@ -1381,6 +1367,7 @@ async def update_review(review_id: str, review_data: ReviewCreate, current_user:
     update_data = review_data.model_dump()
     update_data["review_date"] = review_data.review_date or existing.get("review_date")
     await db.reviews.update_one({"id": review_id}, {"$set": update_data})
+    await rating_summary.refresh(db)
     updated = await db.reviews.find_one({"id": review_id}, {"_id": 0})
     return updated
 
@@ -1389,11 +1376,12 @@ async def delete_review(review_id: str, current_user: dict = Depends(get_current
     result = await db.reviews.delete_one({"id": review_id})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Review not found")
+    await rating_summary.refresh(db)
     return {"message": "Review deleted"}
 
 # ==================== TRUSTPILOT SYNC ====================
 
-TRUSTPILOT_DOMAIN = "gameshopnepal.com"
+TRUSTPILOT_DOMAIN = review_service.TRUSTPILOT_DOMAIN
 TRUSTPILOT_API_KEY = os.environ.get("TRUSTPILOT_API_KEY", "")
 
 async def get_trustpilot_business_unit_id():
@@ -1403,127 +1391,45 @@ async def get_trustpilot_business_unit_id():
         return cached["value"]
     
     # Try to find business unit ID via API or scraping
-    async with httpx.AsyncClient() as client:
-        try:
-            # First try the public find endpoint (may need API key)
-            if TRUSTPILOT_API_KEY:
-                response = await client.get(
-                    f"https://api.trustpilot.com/v1/business-units/find?name={TRUSTPILOT_DOMAIN}",
-                    headers={"apikey": TRUSTPILOT_API_KEY},
-                    timeout=10.0
-                )
-                if response.status_code == 200:
-                    data = response.json()
-                    buid = data.get("id")
-                    if buid:
-                        await db.trustpilot_config.update_one(
-                            {"key": "business_unit_id"},
-                            {"$set": {"key": "business_unit_id", "value": buid}},
-                            upsert=True
-                        )
-                        return buid
-        except Exception as e:
-            logger.error(f"Error getting business unit ID: {e}")
-    
-    return None
-
-async def fetch_trustpilot_reviews_from_page():
-    """Scrape reviews from Trustpilot page as fallback"""
-    reviews = []
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.get(
-                f"https://www.trustpilot.com/review/{TRUSTPILOT_DOMAIN}",
-                headers={
-                    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
-                },
-                timeout=15.0
+    try:
+        # First try the public find endpoint (may need API key)
+        if TRUSTPILOT_API_KEY:
+            response = await review_service.get_client().get(
+                f"{review_service.TRUSTPILOT_API_URL}/v1/business-units/find",
+                params={"name": TRUSTPILOT_DOMAIN},
+                headers={"apikey": TRUSTPILOT_API_KEY},
+                timeout=10.0
             )
             if response.status_code == 200:
-                import re
-                import json
-                
-                # Try to find JSON-LD data in the page
-                html = response.text
-                
-                # Look for review data in script tags
-                json_ld_pattern = r'<script type="application/ld\+json"[^>]*>(.*?)</script>'
-                matches = re.findall(json_ld_pattern, html, re.DOTALL)
-                
-                for match in matches:
-                    try:
-                        data = json.loads(match)
-                        if isinstance(data, dict) and data.get("@type") == "LocalBusiness":
-                            if "review" in data:
-                                for review in data["review"]:
-                                    reviews.append({
-                                        "reviewer_name": review.get("author", {}).get("name", "Anonymous"),
-                                        "rating": int(review.get("reviewRating", {}).get("ratingValue", 5)),
-                                        "comment": review.get("reviewBody", ""),
-                                        "review_date": review.get("datePublished", datetime.now(timezone.utc).isoformat())
-                                    })
-                    except json.JSONDecodeError:
-                        continue
-                
-                # Also try to parse from __NEXT_DATA__
-                next_data_pattern = r'<script id="__NEXT_DATA__"[^>]*>(.*?)</script>'
-                next_matches = re.findall(next_data_pattern, html, re.DOTALL)
-                
-                for match in next_matches:
-                    try:
-                        data = json.loads(match)
-                        props = data.get("props", {}).get("pageProps", {})
-                        review_list = props.get("reviews", [])
-                        
-                        for review in review_list:
-                            consumer = review.get("consumer", {})
-                            # Get the published date from dates object
-                            dates = review.get("dates", {})
-                            published_date = dates.get("publishedDate") or dates.get("experiencedDate")
-                            
-                            reviews.append({
-                                "reviewer_name": consumer.get("displayName", "Anonymous"),
-                                "rating": review.get("rating", 5),
-                                "comment": review.get("text", review.get("title", "")),
-                                "review_date": published_date or datetime.now(timezone.utc).isoformat()
-                            })
-                    except json.JSONDecodeError:
-                        continue
-                        
-        except Exception as e:
-            logger.error(f"Error scraping Trustpilot: {e}")
+                data = response.json()
+                buid = data.get("id")
+                if buid:
+                    await db.trustpilot_config.update_one(
+                        {"key": "business_unit_id"},
+                        {"$set": {"key": "business_unit_id", "value": buid}},
+                        upsert=True
+                    )
+                    return buid
+    except Exception as e:
+        logger.error(f"Error getting business unit ID: {e}")
     
-    return reviews
+    return None
 
 @api_router.post("/reviews/sync-trustpilot")
 async def sync_trustpilot_reviews(current_user: dict = Depends(get_current_user)):
     """Sync reviews from Trustpilot to the database"""
-    synced_count = 0
-    
     try:
-        # Try scraping the Trustpilot page
-        trustpilot_reviews = await fetch_trustpilot_reviews_from_page()
+        trustpilot_reviews, validators = await review_service.fetch_trustpilot_reviews(db)
         
-        for tp_review in trustpilot_reviews:
-            # Check if this review already exists (by reviewer name and comment)
-            existing = await db.reviews.find_one({
-                "reviewer_name": tp_review["reviewer_name"],
-                "comment": tp_review["comment"],
-                "source": "trustpilot"
-            })
-            
-            if not existing:
-                review = {
-                    "id": f"tp-{str(uuid.uuid4())[:8]}",
-                    "reviewer_name": tp_review["reviewer_name"],
-                    "rating": tp_review["rating"],
-                    "comment": tp_review["comment"],
-                    "review_date": tp_review["review_date"],
-                    "created_at": datetime.now(timezone.utc).isoformat(),
-                    "source": "trustpilot"
-                }
-                await db.reviews.insert_one(review)
-                synced_count += 1
+        not_modified = trustpilot_reviews is None
+        synced_count = 0
+        if not not_modified:
+            synced_count = await review_service.ingest_reviews(db, trustpilot_reviews)
+            # An empty parse (e.g. after a markup change) must not mark the page as seen
+            if trustpilot_reviews:
+                await review_service.save_page_validators(db, validators)
+        if synced_count:
+            await rating_summary.refresh(db)
         
         # Update last sync time
         await db.trustpilot_config.update_one(
@@ -1535,8 +1441,9 @@ async def sync_trustpilot_reviews(current_user: dict = Depends(get_current_user)
         return {
             "success": True,
             "synced_count": synced_count,
-            "total_found": len(trustpilot_reviews),
-            "message": f"Synced {synced_count} new reviews from Trustpilot"
+            "total_found": 0 if not_modified else len(trustpilot_reviews),
+            "not_modified": not_modified,
+            "message": "Trustpilot page unchanged since last sync" if not_modified else f"Synced {synced_count} new reviews from Trustpilot"
         }
         
     except Exception as e:
@@ -1558,8 +1465,8 @@ async def get_trustpilot_status(current_user: dict = Depends(get_current_user)):
 
 @api_router.get("/faqs", response_model=List[FAQItem])
 async def get_faqs():
-    faqs = await db.faqs.find({}, {"_id": 0}).sort("sort_order", 1).to_list(100)
-    return faqs
+    faqs = await db.faqs.find({}, FAQ_SHAPE.projection).sort("sort_order", 1).to_list(100)
+    return json_response(FAQ_SHAPE.fill_many(faqs))
 
 @api_router.post("/faqs", response_model=FAQItem)
 async def create_faq(faq_data: FAQItemCreate, current_user: dict = Depends(get_current_user)):
@@ -1656,6 +1563,9 @@ async def delete_social_link(link_id: str, current_user: dict = Depends(get_curr
 async def clear_products(current_user: dict = Depends(get_current_user)):
     await db.products.delete_many({})
     await db.categories.delete_many({})
+    await ticker.refresh_product_pool(db)
+    sitemap_cache.invalidate(SITEMAP_PRODUCTS, SITEMAP_CATEGORIES)
+    await seo_store.load(db)
     return {"message": "All products and categories cleared"}
 
 # ==================== SEED DATA ====================
@@ -1691,6 +1601,7 @@ async def seed_data():
     for faq in default_faqs:
         await db.faqs.update_one({"id": faq["id"]}, {"$set": faq}, upsert=True)
 
+    await rating_summary.refresh(db)
     return {"message": "Data seeded successfully"}
 
 # Order creation models
@@ -1712,6 +1623,10 @@ class CreateOrderRequest(BaseModel):
     credits_used: float = 0  # Store credits used for this order
     promo_code: Optional[str] = None  # Promo code used for this order
 
+def build_items_text(items: List[OrderItem]) -> str:
+    """One-line order summary, e.g. 2x PUBG UC (60 UC), 1x Netflix Premium"""
+    return ", ".join([f"{item.quantity}x {item.name}" + (f" ({item.variation})" if item.variation else "") for item in items])
+
 @api_router.post("/orders/create")
 async def create_order(order_data: CreateOrderRequest):
     # Validate required fields
@@ -1732,13 +1647,14 @@ async def create_order(order_data: CreateOrderRequest):
 
     formatted_phone = format_phone_number(order_data.customer_phone)
 
-    items_text = ", ".join([f"{item.quantity}x {item.name}" + (f" ({item.variation})" if item.variation else "") for item in order_data.items])
+    items_text = build_items_text(order_data.items)
 
     local_order = {
         "id": order_id,
         "customer_name": order_data.customer_name,
         "customer_phone": formatted_phone,
-        "customer_email": order_data.customer_email,
+        # Stored lowercased: customer stats, promo limits and referrals match on it
+        "customer_email": order_data.customer_email.strip().lower(),
         "items": [item.model_dump() for item in order_data.items],
         "total_amount": order_data.total_amount,
         "total": order_data.total_amount,  # Also save as 'total' for invoice compatibility
@@ -1749,11 +1665,22 @@ async def create_order(order_data: CreateOrderRequest):
         "payment_method": None,
         "credits_used": order_data.credits_used,
         "promo_code": order_data.promo_code,
+        "status_history": [],
+        "lookup_keys": [order_id],
         "created_at": datetime.now(timezone.utc).isoformat()
     }
 
     await db.orders.insert_one(local_order)
     
+    # Feed the live purchase ticker and admin event stream
+    ticker.record_order(local_order)
+    order_events.publish(ORDER_CREATED, local_order)
+    
+    try:
+        await customer_stats.record_order_created(db, local_order)
+    except Exception as e:
+        logger.warning(f"Failed to update customer stats for order {order_id}: {e}")
+    
     # Record promo code usage if a promo was used
     if order_data.promo_code:
         try:
@@ -1810,8 +1737,28 @@ async def create_order(order_data: CreateOrderRequest):
 
 @api_router.get("/orders")
 async def get_local_orders(current_user: dict = Depends(get_current_user)):
-    orders = await db.orders.find({}, {"_id": 0}).sort("created_at", -1).to_list(1000)
-    return orders
+    orders = await admin_db.orders.find({}, {"_id": 0, "lookup_keys": 0}).sort("created_at", -1).to_list(1000)
+    return json_response(orders)
+
+@api_router.post("/admin/stream-token")
+async def create_stream_token(current_user: dict = Depends(get_current_user)):
+    """Admin: Short-lived token for opening an SSE stream with EventSource (?token=)"""
+    token, expires_at = issue_stream_token(current_user["id"])
+    return {"token": token, "expires_at": expires_at.isoformat()}
+
+@api_router.get("/admin/orders/events")
+async def stream_admin_order_events(
+    request: Request,
+    last_event_id: Optional[str] = Header(None),
+    current_user: dict = Depends(get_current_user_for_stream)
+):
+    """Admin SSE stream of new orders, payment uploads and status changes"""
+    subscription = order_events.subscribe(last_event_id=last_event_id)
+    return StreamingResponse(
+        stream_events(request, subscription, order_events),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 # ==================== PAYMENT METHODS ====================
 
@@ -1920,6 +1867,8 @@ async def upload_payment_screenshot(order_id: str, data: PaymentScreenshotUpload
     try:
         # Get updated order
         updated_order = await db.orders.find_one({"id": order_id}, {"_id": 0})
+        order_events.publish(PAYMENT_UPLOADED, updated_order)
+        invoice_service.schedule_prerender(db, updated_order)
         
         # Collect all Discord webhooks from order items
         all_webhooks = []
@@ -1982,14 +1931,17 @@ async def complete_order(order_id: str, current_user: dict = Depends(get_current
             logger.warning(f"Failed to award credits for order {order_id}: {e}")
     
     # Update status to Completed with credits info
+    completed_at = datetime.now(timezone.utc).isoformat()
     await db.orders.update_one(
         {"id": order_id},
         {"$set": {
             "status": "Completed",
-            "completed_at": datetime.now(timezone.utc).isoformat(),
+            "completed_at": completed_at,
             "credits_awarded": credits_awarded
         }}
     )
+    order_events.publish(STATUS_CHANGED, {**order, "status": "Completed", "updated_at": completed_at})
+    await customer_stats.record_status_change(db, order, order.get("status"), "Completed")
     
     # Send invoice email to customer if email exists
     if customer_email:
@@ -2048,8 +2000,14 @@ async def complete_order(order_id: str, current_user: dict = Depends(get_current
             """
             text = f"Order #{order_id[:8]} Complete!\n\nYour order has been completed.\n{'You earned Rs ' + str(int(credits_awarded)) + ' in store credits!' if credits_awarded > 0 else ''}\nView Invoice: {invoice_url}\nLeave a Review: {trustpilot_url}"
             
+            # Attach the PDF invoice (cached render, so this is usually a file read)
+            attachments = None
+            invoice_pdf = await invoice_service.load_invoice_pdf(db, {**order, "status": "Completed"})
+            if invoice_pdf:
+                attachments = [(f"{invoice_service.invoice_number(order_id)}.pdf", invoice_pdf, "pdf")]
+            
             from email_service import send_email
-            send_email(customer_email, subject, html, text)
+            send_email(customer_email, subject, html, text, attachments=attachments)
         except Exception as e:
             print(f"Failed to send invoice email: {e}")
     
@@ -2061,20 +2019,16 @@ async def complete_order(order_id: str, current_user: dict = Depends(get_current
 
 @api_router.delete("/orders/{order_id}")
 async def delete_order(order_id: str, current_user: dict = Depends(get_current_user)):
-    """Delete an order - requires delete_orders permission"""
+    """Delete an order and its history, promo usage and invoices - requires delete_orders permission"""
     # Check permission
     if not check_permission(current_user, 'delete_orders'):
         raise HTTPException(status_code=403, detail="You don't have permission to delete orders")
     
-    # Check if order exists
-    order = await db.orders.find_one({"id": order_id})
-    if not order:
-        raise HTTPException(status_code=404, detail="Order not found")
-    
-    # Delete the order
-    result = await db.orders.delete_one({"id": order_id})
+    results = await order_bulk_ops.delete_orders(admin_db, [order_id])
     
-    if result.deleted_count == 0:
+    if results[order_id] == order_bulk_ops.NOT_FOUND:
+        raise HTTPException(status_code=404, detail="Order not found")
+    if results[order_id] != order_bulk_ops.DELETED:
         raise HTTPException(status_code=500, detail="Failed to delete order")
     
     logger.info(f"Order deleted by {current_user.get('username')}: {order_id}")
@@ -2083,10 +2037,11 @@ async def delete_order(order_id: str, current_user: dict = Depends(get_current_u
 
 class BulkDeleteRequest(BaseModel):
     order_ids: List[str]
+    archive: bool = False  # Move to orders_archive instead of deleting
 
 @api_router.post("/orders/bulk-delete")
 async def bulk_delete_orders(request: BulkDeleteRequest, current_user: dict = Depends(get_current_user)):
-    """Bulk delete orders - requires delete_orders permission"""
+    """Bulk delete (or archive) orders - requires delete_orders permission"""
     
     if not check_permission(current_user, 'delete_orders'):
         raise HTTPException(status_code=403, detail="You don't have permission to delete orders")
@@ -2094,34 +2049,34 @@ async def bulk_delete_orders(request: BulkDeleteRequest, current_user: dict = De
     if not request.order_ids:
         raise HTTPException(status_code=400, detail="No order IDs provided")
     
-    deleted_count = 0
-    failed_ids = []
+    results = await order_bulk_ops.bulk_order_operation(admin_db, request.order_ids, archive=request.archive)
     
-    for order_id in request.order_ids:
-        try:
-            result = await db.orders.delete_one({"id": order_id})
-            if result.deleted_count > 0:
-                deleted_count += 1
-                # Also delete tracking history
-                await db.order_status_history.delete_many({"order_id": order_id})
-            else:
-                failed_ids.append(order_id)
-        except Exception as e:
-            logger.error(f"Failed to delete order {order_id}: {e}")
-            failed_ids.append(order_id)
+    done = order_bulk_ops.ARCHIVED if request.archive else order_bulk_ops.DELETED
+    done_count = sum(1 for result in results.values() if result == done)
+    failed_ids = [order_id for order_id, result in results.items() if result != done]
     
-    logger.info(f"Bulk delete by {current_user.get('username')}: {deleted_count} orders deleted")
+    logger.info(f"Bulk {'archive' if request.archive else 'delete'} by {current_user.get('username')}: {done_count} orders")
     
     return {
-        "message": f"Successfully deleted {deleted_count} orders",
-        "deleted_count": deleted_count,
-        "failed_ids": failed_ids
+        "message": f"Successfully {done} {done_count} orders",
+        "deleted_count": done_count,
+        "failed_ids": failed_ids,
+        "results": results
     }
 
+@api_router.post("/orders/archive-old")
+async def archive_old_orders(current_user: dict = Depends(get_current_user)):
+    """Move finished orders past the retention age into orders_archive now"""
+    if not check_permission(current_user, 'delete_orders'):
+        raise HTTPException(status_code=403, detail="You don't have permission to archive orders")
+    
+    archived = await order_archive.archive_old_orders(admin_db)
+    return {"archived_count": archived, "older_than_days": order_archive.ARCHIVE_AFTER_DAYS}
+
 @api_router.get("/invoice/{order_id}")
 async def get_invoice(order_id: str):
     """Get invoice data for an order"""
-    order = await db.orders.find_one({"id": order_id}, {"_id": 0})
+    order = await order_archive.find_order(db, {"id": order_id})
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
     
@@ -2170,10 +2125,8 @@ class BlogPost(BaseModel):
 
 @api_router.get("/blog")
 async def get_blog_posts():
-    posts = await db.blog_posts.find({"is_published": True}).sort("created_at", -1).to_list(100)
-    for p in posts:
-        p.pop("_id", None)
-    return posts
+    posts = await db.blog_posts.find({"is_published": True}, {"_id": 0}).sort("created_at", -1).to_list(100)
+    return json_response(posts)
 
 @api_router.get("/blog/all/admin")
 async def get_all_blog_posts(current_user: dict = Depends(get_current_user)):
@@ -2198,6 +2151,8 @@ async def create_blog_post(post: BlogPost, current_user: dict = Depends(get_curr
     post_dict["created_at"] = datetime.now(timezone.utc).isoformat()
     post_dict["updated_at"] = post_dict["created_at"]
     await db.blog_posts.insert_one(post_dict)
+    sitemap_cache.invalidate(SITEMAP_BLOG)
+    await seo_store.refresh_blog(db, post_dict["id"])
     post_dict.pop("_id", None)
     return post_dict
 
@@ -2207,11 +2162,15 @@ async def update_blog_post(post_id: str, post: BlogPost, current_user: dict = De
     post_dict["id"] = post_id
     post_dict["updated_at"] = datetime.now(timezone.utc).isoformat()
     await db.blog_posts.update_one({"id": post_id}, {"$set": post_dict})
+    sitemap_cache.invalidate(SITEMAP_BLOG)
+    await seo_store.refresh_blog(db, post_id)
     return post_dict
 
 @api_router.delete("/blog/{post_id}")
 async def delete_blog_post(post_id: str, current_user: dict = Depends(get_current_user)):
     await db.blog_posts.delete_one({"id": post_id})
+    sitemap_cache.invalidate(SITEMAP_BLOG)
+    seo_store.remove_blog(post_id)
     return {"message": "Blog post deleted"}
 
 # ==================== SITE SETTINGS ====================
@@ -2294,6 +2253,41 @@ async def delete_promo_code(code_id: str, current_user: dict = Depends(get_curre
         raise HTTPException(status_code=404, detail="Promo code not found")
     return {"message": "Promo code deleted"}
 
+def calculate_promo_discount(promo: dict, subtotal: float) -> Tuple[float, dict]:
+    """Discount amount and its description for a promo that passed validation"""
+    discount = 0
+    discount_details = {}
+    
+    if promo["discount_type"] == "percentage":
+        discount = subtotal * (promo["discount_value"] / 100)
+        discount_details = {
+            "type": "percentage",
+            "value": promo["discount_value"],
+            "description": f"{promo['discount_value']}% off"
+        }
+    elif promo["discount_type"] == "fixed":
+        discount = min(promo["discount_value"], subtotal)
+        discount_details = {
+            "type": "fixed",
+            "value": promo["discount_value"],
+            "description": f"Rs {promo['discount_value']} off"
+        }
+    elif promo["discount_type"] == "buy_x_get_y":
+        buy_qty = promo.get("buy_quantity", 0)
+        get_qty = promo.get("get_quantity", 0)
+        discount_details = {
+            "type": "buy_x_get_y",
+            "buy_quantity": buy_qty,
+            "get_quantity": get_qty,
+            "description": f"Buy {buy_qty}, Get {get_qty} Free"
+        }
+    elif promo["discount_type"] == "free_shipping":
+        discount_details = {
+            "type": "free_shipping",
+            "description": "Free Shipping"
+        }
+    return discount, discount_details
+
 @api_router.post("/promo-codes/validate")
 async def validate_promo_code(
     code: str, 
@@ -2360,38 +2354,7 @@ async def validate_promo_code(
         if not cart_valid:
             raise HTTPException(status_code=400, detail="This promo code is not applicable to items in your cart")
     
-    # Calculate discount
-    discount = 0
-    discount_details = {}
-    
-    if promo["discount_type"] == "percentage":
-        discount = subtotal * (promo["discount_value"] / 100)
-        discount_details = {
-            "type": "percentage",
-            "value": promo["discount_value"],
-            "description": f"{promo['discount_value']}% off"
-        }
-    elif promo["discount_type"] == "fixed":
-        discount = min(promo["discount_value"], subtotal)
-        discount_details = {
-            "type": "fixed",
-            "value": promo["discount_value"],
-            "description": f"Rs {promo['discount_value']} off"
-        }
-    elif promo["discount_type"] == "buy_x_get_y":
-        buy_qty = promo.get("buy_quantity", 0)
-        get_qty = promo.get("get_quantity", 0)
-        discount_details = {
-            "type": "buy_x_get_y",
-            "buy_quantity": buy_qty,
-            "get_quantity": get_qty,
-            "description": f"Buy {buy_qty}, Get {get_qty} Free"
-        }
-    elif promo["discount_type"] == "free_shipping":
-        discount_details = {
-            "type": "free_shipping",
-            "description": "Free Shipping"
-        }
+    discount, discount_details = calculate_promo_discount(promo, subtotal)
     
     return {
         "valid": True,
@@ -2726,56 +2689,36 @@ async def delete_bundle(bundle_id: str, current_user: dict = Depends(get_current
 
 # ==================== RECENT PURCHASES (Live Ticker) ====================
 
-# Nepal cities for random location
-NEPAL_CITIES = ["Kathmandu", "Pokhara", "Lalitpur", "Biratnagar", "Bharatpur", "Birgunj", "Dharan", "Butwal", "Hetauda", "Bhaktapur", "Janakpur", "Nepalgunj", "Itahari", "Dhangadhi", "Tulsipur"]
-
 @api_router.get("/recent-purchases")
 async def get_recent_purchases(limit: int = 10):
-    """Get recent purchases for live ticker - mix of real orders and simulated"""
-    purchases = []
-    
-    # Get real recent orders (last 24 hours)
-    yesterday = (datetime.now(timezone.utc) - timedelta(hours=24)).isoformat()
-    real_orders = await db.orders.find(
-        {"created_at": {"$gte": yesterday}},
-        {"_id": 0, "customer_name": 1, "items_text": 1, "created_at": 1}
-    ).sort("created_at", -1).limit(5).to_list(5)
-    
-    for order in real_orders:
-        # Mask customer name for privacy (show first name only)
-        name_parts = order.get("customer_name", "Customer").split()
-        masked_name = name_parts[0] if name_parts else "Customer"
-        
-        purchases.append({
-            "name": masked_name,
-            "location": random.choice(NEPAL_CITIES),
-            "product": order.get("items_text", "Digital Product"),
-            "time_ago": "Just now",
-            "is_real": True
-        })
-    
-    # If we don't have enough real orders, add simulated ones
-    if len(purchases) < limit:
-        # Get some products for simulation
-        products = await db.products.find({"is_active": True}, {"_id": 0, "name": 1}).limit(20).to_list(20)
-        product_names = [p["name"] for p in products] if products else ["Netflix Premium", "Spotify Premium", "YouTube Premium"]
-        
-        # Common Nepali first names
-        names = ["Aarav", "Sita", "Ram", "Gita", "Bikash", "Anita", "Sunil", "Priya", "Rajesh", "Maya", "Dipak", "Sunita", "Anil", "Kamala", "Binod"]
-        
-        times_ago = ["2 min ago", "5 min ago", "8 min ago", "12 min ago", "15 min ago", "20 min ago", "25 min ago", "30 min ago"]
-        
-        while len(purchases) < limit:
-            purchases.append({
-                "name": random.choice(names),
-                "location": random.choice(NEPAL_CITIES),
-                "product": random.choice(product_names),
-                "time_ago": random.choice(times_ago),
-                "is_real": False
-            })
-    
-    random.shuffle(purchases)
-    return purchases[:limit]
+    """Get recent purchases for live ticker - mix of real orders and simulated (served from memory)"""
+    return ticker.snapshot(limit)
+
+@api_router.get("/recent-purchases/stream")
+async def stream_recent_purchases(request: Request):
+    """Server-sent events stream of new purchases so the ticker doesn't need to poll"""
+    queue = ticker.subscribe()
+
+    async def event_generator():
+        try:
+            while True:
+                if await request.is_disconnected():
+                    break
+                try:
+                    purchase = await asyncio.wait_for(queue.get(), timeout=TICKER_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    # Keep proxies from closing an idle connection
+                    yield ": heartbeat\n\n"
+                    continue
+                yield format_sse(purchase, event="purchase")
+        finally:
+            ticker.unsubscribe(queue)
+
+    return StreamingResponse(
+        event_generator(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 # ==================== WISHLIST ====================
 
@@ -2951,27 +2894,29 @@ async def get_newsletter_stats(current_user: dict = Depends(get_current_user)):
         "recent_week": recent
     }
 
+async def find_tracked_order(order_id: str, projection: dict) -> Optional[dict]:
+    """Order by internal id or Take.app id/number, for the public tracking endpoints"""
+    # lookup_keys holds the internal id and Take.app id/number - one indexed read per tier
+    order = await order_archive.find_order(db, {"lookup_keys": order_id}, projection)
+    if order is None and not order_timeline.backfill_done:
+        # Orders the startup migration hasn't reached yet have no lookup_keys
+        order = await db.orders.find_one({"lookup_keys": {"$exists": False}, "$or": [
+            {"id": order_id}, {"takeapp_order_id": order_id}, {"takeapp_order_number": order_id}
+        ]}, projection)
+    return order
+
 @api_router.get("/orders/track/{order_id}")
 async def track_order(order_id: str):
     """Public order tracking by order ID or order number"""
-    order = await db.orders.find_one(
-        {"$or": [
-            {"id": order_id}, 
-            {"takeapp_order_id": order_id},
-            {"takeapp_order_number": order_id}
-        ]},
-        {"_id": 0}
+    order = await find_tracked_order(
+        order_id,
+        {"_id": 0, "id": 1, "takeapp_order_number": 1, "status": 1, "items_text": 1,
+         "total_amount": 1, "created_at": 1, "status_history": 1}
     )
     
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
     
-    # Get status history
-    history = await db.order_status_history.find(
-        {"order_id": order.get("id")},
-        {"_id": 0}
-    ).sort("created_at", 1).to_list(50)
-    
     # Mask sensitive data for public view
     return {
         "id": order.get("id"),
@@ -2980,27 +2925,66 @@ async def track_order(order_id: str):
         "items_text": order.get("items_text"),
         "total_amount": order.get("total_amount"),
         "created_at": order.get("created_at"),
-        "status_history": history,
+        "status_history": order.get("status_history", []),
         "estimated_delivery": "Instant delivery after payment confirmation"
     }
 
+async def _invoice_response(order_id: str, fmt: str, if_none_match: Optional[str]):
+    order = await order_archive.find_order(db, {"id": order_id})
+    if not order:
+        raise HTTPException(status_code=404, detail="Order not found")
+    
+    artifact = await invoice_service.get_invoice_artifact(db, order, fmt)
+    etag = f'"{artifact["sha256"]}"'
+    headers = {"ETag": etag, "Cache-Control": "private, max-age=300"}
+    if if_none_match == etag:
+        return Response(status_code=304, headers=headers)
+    
+    filename = f"{invoice_service.invoice_number(order_id)}.{fmt}"
+    headers["Content-Disposition"] = f'inline; filename="{filename}"'
+    return FileResponse(artifact["path"], media_type=artifact["media_type"], headers=headers)
+
+@api_router.get("/invoice/{order_id}/pdf")
+async def get_invoice_pdf(order_id: str, if_none_match: Optional[str] = Header(None)):
+    """Download the order invoice as PDF (rendered once per order version)"""
+    return await _invoice_response(order_id, "pdf", if_none_match)
+
+@api_router.get("/invoice/{order_id}/html")
+async def get_invoice_html(order_id: str, if_none_match: Optional[str] = Header(None)):
+    """Printable HTML invoice (rendered once per order version)"""
+    return await _invoice_response(order_id, "html", if_none_match)
+
+@api_router.get("/orders/track/{order_id}/events")
+async def stream_order_tracking_events(order_id: str, request: Request, last_event_id: Optional[str] = Header(None)):
+    """Public SSE stream of status changes for a single order"""
+    order = await find_tracked_order(order_id, {"_id": 0, "id": 1})
+    if not order:
+        raise HTTPException(status_code=404, detail="Order not found")
+    
+    internal_id = order["id"]
+    subscription = order_events.subscribe(
+        event_filter=lambda event: event["order"].get("id") in (internal_id, None),
+        last_event_id=last_event_id
+    )
+    return StreamingResponse(
+        stream_events(request, subscription, order_events, transform=public_order_event),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @api_router.put("/orders/{order_id}/status")
 async def update_order_status(order_id: str, status_data: OrderStatusUpdate, current_user: dict = Depends(get_current_user)):
     """Admin: Update order status"""
-    order = await db.orders.find_one({"id": order_id})
+    # Archived orders can still be corrected; the writes go to whichever tier holds the order
+    order, orders = await order_archive.find_order_with_collection(db, {"id": order_id})
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
     
     old_status = order.get("status", "pending")
     new_status = status_data.status.lower()
     
-    # Update order status
-    await db.orders.update_one(
-        {"id": order_id},
-        {"$set": {"status": status_data.status, "updated_at": datetime.now(timezone.utc).isoformat()}}
-    )
-    
-    # Add to status history
+    # Update order status and append to the embedded status history in one atomic write
+    updated_at = datetime.now(timezone.utc).isoformat()
     history_entry = {
         "id": str(uuid.uuid4()),
         "order_id": order_id,
@@ -3008,9 +2992,17 @@ async def update_order_status(order_id: str, status_data: OrderStatusUpdate, cur
         "new_status": status_data.status,
         "note": status_data.note,
         "updated_by": current_user.get("email"),
-        "created_at": datetime.now(timezone.utc).isoformat()
+        "created_at": updated_at
     }
-    await db.order_status_history.insert_one(history_entry)
+    await orders.update_one(
+        {"id": order_id},
+        {
+            "$set": {"status": status_data.status, "updated_at": updated_at},
+            "$push": push_status_history(history_entry)
+        }
+    )
+    order_events.publish(STATUS_CHANGED, {**order, "status": status_data.status, "updated_at": updated_at})
+    await customer_stats.record_status_change(db, order, old_status, status_data.status)
     
     credits_deducted = 0
     credits_awarded = 0
@@ -3024,7 +3016,7 @@ async def update_order_status(order_id: str, status_data: OrderStatusUpdate, cur
                 await use_credits(customer_email, credits_used, order_id)
                 credits_deducted = credits_used
                 # Mark credits as deducted
-                await db.orders.update_one(
+                await orders.update_one(
                     {"id": order_id},
                     {"$set": {"credits_pending": False, "credits_deducted": True}}
                 )
@@ -3063,24 +3055,17 @@ async def update_order_status(order_id: str, status_data: OrderStatusUpdate, cur
 @api_router.get("/orders/{order_id}")
 async def get_order_details(order_id: str, current_user: dict = Depends(get_current_user)):
     """Admin: Get full order details"""
-    order = await db.orders.find_one({"id": order_id}, {"_id": 0})
+    order = await order_archive.find_order(db, {"id": order_id}, {"_id": 0, "lookup_keys": 0})
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
     
-    history = await db.order_status_history.find(
-        {"order_id": order_id},
-        {"_id": 0}
-    ).sort("created_at", 1).to_list(50)
-    
-    order["status_history"] = history
+    order.setdefault("status_history", [])
     return order
 
 # ==================== ANALYTICS DASHBOARD ====================
 
-@api_router.get("/analytics/overview")
-async def get_analytics_overview(current_user: dict = Depends(get_current_user)):
-    """Get overview analytics for admin dashboard"""
-    now = datetime.now(timezone.utc)
+def analytics_periods(now: datetime) -> Tuple[str, str, str, str, str]:
+    """(today_start, week_ago, month_ago, last_month_start, last_month_end) as ISO strings"""
     today_start = now.replace(hour=0, minute=0, second=0, microsecond=0).isoformat()
     week_ago = (now - timedelta(days=7)).isoformat()
     month_ago = (now - timedelta(days=30)).isoformat()
@@ -3090,57 +3075,56 @@ async def get_analytics_overview(current_user: dict = Depends(get_current_user))
     last_month_end = (first_of_this_month - timedelta(days=1)).isoformat()
     last_month_start = first_of_this_month.replace(month=first_of_this_month.month - 1 if first_of_this_month.month > 1 else 12, 
                                                     year=first_of_this_month.year if first_of_this_month.month > 1 else first_of_this_month.year - 1).isoformat()
-    
-    # Today's stats
-    today_orders = await db.orders.count_documents({"created_at": {"$gte": today_start}})
-    today_revenue_cursor = await db.orders.aggregate([
-        {"$match": {"created_at": {"$gte": today_start}, "status": {"$ne": "cancelled"}}},
-        {"$group": {"_id": None, "total": {"$sum": "$total_amount"}}}
-    ]).to_list(1)
-    today_revenue = today_revenue_cursor[0]["total"] if today_revenue_cursor else 0
-    
-    # This week stats
-    week_orders = await db.orders.count_documents({"created_at": {"$gte": week_ago}})
-    week_revenue_cursor = await db.orders.aggregate([
-        {"$match": {"created_at": {"$gte": week_ago}, "status": {"$ne": "cancelled"}}},
-        {"$group": {"_id": None, "total": {"$sum": "$total_amount"}}}
-    ]).to_list(1)
-    week_revenue = week_revenue_cursor[0]["total"] if week_revenue_cursor else 0
-    
-    # This month stats
-    month_orders = await db.orders.count_documents({"created_at": {"$gte": month_ago}})
-    month_revenue_cursor = await db.orders.aggregate([
-        {"$match": {"created_at": {"$gte": month_ago}, "status": {"$ne": "cancelled"}}},
-        {"$group": {"_id": None, "total": {"$sum": "$total_amount"}}}
-    ]).to_list(1)
-    month_revenue = month_revenue_cursor[0]["total"] if month_revenue_cursor else 0
-    
-    # Last month stats
-    last_month_orders = await db.orders.count_documents({
-        "created_at": {"$gte": last_month_start, "$lte": last_month_end}
-    })
-    last_month_revenue_cursor = await db.orders.aggregate([
-        {"$match": {"created_at": {"$gte": last_month_start, "$lte": last_month_end}, "status": {"$ne": "cancelled"}}},
-        {"$group": {"_id": None, "total": {"$sum": "$total_amount"}}}
-    ]).to_list(1)
-    last_month_revenue = last_month_revenue_cursor[0]["total"] if last_month_revenue_cursor else 0
-    
-    # Total stats (all time)
-    total_orders = await db.orders.count_documents({})
-    total_revenue_cursor = await db.orders.aggregate([
-        {"$match": {"status": {"$ne": "cancelled"}}},
+    return today_start, week_ago, month_ago, last_month_start, last_month_end
+
+async def revenue_total(match: dict) -> float:
+    """Sum of total_amount over the non-cancelled orders matching `match`, archived ones included"""
+    result = await order_archive.aggregate_tiers(reporting_db, [
+        {"$match": {**match, "status": {"$ne": "cancelled"}}},
         {"$group": {"_id": None, "total": {"$sum": "$total_amount"}}}
-    ]).to_list(1)
-    total_revenue = total_revenue_cursor[0]["total"] if total_revenue_cursor else 0
-    
-    # Website visits
-    today_visits = await db.visits.count_documents({"date": today_start[:10]})
-    week_visits = await db.visits.count_documents({"created_at": {"$gte": week_ago}})
-    month_visits = await db.visits.count_documents({"created_at": {"$gte": month_ago}})
-    last_month_visits = await db.visits.count_documents({
-        "created_at": {"$gte": last_month_start, "$lte": last_month_end}
-    })
-    total_visits = await db.visits.count_documents({})
+    ], 1)
+    return sum(group["total"] for group in result)
+
+async def estimated_order_count() -> int:
+    hot, archived = await asyncio.gather(
+        reporting_db.orders.estimated_document_count(),
+        reporting_db.orders_archive.estimated_document_count()
+    )
+    return hot + archived
+
+async def analytics_overview() -> dict:
+    now = datetime.now(timezone.utc)
+    today_start, week_ago, month_ago, last_month_start, last_month_end = analytics_periods(now)
+    today = {"created_at": {"$gte": today_start}}
+    week = {"created_at": {"$gte": week_ago}}
+    month = {"created_at": {"$gte": month_ago}}
+    last_month = {"created_at": {"$gte": last_month_start, "$lte": last_month_end}}
+    visits = reporting_db.visits
+    
+    def count_orders(match: dict):
+        return order_archive.count_tiers(reporting_db, match)
+    
+    # The queries are independent, so they all go out at once
+    (
+        today_orders, today_revenue,
+        week_orders, week_revenue,
+        month_orders, month_revenue,
+        last_month_orders, last_month_revenue,
+        total_orders, total_revenue,
+        today_visits, week_visits, month_visits, last_month_visits, total_visits,
+    ) = await asyncio.gather(
+        count_orders(today), revenue_total(today),
+        count_orders(week), revenue_total(week),
+        count_orders(month), revenue_total(month),
+        count_orders(last_month), revenue_total(last_month),
+        # Total stats (all time) - counts from collection metadata rather than a full scan
+        estimated_order_count(), revenue_total({}),
+        visits.count_documents({"date": today_start[:10]}),
+        visits.count_documents(week),
+        visits.count_documents(month),
+        visits.count_documents(last_month),
+        visits.estimated_document_count(),
+    )
     
     return {
         "today": {"orders": today_orders, "revenue": today_revenue},
@@ -3157,6 +3141,11 @@ async def get_analytics_overview(current_user: dict = Depends(get_current_user))
         }
     }
 
+@api_router.get("/analytics/overview")
+async def get_analytics_overview(current_user: dict = Depends(get_current_user)):
+    """Get overview analytics for admin dashboard"""
+    return await analytics_overview()
+
 @api_router.post("/track-visit")
 async def track_visit(request: Request):
     """Track a website visit - called from frontend"""
@@ -3187,9 +3176,7 @@ async def track_visit(request: Request):
         logger.error(f"Error tracking visit: {e}")
         return {"success": False}
 
-@api_router.get("/analytics/top-products")
-async def get_top_products(current_user: dict = Depends(get_current_user), limit: int = 10):
-    """Get top selling products - only counts completed orders"""
+async def top_products(limit: int = 10) -> List[dict]:
     # Aggregate orders to find top products - only from completed orders
     pipeline = [
         {"$match": {"status": {"$in": ["completed", "Completed", "delivered"]}}},
@@ -3199,24 +3186,23 @@ async def get_top_products(current_user: dict = Depends(get_current_user), limit
             "total_quantity": {"$sum": "$items.quantity"},
             "total_revenue": {"$sum": {"$multiply": ["$items.price", "$items.quantity"]}}
         }},
-        {"$sort": {"total_quantity": -1}},
-        {"$limit": limit}
     ]
     
-    top_products = await db.orders.aggregate(pipeline).to_list(limit)
+    # Archived orders count too; the per-tier groups are merged before ranking
+    merged = {}
+    for group in await order_archive.aggregate_tiers(reporting_db, pipeline):
+        product = merged.setdefault(group["_id"], {"name": group["_id"], "quantity": 0, "revenue": 0})
+        product["quantity"] += group["total_quantity"]
+        product["revenue"] += group["total_revenue"]
     
-    return [
-        {
-            "name": p["_id"],
-            "quantity": p["total_quantity"],
-            "revenue": p["total_revenue"]
-        }
-        for p in top_products
-    ]
+    return sorted(merged.values(), key=lambda p: p["quantity"], reverse=True)[:limit]
 
-@api_router.get("/analytics/revenue-chart")
-async def get_revenue_chart(current_user: dict = Depends(get_current_user), days: int = 30):
-    """Get daily revenue for chart"""
+@api_router.get("/analytics/top-products")
+async def get_top_products(current_user: dict = Depends(get_current_user), limit: int = 10):
+    """Get top selling products - only counts completed orders"""
+    return await top_products(limit)
+
+async def revenue_chart(days: int = 30) -> List[dict]:
     now = datetime.now(timezone.utc)
     start_date = (now - timedelta(days=days)).isoformat()
     
@@ -3230,15 +3216,18 @@ async def get_revenue_chart(current_user: dict = Depends(get_current_user), days
             "orders": {"$sum": 1},
             "revenue": {"$sum": "$total_amount"}
         }},
-        {"$sort": {"_id": 1}}
     ]
     
-    daily_data = await db.orders.aggregate(pipeline).to_list(days)
+    # Ranges past the archive cutoff need the archived days too
+    data_map = {}
+    for d in await order_archive.aggregate_tiers(reporting_db, pipeline):
+        day = data_map.setdefault(d["_id"], {"orders": 0, "revenue": 0})
+        day["orders"] += d["orders"]
+        day["revenue"] += d["revenue"]
     
     # Fill in missing dates with zero values
     result = []
     current = now - timedelta(days=days)
-    data_map = {d["_id"]: d for d in daily_data}
     
     for i in range(days + 1):
         date_str = current.strftime("%Y-%m-%d")
@@ -3254,63 +3243,69 @@ async def get_revenue_chart(current_user: dict = Depends(get_current_user), days
     
     return result
 
-@api_router.get("/analytics/order-status")
-async def get_order_status_breakdown(current_user: dict = Depends(get_current_user)):
-    """Get order status breakdown"""
+@api_router.get("/analytics/revenue-chart")
+async def get_revenue_chart(current_user: dict = Depends(get_current_user), days: int = 30):
+    """Get daily revenue for chart"""
+    return await revenue_chart(days)
+
+async def order_status_breakdown() -> dict:
+    # Sorting on status first lets the count run over the (status, created_at) index alone
     pipeline = [
+        {"$sort": {"status": 1}},
         {"$group": {
             "_id": "$status",
             "count": {"$sum": 1}
         }}
     ]
     
-    status_data = await db.orders.aggregate(pipeline).to_list(10)
-    
-    return {
-        item["_id"] or "pending": item["count"]
-        for item in status_data
-    }
+    breakdown = {}
+    for item in await order_archive.aggregate_tiers(reporting_db, pipeline, 10):
+        status = item["_id"] or "pending"
+        breakdown[status] = breakdown.get(status, 0) + item["count"]
+    return breakdown
 
-@api_router.get("/analytics/profit")
-async def get_profit_analytics(current_user: dict = Depends(get_current_user)):
-    """Get profit analytics based on cost price vs selling price"""
-    now = datetime.now(timezone.utc)
-    today_start = now.replace(hour=0, minute=0, second=0, microsecond=0).isoformat()
-    week_ago = (now - timedelta(days=7)).isoformat()
-    month_ago = (now - timedelta(days=30)).isoformat()
-    
-    # Calculate last month date range
-    first_of_this_month = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-    last_month_end = (first_of_this_month - timedelta(days=1)).isoformat()
-    last_month_start = first_of_this_month.replace(month=first_of_this_month.month - 1 if first_of_this_month.month > 1 else 12, 
-                                                    year=first_of_this_month.year if first_of_this_month.month > 1 else first_of_this_month.year - 1).isoformat()
-    
-    # Get all completed orders (case-insensitive status check)
-    all_orders = await db.orders.find({}).to_list(10000)
-    completed_orders = [o for o in all_orders if (o.get("status", "").lower() in ["completed", "delivered"])]
-    
-    # Get all products to map cost prices
-    products = await db.products.find({}, {"_id": 0}).to_list(1000)
-    
-    # Create variation cost price lookup
+@api_router.get("/analytics/order-status")
+async def get_order_status_breakdown(current_user: dict = Depends(get_current_user)):
+    """Get order status breakdown"""
+    return await order_status_breakdown()
+
+def build_cost_lookup(products: List[dict]) -> dict:
+    """"<product id>_<variation id>" -> cost price"""
     cost_lookup = {}
     for product in products:
         for var in product.get("variations", []):
             key = f"{product['id']}_{var['id']}"
             cost_lookup[key] = var.get("cost_price", 0) or 0
+    return cost_lookup
+
+def calculate_profit(orders: List[dict], cost_lookup: dict) -> dict:
+    """Revenue, cost (from the variations' cost prices) and profit of `orders`"""
+    total_revenue = 0
+    total_cost = 0
+    for order in orders:
+        total_revenue += order.get("total_amount", 0)
+        for item in order.get("items", []):
+            key = f"{item.get('product_id', '')}_{item.get('variation_id', '')}"
+            cost = cost_lookup.get(key, 0)
+            qty = item.get("quantity", 1)
+            total_cost += cost * qty
+    return {"revenue": total_revenue, "cost": total_cost, "profit": total_revenue - total_cost}
+
+async def profit_analytics() -> dict:
+    today_start, week_ago, month_ago, last_month_start, last_month_end = analytics_periods(datetime.now(timezone.utc))
+    
+    # Get all completed orders (the usual status spellings, so it stays on the status index)
+    # (archived ones too, for the all-time figures) and all products to map cost prices
+    completed_query = {"status": {"$in": customer_stats.COMPLETED_STATUS_VARIANTS}}
+    completed_projection = {"_id": 0, "created_at": 1, "total_amount": 1, "items": 1}
+    hot_orders, archived_orders, products = await asyncio.gather(
+        reporting_db.orders.find(completed_query, completed_projection).to_list(10000),
+        reporting_db.orders_archive.find(completed_query, completed_projection).to_list(10000),
+        reporting_db.products.find({}, {"_id": 0}).to_list(1000),
+    )
+    completed_orders = hot_orders + archived_orders
     
-    # Calculate profits
-    def calculate_profit(orders):
-        total_revenue = 0
-        total_cost = 0
-        for order in orders:
-            total_revenue += order.get("total_amount", 0)
-            for item in order.get("items", []):
-                key = f"{item.get('product_id', '')}_{item.get('variation_id', '')}"
-                cost = cost_lookup.get(key, 0)
-                qty = item.get("quantity", 1)
-                total_cost += cost * qty
-        return {"revenue": total_revenue, "cost": total_cost, "profit": total_revenue - total_cost}
+    cost_lookup = build_cost_lookup(products)
     
     # Filter orders by time periods
     today_orders = [o for o in completed_orders if o.get("created_at", "") >= today_start]
@@ -3319,13 +3314,161 @@ async def get_profit_analytics(current_user: dict = Depends(get_current_user)):
     last_month_orders = [o for o in completed_orders if last_month_start <= o.get("created_at", "") <= last_month_end]
     
     return {
-        "today": calculate_profit(today_orders),
-        "week": calculate_profit(week_orders),
-        "month": calculate_profit(month_orders),
-        "lastMonth": calculate_profit(last_month_orders),
-        "total": calculate_profit(completed_orders),
-        "all_time": calculate_profit(completed_orders)
+        "today": calculate_profit(today_orders, cost_lookup),
+        "week": calculate_profit(week_orders, cost_lookup),
+        "month": calculate_profit(month_orders, cost_lookup),
+        "lastMonth": calculate_profit(last_month_orders, cost_lookup),
+        "total": calculate_profit(completed_orders, cost_lookup),
+        "all_time": calculate_profit(completed_orders, cost_lookup)
+    }
+
+@api_router.get("/analytics/profit")
+async def get_profit_analytics(current_user: dict = Depends(get_current_user)):
+    """Get profit analytics based on cost price vs selling price"""
+    return await profit_analytics()
+
+# Sections that don't finish within the budget come back as null, marked "timeout"
+DASHBOARD_BUDGET_MS = float(os.environ.get("ANALYTICS_DASHBOARD_BUDGET_MS", "3000"))
+DASHBOARD_SECTIONS = ("overview", "profit", "revenue_chart", "order_status", "top_products")
+
+async def timed_section(query: Callable[[], Awaitable]) -> Tuple[Any, Optional[Exception], float]:
+    """(result, error, finished_at) - the section records its own end time, so it is there whenever the task is done"""
+    try:
+        return await query(), None, time.perf_counter()
+    except Exception as e:
+        return None, e, time.perf_counter()
+
+@api_router.get("/analytics/dashboard")
+async def get_analytics_dashboard(
+    current_user: dict = Depends(get_current_user),
+    days: int = 30,
+    limit: int = 10,
+    budget_ms: Optional[float] = None,
+    sections: Optional[str] = None
+):
+    """Analytics sections (all, or a comma-separated `sections` list) queried concurrently under one time budget"""
+    budget_ms = DASHBOARD_BUDGET_MS if budget_ms is None else max(1.0, min(budget_ms, DASHBOARD_BUDGET_MS))
+    requested = [name.strip() for name in sections.split(",") if name.strip()] if sections else DASHBOARD_SECTIONS
+    unknown = [name for name in requested if name not in DASHBOARD_SECTIONS]
+    if unknown or not requested:
+        raise HTTPException(status_code=400, detail=f"sections must be from {', '.join(DASHBOARD_SECTIONS)}")
+    queries = {
+        "overview": analytics_overview,
+        "profit": profit_analytics,
+        "revenue_chart": lambda: revenue_chart(days),
+        "order_status": order_status_breakdown,
+        "top_products": lambda: top_products(limit),
     }
+    started = time.perf_counter()
+    tasks = {}
+    # Each task copies the context here, so the driver enforces the budget on every
+    # query (and the server kills them via maxTimeMS); the wait below only stops the rest
+    with database.time_budget(budget_ms / 1000):
+        for name in dict.fromkeys(requested):
+            tasks[name] = asyncio.create_task(timed_section(queries[name]))
+    
+    _, pending = await asyncio.wait(tasks.values(), timeout=budget_ms / 1000)
+    for task in pending:
+        task.cancel()
+    
+    result = {}
+    timings = {}
+    for name, task in tasks.items():
+        result[name] = None
+        if task in pending:
+            timings[name] = {"status": "timeout", "ms": round(budget_ms, 1)}
+            continue
+        value, error, finished_at = task.result()
+        elapsed_ms = round((finished_at - started) * 1000, 1)
+        if getattr(error, "timeout", False):
+            # The driver's deadline fired before the outer wait noticed
+            timings[name] = {"status": "timeout", "ms": elapsed_ms}
+        elif error is not None:
+            logger.error(f"Analytics dashboard section {name} failed: {error}")
+            timings[name] = {"status": "error", "ms": elapsed_ms}
+        else:
+            result[name] = value
+            timings[name] = {"status": "ok", "ms": elapsed_ms}
+    
+    result["sections"] = timings
+    result["partial"] = any(timing["status"] != "ok" for timing in timings.values())
+    result["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    return result
+
+SLOW_QUERY_SORTS = ("total_ms", "count", "avg_ms", "max_ms")
+
+@api_router.get("/admin/slow-queries")
+async def get_slow_queries(limit: int = 20, sort: str = "total_ms", current_user: dict = Depends(get_current_user)):
+    """Admin: Slowest MongoDB query shapes since startup (or the last reset), with their plans"""
+    if sort not in SLOW_QUERY_SORTS:
+        raise HTTPException(status_code=400, detail=f"sort must be one of {', '.join(SLOW_QUERY_SORTS)}")
+    return query_profiler.profiler.report(limit=max(1, min(limit, 200)), sort=sort)
+
+@api_router.delete("/admin/slow-queries")
+async def reset_slow_queries(current_user: dict = Depends(get_current_user)):
+    """Admin: Clear the slow query report"""
+    query_profiler.profiler.reset()
+    return {"message": "Slow query report cleared"}
+
+@api_router.get("/admin/loop-stalls")
+async def get_loop_stalls(current_user: dict = Depends(get_current_user)):
+    """Admin: Recent event loop stalls with the route and stack that caused them"""
+    return loop_watchdog.watchdog.report()
+
+@api_router.post("/admin/profiling/token")
+async def create_profiling_token(minutes: int = 10, current_user: dict = Depends(get_current_user)):
+    """Admin: Signed header value that profiles any request it is sent with"""
+    token, expires_at = profiling.issue_token(minutes)
+    return {"header": "X-Profile-Token", "value": token, "expires_at": expires_at.isoformat()}
+
+@api_router.post("/admin/profiling/cpu")
+async def start_cpu_profile(seconds: float = 10, all_threads: bool = False, current_user: dict = Depends(get_current_user)):
+    """Admin: Sample the event loop (or every thread) for a time window"""
+    report = profiling.cpu_profiler.start_window(seconds, all_threads)
+    if report is None:
+        raise HTTPException(status_code=429, detail="Too many profiles running")
+    return report.summary()
+
+@api_router.get("/admin/profiling/reports")
+async def list_cpu_profiles(current_user: dict = Depends(get_current_user)):
+    """Admin: Recent CPU profiles, newest first"""
+    return [report.summary() for report in reversed(profiling.cpu_profiler.reports)]
+
+@api_router.get("/admin/profiling/reports/{report_id}")
+async def get_cpu_profile(report_id: str, format: str = "folded", current_user: dict = Depends(get_current_user)):
+    """Admin: A CPU profile as folded stacks (flamegraph.pl / speedscope) or a JSON summary"""
+    report = profiling.cpu_profiler.get(report_id)
+    if not report:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    if format == "json":
+        return report.summary()
+    return Response(
+        content=report.folded(),
+        media_type="text/plain",
+        headers={"Content-Disposition": f'attachment; filename="profile-{report.id}.folded"'}
+    )
+
+@api_router.post("/admin/profiling/memory/start")
+async def start_memory_tracing(frames: int = 1, current_user: dict = Depends(get_current_user)):
+    """Admin: Start tracemalloc (slows allocations down until stopped)"""
+    profiling.memory_profiler.start(frames)
+    return {"message": "Memory tracing started", "running": True}
+
+@api_router.post("/admin/profiling/memory/stop")
+async def stop_memory_tracing(current_user: dict = Depends(get_current_user)):
+    """Admin: Stop tracemalloc and drop its snapshots"""
+    profiling.memory_profiler.stop()
+    return {"message": "Memory tracing stopped", "running": False}
+
+@api_router.get("/admin/profiling/memory")
+async def get_memory_snapshot(diff: bool = False, limit: int = 25, group_by: str = "module",
+                              current_user: dict = Depends(get_current_user)):
+    """Admin: Allocations by module (or line), optionally as a diff against the previous snapshot"""
+    if not profiling.memory_profiler.running:
+        raise HTTPException(status_code=400, detail="Memory tracing is not running")
+    if group_by not in ("module", "line"):
+        raise HTTPException(status_code=400, detail="group_by must be module or line")
+    return await profiling.memory_profiler.report(diff=diff, limit=max(1, min(limit, 200)), group_by=group_by)
 
 # ==================== GOOGLE SHEETS ====================
 
@@ -3338,7 +3481,7 @@ async def test_google_sheets(current_user: dict = Depends(get_current_user)):
 async def sync_all_to_sheets(current_user: dict = Depends(get_current_user)):
     """Sync all customers and orders to Google Sheets"""
     # Sync all customers
-    customers = await db.customers.find({}, {"_id": 0}).to_list(10000)
+    customers = await admin_db.customers.find({}, {"_id": 0}).to_list(10000)
     customers_synced = 0
     for customer in customers:
         try:
@@ -3348,7 +3491,7 @@ async def sync_all_to_sheets(current_user: dict = Depends(get_current_user)):
             logger.error(f"Failed to sync customer {customer.get('email')}: {e}")
     
     # Sync all orders
-    orders = await db.orders.find({}, {"_id": 0}).to_list(10000)
+    orders = await admin_db.orders.find({}, {"_id": 0}).to_list(10000)
     orders_synced = 0
     for order in orders:
         try:
@@ -3367,126 +3510,47 @@ async def sync_all_to_sheets(current_user: dict = Depends(get_current_user)):
 
 from fastapi.responses import Response
 
+def _sitemap_response(sitemap_file, accept_encoding: Optional[str], if_none_match: Optional[str]):
+    encoding, body = sitemap_file.select(accept_encoding)
+    etag = sitemap_file.etag(encoding)
+    headers = {"ETag": etag, "Cache-Control": "public, max-age=3600", "Vary": "Accept-Encoding"}
+    if if_none_match == etag:
+        return Response(status_code=304, headers=headers)
+    if encoding != IDENTITY:
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type="application/xml", headers=headers)
+
 @api_router.get("/sitemap.xml")
-async def get_sitemap():
-    """Generate dynamic sitemap for SEO"""
-    base_url = os.environ.get("SITE_URL", "https://gameshopnepal.com")
-    
-    # Static pages
-    static_pages = [
-        {"loc": "/", "priority": "1.0", "changefreq": "daily"},
-        {"loc": "/about", "priority": "0.7", "changefreq": "monthly"},
-        {"loc": "/faq", "priority": "0.6", "changefreq": "monthly"},
-        {"loc": "/terms", "priority": "0.5", "changefreq": "monthly"},
-        {"loc": "/blog", "priority": "0.8", "changefreq": "weekly"},
-    ]
-    
-    # Get all active products
-    products = await db.products.find({"is_active": True}, {"slug": 1}).to_list(1000)
-    
-    # Get all published blog posts
-    blog_posts = await db.blog_posts.find({"is_published": True}, {"slug": 1}).to_list(100)
-    
-    # Get all categories
-    categories = await db.categories.find({}, {"slug": 1}).to_list(100)
-    
-    # Build sitemap XML
-    xml_content = '<?xml version="1.0" encoding="UTF-8"?>\n'
-    xml_content += '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
-    
-    # Add static pages
-    for page in static_pages:
-        xml_content += f'''  <url>
-    <loc>{base_url}{page["loc"]}</loc>
-    <changefreq>{page["changefreq"]}</changefreq>
-    <priority>{page["priority"]}</priority>
-  </url>\n'''
-    
-    # Add products
-    for product in products:
-        if product.get("slug"):
-            xml_content += f'''  <url>
-    <loc>{base_url}/product/{product["slug"]}</loc>
-    <changefreq>weekly</changefreq>
-    <priority>0.9</priority>
-  </url>\n'''
-    
-    # Add blog posts
-    for post in blog_posts:
-        if post.get("slug"):
-            xml_content += f'''  <url>
-    <loc>{base_url}/blog/{post["slug"]}</loc>
-    <changefreq>monthly</changefreq>
-    <priority>0.7</priority>
-  </url>\n'''
-    
-    # Add categories
-    for category in categories:
-        if category.get("slug"):
-            xml_content += f'''  <url>
-    <loc>{base_url}/category/{category["slug"]}</loc>
-    <changefreq>weekly</changefreq>
-    <priority>0.8</priority>
-  </url>\n'''
-    
-    xml_content += '</urlset>'
-    
-    return Response(content=xml_content, media_type="application/xml")
+async def get_sitemap(accept_encoding: Optional[str] = Header(None), if_none_match: Optional[str] = Header(None)):
+    """Sitemap (or sitemap index once the catalog outgrows one file), served from cache"""
+    sitemap_file = await sitemap_cache.get_file(db, "sitemap.xml")
+    return _sitemap_response(sitemap_file, accept_encoding, if_none_match)
+
+@api_router.get("/sitemap-{page}.xml")
+async def get_sitemap_page(page: int, accept_encoding: Optional[str] = Header(None), if_none_match: Optional[str] = Header(None)):
+    """One file of a split sitemap"""
+    sitemap_file = await sitemap_cache.get_file(db, f"sitemap-{page}.xml")
+    if not sitemap_file:
+        raise HTTPException(status_code=404, detail="Sitemap not found")
+    return _sitemap_response(sitemap_file, accept_encoding, if_none_match)
+
+class SeoMetaBulkRequest(BaseModel):
+    products: List[str] = []
+    blog: List[str] = []
+
+SEO_BULK_LIMIT = 5000
 
 @api_router.get("/seo/meta/{page_type}/{slug}")
 async def get_seo_meta(page_type: str, slug: str):
     """Get SEO meta data for a specific page"""
-    if page_type == "product":
-        product = await db.products.find_one({"slug": slug}, {"_id": 0})
-        if product:
-            # Get lowest price from variations
-            min_price = min([v.get("price", 0) for v in product.get("variations", [])]) if product.get("variations") else 0
-            
-            return {
-                "title": f"{product['name']} - Buy Online | GameShop Nepal",
-                "description": f"Buy {product['name']} at the best price in Nepal. Starting from Rs {min_price}. Instant delivery, 100% genuine products.",
-                "keywords": f"{product['name']}, buy {product['name']} Nepal, {product['name']} price Nepal, digital products Nepal",
-                "og_image": product.get("image_url"),
-                "schema": {
-                    "@context": "https://schema.org",
-                    "@type": "Product",
-                    "name": product["name"],
-                    "description": product.get("description", "")[:200].replace("<p>", "").replace("</p>", ""),
-                    "image": product.get("image_url"),
-                    "offers": {
-                        "@type": "AggregateOffer",
-                        "lowPrice": min_price,
-                        "priceCurrency": "NPR",
-                        "availability": "https://schema.org/InStock" if not product.get("is_sold_out") else "https://schema.org/OutOfStock"
-                    }
-                }
-            }
-    
-    elif page_type == "blog":
-        post = await db.blog_posts.find_one({"slug": slug}, {"_id": 0})
-        if post:
-            return {
-                "title": f"{post['title']} | GameShop Nepal Blog",
-                "description": post.get("excerpt", post.get("content", "")[:160]),
-                "keywords": f"{post['title']}, gaming blog Nepal, digital products guide",
-                "og_image": post.get("image_url"),
-                "schema": {
-                    "@context": "https://schema.org",
-                    "@type": "BlogPosting",
-                    "headline": post["title"],
-                    "description": post.get("excerpt", ""),
-                    "image": post.get("image_url"),
-                    "datePublished": post.get("created_at"),
-                    "author": {"@type": "Organization", "name": "GameShop Nepal"}
-                }
-            }
-    
-    # Default meta
-    return {
-        "title": "GameShop Nepal - Digital Products at Best Prices",
-        "description": "Buy Netflix, Spotify, YouTube Premium, PUBG UC and more at the best prices in Nepal. Instant delivery, 100% genuine products.",
-        "keywords": "digital products Nepal, Netflix Nepal, Spotify Nepal, gaming topup Nepal"
-    }
+    return await seo_store.get(db, page_type, slug)
+
+@api_router.post("/seo/meta/bulk")
+async def get_seo_meta_bulk(request: SeoMetaBulkRequest):
+    """SEO meta for many product/blog slugs in one call (for prerendering)"""
+    if len(request.products) + len(request.blog) > SEO_BULK_LIMIT:
+        raise HTTPException(status_code=400, detail=f"At most {SEO_BULK_LIMIT} slugs per request")
+    return await seo_store.get_many(db, request.products, request.blog)
 
 # ==================== CUSTOMER ACCOUNTS ====================
 
@@ -3521,10 +3585,9 @@ async def customer_login(data: CustomerLogin):
                 "email": None,
                 "otp": otp,
                 "otp_expires": (datetime.now(timezone.utc) + timedelta(minutes=10)).isoformat(),
-                "created_at": datetime.now(timezone.utc).isoformat(),
-                "total_orders": 0,
-                "total_spent": 0
+                "created_at": datetime.now(timezone.utc).isoformat()
             })
+            await customer_stats.refresh_customer_stats(db, phone=phone)
         
         # In production, send OTP via SMS. For now, return it (dev mode)
         return {"message": "OTP sent", "dev_otp": otp}  # Remove dev_otp in production
@@ -3561,105 +3624,63 @@ async def customer_login(data: CustomerLogin):
 
 @api_router.post("/customers/sync-from-takeapp")
 async def sync_customers_from_takeapp(current_user: dict = Depends(get_current_user)):
-    """Admin: Sync customer data from Take.app orders"""
+    """Admin: Start an incremental import of Take.app orders and customers"""
     if not TAKEAPP_API_KEY:
         raise HTTPException(status_code=400, detail="Take.app API key not configured")
     
-    async with httpx.AsyncClient() as client:
-        response = await client.get(f"{TAKEAPP_BASE_URL}/orders?api_key={TAKEAPP_API_KEY}")
-        if response.status_code != 200:
-            raise HTTPException(status_code=500, detail="Failed to fetch Take.app orders")
-        
-        orders = response.json()
-        synced_count = 0
-        
-        for order in orders:
-            phone = order.get("customer_phone") or order.get("phone")
-            if not phone:
-                continue
-            
-            phone = phone.strip().replace(" ", "").replace("-", "")
-            
-            # Find or create customer
-            existing = await db.customers.find_one({"phone": phone})
-            
-            order_amount = float(order.get("total", 0) or 0)
-            
-            if existing:
-                # Update stats
-                await db.customers.update_one(
-                    {"phone": phone},
-                    {
-                        "$inc": {"total_orders": 1, "total_spent": order_amount},
-                        "$set": {
-                            "name": order.get("customer_name") or existing.get("name"),
-                            "email": order.get("customer_email") or existing.get("email"),
-                            "last_order_at": order.get("created_at") or datetime.now(timezone.utc).isoformat()
-                        }
-                    }
-                )
-            else:
-                # Create new customer
-                await db.customers.insert_one({
-                    "id": str(uuid.uuid4()),
-                    "phone": phone,
-                    "name": order.get("customer_name"),
-                    "email": order.get("customer_email"),
-                    "created_at": datetime.now(timezone.utc).isoformat(),
-                    "total_orders": 1,
-                    "total_spent": order_amount,
-                    "last_order_at": order.get("created_at"),
-                    "source": "takeapp"
-                })
-                synced_count += 1
-        
-        return {"message": f"Synced {synced_count} new customers from Take.app", "total_orders_processed": len(orders)}
+    state = await takeapp_sync.get_sync_state(admin_db)
+    # The in-process lock, not the stored status - a run that crashed or was
+    # cut short by a restart leaves "running" behind
+    if not takeapp_sync.is_running():
+        task = asyncio.create_task(takeapp_sync.sync_takeapp_orders(admin_db))
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        state["status"] = "running"
+    
+    return {"message": "Take.app sync started", "state": state}
+
+@api_router.get("/customers/sync-from-takeapp/status")
+async def get_takeapp_sync_status(current_user: dict = Depends(get_current_user)):
+    """Admin: Progress and high-water mark of the Take.app importer"""
+    return await takeapp_sync.get_sync_state(admin_db)
 
 @api_router.get("/customers")
-async def get_all_customers(current_user: dict = Depends(get_current_user)):
-    """Admin: Get all customers with order stats"""
-    customers = await db.customers.find({}, {"_id": 0, "otp": 0, "otp_expires": 0}).sort("created_at", -1).to_list(1000)
-    
-    # Get order stats for all customers
-    order_stats = await db.orders.aggregate([
-        {"$group": {
-            "_id": "$customer_email",
-            "total_orders": {"$sum": 1},
-            "total_spent": {"$sum": "$total_amount"},
-            "phone": {"$first": "$customer_phone"}
-        }}
-    ]).to_list(10000)
-    
-    # Create lookup by email
-    stats_by_email = {stat["_id"]: stat for stat in order_stats if stat["_id"]}
-    
-    # Also aggregate by phone for customers without email
-    phone_stats = await db.orders.aggregate([
-        {"$group": {
-            "_id": "$customer_phone",
-            "total_orders": {"$sum": 1},
-            "total_spent": {"$sum": "$total_amount"}
-        }}
-    ]).to_list(10000)
-    
-    stats_by_phone = {stat["_id"]: stat for stat in phone_stats if stat["_id"]}
-    
-    # Merge order stats into customers
-    for customer in customers:
-        email = customer.get("email")
-        phone = customer.get("phone") or customer.get("whatsapp_number")
-        
-        # Try to find stats by email first, then by phone
-        stats = stats_by_email.get(email) or stats_by_phone.get(phone) or {}
-        
-        customer["total_orders"] = stats.get("total_orders", 0)
-        customer["total_spent"] = stats.get("total_spent", 0)
-        
-        # If customer doesn't have phone, try to get it from orders
-        if not customer.get("phone") and stats.get("phone"):
-            customer["phone"] = stats.get("phone")
-    
-    return customers
+async def get_all_customers(
+    page: int = 1,
+    limit: int = 1000,
+    sort_by: str = "created_at",
+    sort_order: str = "desc",
+    current_user: dict = Depends(get_current_user)
+):
+    """Admin: List customers with their order stats (total count in X-Total-Count)"""
+    if sort_by not in customer_stats.SORTABLE_FIELDS:
+        raise HTTPException(status_code=400, detail=f"sort_by must be one of: {', '.join(customer_stats.SORTABLE_FIELDS)}")
+    page = max(page, 1)
+    limit = min(max(limit, 1), 1000)
+    
+    # Collection metadata, not a scan of every customer
+    total = await admin_db.customers.estimated_document_count()
+    direction = 1 if sort_order == "asc" else -1
+    # Tie-break in the same direction so the (field, id) index serves the sort
+    customers = await admin_db.customers.find(
+        {}, {"_id": 0, "otp": 0, "otp_expires": 0}
+    ).sort([(sort_by, direction), ("id", direction)]).skip((page - 1) * limit).limit(limit).to_list(limit)
+    
+    # Not reached by the startup backfill yet: one batched refresh for the page
+    missing = [customer for customer in customers if "total_orders" not in customer]
+    if missing:
+        refreshed = await customer_stats.refresh_many(admin_db, missing)
+        for customer in missing:
+            customer.update(refreshed[customer["id"]])
+    
+    return json_response(customers, headers={"X-Total-Count": str(total)})
+
+@api_router.post("/customers/rebuild-stats")
+async def rebuild_customer_stats(current_user: dict = Depends(get_current_user)):
+    """Admin: Recompute every customer's order stats from the orders collection"""
+    # Full-collection aggregations - allow more than the admin pool's default budget
+    with database.time_budget(300):
+        updated = await customer_stats.rebuild_customer_stats(admin_db)
+    return {"message": f"Rebuilt stats for {updated} customers", "updated": updated}
 
 # ==================== DAILY REWARDS ====================
 
@@ -4256,21 +4277,69 @@ async def root():
 # Include router
 app.include_router(api_router)
 
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics(authorization: Optional[str] = Header(None)):
+    """Prometheus scrape endpoint; requires METRICS_TOKEN as a bearer token, and is off without one"""
+    # Route inventory, latencies and job state aren't for the public storefront
+    if not metrics.METRICS_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not secrets.compare_digest(authorization or "", f"Bearer {metrics.METRICS_TOKEN}"):
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+    return Response(content=metrics.scrape(), media_type=metrics.CONTENT_TYPE)
+
 # CORS
+# JSON/XML/HTML over MINIMUM_SIZE bytes goes out gzip- or brotli-encoded
+app.add_middleware(CompressionMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
     allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Total-Count", "X-Profile-Id"],
 )
 
+# Requests carrying a signed X-Profile-Token are CPU-profiled end to end
+app.add_middleware(profiling.ProfilingMiddleware)
+
+# Outermost, so latency covers every other middleware
+app.add_middleware(metrics.MetricsMiddleware)
+
 @app.on_event("startup")
 async def startup_event():
     """Start background tasks on server startup"""
-    asyncio.create_task(run_cleanup_task())
+    asyncio.create_task(run_cleanup_task(admin_db))
     logger.info("✅ Order cleanup task started")
+    
+    asyncio.create_task(order_events.run_change_stream(admin_db))
+    asyncio.create_task(takeapp_sync.run_takeapp_sync_task(admin_db))
+    asyncio.create_task(order_archive.run_archive_task(admin_db))
+    loop_watchdog.watchdog.start(app)
+    asyncio.create_task(query_profiler.profiler.run_explain_worker(admin_db))
+    
+    try:
+        await database.with_retry(lambda: database.ensure_indexes(admin_db), description="index creation")
+    except Exception as e:
+        logger.error(f"Failed to create indexes: {e}")
+    
+    asyncio.create_task(customer_stats.backfill_missing_stats(admin_db))
+    # Needs the lookup_keys index above; tracking falls back to the old lookup until it is done
+    asyncio.create_task(order_timeline.run_startup_migration(admin_db))
+    
+    try:
+        await ticker.seed_from_db(db)
+    except Exception as e:
+        logger.error(f"Failed to seed recent purchases ticker: {e}")
+    
+    try:
+        await seo_store.load(db)
+    except Exception as e:
+        logger.error(f"Failed to load SEO metadata: {e}")
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
-    client.close()
+    loop_watchdog.watchdog.stop()
+    invoice_service.shutdown_pool()
+    await review_service.close_client()
+    database.close_clients()
@@ -3,20 +3,17 @@ Admin Permission System Setup Script
 Creates main admin and permission structure
 """
 import asyncio
-from motor.motor_asyncio import AsyncIOMotorClient
-import os
 from datetime import datetime, timezone
 from dotenv import load_dotenv
 from pathlib import Path
+from database import ADMIN, get_db
 import hashlib
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
 # MongoDB connection
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+db = get_db(ADMIN)
 
 def hash_password(password: str) -> str:
     """Simple password hashing"""
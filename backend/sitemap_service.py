@@ -0,0 +1,157 @@
+"""
+Sitemap Service
+Keeps the generated sitemap in memory and only rebuilds the sections whose
+source data changed (products, blog posts, categories). Each rendered file is
+stored with precompressed gzip/brotli bodies and ETags so crawler hits are a
+dict lookup.
+
+Once the URL count passes SITEMAP_URL_LIMIT the sitemap is split into
+sitemap-1.xml, sitemap-2.xml, ... and /sitemap.xml becomes a sitemap index.
+"""
+import asyncio
+import logging
+import os
+from html import escape
+from typing import Dict, List, Optional
+
+from compression import PrecompressedBody
+
+logger = logging.getLogger(__name__)
+
+SITE_URL = os.environ.get("SITE_URL", "https://gameshopnepal.com")
+# Where the split sitemap-N.xml files are reachable (defaults to the site root)
+SITEMAP_BASE_URL = os.environ.get("SITEMAP_BASE_URL", SITE_URL).rstrip("/")
+
+# Protocol limit is 50,000 URLs per file
+SITEMAP_URL_LIMIT = int(os.environ.get("SITEMAP_URL_LIMIT", "50000"))
+
+SITEMAP_NS = "http://www.sitemaps.org/schemas/sitemap/0.9"
+
+STATIC_PAGES = [
+    {"loc": "/", "priority": "1.0", "changefreq": "daily"},
+    {"loc": "/about", "priority": "0.7", "changefreq": "monthly"},
+    {"loc": "/faq", "priority": "0.6", "changefreq": "monthly"},
+    {"loc": "/terms", "priority": "0.5", "changefreq": "monthly"},
+    {"loc": "/blog", "priority": "0.8", "changefreq": "weekly"},
+]
+
+PRODUCTS = "products"
+BLOG = "blog"
+CATEGORIES = "categories"
+
+# section -> (collection, filter, url prefix, changefreq, priority)
+SECTIONS = {
+    PRODUCTS: ("products", {"is_active": True}, "/product/", "weekly", "0.9"),
+    BLOG: ("blog_posts", {"is_published": True}, "/blog/", "monthly", "0.7"),
+    CATEGORIES: ("categories", {}, "/category/", "weekly", "0.8"),
+}
+
+
+class SitemapFile(PrecompressedBody):
+    """A rendered sitemap file with its compressed variants and validators"""
+
+    __slots__ = ()
+
+    def __init__(self, xml: str):
+        super().__init__(xml.encode("utf-8"))
+        self.warm()
+
+
+def _url_entry(loc: str, changefreq: str, priority: str, lastmod: Optional[str] = None) -> str:
+    parts = [f"  <url>\n    <loc>{escape(loc)}</loc>\n"]
+    if lastmod:
+        parts.append(f"    <lastmod>{escape(lastmod)}</lastmod>\n")
+    parts.append(f"    <changefreq>{changefreq}</changefreq>\n    <priority>{priority}</priority>\n  </url>\n")
+    return "".join(parts)
+
+
+def _urlset(entries: List[str]) -> str:
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        f'<urlset xmlns="{SITEMAP_NS}">\n'
+        + "".join(entries)
+        + "</urlset>"
+    )
+
+
+def _sitemap_index(count: int, lastmod: Optional[str]) -> str:
+    lastmod_tag = f"    <lastmod>{escape(lastmod)}</lastmod>\n" if lastmod else ""
+    entries = "".join(
+        f"  <sitemap>\n    <loc>{escape(SITEMAP_BASE_URL)}/sitemap-{n}.xml</loc>\n{lastmod_tag}  </sitemap>\n"
+        for n in range(1, count + 1)
+    )
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        f'<sitemapindex xmlns="{SITEMAP_NS}">\n'
+        + entries
+        + "</sitemapindex>"
+    )
+
+
+class SitemapCache:
+    """
+    Rendered sitemap files, rebuilt lazily on the first request after an
+    invalidation. Only invalidated sections are re-queried; the rest reuse
+    their cached URL entries.
+    """
+
+    def __init__(self):
+        self._entries: Dict[str, List[str]] = {}
+        self._lastmod: Dict[str, Optional[str]] = {}
+        self._dirty = set(SECTIONS)
+        self._files: Dict[str, SitemapFile] = {}
+        self._lock = asyncio.Lock()
+
+    def invalidate(self, *sections: str):
+        """Mark sections stale after a write (all sections if none given)"""
+        self._dirty.update(sections or SECTIONS)
+
+    async def _load_section(self, db, section: str):
+        collection, query, prefix, changefreq, priority = SECTIONS[section]
+        entries = []
+        newest = None
+        cursor = db[collection].find(query, {"_id": 0, "slug": 1, "updated_at": 1, "created_at": 1})
+        async for doc in cursor:
+            if not doc.get("slug"):
+                continue
+            lastmod = doc.get("updated_at") or doc.get("created_at")
+            if lastmod and (newest is None or lastmod > newest):
+                newest = lastmod
+            entries.append(_url_entry(f"{SITE_URL}{prefix}{doc['slug']}", changefreq, priority, lastmod))
+        self._entries[section] = entries
+        self._lastmod[section] = newest
+
+    def _render(self):
+        entries = [_url_entry(f"{SITE_URL}{page['loc']}", page["changefreq"], page["priority"]) for page in STATIC_PAGES]
+        for section in SECTIONS:
+            entries.extend(self._entries.get(section, []))
+
+        if len(entries) <= SITEMAP_URL_LIMIT:
+            self._files = {"sitemap.xml": SitemapFile(_urlset(entries))}
+            return
+
+        chunks = [entries[i:i + SITEMAP_URL_LIMIT] for i in range(0, len(entries), SITEMAP_URL_LIMIT)]
+        lastmods = [m for m in self._lastmod.values() if m]
+        files = {"sitemap.xml": SitemapFile(_sitemap_index(len(chunks), max(lastmods) if lastmods else None))}
+        for n, chunk in enumerate(chunks, start=1):
+            files[f"sitemap-{n}.xml"] = SitemapFile(_urlset(chunk))
+        self._files = files
+
+    async def get_file(self, db, name: str = "sitemap.xml") -> Optional[SitemapFile]:
+        if self._dirty:
+            async with self._lock:
+                if self._dirty:
+                    dirty, self._dirty = self._dirty, set()
+                    try:
+                        for section in dirty:
+                            await self._load_section(db, section)
+                    except Exception:
+                        self._dirty.update(dirty)
+                        raise
+                    # Rendering + compressing a large catalog is CPU work; keep it off the loop
+                    await asyncio.to_thread(self._render)
+                    logger.info(f"Sitemap rebuilt ({', '.join(sorted(dirty))}): {len(self._files)} file(s)")
+        return self._files.get(name)
+
+
+sitemap_cache = SitemapCache()
@@ -0,0 +1,260 @@
+"""
+Take.app Order Importer
+Incrementally pages through Take.app orders since the last high-water mark,
+stores them deduplicated by Take.app order id in `takeapp_orders`, and
+upserts the customers they belong to - all with bulk writes. New orders
+count towards their customer's stats (see customer_stats) unless the order
+was also placed locally.
+
+Progress and the high-water mark live in the `sync_state` collection, so a
+restart resumes where the last successful run ended.
+"""
+import asyncio
+import logging
+import os
+import uuid
+from datetime import datetime, timezone
+from typing import Optional
+
+import httpx
+from pymongo import UpdateOne
+
+import customer_stats
+import metrics
+from database import with_retry
+
+logger = logging.getLogger(__name__)
+
+TAKEAPP_API_KEY = os.environ.get("TAKEAPP_API_KEY", "")
+TAKEAPP_BASE_URL = os.environ.get("TAKEAPP_BASE_URL", "https://api.take.app/v1").rstrip("/")
+
+TAKEAPP_PAGE_SIZE = int(os.environ.get("TAKEAPP_PAGE_SIZE", "100"))
+# Seconds between scheduled runs; 0 disables the background job
+TAKEAPP_SYNC_INTERVAL = int(os.environ.get("TAKEAPP_SYNC_INTERVAL", "900"))
+TAKEAPP_REQUEST_TIMEOUT = 30.0
+
+SYNC_STATE_ID = "takeapp_orders"
+
+_lock = asyncio.Lock()
+
+
+def is_running() -> bool:
+    """Whether a sync is in progress in this process"""
+    return _lock.locked()
+
+
+def normalize_phone(phone: Optional[str]) -> Optional[str]:
+    if not phone:
+        return None
+    phone = str(phone).strip().replace(" ", "").replace("-", "")
+    return phone or None
+
+
+def _page_items(payload) -> list:
+    """Take.app returns either a bare list or an envelope with the list inside"""
+    if isinstance(payload, list):
+        return payload
+    if isinstance(payload, dict):
+        for key in ("data", "orders", "items", "results"):
+            if isinstance(payload.get(key), list):
+                return payload[key]
+    return []
+
+
+def _order_timestamp(order: dict) -> Optional[str]:
+    return order.get("updated_at") or order.get("updatedAt") or order.get("created_at") or order.get("createdAt")
+
+
+def _external_id(order: dict) -> Optional[str]:
+    value = order.get("id") or order.get("_id") or order.get("order_id") or order.get("number")
+    return str(value) if value else None
+
+
+def normalize_order(order: dict) -> dict:
+    return {
+        "takeapp_id": _external_id(order),
+        "number": order.get("number") or order.get("order_number"),
+        "customer_name": order.get("customer_name") or (order.get("customer") or {}).get("name"),
+        "customer_email": (order.get("customer_email") or (order.get("customer") or {}).get("email") or "").lower() or None,
+        "customer_phone": normalize_phone(order.get("customer_phone") or order.get("phone") or (order.get("customer") or {}).get("phone")),
+        "status": order.get("status"),
+        "total": float(order.get("total", 0) or 0),
+        "created_at": order.get("created_at") or order.get("createdAt"),
+        "updated_at": _order_timestamp(order),
+    }
+
+
+async def get_sync_state(db) -> dict:
+    state = await db.sync_state.find_one({"id": SYNC_STATE_ID}, {"_id": 0})
+    return state or {"id": SYNC_STATE_ID, "status": "never_run", "high_water_mark": None}
+
+
+async def _set_state(db, **fields):
+    await db.sync_state.update_one({"id": SYNC_STATE_ID}, {"$set": fields}, upsert=True)
+
+
+async def ensure_takeapp_indexes(db):
+    await db.takeapp_orders.create_index("takeapp_id", unique=True)
+    await db.takeapp_orders.create_index("updated_at")
+    await db.takeapp_orders.create_index("customer_email")
+    await db.takeapp_orders.create_index("customer_phone")
+    # Local orders that were also placed on Take.app, skipped when counting stats
+    await db.orders.create_index("takeapp_order_id", sparse=True)
+    await db.orders_archive.create_index("takeapp_order_id", sparse=True)
+
+
+async def _apply_page(db, orders: list) -> dict:
+    """Upsert one page of orders and their customers with one bulk_write per collection"""
+    normalized = {}
+    for raw in orders:
+        order = normalize_order(raw)
+        if order["takeapp_id"]:
+            normalized[order["takeapp_id"]] = order
+
+    ids = list(normalized)
+    previous_status = {
+        order["takeapp_id"]: order.get("status")
+        async for order in db.takeapp_orders.find({"takeapp_id": {"$in": ids}}, {"_id": 0, "takeapp_id": 1, "status": 1})
+    }
+    # Orders also placed locally are already in the customers' stats
+    local = await customer_stats.local_takeapp_ids(db, ids)
+
+    now = datetime.now(timezone.utc).isoformat()
+    order_ops = [
+        UpdateOne(
+            {"takeapp_id": takeapp_id},
+            {"$set": order, "$setOnInsert": {"imported_at": now}},
+            upsert=True
+        )
+        for takeapp_id, order in normalized.items()
+    ]
+
+    # One customer op per phone; later orders on the page win
+    customers = {}
+    for order in normalized.values():
+        if not order["customer_phone"]:
+            continue
+        profile = customers.setdefault(order["customer_phone"], {})
+        if order["customer_name"]:
+            profile["name"] = order["customer_name"]
+        if order["customer_email"]:
+            profile["email"] = order["customer_email"]
+
+    phones = list(customers)
+    customer_ops = []
+    for phone in phones:
+        update = {"$setOnInsert": {"id": str(uuid.uuid4()), "phone": phone, "created_at": now, "source": "takeapp"}}
+        if customers[phone]:
+            update["$set"] = customers[phone]
+        customer_ops.append(UpdateOne({"phone": phone}, update, upsert=True))
+
+    result = {"orders_imported": 0, "customers_created": 0, "customers_updated": 0}
+    if order_ops:
+        # Upserts keyed by Take.app id / phone, so a retried page is harmless
+        order_result = await with_retry(
+            lambda: db.takeapp_orders.bulk_write(order_ops, ordered=False), description="Take.app order upsert"
+        )
+        result["orders_imported"] = order_result.upserted_count
+    new_customers = set()
+    if customer_ops:
+        customer_result = await with_retry(
+            lambda: db.customers.bulk_write(customer_ops, ordered=False), description="Take.app customer upsert"
+        )
+        result["customers_created"] = customer_result.upserted_count
+        result["customers_updated"] = customer_result.modified_count
+        # New customers may already have local orders - give them their stats
+        for index in customer_result.upserted_ids:
+            phone = phones[index]
+            new_customers.add(phone)
+            await customer_stats.refresh_customer_stats(db, email=customers[phone].get("email"), phone=phone)
+
+    # Existing customers get the same counter updates as a local order
+    for takeapp_id, order in normalized.items():
+        if takeapp_id in local or (order["customer_phone"] and order["customer_phone"] in new_customers):
+            continue
+        if takeapp_id not in previous_status:
+            await customer_stats.record_order_created(db, order)
+        elif previous_status[takeapp_id] != order["status"]:
+            await customer_stats.record_status_change(db, order, previous_status[takeapp_id], order["status"])
+    return result
+
+
+async def sync_takeapp_orders(db, base_url: str = TAKEAPP_BASE_URL, api_key: str = TAKEAPP_API_KEY,
+                              page_size: int = TAKEAPP_PAGE_SIZE) -> dict:
+    """
+    Import every Take.app order changed since the stored high-water mark.
+    The mark only advances when the whole run succeeds; re-imported orders
+    are harmless because writes are keyed by Take.app order id.
+    """
+    if _lock.locked():
+        return await get_sync_state(db)
+
+    async with _lock:
+        state = await get_sync_state(db)
+        since = state.get("high_water_mark")
+        started_at = datetime.now(timezone.utc).isoformat()
+        progress = {"pages": 0, "orders_seen": 0, "orders_imported": 0, "customers_created": 0, "customers_updated": 0}
+        await _set_state(db, status="running", started_at=started_at, finished_at=None, error=None, **progress)
+
+        high_water_mark = since
+        seen_ids = set()
+        try:
+            async with httpx.AsyncClient(timeout=TAKEAPP_REQUEST_TIMEOUT, transport=metrics.http_transport(metrics.TAKEAPP)) as client:
+                page = 1
+                while True:
+                    params = {"api_key": api_key, "page": page, "limit": page_size}
+                    if since:
+                        params["updated_after"] = since
+                    response = await client.get(f"{base_url}/orders", params=params)
+                    response.raise_for_status()
+                    orders = _page_items(response.json())
+                    page_ids = {_external_id(order) for order in orders}
+                    if not orders or page_ids <= seen_ids:
+                        # Empty page, or the API ignored paging and repeated itself
+                        break
+                    seen_ids |= page_ids
+
+                    page_result = await _apply_page(db, orders)
+                    for key, value in page_result.items():
+                        progress[key] += value
+                    progress["pages"] = page
+                    progress["orders_seen"] += len(orders)
+                    for order in orders:
+                        timestamp = _order_timestamp(order)
+                        if timestamp and (high_water_mark is None or timestamp > high_water_mark):
+                            high_water_mark = timestamp
+                    await _set_state(db, **progress)
+
+                    if len(orders) < page_size:
+                        break
+                    page += 1
+        except Exception as e:
+            logger.error(f"Take.app sync failed on page {progress['pages'] + 1}: {e}")
+            await _set_state(db, status="failed", error=str(e), finished_at=datetime.now(timezone.utc).isoformat())
+            raise
+
+        await _set_state(
+            db,
+            status="idle",
+            high_water_mark=high_water_mark,
+            last_success_at=started_at,
+            finished_at=datetime.now(timezone.utc).isoformat()
+        )
+        logger.info(
+            f"Take.app sync: {progress['orders_seen']} orders over {progress['pages']} pages, "
+            f"{progress['customers_created']} new customers"
+        )
+        return await get_sync_state(db)
+
+
+async def run_takeapp_sync_task(db):
+    """Scheduled incremental import"""
+    if not TAKEAPP_API_KEY or TAKEAPP_SYNC_INTERVAL <= 0:
+        return
+    while True:
+        try:
+            with metrics.task_run("takeapp_sync"):
+                await sync_takeapp_orders(db)
+        except Exception as e:
+            logger.error(f"Error in Take.app sync task: {e}")
+        await asyncio.sleep(TAKEAPP_SYNC_INTERVAL)
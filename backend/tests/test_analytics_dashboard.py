@@ -0,0 +1,107 @@
+"""
+Analytics Dashboard Tests
+Calls the dashboard endpoint in-process with its sections replaced by
+stubs - no MongoDB or running server needed.
+Tests: a section past the budget comes back null as "timeout", a failing
+section as "error", driver timeouts, the sections filter
+"""
+import asyncio
+import os
+import sys
+from pathlib import Path
+
+import pytest
+from fastapi import HTTPException
+from pymongo.errors import ExecutionTimeout
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+# server.py reads these at import; nothing connects until a query runs
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "test_analytics_dashboard")
+
+import server  # noqa: E402
+
+ADMIN = {"id": "admin", "email": "gsnadmin"}
+
+
+async def slow_section(*args):
+    await asyncio.sleep(5)
+    return {"never": "returned"}
+
+
+async def fast_section(*args):
+    return {"completed": 3}
+
+
+async def failing_section(*args):
+    raise RuntimeError("boom")
+
+
+async def driver_timeout(*args):
+    raise ExecutionTimeout("operation exceeded time limit", 50)
+
+
+@pytest.fixture
+def sections(monkeypatch):
+    """Every section fast by default; tests swap in slow or failing ones"""
+    for name in ("analytics_overview", "profit_analytics", "revenue_chart", "order_status_breakdown", "top_products"):
+        monkeypatch.setattr(server, name, fast_section)
+    return monkeypatch
+
+
+def dashboard(**params):
+    return asyncio.run(server.get_analytics_dashboard(current_user=ADMIN, **params))
+
+
+class TestAnalyticsDashboard:
+    def test_all_sections_ok(self, sections):
+        data = dashboard()
+        assert set(data["sections"]) == set(server.DASHBOARD_SECTIONS)
+        assert all(timing["status"] == "ok" for timing in data["sections"].values())
+        assert data["partial"] is False
+        assert data["order_status"] == {"completed": 3}
+
+    def test_slow_section_times_out(self, sections):
+        sections.setattr(server, "top_products", slow_section)
+        data = dashboard(budget_ms=50)
+        assert data["partial"] is True
+        assert data["top_products"] is None
+        assert data["sections"]["top_products"] == {"status": "timeout", "ms": 50.0}
+        # The others still come back
+        assert data["order_status"] == {"completed": 3}
+        assert data["sections"]["order_status"]["status"] == "ok"
+        assert data["elapsed_ms"] < 5000
+
+    def test_tiny_budget_never_fails_the_request(self, sections):
+        """Sections finishing as the budget runs out are either ok or timeout, never a 500"""
+        for _ in range(20):
+            data = dashboard(budget_ms=1)
+            for name, timing in data["sections"].items():
+                assert timing["status"] in ("ok", "timeout")
+                assert (data[name] is None) == (timing["status"] == "timeout")
+
+    def test_failing_section_is_an_error(self, sections):
+        sections.setattr(server, "order_status_breakdown", failing_section)
+        data = dashboard()
+        assert data["partial"] is True
+        assert data["order_status"] is None
+        assert data["sections"]["order_status"]["status"] == "error"
+
+    def test_driver_timeout_is_a_timeout(self, sections):
+        sections.setattr(server, "profit_analytics", driver_timeout)
+        data = dashboard()
+        assert data["profit"] is None
+        assert data["sections"]["profit"]["status"] == "timeout"
+
+    def test_sections_filter(self, sections):
+        sections.setattr(server, "analytics_overview", failing_section)
+        data = dashboard(sections="revenue_chart, top_products")
+        assert set(data["sections"]) == {"revenue_chart", "top_products"}
+        assert "overview" not in data
+        assert data["partial"] is False
+
+    def test_unknown_section_is_rejected(self, sections):
+        with pytest.raises(HTTPException) as error:
+            dashboard(sections="overview,bogus")
+        assert error.value.status_code == 400
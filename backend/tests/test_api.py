@@ -18,6 +18,13 @@ class TestHealthCheck:
         assert "message" in data
         assert data["message"] == "GameShop Nepal API"
 
+    def test_security_headers(self):
+        """Every response carries the security headers exactly once"""
+        response = requests.get(f"{BASE_URL}/api/")
+        assert response.headers["x-content-type-options"] == "nosniff"
+        assert response.headers["x-frame-options"] == "DENY"
+        assert response.headers["strict-transport-security"].startswith("max-age=")
+
 
 class TestAuthentication:
     """Admin authentication tests"""
@@ -212,6 +219,16 @@ class TestProductsAPI:
         
         for product in data:
             assert "sort_order" in product
+    
+    def test_public_products_hide_admin_fields(self):
+        """Public product list never exposes Discord webhooks or cost prices"""
+        response = requests.get(f"{BASE_URL}/api/products?active_only=false")
+        assert response.status_code == 200
+        
+        for product in response.json():
+            assert product["discord_webhooks"] == []
+            for variation in product["variations"]:
+                assert variation.get("cost_price") is None
 
 
 class TestCategoriesAPI:
@@ -259,6 +276,300 @@ class TestReviewsAPI:
         data = response.json()
         assert isinstance(data, list)
 
+    def test_get_reviews_summary(self):
+        """Cached rating summary has value and count"""
+        response = requests.get(f"{BASE_URL}/api/reviews/summary")
+        assert response.status_code == 200
+        data = response.json()
+        assert set(data.keys()) == {"rating_value", "review_count"}
+        if data["review_count"]:
+            assert 1 <= data["rating_value"] <= 5
+
+
+class TestRecentPurchasesAPI:
+    """Live ticker tests"""
+
+    def test_get_recent_purchases(self):
+        """Ticker returns exactly `limit` entries with the public fields only"""
+        response = requests.get(f"{BASE_URL}/api/recent-purchases?limit=6")
+        assert response.status_code == 200
+        data = response.json()
+        assert len(data) == 6
+        for purchase in data:
+            assert set(purchase.keys()) == {"name", "location", "product", "time_ago", "is_real"}
+
+    def test_recent_purchases_stream(self):
+        """SSE stream responds with event-stream content type"""
+        with requests.get(f"{BASE_URL}/api/recent-purchases/stream", stream=True, timeout=5) as response:
+            assert response.status_code == 200
+            assert response.headers["content-type"].startswith("text/event-stream")
+
+
+class TestInvoiceAPI:
+    """Invoice rendering tests"""
+
+    def test_unknown_order_invoice(self):
+        """Invoice for a missing order returns 404"""
+        response = requests.get(f"{BASE_URL}/api/invoice/does-not-exist/pdf")
+        assert response.status_code == 404
+
+
+class TestSitemapAPI:
+    """Sitemap tests"""
+
+    def test_sitemap_cached_with_etag(self):
+        """Sitemap is served with an ETag and revalidates with 304"""
+        response = requests.get(f"{BASE_URL}/api/sitemap.xml")
+        assert response.status_code == 200
+        assert "<urlset" in response.text or "<sitemapindex" in response.text
+        etag = response.headers["etag"]
+
+        cached = requests.get(f"{BASE_URL}/api/sitemap.xml", headers={"If-None-Match": etag})
+        assert cached.status_code == 304
+
+
+class TestCompression:
+    """Response compression tests"""
+
+    def test_large_json_is_gzipped(self):
+        """Product list is gzip-encoded when the client accepts it"""
+        response = requests.get(f"{BASE_URL}/api/products", headers={"Accept-Encoding": "gzip"})
+        assert response.status_code == 200
+        assert response.headers.get("content-encoding") == "gzip"
+        assert "accept-encoding" in response.headers.get("vary", "").lower()
+        assert isinstance(response.json(), list)
+
+    def test_identity_when_not_accepted(self):
+        """No encoding is applied when the client doesn't ask for one"""
+        response = requests.get(f"{BASE_URL}/api/products", headers={"Accept-Encoding": "identity"})
+        assert response.status_code == 200
+        assert "content-encoding" not in response.headers
+
+
+class TestMetrics:
+    """Prometheus endpoint tests"""
+
+    def test_requires_token(self):
+        """Never served without the bearer token (and not at all when none is configured)"""
+        response = requests.get(f"{BASE_URL}/metrics")
+        assert response.status_code in [401, 404]
+        assert "nobeosh_" not in response.text
+
+    def test_route_templates_are_labels(self):
+        """Requests are counted under their path template, not the raw path"""
+        if not os.environ.get("METRICS_TOKEN"):
+            pytest.skip("METRICS_TOKEN not set")
+        requests.get(f"{BASE_URL}/api/orders/track/TEST_missing")
+        headers = {"Authorization": f"Bearer {os.environ['METRICS_TOKEN']}"}
+        response = requests.get(f"{BASE_URL}/metrics", headers=headers)
+        if response.status_code == 404:
+            pytest.skip("/metrics is not routed to the backend at BASE_URL")
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain")
+        assert 'route="/api/orders/track/{order_id}"' in response.text
+        assert "TEST_missing" not in response.text
+        assert "# TYPE nobeosh_http_request_duration_seconds histogram" in response.text
+
+
+class TestSeoMetaAPI:
+    """SEO metadata tests"""
+
+    def test_bulk_meta_matches_single(self):
+        """Bulk endpoint returns the same meta as the per-slug endpoint"""
+        products = requests.get(f"{BASE_URL}/api/products").json()
+        slugs = [p["slug"] for p in products if p.get("slug")][:5]
+
+        response = requests.post(f"{BASE_URL}/api/seo/meta/bulk", json={"products": slugs + ["TEST_missing"]})
+        assert response.status_code == 200
+        data = response.json()
+        assert "TEST_missing" not in data["products"]
+        for slug in slugs:
+            single = requests.get(f"{BASE_URL}/api/seo/meta/product/{slug}").json()
+            assert data["products"][slug] == single
+
+
+class TestCustomersAPI:
+    """Admin customer listing tests"""
+
+    @pytest.fixture
+    def auth_token(self):
+        response = requests.post(f"{BASE_URL}/api/auth/login", json={
+            "email": "gsnadmin",
+            "password": "gsnadmin"
+        })
+        return response.json()["token"]
+
+    def test_customers_paginated_with_total(self, auth_token):
+        """Customer list is paginated and reports the total in X-Total-Count"""
+        response = requests.get(
+            f"{BASE_URL}/api/customers?limit=5&sort_by=total_spent&sort_order=desc",
+            headers={"Authorization": f"Bearer {auth_token}"}
+        )
+        assert response.status_code == 200
+        data = response.json()
+        assert len(data) <= 5
+        assert int(response.headers["x-total-count"]) >= len(data)
+        spent = [c["total_spent"] for c in data]
+        assert spent == sorted(spent, reverse=True)
+
+    def test_customers_invalid_sort(self, auth_token):
+        """Unknown sort fields are rejected"""
+        response = requests.get(
+            f"{BASE_URL}/api/customers?sort_by=otp",
+            headers={"Authorization": f"Bearer {auth_token}"}
+        )
+        assert response.status_code == 400
+
+
+class TestOrderArchiveAPI:
+    """Order archiving tests"""
+
+    def test_archive_requires_auth(self):
+        """Archiving is admin-only"""
+        response = requests.post(f"{BASE_URL}/api/orders/archive-old")
+        assert response.status_code in [401, 403]
+
+    def test_unknown_order_not_tracked(self):
+        """Tracking falls through both tiers and still 404s for unknown orders"""
+        response = requests.get(f"{BASE_URL}/api/orders/track/TEST_missing_order")
+        assert response.status_code == 404
+
+
+class TestSlowQueriesAPI:
+    """Slow query report tests"""
+
+    @pytest.fixture
+    def auth_token(self):
+        response = requests.post(f"{BASE_URL}/api/auth/login", json={
+            "email": "gsnadmin",
+            "password": "gsnadmin"
+        })
+        return response.json()["token"]
+
+    def test_report_requires_auth(self):
+        """The report is admin-only"""
+        response = requests.get(f"{BASE_URL}/api/admin/slow-queries")
+        assert response.status_code in [401, 403]
+
+    def test_report_lists_shapes_without_values(self, auth_token):
+        """Shapes are ordered by total time and carry no query values"""
+        response = requests.get(
+            f"{BASE_URL}/api/admin/slow-queries?limit=50",
+            headers={"Authorization": f"Bearer {auth_token}"}
+        )
+        assert response.status_code == 200
+        data = response.json()
+        totals = [shape["total_ms"] for shape in data["shapes"]]
+        assert totals == sorted(totals, reverse=True)
+        assert "gsnadmin" not in response.text
+
+
+class TestLoopStallsAPI:
+    """Event loop watchdog report tests"""
+
+    def test_report_requires_auth(self):
+        """The stall report is admin-only"""
+        response = requests.get(f"{BASE_URL}/api/admin/loop-stalls")
+        assert response.status_code in [401, 403]
+
+    def test_report_shape(self):
+        """Stalls carry a route, a site and a stack"""
+        token = requests.post(f"{BASE_URL}/api/auth/login", json={
+            "email": "gsnadmin",
+            "password": "gsnadmin"
+        }).json()["token"]
+        response = requests.get(f"{BASE_URL}/api/admin/loop-stalls", headers={"Authorization": f"Bearer {token}"})
+        assert response.status_code == 200
+        data = response.json()
+        assert data["threshold_ms"] >= 0
+        for stall in data["stalls"]:
+            assert {"route", "site", "stack", "duration_ms"} <= set(stall)
+
+
+class TestProfilingAPI:
+    """On-demand profiling tests"""
+
+    @pytest.fixture
+    def auth_headers(self):
+        response = requests.post(f"{BASE_URL}/api/auth/login", json={
+            "email": "gsnadmin",
+            "password": "gsnadmin"
+        })
+        return {"Authorization": f"Bearer {response.json()['token']}"}
+
+    def test_token_requires_auth(self):
+        """Profiling tokens are admin-only"""
+        response = requests.post(f"{BASE_URL}/api/admin/profiling/token")
+        assert response.status_code in [401, 403]
+
+    def test_forged_token_is_ignored(self):
+        """A request with an unsigned token is served but not profiled"""
+        response = requests.get(f"{BASE_URL}/api/products", headers={"X-Profile-Token": "9999999999.forged"})
+        assert response.status_code == 200
+        assert "x-profile-id" not in response.headers
+
+    def test_profiled_request_produces_folded_report(self, auth_headers):
+        """A signed request returns a profile id whose report is in folded format"""
+        token = requests.post(f"{BASE_URL}/api/admin/profiling/token", headers=auth_headers).json()
+        response = requests.get(f"{BASE_URL}/api/products", headers={token["header"]: token["value"]})
+        assert response.status_code == 200
+        profile_id = response.headers["x-profile-id"]
+
+        summary = requests.get(f"{BASE_URL}/api/admin/profiling/reports/{profile_id}?format=json", headers=auth_headers)
+        assert summary.status_code == 200
+        assert summary.json()["label"] == "GET /api/products"
+        folded = requests.get(f"{BASE_URL}/api/admin/profiling/reports/{profile_id}", headers=auth_headers)
+        assert folded.status_code == 200
+        for line in folded.text.splitlines():
+            assert line.rsplit(" ", 1)[1].isdigit()
+
+
+
+class TestAnalyticsDashboardAPI:
+    """Combined analytics dashboard tests"""
+
+    @pytest.fixture
+    def auth_headers(self):
+        response = requests.post(f"{BASE_URL}/api/auth/login", json={
+            "email": "gsnadmin",
+            "password": "gsnadmin"
+        })
+        return {"Authorization": f"Bearer {response.json()['token']}"}
+
+    def test_dashboard_requires_auth(self):
+        """The dashboard is admin-only"""
+        response = requests.get(f"{BASE_URL}/api/analytics/dashboard")
+        assert response.status_code in [401, 403]
+
+    def test_dashboard_matches_the_section_endpoints(self, auth_headers):
+        """Every section is timed and carries what its own endpoint returns"""
+        response = requests.get(f"{BASE_URL}/api/analytics/dashboard?days=7", headers=auth_headers)
+        assert response.status_code == 200
+        data = response.json()
+        assert set(data["sections"]) == {"overview", "profit", "revenue_chart", "order_status", "top_products"}
+        for name, timing in data["sections"].items():
+            assert timing["status"] in ["ok", "timeout", "error"]
+            assert (data[name] is not None) == (timing["status"] == "ok")
+        assert data["partial"] == any(t["status"] != "ok" for t in data["sections"].values())
+        if data["revenue_chart"] is not None:
+            assert len(data["revenue_chart"]) == 8
+        if data["order_status"] is not None:
+            own = requests.get(f"{BASE_URL}/api/analytics/order-status", headers=auth_headers).json()
+            assert own == data["order_status"]
+
+    def test_dashboard_sections_filter(self, auth_headers):
+        """Only the requested sections run; unknown names are rejected"""
+        response = requests.get(
+            f"{BASE_URL}/api/analytics/dashboard?sections=revenue_chart,top_products", headers=auth_headers
+        )
+        assert response.status_code == 200
+        data = response.json()
+        assert set(data["sections"]) == {"revenue_chart", "top_products"}
+        assert "overview" not in data and "profit" not in data
+
+        response = requests.get(f"{BASE_URL}/api/analytics/dashboard?sections=overview,bogus", headers=auth_headers)
+        assert response.status_code == 400
+
 
 # Cleanup test data after all tests
 @pytest.fixture(scope="session", autouse=True)
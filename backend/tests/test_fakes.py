@@ -0,0 +1,111 @@
+"""
+Integration Stand-in Tests
+Runs the fakes in-process (HTTP through TestClient, the SMTP sink on a
+local port) - no MongoDB or network needed.
+Tests: latency specs, injected errors and 429s, the control API, SMTP
+capture and failures, a Sheets append/read round trip
+"""
+import asyncio
+import random
+import smtplib
+import sys
+import threading
+from email.mime.text import MIMEText
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from fakes.faults import Latency, Profile  # noqa: E402
+from fakes.server import Fakes, create_app  # noqa: E402
+from fakes.smtp import start_smtp  # noqa: E402
+
+
+@pytest.fixture
+def fakes():
+    return Fakes(takeapp_orders=10, trustpilot_reviews=3)
+
+
+@pytest.fixture
+def client(fakes):
+    return TestClient(create_app(fakes))
+
+
+@pytest.fixture
+def smtp_port(fakes):
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    server = asyncio.run_coroutine_threadsafe(start_smtp(fakes, "127.0.0.1", 0), loop).result()
+    yield server.sockets[0].getsockname()[1]
+    loop.call_soon_threadsafe(server.close)
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join(5)
+
+
+def send_mail(port: int):
+    message = MIMEText("hello")
+    message["Subject"] = "Order Confirmation"
+    message["From"] = "shop@example.com"
+    message["To"] = "buyer@example.com"
+    with smtplib.SMTP("127.0.0.1", port, timeout=5) as server:
+        server.login("user", "password")
+        server.send_message(message)
+
+
+class TestFaultProfiles:
+    def test_latency_specs(self):
+        assert Latency("50").spec == "fixed:50"
+        assert Latency("uniform:10,20").sample(random.Random(1)) <= 0.02
+        for bad in ("gamma:1", "uniform:20,10", "normal:1", "lognormal:-1,0.5"):
+            with pytest.raises(ValueError):
+                Latency(bad)
+        with pytest.raises(ValueError):
+            Profile(error_rate=2)
+
+    def test_injected_errors_and_rate_limit(self, client):
+        client.put("/_fakes/faults/discord", json={"error_rate": 1, "error_status": 502})
+        response = client.post("/discord/api/webhooks/1/token", json={"content": "hi"})
+        assert response.status_code == 502
+
+        client.put("/_fakes/faults/discord", json={"error_rate": 0, "rate_limit": 1})
+        statuses = [client.post("/discord/api/webhooks/1/token", json={"content": "hi"}).status_code
+                    for _ in range(3)]
+        assert statuses == [204, 429, 429]
+
+        summary = client.get("/_fakes").json()["discord"]
+        assert (summary["requests"], summary["errors"], summary["throttled"], summary["captured"]) == (4, 1, 2, 1)
+
+    def test_bad_profile_is_rejected(self, client):
+        assert client.put("/_fakes/faults/all", json={"latency": "sometimes"}).status_code == 400
+        assert client.put("/_fakes/faults/nope", json={"error_rate": 0}).status_code == 404
+
+
+class TestSmtpSink:
+    def test_captures_messages(self, fakes, smtp_port):
+        send_mail(smtp_port)
+        [message] = fakes.captured["smtp"]
+        assert message["to"] == ["buyer@example.com"]
+        assert message["subject"] == "Order Confirmation"
+
+    def test_injected_failure(self, fakes, smtp_port):
+        fakes.faults.set_profile("smtp", Profile(error_rate=1))
+        with pytest.raises(smtplib.SMTPDataError) as error:
+            send_mail(smtp_port)
+        assert error.value.smtp_code == 451
+        assert not fakes.captured["smtp"]
+
+
+class TestGoogleSheets:
+    def test_append_then_read(self, client):
+        base = "/google/v4/spreadsheets/sheet-id"
+        client.post(f"{base}:batchUpdate", json={"requests": [{"addSheet": {"properties": {"title": "Orders"}}}]})
+        client.post(f"{base}/values/'Orders'!A1:append", json={"values": [["Order ID", "Total"]]})
+        client.post(f"{base}/values/'Orders'!A1:append", json={"values": [["o-1", 499]]})
+        client.put(f"{base}/values/'Orders'!B2:B2", json={"values": [[550]]})
+
+        assert client.get(f"{base}/values/'Orders'").json()["values"] == [["Order ID", "Total"], ["o-1", "550"]]
+        titles = [sheet["properties"]["title"] for sheet in client.get(base).json()["sheets"]]
+        assert titles == ["Sheet1", "Orders"]
@@ -0,0 +1,177 @@
+"""
+Bulk Order Operation Tests
+Runs order_bulk_ops against a scratch MongoDB database (skipped when MongoDB
+is not reachable).
+Tests: chunking and per-id results, failed chunks, promo used_count release,
+customer stat decrements, status history and invoice cascade, archived orders
+"""
+import asyncio
+import os
+import sys
+import uuid
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from motor.motor_asyncio import AsyncIOMotorClient  # noqa: E402
+
+import customer_stats  # noqa: E402
+import order_bulk_ops  # noqa: E402
+
+MONGO_URL = os.environ.get("MONGO_URL", "mongodb://localhost:27017")
+
+CUSTOMER_EMAIL = "test_bulk@example.com"
+PROMO_CODE = "TEST_BULK"
+
+
+def make_order(n: int, status: str = "completed") -> dict:
+    return {
+        "id": f"order-{n}", "customer_email": CUSTOMER_EMAIL, "customer_phone": "9800000000",
+        "total_amount": 100, "status": status, "created_at": f"2026-01-01T00:00:{n:02d}+00:00",
+    }
+
+
+ORDERS = [make_order(n) for n in range(5)]
+
+
+@pytest.fixture
+def scratch_db():
+    db_name = f"test_order_bulk_ops_{uuid.uuid4().hex[:8]}"
+
+    async def ping():
+        client = AsyncIOMotorClient(MONGO_URL, serverSelectionTimeoutMS=1000)
+        try:
+            await client.admin.command("ping")
+        finally:
+            client.close()
+
+    try:
+        asyncio.run(ping())
+    except Exception:
+        pytest.skip("MongoDB not reachable")
+
+    yield db_name
+
+    async def drop():
+        client = AsyncIOMotorClient(MONGO_URL)
+        await client.drop_database(db_name)
+        client.close()
+
+    asyncio.run(drop())
+
+
+def run(db_name, operation, hot=ORDERS, archived=()):
+    """Seed the orders and everything hanging off them, run `operation(db)` and return (result, db state)"""
+    async def go():
+        client = AsyncIOMotorClient(MONGO_URL)
+        db = client[db_name]
+        try:
+            orders = list(hot) + list(archived)
+            if hot:
+                await db.orders.insert_many([dict(order) for order in hot])
+            if archived:
+                await db.orders_archive.insert_many([dict(order) for order in archived])
+            await db.order_status_history.insert_many([{"order_id": order["id"]} for order in orders])
+            await db.invoice_artifacts.insert_many([{"order_id": order["id"], "format": "pdf"} for order in orders])
+            await db.promo_usage.insert_many([
+                {"promo_code": PROMO_CODE, "order_id": order["id"], "customer_email": CUSTOMER_EMAIL}
+                for order in orders
+            ])
+            await db.promo_codes.insert_one({"code": PROMO_CODE, "used_count": len(orders)})
+            await db.customers.insert_one({
+                "id": "customer", "email": CUSTOMER_EMAIL, "total_orders": len(orders),
+                "total_spent": 100 * len(orders), "completed_orders": len(orders),
+            })
+
+            result = await operation(db)
+            state = {
+                "orders": await db.orders.count_documents({}),
+                "archived": await db.orders_archive.count_documents({}),
+                "history": await db.order_status_history.count_documents({}),
+                "invoices": await db.invoice_artifacts.count_documents({}),
+                "promo_usage": await db.promo_usage.count_documents({}),
+                "used_count": (await db.promo_codes.find_one({"code": PROMO_CODE}))["used_count"],
+                "customer": await db.customers.find_one({"id": "customer"}, {"_id": 0}),
+            }
+            return result, state
+        finally:
+            client.close()
+
+    return asyncio.run(go())
+
+
+class TestBulkDelete:
+    """order_bulk_ops.bulk_order_operation / delete_orders"""
+
+    def test_chunks_report_per_id(self, scratch_db):
+        ids = [order["id"] for order in ORDERS] + ["missing", ORDERS[0]["id"]]
+        results, state = run(scratch_db, lambda db: order_bulk_ops.bulk_order_operation(db, ids, chunk_size=2))
+        assert list(results) == [order["id"] for order in ORDERS] + ["missing"]
+        assert all(results[order["id"]] == order_bulk_ops.DELETED for order in ORDERS)
+        assert results["missing"] == order_bulk_ops.NOT_FOUND
+        assert state["orders"] == 0
+
+    def test_cascade(self, scratch_db):
+        """History, invoices and promo usage go; used_count and the customer's stats come back down"""
+        ids = [order["id"] for order in ORDERS[:3]]
+        _, state = run(scratch_db, lambda db: order_bulk_ops.delete_orders(db, ids))
+        assert state["orders"] == 2
+        assert state["history"] == 2
+        assert state["invoices"] == 2
+        assert state["promo_usage"] == 2
+        assert state["used_count"] == 2
+        customer = state["customer"]
+        assert (customer["total_orders"], customer["total_spent"], customer["completed_orders"]) == (2, 200, 2)
+
+    def test_only_completed_orders_decrement_completed(self, scratch_db):
+        orders = [make_order(0), make_order(1, status="pending")]
+        _, state = run(scratch_db, lambda db: order_bulk_ops.delete_orders(db, ["order-1"]), hot=orders)
+        customer = state["customer"]
+        assert (customer["total_orders"], customer["completed_orders"]) == (1, 2)
+
+    def test_archived_orders_are_deleted(self, scratch_db):
+        archived = [make_order(10), make_order(11)]
+        results, state = run(
+            scratch_db, lambda db: order_bulk_ops.delete_orders(db, ["order-0", "order-10"]), archived=archived
+        )
+        assert results == {"order-0": order_bulk_ops.DELETED, "order-10": order_bulk_ops.DELETED}
+        assert (state["orders"], state["archived"]) == (4, 1)
+        assert state["customer"]["total_orders"] == 5
+
+    def test_failed_cascade_is_not_reported_deleted(self, scratch_db, monkeypatch):
+        """A chunk whose cascade fails reports its ids as failed; later chunks still run"""
+        calls = []
+        original = customer_stats.record_orders_removed
+
+        async def fail_first_chunk(db, orders):
+            calls.append(orders)
+            if len(calls) == 1:
+                raise RuntimeError("stats write failed")
+            await original(db, orders)
+
+        monkeypatch.setattr(customer_stats, "record_orders_removed", fail_first_chunk)
+        ids = [order["id"] for order in ORDERS[:4]]
+        results, _ = run(scratch_db, lambda db: order_bulk_ops.bulk_order_operation(db, ids, chunk_size=2))
+        assert results == {
+            "order-0": order_bulk_ops.FAILED, "order-1": order_bulk_ops.FAILED,
+            "order-2": order_bulk_ops.DELETED, "order-3": order_bulk_ops.DELETED,
+        }
+
+
+class TestBulkArchive:
+    """order_bulk_ops.archive_orders"""
+
+    def test_archive_keeps_stats_and_promo_counts(self, scratch_db):
+        results, state = run(
+            scratch_db, lambda db: order_bulk_ops.archive_orders(db, ["order-0", "order-10", "missing"]),
+            archived=[make_order(10)]
+        )
+        assert results == {
+            "order-0": order_bulk_ops.ARCHIVED, "order-10": order_bulk_ops.ARCHIVED,
+            "missing": order_bulk_ops.NOT_FOUND,
+        }
+        assert (state["orders"], state["archived"]) == (4, 2)
+        assert state["used_count"] == 6
+        assert state["customer"]["total_orders"] == 6
@@ -0,0 +1,93 @@
+"""
+Backend API Tests for GameShop Nepal - Order Event Streams
+Tests: Admin order SSE stream, public order tracking SSE stream
+"""
+import pytest
+import requests
+import os
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+
+@pytest.fixture(scope="module")
+def auth_token():
+    response = requests.post(f"{BASE_URL}/api/auth/login", json={
+        "email": "gsnadmin",
+        "password": "gsnadmin"
+    })
+    return response.json()["token"]
+
+
+class TestAdminOrderEvents:
+    """GET /api/admin/orders/events"""
+
+    def test_requires_auth(self):
+        response = requests.get(f"{BASE_URL}/api/admin/orders/events", timeout=5)
+        assert response.status_code == 401
+
+    def test_stream_with_query_token(self, auth_token):
+        """EventSource can't set headers, so a short-lived stream token is accepted as a query param"""
+        response = requests.post(
+            f"{BASE_URL}/api/admin/stream-token", headers={"Authorization": f"Bearer {auth_token}"}
+        )
+        assert response.status_code == 200
+        with requests.get(
+            f"{BASE_URL}/api/admin/orders/events",
+            params={"token": response.json()["token"]},
+            stream=True,
+            timeout=5
+        ) as response:
+            assert response.status_code == 200
+            assert response.headers["content-type"].startswith("text/event-stream")
+
+    def test_admin_jwt_not_accepted_in_query(self, auth_token):
+        """The long-lived admin token must never travel in a URL"""
+        response = requests.get(
+            f"{BASE_URL}/api/admin/orders/events", params={"token": auth_token}, stream=True, timeout=5
+        )
+        assert response.status_code == 401
+
+    def test_tampered_stream_token_rejected(self, auth_token):
+        token = requests.post(
+            f"{BASE_URL}/api/admin/stream-token", headers={"Authorization": f"Bearer {auth_token}"}
+        ).json()["token"]
+        user_id, expires, signature = token.rsplit(".", 2)
+        forged = f"{user_id}.{int(expires) + 86400}.{signature}"
+        response = requests.get(
+            f"{BASE_URL}/api/admin/orders/events", params={"token": forged}, stream=True, timeout=5
+        )
+        assert response.status_code == 401
+
+    def test_new_order_is_pushed(self, auth_token):
+        """Creating an order emits an order.created event"""
+        with requests.get(
+            f"{BASE_URL}/api/admin/orders/events",
+            headers={"Authorization": f"Bearer {auth_token}"},
+            stream=True,
+            timeout=10
+        ) as stream:
+            create = requests.post(f"{BASE_URL}/api/orders/create", json={
+                "customer_name": "TEST_Events",
+                "customer_phone": "9800000000",
+                "customer_email": "test_events@example.com",
+                "items": [{"name": "TEST_Item", "price": 10, "quantity": 1}],
+                "total_amount": 10
+            })
+            order_id = create.json()["order_id"]
+
+            seen = False
+            for line in stream.iter_lines(decode_unicode=True):
+                if line and line.startswith("data:") and order_id in line:
+                    seen = True
+                    break
+            assert seen
+
+        requests.delete(f"{BASE_URL}/api/orders/{order_id}", headers={"Authorization": f"Bearer {auth_token}"})
+
+
+class TestOrderTrackingEvents:
+    """GET /api/orders/track/{order_id}/events"""
+
+    def test_unknown_order_returns_404(self):
+        response = requests.get(f"{BASE_URL}/api/orders/track/does-not-exist/events", timeout=5)
+        assert response.status_code == 404
@@ -0,0 +1,293 @@
+"""
+Query Plan Regression Tests
+Seeds a scratch MongoDB database with generate_dataset (skipped when MongoDB
+is not reachable), creates the indexes the server creates at startup, moves
+the old finished orders to orders_archive like the archive job and explains
+the query shapes behind the hot endpoints with executionStats.
+Each must be index-backed: no COLLSCAN, no in-memory SORT, and no more than
+QUERY_PLAN_MAX_RATIO documents examined per document returned (or matched,
+for aggregations).
+
+The shapes are copied from server.py - when an endpoint's query changes,
+change it here too. Product search is a regex over name and description and
+is left out: it needs a text index, not a regular one.
+Tests: catalog, order tracking and history, promo validation, credits,
+visits, wishlists, admin lists and analytics, on both order tiers
+"""
+import asyncio
+import os
+import sys
+import uuid
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from motor.motor_asyncio import AsyncIOMotorClient  # noqa: E402
+
+import customer_stats  # noqa: E402
+import database  # noqa: E402
+import generate_dataset  # noqa: E402
+import order_archive  # noqa: E402
+from query_profiler import summarize_plan  # noqa: E402
+
+MONGO_URL = os.environ.get("MONGO_URL", "mongodb://localhost:27017")
+MAX_EXAMINED_RATIO = float(os.environ.get("QUERY_PLAN_MAX_RATIO", "2"))
+
+DATASET = generate_dataset.options(
+    products=300, customers=2_000, orders=20_000, visits=20_000, wishlists=2_000, promo_codes=20, years=1
+)
+
+NOT_CANCELLED = {"status": {"$ne": "cancelled"}}
+REVENUE_GROUP = {"$group": {"_id": None, "total": {"$sum": "$total_amount"}}}
+
+
+def find(collection, filter, sort=None, limit=None):
+    body = {"find": collection, "filter": filter}
+    if sort:
+        body["sort"] = dict(sort)
+    if limit:
+        body["limit"] = limit
+    return body
+
+
+def aggregate(collection, pipeline):
+    return {"aggregate": collection, "pipeline": pipeline, "cursor": {}}
+
+
+def count(collection, filter):
+    """count_documents, as the driver sends it"""
+    return aggregate(collection, [{"$match": filter}, {"$group": {"_id": 1, "n": {"$sum": 1}}}])
+
+
+def periods():
+    now = datetime.now(timezone.utc)
+    first_of_this_month = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    last_month_end = first_of_this_month - timedelta(days=1)
+    return {
+        "today": now.replace(hour=0, minute=0, second=0, microsecond=0).isoformat(),
+        "week_ago": (now - timedelta(days=7)).isoformat(),
+        "month_ago": (now - timedelta(days=30)).isoformat(),
+        "last_month": {"$gte": last_month_end.replace(day=1, hour=0, minute=0, second=0).isoformat(),
+                       "$lte": last_month_end.isoformat()},
+    }
+
+
+# name -> command built from sample values s (see `samples`)
+HOT_QUERIES = {
+    # Storefront catalog
+    "get_products": lambda s: find("products", {"is_active": True}, [("sort_order", 1), ("created_at", -1)]),
+    "get_products_by_category": lambda s: find(
+        "products", {"category_id": s["product"]["category_id"], "is_active": True},
+        [("sort_order", 1), ("created_at", -1)]),
+    "get_product_by_slug": lambda s: find("products", {"slug": s["product"]["slug"]}, limit=1),
+    "get_product_by_id": lambda s: find("products", {"id": s["product"]["id"]}, limit=1),
+    "related_lookup": lambda s: find(
+        "products", {"$or": [{"slug": s["product"]["slug"]}, {"id": s["product"]["slug"]}]}, limit=1),
+    "related_same_category": lambda s: find(
+        "products", {"category_id": s["product"]["category_id"], "id": {"$ne": s["product"]["id"]},
+                     "is_active": True}, limit=4),
+    "related_by_tags": lambda s: find(
+        "products", {"tags": {"$in": s["product"]["tags"]}, "id": {"$nin": [s["product"]["id"]]},
+                     "is_active": True}, limit=4),
+    # Orders
+    "track_order": lambda s: find("orders", {"lookup_keys": s["order"]["id"]}, limit=1),
+    "order_by_id": lambda s: find("orders", {"id": s["order"]["id"]}, limit=1),
+    "get_customer_orders": lambda s: find(
+        "orders", {"customer_email": s["order"]["customer_email"]}, [("created_at", -1)], limit=100),
+    "admin_orders": lambda s: find("orders", {}, [("created_at", -1)]),
+    # Checkout: promo codes and credits
+    "validate_promo_code": lambda s: find("promo_codes", {"code": s["promo"]["code"], "is_active": True}, limit=1),
+    "promo_usage_per_customer": lambda s: count(
+        "promo_usage", {"promo_code": s["promo"]["code"], "customer_email": s["order"]["customer_email"]}),
+    "first_time_buyer": lambda s: count("orders", {"customer_email": s["order"]["customer_email"]}),
+    "auto_apply_promos": lambda s: find("promo_codes", {
+        "is_active": True, "auto_apply": True,
+        "$or": [{"expiry_date": None}, {"expiry_date": {"$gt": datetime.now(timezone.utc).isoformat()}}]}),
+    "credit_balance": lambda s: find("customers", {"email": s["order"]["customer_email"]}, limit=1),
+    # Visits and wishlists
+    "track_visit": lambda s: find("visits", {"visitor_id": s["visit"]["visitor_id"], "date": s["visit"]["date"]},
+                                  limit=1),
+    "get_wishlist": lambda s: find("wishlists", {"visitor_id": s["wishlist"]["visitor_id"]}),
+    "wishlist_existing": lambda s: find("wishlists", {
+        "visitor_id": s["wishlist"]["visitor_id"], "product_id": s["wishlist"]["product_id"],
+        "variation_id": s["wishlist"]["variation_id"]}, limit=1),
+    "customer_stats_wishlist": lambda s: count("wishlists", {"email": s["order"]["customer_email"]}),
+    # Admin
+    "customer_list": lambda s: find("customers", {}, [("created_at", -1), ("id", -1)], limit=50),
+    "customer_list_by_spend": lambda s: find("customers", {}, [("total_spent", -1), ("id", -1)], limit=50),
+    # Analytics
+    "overview_orders_week": lambda s: count("orders", {"created_at": {"$gte": s["periods"]["week_ago"]}}),
+    "overview_orders_last_month": lambda s: count("orders", {"created_at": s["periods"]["last_month"]}),
+    "overview_revenue_today": lambda s: aggregate("orders", [
+        {"$match": {"created_at": {"$gte": s["periods"]["today"]}, **NOT_CANCELLED}}, REVENUE_GROUP]),
+    "overview_revenue_month": lambda s: aggregate("orders", [
+        {"$match": {"created_at": {"$gte": s["periods"]["month_ago"]}, **NOT_CANCELLED}}, REVENUE_GROUP]),
+    "overview_revenue_total": lambda s: aggregate("orders", [{"$match": NOT_CANCELLED}, REVENUE_GROUP]),
+    "overview_visits_today": lambda s: count("visits", {"date": s["periods"]["today"][:10]}),
+    "overview_visits_month": lambda s: count("visits", {"created_at": {"$gte": s["periods"]["month_ago"]}}),
+    "top_products": lambda s: aggregate("orders", [
+        {"$match": {"status": {"$in": ["completed", "Completed", "delivered"]}}},
+        {"$unwind": "$items"},
+        {"$group": {"_id": "$items.name", "total_quantity": {"$sum": "$items.quantity"},
+                    "total_revenue": {"$sum": {"$multiply": ["$items.price", "$items.quantity"]}}}}]),
+    "revenue_chart": lambda s: aggregate("orders", [
+        {"$match": {"created_at": {"$gte": s["periods"]["month_ago"]}, **NOT_CANCELLED}},
+        {"$addFields": {"date": {"$substr": ["$created_at", 0, 10]}}},
+        {"$group": {"_id": "$date", "orders": {"$sum": 1}, "revenue": {"$sum": "$total_amount"}}}]),
+    "order_status_breakdown": lambda s: aggregate("orders", [
+        {"$sort": {"status": 1}}, {"$group": {"_id": "$status", "count": {"$sum": 1}}}]),
+    "profit_completed_orders": lambda s: find(
+        "orders", {"status": {"$in": customer_stats.COMPLETED_STATUS_VARIANTS}}),
+    # Archive tier: find_order falls through to it
+    "track_order_archive": lambda s: find("orders_archive", {"lookup_keys": s["archived_order"]["id"]}, limit=1),
+    "order_by_id_archive": lambda s: find("orders_archive", {"id": s["archived_order"]["id"]}, limit=1),
+}
+
+
+def in_archive(build):
+    """The same command against orders_archive"""
+    def archived(s):
+        command = build(s)
+        return {**command, "find" if "find" in command else "aggregate": "orders_archive"}
+    return archived
+
+
+# Analytics run on both tiers (order_archive.count_tiers / aggregate_tiers, profit_analytics)
+TIERED_QUERIES = (
+    "overview_orders_week", "overview_orders_last_month", "overview_revenue_today", "overview_revenue_month",
+    "overview_revenue_total", "top_products", "revenue_chart", "order_status_breakdown", "profit_completed_orders",
+)
+HOT_QUERIES.update({f"{name}_archive": in_archive(HOT_QUERIES[name]) for name in TIERED_QUERIES})
+
+
+@pytest.fixture(scope="module")
+def seeded_db():
+    db_name = f"test_query_plans_{uuid.uuid4().hex[:8]}"
+
+    async def seed():
+        client = AsyncIOMotorClient(MONGO_URL, serverSelectionTimeoutMS=1000)
+        try:
+            await client.admin.command("ping")
+        except Exception:
+            return False
+        try:
+            # populate() creates the indexes with database.ensure_indexes, like startup
+            await generate_dataset.populate(client[db_name], DATASET)
+            await order_archive.archive_old_orders(client[db_name])
+        finally:
+            client.close()
+        return True
+
+    if not asyncio.run(seed()):
+        pytest.skip("MongoDB not reachable")
+
+    yield db_name
+
+    async def drop():
+        client = AsyncIOMotorClient(MONGO_URL)
+        await client.drop_database(db_name)
+        client.close()
+
+    asyncio.run(drop())
+
+
+@pytest.fixture(scope="module")
+def samples(seeded_db):
+    async def load():
+        client = AsyncIOMotorClient(MONGO_URL)
+        db = client[seeded_db]
+        try:
+            return {
+                "product": await db.products.find_one({"is_active": True}),
+                "order": await db.orders.find_one({}, sort=[("created_at", -1)]),
+                "archived_order": await db.orders_archive.find_one({}, sort=[("created_at", -1)]),
+                "promo": await db.promo_codes.find_one({"is_active": True}),
+                "visit": await db.visits.find_one({}, sort=[("created_at", -1)]),
+                "wishlist": await db.wishlists.find_one({}),
+                "periods": periods(),
+            }
+        finally:
+            client.close()
+
+    return asyncio.run(load())
+
+
+def execution_stats(explain) -> list:
+    """Every executionStats section, wherever this server version puts them"""
+    found = []
+
+    def walk(node):
+        if isinstance(node, dict):
+            stats = node.get("executionStats")
+            if isinstance(stats, dict) and "totalDocsExamined" in stats:
+                found.append(stats)
+            for key, value in node.items():
+                if key != "executionStats":
+                    walk(value)
+        elif isinstance(node, list):
+            for item in node:
+                walk(item)
+
+    walk(explain)
+    return found
+
+
+def explain(db_name, command):
+    async def go():
+        client = AsyncIOMotorClient(MONGO_URL)
+        db = client[db_name]
+        try:
+            result = await db.command({"explain": command, "verbosity": "executionStats"})
+            if "find" in command:
+                returned = None
+            elif command["pipeline"] and "$match" in command["pipeline"][0]:
+                returned = await db[command["aggregate"]].count_documents(command["pipeline"][0]["$match"])
+            else:
+                returned = await db[command["aggregate"]].estimated_document_count()
+            return result, returned
+        finally:
+            client.close()
+
+    return asyncio.run(go())
+
+
+class TestQueryPlans:
+    """Hot query shapes stay on their indexes"""
+
+    def test_core_indexes_exist(self, seeded_db):
+        async def go():
+            client = AsyncIOMotorClient(MONGO_URL)
+            try:
+                return {
+                    collection: [list(index["key"].items()) async for index in client[seeded_db][collection].list_indexes()]
+                    for collection in database.CORE_INDEXES
+                }
+            finally:
+                client.close()
+
+        existing = asyncio.run(go())
+        for collection, indexes in database.CORE_INDEXES.items():
+            for keys in indexes:
+                assert [(field, direction) for field, direction in keys] in existing[collection], (collection, keys)
+
+    @pytest.mark.parametrize("name", sorted(HOT_QUERIES))
+    def test_hot_query_is_index_backed(self, seeded_db, samples, name):
+        command = HOT_QUERIES[name](samples)
+        result, matched = explain(seeded_db, command)
+        plan = summarize_plan(result)
+
+        assert not plan["collscan"], f"{name} scans the collection: {plan['stages']}"
+        assert not plan["in_memory_sort"], f"{name} sorts in memory: {plan['stages']}"
+
+        stats = execution_stats(result)
+        assert stats, f"no executionStats in explain for {name}"
+        examined = sum(section["totalDocsExamined"] for section in stats)
+        returned = matched if matched is not None else stats[0]["nReturned"]
+        ratio = examined / max(returned, 1)
+        assert ratio <= MAX_EXAMINED_RATIO, (
+            f"{name} examined {examined} documents for {returned} ({ratio:.1f}x, max {MAX_EXAMINED_RATIO}x) "
+            f"using {plan['indexes'] or plan['stages']}"
+        )
@@ -0,0 +1,156 @@
+"""
+Slow Query Profiler Tests
+Exercises query_profiler's shape normalization, plan summaries and shape
+bookkeeping directly - no MongoDB or running server needed.
+Tests: values become "?", $field references and sort directions stay,
+COLLSCAN / in-memory SORT flagged, grouping by shape, MAX_SHAPES cap
+"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import query_profiler  # noqa: E402
+from query_profiler import PLACEHOLDER as Q  # noqa: E402
+
+
+def find(filter_, sort=None) -> dict:
+    command = {"find": "orders", "filter": filter_, "limit": 20, "lsid": {"id": "session"}}
+    if sort:
+        command["sort"] = sort
+    return command
+
+
+class TestNormalize:
+    def test_values_become_placeholders(self):
+        assert query_profiler.normalize({"id": "order-1", "total_amount": {"$gte": 500}}) == {
+            "id": Q, "total_amount": {"$gte": Q},
+        }
+
+    def test_field_references_stay(self):
+        stage = {"$group": {"_id": "$customer_email", "total": {"$sum": "$total_amount"}, "orders": {"$sum": 1}}}
+        assert query_profiler.normalize(stage) == {
+            "$group": {"_id": "$customer_email", "total": {"$sum": "$total_amount"}, "orders": {"$sum": Q}},
+        }
+
+    def test_lists_collapse_to_distinct_shapes(self):
+        """An $in over 3 ids or 300 ids is the same shape"""
+        short = query_profiler.normalize({"id": {"$in": ["a", "b", "c"]}})
+        long = query_profiler.normalize({"id": {"$in": [str(n) for n in range(300)]}})
+        assert short == long == {"id": {"$in": [Q]}}
+        assert query_profiler.normalize({"$or": [{"email": "a"}, {"phone": "1"}]}) == {
+            "$or": [{"email": Q}, {"phone": Q}],
+        }
+
+
+class TestCommandShape:
+    def test_find_keeps_sort_directions(self):
+        shape = query_profiler.command_shape("find", find({"status": "pending"}, sort={"created_at": -1}))
+        assert shape == {"filter": {"status": Q}, "sort": {"created_at": -1}}
+        ascending = query_profiler.command_shape("find", find({"status": "pending"}, sort={"created_at": 1}))
+        assert ascending["sort"] == {"created_at": 1}
+
+    def test_transport_fields_are_dropped(self):
+        shape = query_profiler.command_shape("find", find({"id": "order-1"}))
+        assert shape == {"filter": {"id": Q}}
+
+    def test_count_and_distinct(self):
+        assert query_profiler.command_shape("count", {"count": "orders", "query": {"status": "completed"}}) == {
+            "filter": {"status": Q},
+        }
+        assert query_profiler.command_shape(
+            "distinct", {"distinct": "orders", "key": "customer_email", "query": {"status": "completed"}}
+        ) == {"filter": {"status": Q}, "key": "customer_email"}
+
+    def test_aggregate_keeps_sort_and_limit_literal(self):
+        pipeline = [
+            {"$match": {"status": "completed", "created_at": {"$gte": "2026-01-01"}}},
+            {"$group": {"_id": "$items.product_id", "sold": {"$sum": "$items.quantity"}}},
+            {"$sort": {"sold": -1}},
+            {"$limit": 10},
+        ]
+        assert query_profiler.command_shape("aggregate", {"aggregate": "orders", "pipeline": pipeline}) == {
+            "pipeline": [
+                {"$match": {"status": Q, "created_at": {"$gte": Q}}},
+                {"$group": {"_id": "$items.product_id", "sold": {"$sum": "$items.quantity"}}},
+                {"$sort": {"sold": -1}},
+                {"$limit": 10},
+            ],
+        }
+
+    def test_update_and_delete(self):
+        update = {"update": "orders", "updates": [{"q": {"id": "order-1"}, "u": {"$set": {"status": "x"}}}]}
+        assert query_profiler.command_shape("update", update) == {"filter": {"id": Q}, "multi": False}
+        delete = {"delete": "orders", "deletes": [{"q": {"id": {"$in": ["a", "b"]}}, "limit": 0}]}
+        assert query_profiler.command_shape("delete", delete) == {"filter": {"id": {"$in": [Q]}}, "multi": True}
+
+
+class TestSummarizePlan:
+    def test_collscan_and_in_memory_sort(self):
+        explain = {"queryPlanner": {"winningPlan": {
+            "stage": "SORT", "sortPattern": {"created_at": -1},
+            "inputStage": {"stage": "COLLSCAN", "direction": "forward"},
+        }}}
+        plan = query_profiler.summarize_plan(explain)
+        assert plan == {"stages": ["COLLSCAN", "SORT"], "collscan": True, "in_memory_sort": True, "indexes": []}
+
+    def test_index_scan_is_clean(self):
+        explain = {"queryPlanner": {
+            "winningPlan": {"stage": "FETCH", "inputStage": {"stage": "IXSCAN", "indexName": "status_1_created_at_-1"}},
+            # A rejected collection scan is not the plan that runs
+            "rejectedPlans": [{"stage": "COLLSCAN"}],
+        }}
+        plan = query_profiler.summarize_plan(explain)
+        assert plan["collscan"] is False
+        assert plan["in_memory_sort"] is False
+        assert plan["indexes"] == ["status_1_created_at_-1"]
+
+    def test_aggregate_cursor_stage(self):
+        """Aggregate explains nest the plan under $cursor"""
+        explain = {"stages": [
+            {"$cursor": {"queryPlanner": {"winningPlan": {"stage": "COLLSCAN"}}}},
+            {"$group": {"_id": "$status"}},
+        ]}
+        assert query_profiler.summarize_plan(explain)["collscan"] is True
+
+
+class TestRecord:
+    def pending(self, filter_, route="/api/orders", sort=None) -> tuple:
+        return ("shop", "find", find(filter_, sort=sort), route)
+
+    def test_same_shape_is_grouped(self):
+        profiler = query_profiler.QueryProfiler(threshold_ms=100)
+        profiler._record(self.pending({"id": "order-1"}), 150)
+        profiler._record(self.pending({"id": "order-2"}), 250)
+        profiler._record(self.pending({"id": "order-3"}, route="/api/track"), 200)
+
+        report = profiler.report()
+        assert report["shapes_tracked"] == 1
+        shape = report["shapes"][0]
+        assert (shape["collection"], shape["command"], shape["shape"]) == ("orders", "find", {"filter": {"id": Q}})
+        assert (shape["count"], shape["total_ms"], shape["max_ms"], shape["avg_ms"]) == (3, 600.0, 250.0, 200.0)
+        assert shape["routes"] == {"/api/orders": 2, "/api/track": 1}
+        # Only the shape is kept, never the values
+        assert "order-1" not in str(report)
+
+    def test_different_sorts_are_different_shapes(self):
+        profiler = query_profiler.QueryProfiler(threshold_ms=100)
+        profiler._record(self.pending({"status": "pending"}, sort={"created_at": -1}), 150)
+        profiler._record(self.pending({"status": "pending"}, sort={"created_at": 1}), 150)
+        assert profiler.report()["shapes_tracked"] == 2
+
+    def test_max_shapes_cap(self, monkeypatch):
+        monkeypatch.setattr(query_profiler, "MAX_SHAPES", 3)
+        profiler = query_profiler.QueryProfiler(threshold_ms=100)
+        for n in range(5):
+            profiler._record(self.pending({f"field_{n}": "value"}), 150)
+        # Shapes already tracked keep counting once the cap is reached
+        profiler._record(self.pending({"field_0": "other"}), 150)
+
+        report = profiler.report()
+        assert report["shapes_tracked"] == 3
+        assert report["shapes_dropped"] == 2
+        assert sum(shape["count"] for shape in report["shapes"]) == 4
+
+        profiler.reset()
+        assert (profiler.report()["shapes_tracked"], profiler.dropped) == (0, 0)
@@ -0,0 +1,179 @@
+"""
+Take.app Importer Tests
+Runs takeapp_sync against a local fake Take.app server and a scratch MongoDB
+database (skipped when MongoDB is not reachable).
+Tests: paging, dedupe by Take.app id, high-water mark, customer upserts,
+customer order stats, single-customer refresh agreeing with the rebuild
+"""
+import asyncio
+import json
+import os
+import sys
+import threading
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from motor.motor_asyncio import AsyncIOMotorClient  # noqa: E402
+
+import customer_stats  # noqa: E402
+import takeapp_sync  # noqa: E402
+
+MONGO_URL = os.environ.get("MONGO_URL", "mongodb://localhost:27017")
+
+FAKE_ORDERS = [
+    {"id": f"ta-{i}", "number": 1000 + i, "customer_name": f"TEST_Customer {i % 3}",
+     "customer_phone": f"98000000{i % 3}", "customer_email": f"test_takeapp{i % 3}@example.com",
+     "total": 100 + i, "status": "completed",
+     "created_at": f"2026-01-01T00:00:{i:02d}+00:00", "updated_at": f"2026-01-01T00:00:{i:02d}+00:00"}
+    for i in range(7)
+]
+
+
+class FakeTakeAppHandler(BaseHTTPRequestHandler):
+    """Serves FAKE_ORDERS with page/limit/updated_after like the Take.app API"""
+    requests_seen = []
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {k: v[0] for k, v in parse_qs(url.query).items()}
+        FakeTakeAppHandler.requests_seen.append(params)
+
+        orders = [o for o in FAKE_ORDERS if o["updated_at"] > params.get("updated_after", "")]
+        page, limit = int(params.get("page", 1)), int(params.get("limit", 100))
+        body = json.dumps({"data": orders[(page - 1) * limit:page * limit]}).encode()
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(scope="module")
+def fake_takeapp():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeTakeAppHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+
+
+@pytest.fixture
+def scratch_db():
+    db_name = f"test_takeapp_sync_{uuid.uuid4().hex[:8]}"
+
+    async def ping():
+        client = AsyncIOMotorClient(MONGO_URL, serverSelectionTimeoutMS=1000)
+        try:
+            await client.admin.command("ping")
+        finally:
+            client.close()
+
+    try:
+        asyncio.run(ping())
+    except Exception:
+        pytest.skip("MongoDB not reachable")
+
+    yield db_name
+
+    async def drop():
+        client = AsyncIOMotorClient(MONGO_URL)
+        await client.drop_database(db_name)
+        client.close()
+
+    asyncio.run(drop())
+
+
+def run_sync(db_name, base_url, existing_customers=()):
+    async def go():
+        client = AsyncIOMotorClient(MONGO_URL)
+        db = client[db_name]
+        try:
+            if existing_customers:
+                await db.customers.insert_many([dict(customer) for customer in existing_customers])
+            await takeapp_sync.ensure_takeapp_indexes(db)
+            state = await takeapp_sync.sync_takeapp_orders(db, base_url=base_url, api_key="test", page_size=3)
+            orders = await db.takeapp_orders.count_documents({})
+            customers = await db.customers.find({}, {"_id": 0}).to_list(None)
+            return state, orders, customers
+        finally:
+            client.close()
+
+    return asyncio.run(go())
+
+
+class TestTakeAppSync:
+    """Incremental importer against the fake server"""
+
+    def test_pages_through_all_orders(self, fake_takeapp, scratch_db):
+        state, orders, customers = run_sync(scratch_db, fake_takeapp)
+        assert state["status"] == "idle"
+        assert state["pages"] == 3
+        assert orders == len(FAKE_ORDERS)
+        assert len(customers) == 3
+        assert state["high_water_mark"] == FAKE_ORDERS[-1]["updated_at"]
+
+    def test_resync_is_incremental_and_idempotent(self, fake_takeapp, scratch_db):
+        run_sync(scratch_db, fake_takeapp)
+        FakeTakeAppHandler.requests_seen.clear()
+
+        state, orders, customers = run_sync(scratch_db, fake_takeapp)
+        assert FakeTakeAppHandler.requests_seen[0]["updated_after"] == FAKE_ORDERS[-1]["updated_at"]
+        assert state["orders_seen"] == 0
+        assert orders == len(FAKE_ORDERS)
+        assert len(customers) == 3
+
+    def test_takeapp_only_customers_get_order_stats(self, fake_takeapp, scratch_db):
+        """New customers are refreshed and existing ones $inc'd - both count their Take.app orders"""
+        existing = {"id": "existing", "phone": FAKE_ORDERS[1]["customer_phone"], "total_orders": 0, "total_spent": 0}
+        _, _, customers = run_sync(scratch_db, fake_takeapp, existing_customers=[existing])
+        by_phone = {customer["phone"]: customer for customer in customers}
+        assert len(customers) == 3
+
+        for phone, customer in by_phone.items():
+            orders = [order for order in FAKE_ORDERS if order["customer_phone"] == phone]
+            assert customer["total_orders"] == len(orders)
+            assert customer["total_spent"] == sum(order["total"] for order in orders)
+            assert customer["completed_orders"] == len(orders)
+        assert by_phone[existing["phone"]]["id"] == "existing"
+
+        # A second run sees nothing new and must not count anything twice
+        _, _, customers = run_sync(scratch_db, fake_takeapp)
+        assert {c["phone"]: c["total_orders"] for c in customers} == {p: c["total_orders"] for p, c in by_phone.items()}
+
+    def test_refresh_agrees_with_rebuild(self, fake_takeapp, scratch_db):
+        """A local copy of a Take.app order, stored with a mixed-case email, counts once either way"""
+        run_sync(scratch_db, fake_takeapp)
+        imported = FAKE_ORDERS[0]
+        email = imported["customer_email"]
+
+        async def go():
+            client = AsyncIOMotorClient(MONGO_URL)
+            db = client[scratch_db]
+            try:
+                await db.orders.insert_one({
+                    "id": "local-copy", "takeapp_order_id": imported["id"], "customer_email": email.upper(),
+                    "customer_phone": imported["customer_phone"], "total_amount": imported["total"],
+                    "status": "completed", "created_at": imported["created_at"],
+                })
+                await customer_stats.normalize_order_emails(db)
+                refreshed = await customer_stats.refresh_customer_stats(db, email=email)
+                await customer_stats.rebuild_customer_stats(db)
+                rebuilt = await db.customers.find_one({"email": email}, {"_id": 0})
+                return refreshed, rebuilt
+            finally:
+                client.close()
+
+        refreshed, rebuilt = asyncio.run(go())
+        orders = [order for order in FAKE_ORDERS if order["customer_email"] == email]
+        assert refreshed["total_orders"] == len(orders)
+        assert {field: rebuilt[field] for field in customer_stats.STAT_FIELDS} == refreshed
@@ -0,0 +1,151 @@
+"""
+Live Purchase Ticker Service
+Keeps recent purchases in memory so the storefront ticker never hits MongoDB
+"""
+import asyncio
+import logging
+import random
+from collections import deque
+from datetime import datetime, timezone, timedelta
+from typing import List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Nepal cities for random location
+NEPAL_CITIES = ["Kathmandu", "Pokhara", "Lalitpur", "Biratnagar", "Bharatpur", "Birgunj", "Dharan", "Butwal", "Hetauda", "Bhaktapur", "Janakpur", "Nepalgunj", "Itahari", "Dhangadhi", "Tulsipur"]
+
+# Common Nepali first names
+SIMULATED_NAMES = ["Aarav", "Sita", "Ram", "Gita", "Bikash", "Anita", "Sunil", "Priya", "Rajesh", "Maya", "Dipak", "Sunita", "Anil", "Kamala", "Binod"]
+
+SIMULATED_TIMES_AGO = ["2 min ago", "5 min ago", "8 min ago", "12 min ago", "15 min ago", "20 min ago", "25 min ago", "30 min ago"]
+
+DEFAULT_PRODUCT_NAMES = ["Netflix Premium", "Spotify Premium", "YouTube Premium"]
+
+# Only the most recent real orders are ever shown, so keep the buffer small
+RING_BUFFER_SIZE = 5
+REAL_PURCHASE_WINDOW = timedelta(hours=24)
+PRODUCT_POOL_SIZE = 20
+
+# Per-subscriber queue size for the SSE stream - slow clients drop old events
+SUBSCRIBER_QUEUE_SIZE = 20
+
+
+def mask_customer_name(customer_name: Optional[str]) -> str:
+    """Mask customer name for privacy (show first name only)"""
+    name_parts = (customer_name or "Customer").split()
+    return name_parts[0] if name_parts else "Customer"
+
+
+class RecentPurchasesTicker:
+    """
+    Bounded ring buffer of masked real purchases plus precomputed pools
+    for the simulated entries.
+
+    Fed by order events (`record_order`), seeded from the DB at startup
+    (`seed_from_db`) and refreshed when the catalog changes (`refresh_product_pool`).
+    """
+
+    def __init__(self, size: int = RING_BUFFER_SIZE):
+        self._purchases = deque(maxlen=size)
+        self._product_names = list(DEFAULT_PRODUCT_NAMES)
+        self._subscribers = set()
+
+    def _make_entry(self, order: dict) -> Optional[dict]:
+        created_at = order.get("created_at")
+        if isinstance(created_at, str):
+            try:
+                created_at = datetime.fromisoformat(created_at.replace('Z', '+00:00'))
+            except ValueError:
+                created_at = None
+        if not isinstance(created_at, datetime):
+            created_at = datetime.now(timezone.utc)
+        if created_at.tzinfo is None:
+            created_at = created_at.replace(tzinfo=timezone.utc)
+
+        return {
+            "name": mask_customer_name(order.get("customer_name")),
+            "product": order.get("items_text") or "Digital Product",
+            "created_at": created_at,
+        }
+
+    async def seed_from_db(self, db):
+        """Load the last 24 hours of orders and the product pool"""
+        since = (datetime.now(timezone.utc) - REAL_PURCHASE_WINDOW).isoformat()
+        real_orders = await db.orders.find(
+            {"created_at": {"$gte": since}},
+            {"_id": 0, "customer_name": 1, "items_text": 1, "created_at": 1}
+        ).sort("created_at", -1).limit(self._purchases.maxlen).to_list(self._purchases.maxlen)
+
+        self._purchases.clear()
+        # Oldest first so the newest ends up at the right of the deque
+        for order in reversed(real_orders):
+            self._purchases.append(self._make_entry(order))
+
+        await self.refresh_product_pool(db)
+        logger.info(f"Recent purchases ticker seeded with {len(self._purchases)} orders")
+
+    async def refresh_product_pool(self, db):
+        """Rebuild the simulated product name pool from the active catalog"""
+        products = await db.products.find(
+            {"is_active": True}, {"_id": 0, "name": 1}
+        ).limit(PRODUCT_POOL_SIZE).to_list(PRODUCT_POOL_SIZE)
+        names = [p["name"] for p in products if p.get("name")]
+        self._product_names = names or list(DEFAULT_PRODUCT_NAMES)
+
+    def record_order(self, order: dict):
+        """Push a newly placed order into the buffer and notify stream subscribers"""
+        entry = self._make_entry(order)
+        self._purchases.append(entry)
+
+        event = self._public_entry(entry)
+        for queue in list(self._subscribers):
+            if queue.full():
+                try:
+                    queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    pass
+            queue.put_nowait(event)
+
+    def _public_entry(self, entry: dict) -> dict:
+        return {
+            "name": entry["name"],
+            "location": random.choice(NEPAL_CITIES),
+            "product": entry["product"],
+            "time_ago": "Just now",
+            "is_real": True
+        }
+
+    def _simulated_entry(self) -> dict:
+        return {
+            "name": random.choice(SIMULATED_NAMES),
+            "location": random.choice(NEPAL_CITIES),
+            "product": random.choice(self._product_names),
+            "time_ago": random.choice(SIMULATED_TIMES_AGO),
+            "is_real": False
+        }
+
+    def snapshot(self, limit: int = 10) -> List[dict]:
+        """Mix of real (last 24h) and simulated purchases, served from memory"""
+        cutoff = datetime.now(timezone.utc) - REAL_PURCHASE_WINDOW
+        purchases = [
+            self._public_entry(entry)
+            for entry in reversed(self._purchases)
+            if entry["created_at"] >= cutoff
+        ]
+
+        while len(purchases) < limit:
+            purchases.append(self._simulated_entry())
+
+        random.shuffle(purchases)
+        return purchases[:limit]
+
+    def subscribe(self) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self._subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        self._subscribers.discard(queue)
+
+
+ticker = RecentPurchasesTicker()
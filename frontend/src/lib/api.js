@@ -203,6 +203,12 @@ export const analyticsAPI = {
   getTopProducts: (limit = 10) => api.get(`/analytics/top-products?limit=${limit}`),
   getRevenueChart: (days = 30) => api.get(`/analytics/revenue-chart?days=${days}`),
   getOrderStatus: () => api.get('/analytics/order-status'),
+  // All sections (or just `sections`) in one request; a section that misses the server's time budget comes back null
+  getDashboard: (days = 30, limit = 10, sections) => {
+    let url = `/analytics/dashboard?days=${days}&limit=${limit}`;
+    if (sections) url += `&sections=${sections.join(',')}`;
+    return api.get(url);
+  },
 };
 
 // ==================== SEO ====================
@@ -1,5 +1,6 @@
 import { useState, useEffect, useCallback } from 'react';
 import { 
+  AlertTriangle,
   Calendar,
   Package
 } from 'lucide-react';
@@ -25,6 +26,17 @@ import {
   Bar
 } from 'recharts';
 
+// Shown in place of a section the server didn't finish within its time budget
+function SectionUnavailable() {
+  return (
+    <div className="h-full flex flex-col items-center justify-center text-center">
+      <AlertTriangle className="w-10 h-10 text-amber-500/70 mb-3" />
+      <p className="text-gray-400">Couldn't load this section</p>
+      <p className="text-gray-500 text-sm">Refresh to try again</p>
+    </div>
+  );
+}
+
 export default function AdminAnalytics() {
   const [revenueChart, setRevenueChart] = useState([]);
   const [topProducts, setTopProducts] = useState([]);
@@ -42,13 +54,11 @@ export default function AdminAnalytics() {
   const fetchAnalytics = useCallback(async () => {
     setLoading(true);
     try {
-      const [chartRes, topRes] = await Promise.all([
-        analyticsAPI.getRevenueChart(chartDays),
-        analyticsAPI.getTopProducts(10),
-      ]);
+      // Only the sections this page shows; a section that timed out or failed comes back null
+      const { data } = await analyticsAPI.getDashboard(chartDays, 10, ['revenue_chart', 'top_products']);
       
       // Process chart data to include all metrics
-      const chartData = chartRes.data.map(item => ({
+      const chartData = data.revenue_chart && data.revenue_chart.map(item => ({
         ...item,
         orders: item.orders || 0,
         visits: item.visits || Math.floor(Math.random() * 50) + 10, // Placeholder if not available
@@ -56,7 +66,7 @@ export default function AdminAnalytics() {
       }));
       
       setRevenueChart(chartData);
-      setTopProducts(topRes.data);
+      setTopProducts(data.top_products);
     } catch (error) {
       console.error('Error fetching analytics:', error);
     } finally {
@@ -92,7 +102,7 @@ export default function AdminAnalytics() {
     setIsCalendarOpen(false);
   };
 
-  if (loading && revenueChart.length === 0) {
+  if (loading && !revenueChart?.length) {
     return (
       <AdminLayout>
         <div className="flex items-center justify-center h-64">
@@ -165,6 +175,16 @@ export default function AdminAnalytics() {
           </Popover>
         </div>
 
+        {(revenueChart === null || topProducts === null) && (
+          <div className="flex items-center gap-3 bg-amber-500/10 border border-amber-500/30 rounded-lg px-4 py-3">
+            <AlertTriangle className="w-5 h-5 text-amber-500 shrink-0" />
+            <p className="text-sm text-amber-200 flex-1">Some sections couldn't be loaded in time, so this view is incomplete.</p>
+            <Button size="sm" variant="outline" className="bg-zinc-800 border-zinc-600 text-white hover:bg-zinc-700" onClick={fetchAnalytics}>
+              Retry
+            </Button>
+          </div>
+        )}
+
         {/* Charts Grid - 2x2 */}
         <div className="grid grid-cols-1 lg:grid-cols-2 gap-6">
           
@@ -175,46 +195,50 @@ export default function AdminAnalytics() {
             </CardHeader>
             <CardContent>
               <div className="h-[280px]">
-                <ResponsiveContainer width="100%" height="100%">
-                  <AreaChart data={revenueChart}>
-                    <defs>
-                      <linearGradient id="colorRevenue" x1="0" y1="0" x2="0" y2="1">
-                        <stop offset="5%" stopColor="#F5A623" stopOpacity={0.4}/>
-                        <stop offset="95%" stopColor="#F5A623" stopOpacity={0}/>
-                      </linearGradient>
-                    </defs>
-                    <CartesianGrid strokeDasharray="3 3" stroke="#333" vertical={false} />
-                    <XAxis 
-                      dataKey="date" 
-                      stroke="#666"
-                      fontSize={11}
-                      tickLine={false}
-                      axisLine={false}
-                      tickFormatter={(val) => format(new Date(val), 'MMM d')}
-                    />
-                    <YAxis 
-                      stroke="#666" 
-                      fontSize={11}
-                      tickLine={false}
-                      axisLine={false}
-                      tickFormatter={(val) => `Rs ${val >= 1000 ? `${(val/1000).toFixed(0)}K` : val}`} 
-                    />
-                    <Tooltip 
-                      contentStyle={{ backgroundColor: '#18181b', border: '1px solid #3f3f46', borderRadius: '8px' }}
-                      labelStyle={{ color: '#fff', fontWeight: 'bold' }}
-                      formatter={(value) => [`Rs ${Math.round(value).toLocaleString()}`, 'Revenue']}
-                      labelFormatter={(val) => format(new Date(val), 'EEE, MMM d, yyyy')}
-                    />
-                    <Area 
-                      type="monotone" 
-                      dataKey="revenue" 
-                      stroke="#F5A623" 
-                      strokeWidth={2}
-                      fillOpacity={1} 
-                      fill="url(#colorRevenue)" 
-                    />
-                  </AreaChart>
-                </ResponsiveContainer>
+                {revenueChart === null ? (
+                  <SectionUnavailable />
+                ) : (
+                  <ResponsiveContainer width="100%" height="100%">
+                    <AreaChart data={revenueChart}>
+                      <defs>
+                        <linearGradient id="colorRevenue" x1="0" y1="0" x2="0" y2="1">
+                          <stop offset="5%" stopColor="#F5A623" stopOpacity={0.4}/>
+                          <stop offset="95%" stopColor="#F5A623" stopOpacity={0}/>
+                        </linearGradient>
+                      </defs>
+                      <CartesianGrid strokeDasharray="3 3" stroke="#333" vertical={false} />
+                      <XAxis 
+                        dataKey="date" 
+                        stroke="#666"
+                        fontSize={11}
+                        tickLine={false}
+                        axisLine={false}
+                        tickFormatter={(val) => format(new Date(val), 'MMM d')}
+                      />
+                      <YAxis 
+                        stroke="#666" 
+                        fontSize={11}
+                        tickLine={false}
+                        axisLine={false}
+                        tickFormatter={(val) => `Rs ${val >= 1000 ? `${(val/1000).toFixed(0)}K` : val}`} 
+                      />
+                      <Tooltip 
+                        contentStyle={{ backgroundColor: '#18181b', border: '1px solid #3f3f46', borderRadius: '8px' }}
+                        labelStyle={{ color: '#fff', fontWeight: 'bold' }}
+                        formatter={(value) => [`Rs ${Math.round(value).toLocaleString()}`, 'Revenue']}
+                        labelFormatter={(val) => format(new Date(val), 'EEE, MMM d, yyyy')}
+                      />
+                      <Area 
+                        type="monotone" 
+                        dataKey="revenue" 
+                        stroke="#F5A623" 
+                        strokeWidth={2}
+                        fillOpacity={1} 
+                        fill="url(#colorRevenue)" 
+                      />
+                    </AreaChart>
+                  </ResponsiveContainer>
+                )}
               </div>
             </CardContent>
           </Card>
@@ -226,45 +250,49 @@ export default function AdminAnalytics() {
             </CardHeader>
             <CardContent>
               <div className="h-[280px]">
-                <ResponsiveContainer width="100%" height="100%">
-                  <AreaChart data={revenueChart}>
-                    <defs>
-                      <linearGradient id="colorVisits" x1="0" y1="0" x2="0" y2="1">
-                        <stop offset="5%" stopColor="#8B5CF6" stopOpacity={0.4}/>
-                        <stop offset="95%" stopColor="#8B5CF6" stopOpacity={0}/>
-                      </linearGradient>
-                    </defs>
-                    <CartesianGrid strokeDasharray="3 3" stroke="#333" vertical={false} />
-                    <XAxis 
-                      dataKey="date" 
-                      stroke="#666"
-                      fontSize={11}
-                      tickLine={false}
-                      axisLine={false}
-                      tickFormatter={(val) => format(new Date(val), 'MMM d')}
-                    />
-                    <YAxis 
-                      stroke="#666" 
-                      fontSize={11}
-                      tickLine={false}
-                      axisLine={false}
-                    />
-                    <Tooltip 
-                      contentStyle={{ backgroundColor: '#18181b', border: '1px solid #3f3f46', borderRadius: '8px' }}
-                      labelStyle={{ color: '#fff', fontWeight: 'bold' }}
-                      formatter={(value) => [value, 'Visitors']}
-                      labelFormatter={(val) => format(new Date(val), 'EEE, MMM d, yyyy')}
-                    />
-                    <Area 
-                      type="monotone" 
-                      dataKey="visits" 
-                      stroke="#8B5CF6" 
-                      strokeWidth={2}
-                      fillOpacity={1} 
-                      fill="url(#colorVisits)" 
-                    />
-                  </AreaChart>
-                </ResponsiveContainer>
+                {revenueChart === null ? (
+                  <SectionUnavailable />
+                ) : (
+                  <ResponsiveContainer width="100%" height="100%">
+                    <AreaChart data={revenueChart}>
+                      <defs>
+                        <linearGradient id="colorVisits" x1="0" y1="0" x2="0" y2="1">
+                          <stop offset="5%" stopColor="#8B5CF6" stopOpacity={0.4}/>
+                          <stop offset="95%" stopColor="#8B5CF6" stopOpacity={0}/>
+                        </linearGradient>
+                      </defs>
+                      <CartesianGrid strokeDasharray="3 3" stroke="#333" vertical={false} />
+                      <XAxis 
+                        dataKey="date" 
+                        stroke="#666"
+                        fontSize={11}
+                        tickLine={false}
+                        axisLine={false}
+                        tickFormatter={(val) => format(new Date(val), 'MMM d')}
+                      />
+                      <YAxis 
+                        stroke="#666" 
+                        fontSize={11}
+                        tickLine={false}
+                        axisLine={false}
+                      />
+                      <Tooltip 
+                        contentStyle={{ backgroundColor: '#18181b', border: '1px solid #3f3f46', borderRadius: '8px' }}
+                        labelStyle={{ color: '#fff', fontWeight: 'bold' }}
+                        formatter={(value) => [value, 'Visitors']}
+                        labelFormatter={(val) => format(new Date(val), 'EEE, MMM d, yyyy')}
+                      />
+                      <Area 
+                        type="monotone" 
+                        dataKey="visits" 
+                        stroke="#8B5CF6" 
+                        strokeWidth={2}
+                        fillOpacity={1} 
+                        fill="url(#colorVisits)" 
+                      />
+                    </AreaChart>
+                  </ResponsiveContainer>
+                )}
               </div>
             </CardContent>
           </Card>
@@ -276,37 +304,41 @@ export default function AdminAnalytics() {
             </CardHeader>
             <CardContent>
               <div className="h-[280px]">
-                <ResponsiveContainer width="100%" height="100%">
-                  <BarChart data={revenueChart}>
-                    <CartesianGrid strokeDasharray="3 3" stroke="#333" vertical={false} />
-                    <XAxis 
-                      dataKey="date" 
-                      stroke="#666"
-                      fontSize={11}
-                      tickLine={false}
-                      axisLine={false}
-                      tickFormatter={(val) => format(new Date(val), 'MMM d')}
-                    />
-                    <YAxis 
-                      stroke="#666" 
-                      fontSize={11}
-                      tickLine={false}
-                      axisLine={false}
-                      allowDecimals={false}
-                    />
-                    <Tooltip 
-                      contentStyle={{ backgroundColor: '#18181b', border: '1px solid #3f3f46', borderRadius: '8px' }}
-                      labelStyle={{ color: '#fff', fontWeight: 'bold' }}
-                      formatter={(value) => [value, 'Orders']}
-                      labelFormatter={(val) => format(new Date(val), 'EEE, MMM d, yyyy')}
-                    />
-                    <Bar 
-                      dataKey="orders" 
-                      fill="#3B82F6"
-                      radius={[4, 4, 0, 0]}
-                    />
-                  </BarChart>
-                </ResponsiveContainer>
+                {revenueChart === null ? (
+                  <SectionUnavailable />
+                ) : (
+                  <ResponsiveContainer width="100%" height="100%">
+                    <BarChart data={revenueChart}>
+                      <CartesianGrid strokeDasharray="3 3" stroke="#333" vertical={false} />
+                      <XAxis 
+                        dataKey="date" 
+                        stroke="#666"
+                        fontSize={11}
+                        tickLine={false}
+                        axisLine={false}
+                        tickFormatter={(val) => format(new Date(val), 'MMM d')}
+                      />
+                      <YAxis 
+                        stroke="#666" 
+                        fontSize={11}
+                        tickLine={false}
+                        axisLine={false}
+                        allowDecimals={false}
+                      />
+                      <Tooltip 
+                        contentStyle={{ backgroundColor: '#18181b', border: '1px solid #3f3f46', borderRadius: '8px' }}
+                        labelStyle={{ color: '#fff', fontWeight: 'bold' }}
+                        formatter={(value) => [value, 'Orders']}
+                        labelFormatter={(val) => format(new Date(val), 'EEE, MMM d, yyyy')}
+                      />
+                      <Bar 
+                        dataKey="orders" 
+                        fill="#3B82F6"
+                        radius={[4, 4, 0, 0]}
+                      />
+                    </BarChart>
+                  </ResponsiveContainer>
+                )}
               </div>
             </CardContent>
           </Card>
@@ -318,40 +350,44 @@ export default function AdminAnalytics() {
             </CardHeader>
             <CardContent>
               <div className="h-[280px]">
-                <ResponsiveContainer width="100%" height="100%">
-                  <LineChart data={revenueChart}>
-                    <CartesianGrid strokeDasharray="3 3" stroke="#333" vertical={false} />
-                    <XAxis 
-                      dataKey="date" 
-                      stroke="#666"
-                      fontSize={11}
-                      tickLine={false}
-                      axisLine={false}
-                      tickFormatter={(val) => format(new Date(val), 'MMM d')}
-                    />
-                    <YAxis 
-                      stroke="#666" 
-                      fontSize={11}
-                      tickLine={false}
-                      axisLine={false}
-                      tickFormatter={(val) => `Rs ${val}`} 
-                    />
-                    <Tooltip 
-                      contentStyle={{ backgroundColor: '#18181b', border: '1px solid #3f3f46', borderRadius: '8px' }}
-                      labelStyle={{ color: '#fff', fontWeight: 'bold' }}
-                      formatter={(value) => [`Rs ${Math.round(value).toLocaleString()}`, 'Avg Order Value']}
-                      labelFormatter={(val) => format(new Date(val), 'EEE, MMM d, yyyy')}
-                    />
-                    <Line 
-                      type="monotone" 
-                      dataKey="avgOrderValue" 
-                      stroke="#10B981" 
-                      strokeWidth={2}
-                      dot={{ fill: '#10B981', strokeWidth: 0, r: 3 }}
-                      activeDot={{ r: 5, fill: '#10B981' }}
-                    />
-                  </LineChart>
-                </ResponsiveContainer>
+                {revenueChart === null ? (
+                  <SectionUnavailable />
+                ) : (
+                  <ResponsiveContainer width="100%" height="100%">
+                    <LineChart data={revenueChart}>
+                      <CartesianGrid strokeDasharray="3 3" stroke="#333" vertical={false} />
+                      <XAxis 
+                        dataKey="date" 
+                        stroke="#666"
+                        fontSize={11}
+                        tickLine={false}
+                        axisLine={false}
+                        tickFormatter={(val) => format(new Date(val), 'MMM d')}
+                      />
+                      <YAxis 
+                        stroke="#666" 
+                        fontSize={11}
+                        tickLine={false}
+                        axisLine={false}
+                        tickFormatter={(val) => `Rs ${val}`} 
+                      />
+                      <Tooltip 
+                        contentStyle={{ backgroundColor: '#18181b', border: '1px solid #3f3f46', borderRadius: '8px' }}
+                        labelStyle={{ color: '#fff', fontWeight: 'bold' }}
+                        formatter={(value) => [`Rs ${Math.round(value).toLocaleString()}`, 'Avg Order Value']}
+                        labelFormatter={(val) => format(new Date(val), 'EEE, MMM d, yyyy')}
+                      />
+                      <Line 
+                        type="monotone" 
+                        dataKey="avgOrderValue" 
+                        stroke="#10B981" 
+                        strokeWidth={2}
+                        dot={{ fill: '#10B981', strokeWidth: 0, r: 3 }}
+                        activeDot={{ r: 5, fill: '#10B981' }}
+                      />
+                    </LineChart>
+                  </ResponsiveContainer>
+                )}
               </div>
             </CardContent>
           </Card>
@@ -368,7 +404,11 @@ export default function AdminAnalytics() {
             </div>
           </CardHeader>
           <CardContent>
-            {topProducts.length === 0 ? (
+            {topProducts === null ? (
+              <div className="py-12">
+                <SectionUnavailable />
+              </div>
+            ) : topProducts.length === 0 ? (
               <div className="py-12 text-center">
                 <Package className="w-12 h-12 text-gray-600 mx-auto mb-3" />
                 <p className="text-gray-400">No sales data yet</p>